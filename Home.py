@@ -13,6 +13,10 @@ st.set_page_config(
 # Apply Password Protection
 login_required()
 
+# Hourly/daily/monthly database backups run on a background thread
+from db_backup import start_backup_scheduler
+start_backup_scheduler()
+
 # Custom CSS for Premium Landing Page
 st.markdown("""
 <style>
@@ -111,6 +115,30 @@ st.markdown("""
         font-size: 0.7rem;
         letter-spacing: 1px;
     }
+    
+    .search-hit {
+        background: #1e293b;
+        border-left: 3px solid #f4b942;
+        border-radius: 8px;
+        padding: 0.6rem 1rem;
+        margin-bottom: 0.5rem;
+        color: #cbd5e1;
+        font-size: 0.9rem;
+    }
+    
+    .search-hit-head {
+        color: #64748b;
+        font-size: 0.75rem;
+        text-transform: uppercase;
+        letter-spacing: 1px;
+    }
+    
+    .search-hit mark {
+        background: #f4b942;
+        color: #0f172a;
+        border-radius: 3px;
+        padding: 0 2px;
+    }
 </style>
 """, unsafe_allow_html=True)
 
@@ -122,6 +150,27 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Global Search across every register
+import html
+from register_search import search, highlight_html
+search_text = st.text_input(
+    "🔎 Search all registers",
+    placeholder="Permit no., tanker no., distillery, batch, brand, remark...",
+)
+if search_text.strip():
+    hits = search(search_text, limit=25)
+    if hits.empty:
+        st.info(f"No entries match \"{search_text}\"")
+    else:
+        st.caption(f"Most relevant matches across the registers ({len(hits)})")
+        for hit in hits.itertuples():
+            st.markdown(f"""
+            <div class="search-hit">
+                <div class="search-hit-head">{html.escape(f"{hit.label} · {hit.row_key} · {hit.row_date or ''}")}</div>
+                {highlight_html(hit.snippet)}
+            </div>
+            """, unsafe_allow_html=True)
+
 # Main Navigation Portal
 st.markdown("### 🚪 Strategic Register Access")
 col1, col2, col3 = st.columns(3)
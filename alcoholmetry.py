@@ -0,0 +1,349 @@
+"""
+Alcoholmetry - Strength / density / temperature conversions for ethanol-water spirit
+A density table (strength % v/v × temperature °C) is precompiled into a NumPy grid
+and every conversion is a bilinear interpolation on it, for single readings or
+whole register histories at once
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+DB_PATH = "excise_registers.db"
+
+REFERENCE_TEMP_C = 20.0
+
+# Grid spacing of the built-in reference table
+STRENGTH_STEP = 0.1
+TEMP_MIN_C, TEMP_MAX_C, TEMP_STEP = 0.0, 40.0, 0.5
+
+# OIML R 22 polynomial: density (kg/m³) at 20 °C against mass fraction of ethanol
+OIML_A = (
+    998.20123, -192.9769495, 389.1238958, -1668.103923, 13522.15441, -88292.78388,
+    306287.4042, -613838.1234, 747017.2998, -547846.1354, 223446.0334, -39032.85426
+)
+ETHANOL_EXPANSION_PER_C = 1.077e-3
+
+CREATE_ALCOHOLMETRY_TABLE = """
+CREATE TABLE IF NOT EXISTS alcoholmetry_table (
+    strength_vv REAL NOT NULL,
+    temperature_c REAL NOT NULL,
+    density_gm_cc REAL NOT NULL,
+    table_ref TEXT,
+    created_at TEXT NOT NULL,
+    
+    PRIMARY KEY (strength_vv, temperature_c)
+);
+"""
+
+# {"strengths": 1-D, "temps": 1-D, "density": 2-D [strength, temp], "source": str}
+_grid: Optional[Dict] = None
+_grid_lock = threading.Lock()
+
+
+# ============================================================================
+# TABLE STORAGE
+# ============================================================================
+
+def init_alcoholmetry_table(conn: Optional[sqlite3.Connection] = None):
+    """Create the alcoholmetry_table if it doesn't exist"""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.executescript(CREATE_ALCOHOLMETRY_TABLE)
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def import_alcoholmetry_csv(csv_source, table_ref: str = "") -> Tuple[bool, str]:
+    """
+    Replace the density table with an official one from a CSV with columns
+    strength_vv, temperature_c, density_gm_cc.
+    
+    csv_source may be a path or a file-like object (e.g. a Streamlit upload).
+    The rows must form a complete rectangular grid.
+    """
+    try:
+        df = pd.read_csv(csv_source)
+        df.columns = [c.strip().lower() for c in df.columns]
+        missing = {"strength_vv", "temperature_c", "density_gm_cc"} - set(df.columns)
+        if missing:
+            return False, f"❌ Missing columns: {', '.join(sorted(missing))}"
+        
+        df = df[["strength_vv", "temperature_c", "density_gm_cc"]].astype(float)
+        if df.duplicated(["strength_vv", "temperature_c"]).any():
+            return False, "❌ Duplicate strength/temperature points in table"
+        
+        grid = df.pivot(index="strength_vv", columns="temperature_c", values="density_gm_cc")
+        if grid.isna().any().any() or grid.shape[0] < 2 or grid.shape[1] < 2:
+            return False, "❌ Table must cover every strength at every temperature"
+        if np.any(np.diff(grid.to_numpy(), axis=0) >= 0):
+            return False, "❌ Density must fall as strength rises at every temperature"
+        
+        if not table_ref and isinstance(csv_source, str):
+            table_ref = os.path.basename(csv_source)
+        
+        conn = sqlite3.connect(DB_PATH)
+        init_alcoholmetry_table(conn)
+        now = datetime.now().isoformat()
+        with conn:
+            conn.execute("DELETE FROM alcoholmetry_table")
+            conn.executemany(
+                "INSERT INTO alcoholmetry_table (strength_vv, temperature_c, density_gm_cc, table_ref, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(s, t, d, table_ref, now) for s, t, d in df.itertuples(index=False)]
+            )
+        conn.close()
+        invalidate_grid_cache()
+        return True, f"✅ Alcoholmetry table imported ({grid.shape[0]} strengths × {grid.shape[1]} temperatures)"
+    except Exception as e:
+        return False, f"❌ Error importing alcoholmetry table: {str(e)}"
+
+
+def _reference_grid() -> Dict:
+    """
+    Built-in table used until an official one is imported.
+    
+    Densities at 20 °C come from the OIML R 22 polynomial. Other temperatures scale
+    the water and ethanol volume fractions by their own thermal expansion - a close
+    approximation; import the official tables for statutory figures.
+    """
+    ethanol_20 = sum(OIML_A) / 1000
+    mass_fraction = np.linspace(0.0, 1.0, 20001)
+    density_20_by_mass = np.polynomial.polynomial.polyval(mass_fraction, OIML_A) / 1000
+    strength_by_mass = mass_fraction * density_20_by_mass / ethanol_20 * 100
+    
+    strengths = np.round(np.arange(0.0, 100.0 + STRENGTH_STEP / 2, STRENGTH_STEP), 1)
+    temps = np.round(np.arange(TEMP_MIN_C, TEMP_MAX_C + TEMP_STEP / 2, TEMP_STEP), 1)
+    density_20 = np.interp(strengths, strength_by_mass, density_20_by_mass)
+    
+    # Relative density of water (Tanaka et al. 2001) and ethanol against 20 °C
+    def water(t):
+        return 999.97495 * (1 - (t - 3.983035) ** 2 * (t + 301.797) / (522528.9 * (t + 69.34881)))
+    
+    water_factor = water(temps) / water(REFERENCE_TEMP_C)
+    ethanol_factor = 1 - ETHANOL_EXPANSION_PER_C * (temps - REFERENCE_TEMP_C)
+    fraction = strengths[:, None] / 100
+    factor = 1 / ((1 - fraction) / water_factor[None, :] + fraction / ethanol_factor[None, :])
+    
+    return {
+        "strengths": strengths,
+        "temps": temps,
+        "density": density_20[:, None] * factor,
+        "source": "Built-in reference (OIML R 22 at 20 °C)",
+    }
+
+
+def _load_grid() -> Dict:
+    global _grid
+    grid = _grid
+    if grid is not None:
+        return grid
+    
+    with _grid_lock:
+        if _grid is None:
+            conn = sqlite3.connect(DB_PATH)
+            try:
+                init_alcoholmetry_table(conn)
+                df = pd.read_sql_query(
+                    "SELECT strength_vv, temperature_c, density_gm_cc, table_ref FROM alcoholmetry_table", conn
+                )
+            finally:
+                conn.close()
+            
+            if df.empty:
+                _grid = _reference_grid()
+            else:
+                table = df.pivot(index="strength_vv", columns="temperature_c", values="density_gm_cc").sort_index()
+                table = table.sort_index(axis=1)
+                _grid = {
+                    "strengths": table.index.to_numpy(dtype=float),
+                    "temps": table.columns.to_numpy(dtype=float),
+                    "density": table.to_numpy(dtype=float),
+                    "source": df["table_ref"].iloc[0] or "Imported table",
+                }
+        return _grid
+
+
+def invalidate_grid_cache():
+    """Force the next conversion to reload the density table"""
+    global _grid
+    with _grid_lock:
+        _grid = None
+
+
+def get_table_info() -> Dict:
+    """Source and coverage of the density table in use"""
+    grid = _load_grid()
+    return {
+        "source": grid["source"],
+        "strength_range": (float(grid["strengths"][0]), float(grid["strengths"][-1])),
+        "temp_range": (float(grid["temps"][0]), float(grid["temps"][-1])),
+    }
+
+
+# ============================================================================
+# INTERPOLATION
+# ============================================================================
+
+def _locate(axis: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Lower cell index and fractional offset of each value on a sorted axis"""
+    inside = (values >= axis[0]) & (values <= axis[-1])
+    idx = np.clip(np.searchsorted(axis, values, side="right") - 1, 0, len(axis) - 2)
+    frac = (values - axis[idx]) / (axis[idx + 1] - axis[idx])
+    return idx, frac, inside
+
+
+def _column_value(rows: np.ndarray, j: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Table density at strength row `rows`, interpolated between temperature columns j and j+1"""
+    density = _load_grid()["density"]
+    return density[rows, j] * (1 - v) + density[rows, j + 1] * v
+
+
+def _result(values: np.ndarray):
+    return float(values) if values.ndim == 0 else values
+
+
+def density_at(strength_vv, temp_c):
+    """
+    Density (gm/cc) of spirit of a given true strength at a given temperature.
+    
+    Accepts scalars or array-likes (broadcast together); readings outside the
+    table give NaN.
+    """
+    grid = _load_grid()
+    strength, temp = np.broadcast_arrays(np.asarray(strength_vv, dtype=float), np.asarray(temp_c, dtype=float))
+    i, u, s_inside = _locate(grid["strengths"], strength)
+    j, v, t_inside = _locate(grid["temps"], temp)
+    
+    d = grid["density"]
+    result = ((1 - u) * (1 - v) * d[i, j] + u * (1 - v) * d[i + 1, j]
+              + (1 - u) * v * d[i, j + 1] + u * v * d[i + 1, j + 1])
+    return _result(np.where(s_inside & t_inside, result, np.nan))
+
+
+def strength_from_density(density_gm_cc, temp_c):
+    """
+    True strength (% v/v at 20 °C) of spirit with a density measured at temp_c.
+    
+    Each reading is inverted by bisection over the strength rows of its
+    temperature-interpolated table column, all readings advancing together.
+    """
+    density, temp = np.broadcast_arrays(np.asarray(density_gm_cc, dtype=float), np.asarray(temp_c, dtype=float))
+    shape = density.shape
+    density, temp = density.ravel(), temp.ravel()
+    
+    grid = _load_grid()
+    strengths = grid["strengths"]
+    j, v, inside = _locate(grid["temps"], temp)
+    
+    # Density falls as strength rises: keep lo denser than the reading, hi not
+    lo = np.zeros(len(density), dtype=int)
+    hi = np.full(len(density), len(strengths) - 1)
+    top, bottom = _column_value(lo, j, v), _column_value(hi, j, v)
+    while np.any(hi - lo > 1):
+        mid = (lo + hi) // 2
+        denser = _column_value(mid, j, v) > density
+        lo = np.where(denser, mid, lo)
+        hi = np.where(denser, hi, mid)
+    
+    upper, lower = _column_value(lo, j, v), _column_value(hi, j, v)
+    frac = (upper - density) / (upper - lower)
+    result = strengths[lo] + frac * (strengths[hi] - strengths[lo])
+    
+    valid = inside & (density <= top) & (density >= bottom)
+    return _result(np.where(valid, result, np.nan).reshape(shape))
+
+
+def density_to_20c(density_gm_cc, temp_c):
+    """Density at 20 °C of spirit whose density was measured at temp_c"""
+    return density_at(strength_from_density(density_gm_cc, temp_c), REFERENCE_TEMP_C)
+
+
+def true_strength(indication, temp_c):
+    """
+    True strength from an alcoholmeter indication (apparent % v/v) read at temp_c.
+    
+    The meter is graduated at 20 °C, so the indication names the strength whose
+    20 °C density equals the liquid's density at the reading temperature.
+    """
+    return strength_from_density(density_at(indication, REFERENCE_TEMP_C), temp_c)
+
+
+def bl_at_20c(bl, strength_vv, temp_c):
+    """Bulk litres at temp_c corrected to 20 °C (mass is conserved)"""
+    return (np.asarray(bl, dtype=float) * np.asarray(density_at(strength_vv, temp_c))
+            / np.asarray(density_at(strength_vv, REFERENCE_TEMP_C)))
+
+
+# ============================================================================
+# BATCH CONVERSION
+# ============================================================================
+
+def convert_readings(df: pd.DataFrame, density_col: str, temp_col: str,
+                     mass_col: Optional[str] = None) -> pd.DataFrame:
+    """
+    Derive strength, density at 20 °C and (with mass_col) BL / AL at 20 °C for
+    every row of a DataFrame of density readings in one vectorized call.
+    
+    Adds derived_strength, derived_density_20c and, with mass_col, derived_bl_20c
+    and derived_al columns to a copy of df.
+    """
+    out = df.copy()
+    density = out[density_col].to_numpy(dtype=float)
+    temp = out[temp_col].to_numpy(dtype=float)
+    
+    strength = strength_from_density(density, temp)
+    density_20 = density_at(strength, REFERENCE_TEMP_C)
+    out["derived_strength"] = np.round(strength, 2)
+    out["derived_density_20c"] = np.round(density_20, 4)
+    
+    if mass_col:
+        bl_20 = out[mass_col].to_numpy(dtype=float) / density_20
+        out["derived_bl_20c"] = np.round(bl_20, 2)
+        out["derived_al"] = np.round(bl_20 * strength / 100, 2)
+    return out
+
+
+def rederive_reg76_readings(start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+    """
+    Recompute strength, density at 20 °C and BL at 20 °C of every Reg-76 receipt
+    from its MFM mass, density at temperature and unloading temperature, with the
+    variance against the recorded values. Recorded values are not modified.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    query = """
+        SELECT reg76_id, permit_no, date_receipt, rec_mass_kg, rec_unload_temp,
+               rec_density_at_temp, rec_density_20c, rec_strength, rec_bl_20c
+        FROM reg76_receipts
+        WHERE rec_density_at_temp > 0 AND rec_mass_kg > 0
+    """
+    params = []
+    if start_date and end_date:
+        query += " AND date_receipt BETWEEN ? AND ?"
+        params = [str(start_date), str(end_date)]
+    query += " ORDER BY date_receipt"
+    
+    try:
+        df = pd.read_sql_query(query, conn, params=params if params else None)
+    finally:
+        conn.close()
+    
+    if df.empty:
+        return df
+    
+    df = df.fillna({"rec_unload_temp": REFERENCE_TEMP_C, "rec_density_20c": 0.0,
+                    "rec_strength": 0.0, "rec_bl_20c": 0.0})
+    df = convert_readings(df, "rec_density_at_temp", "rec_unload_temp", mass_col="rec_mass_kg")
+    
+    df["strength_variance"] = (df["rec_strength"] - df["derived_strength"]).round(2)
+    df["density_20c_variance"] = (df["rec_density_20c"] - df["derived_density_20c"]).round(4)
+    df["bl_20c_variance"] = (df["rec_bl_20c"] - df["derived_bl_20c"]).round(2)
+    return df
@@ -0,0 +1,366 @@
+"""
+Artifact Store - Content-addressed cache of generated reports
+Handbook PDFs, maintenance reports and Register Format exports are stored
+compressed under the hash of their bytes and indexed by what produced them
+(kind, generator version, digest of the input data). Asking again for a report
+whose inputs have not changed copies the stored file out instead of rendering
+it; identical outputs are stored once, and the least recently used entries are
+evicted once the store outgrows its size limit.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import zlib
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+import logging
+
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STORE_ROOT = "artifact_store"
+MAX_STORE_BYTES = 512 * 1024 * 1024
+
+# Keep a blob compressed only if that saves at least this fraction (PDFs and xlsx are already deflated)
+MIN_COMPRESSION_SAVING = 0.05
+
+CREATE_ARTIFACT_TABLES = """
+CREATE TABLE IF NOT EXISTS blobs (
+    content_hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    stored_size INTEGER NOT NULL,
+    compressed INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS artifacts (
+    cache_key TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    generator_version TEXT NOT NULL,
+    input_digest TEXT NOT NULL,
+    name TEXT,
+    content_hash TEXT NOT NULL REFERENCES blobs(content_hash),
+    created_at TEXT NOT NULL,
+    last_access TEXT NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_artifacts_lru ON artifacts(last_access);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind ON artifacts(kind, input_digest);
+CREATE INDEX IF NOT EXISTS idx_artifacts_blob ON artifacts(content_hash);
+"""
+
+_stores: Dict[str, "ArtifactStore"] = {}
+_stores_lock = threading.Lock()
+
+
+# ============================================================================
+# INPUT DIGESTS
+# ============================================================================
+
+def digest_inputs(*parts) -> str:
+    """Stable digest of JSON-serializable input descriptions"""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_digest(path) -> Optional[str]:
+    """sha256 of a file's bytes, or None if it does not exist"""
+    if not os.path.exists(path):
+        return None
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def table_state(conn: sqlite3.Connection, table: str, date_col: Optional[str] = None,
+                through: Optional[str] = None) -> Optional[list]:
+    """
+    Cheap fingerprint of a table's rows (only those dated on or before through,
+    when given): row count, highest rowid, sum of row versions and the latest
+    change-log entry. Any insert, update or delete among those rows changes it.
+    None if the table does not exist.
+    """
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if not columns:
+        return None
+    where, params = "", []
+    if date_col and through is not None:
+        where, params = f"WHERE {date_col} <= ?", [str(through)]
+    version = "COALESCE(SUM(row_version), 0)" if "row_version" in columns else "0"
+    state = list(conn.execute(
+        f"SELECT COUNT(*), COALESCE(MAX(rowid), 0), {version} FROM {table} {where}", params
+    ).fetchone())
+    
+    has_log = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'").fetchone()
+    if has_log:
+        log_where = "table_name = ?" + (" AND row_date <= ?" if where else "")
+        state.append(conn.execute(
+            f"SELECT COALESCE(MAX(seq), 0) FROM change_log WHERE {log_where}", [table] + params
+        ).fetchone()[0])
+    return state
+
+
+def frame_digest(df: pd.DataFrame) -> str:
+    """Digest of a DataFrame's contents, for inputs read outside the register database"""
+    return hashlib.sha256(df.to_csv(index=False).encode("utf-8")).hexdigest()
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class ArtifactStore:
+    """
+    Blobs live at <root>/objects/<2 hex>/<sha256>; the index is a small
+    SQLite database of its own, so caching never touches the register database.
+    """
+    
+    def __init__(self, root: str = STORE_ROOT, max_bytes: int = MAX_STORE_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.index_path = os.path.join(root, "index.db")
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(CREATE_ARTIFACT_TABLES)
+            conn.commit()
+        finally:
+            conn.close()
+    
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.index_path, timeout=30)
+    
+    def _blob_path(self, content_hash: str) -> str:
+        return os.path.join(self.root, "objects", content_hash[:2], content_hash)
+    
+    @staticmethod
+    def cache_key(kind: str, generator_version: str, input_digest: str) -> str:
+        return hashlib.sha256(f"{kind}\n{generator_version}\n{input_digest}".encode("utf-8")).hexdigest()
+    
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+    
+    def get(self, kind: str, generator_version: str, input_digest: str) -> Optional[bytes]:
+        """The stored artifact's bytes, or None on a miss (an unreadable blob counts as a miss)"""
+        key = self.cache_key(kind, generator_version, input_digest)
+        conn = self._connect()
+        try:
+            row = conn.execute("""
+                SELECT a.content_hash, b.compressed FROM artifacts a
+                JOIN blobs b ON b.content_hash = a.content_hash
+                WHERE a.cache_key = ?
+            """, (key,)).fetchone()
+            if row is None:
+                return None
+            content_hash, compressed = row
+            try:
+                with open(self._blob_path(content_hash), "rb") as f:
+                    data = f.read()
+                if compressed:
+                    data = zlib.decompress(data)
+            except (OSError, zlib.error) as e:
+                logger.error(f"❌ Artifact blob {content_hash} unreadable, dropping it: {e}")
+                with conn:
+                    conn.execute("DELETE FROM artifacts WHERE content_hash = ?", (content_hash,))
+                    conn.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+                return None
+            if hashlib.sha256(data).hexdigest() != content_hash:
+                logger.error(f"❌ Artifact blob {content_hash} failed its hash check, dropping it")
+                with conn:
+                    conn.execute("DELETE FROM artifacts WHERE content_hash = ?", (content_hash,))
+                    conn.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+                return None
+            with conn:
+                conn.execute("UPDATE artifacts SET last_access = ?, hits = hits + 1 WHERE cache_key = ?",
+                             (datetime.now().isoformat(), key))
+            return data
+        finally:
+            conn.close()
+    
+    def fetch_to(self, kind: str, generator_version: str, input_digest: str, path) -> bool:
+        """Write the stored artifact to path (atomically); False on a miss"""
+        data = self.get(kind, generator_version, input_digest)
+        if data is None:
+            return False
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return True
+    
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    
+    def put(self, kind: str, generator_version: str, input_digest: str, data: bytes,
+            name: Optional[str] = None) -> str:
+        """Store bytes under their content hash (once) and index them; returns the content hash"""
+        content_hash = hashlib.sha256(data).hexdigest()
+        blob_path = self._blob_path(content_hash)
+        compressed_data = zlib.compress(data, 6)
+        compressed = len(compressed_data) <= len(data) * (1 - MIN_COMPRESSION_SAVING)
+        stored = compressed_data if compressed else data
+        
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(stored)
+            os.replace(tmp_path, blob_path)
+        
+        now = datetime.now().isoformat()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("""
+                    INSERT OR IGNORE INTO blobs (content_hash, size, stored_size, compressed)
+                    VALUES (?, ?, ?, ?)
+                """, (content_hash, len(data), len(stored), int(compressed)))
+                conn.execute("""
+                    INSERT INTO artifacts (cache_key, kind, generator_version, input_digest, name,
+                                           content_hash, created_at, last_access)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(cache_key) DO UPDATE SET
+                        name = excluded.name,
+                        content_hash = excluded.content_hash,
+                        created_at = excluded.created_at,
+                        last_access = excluded.last_access
+                """, (self.cache_key(kind, generator_version, input_digest), kind, generator_version,
+                      input_digest, name, content_hash, now, now))
+        finally:
+            conn.close()
+        self.evict()
+        return content_hash
+    
+    def put_file(self, kind: str, generator_version: str, input_digest: str, path) -> str:
+        with open(path, "rb") as f:
+            return self.put(kind, generator_version, input_digest, f.read(), os.path.basename(str(path)))
+    
+    # ------------------------------------------------------------------
+    # Eviction and housekeeping
+    # ------------------------------------------------------------------
+    
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Drop least recently used artifacts until the blobs still referenced fit
+        in max_bytes, then delete unreferenced blobs. Returns artifacts dropped.
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        conn = self._connect()
+        try:
+            total = conn.execute("SELECT COALESCE(SUM(stored_size), 0) FROM blobs").fetchone()[0]
+            dropped = 0
+            if total > limit:
+                rows = conn.execute("""
+                    SELECT a.cache_key, a.content_hash, b.stored_size FROM artifacts a
+                    JOIN blobs b ON b.content_hash = a.content_hash
+                    ORDER BY a.last_access
+                """).fetchall()
+                references: Dict[str, int] = {}
+                for _, content_hash, _ in rows:
+                    references[content_hash] = references.get(content_hash, 0) + 1
+                with conn:
+                    for cache_key, content_hash, stored_size in rows:
+                        if total <= limit:
+                            break
+                        conn.execute("DELETE FROM artifacts WHERE cache_key = ?", (cache_key,))
+                        dropped += 1
+                        references[content_hash] -= 1
+                        if references[content_hash] == 0:
+                            total -= stored_size
+            
+            orphans = [row[0] for row in conn.execute("""
+                SELECT content_hash FROM blobs
+                WHERE content_hash NOT IN (SELECT content_hash FROM artifacts)
+            """)]
+            with conn:
+                for content_hash in orphans:
+                    conn.execute("DELETE FROM blobs WHERE content_hash = ?", (content_hash,))
+            for content_hash in orphans:
+                blob_path = self._blob_path(content_hash)
+                try:
+                    os.remove(blob_path)
+                    os.rmdir(os.path.dirname(blob_path))  # only succeeds once the shard is empty
+                except OSError:
+                    pass
+            if dropped:
+                logger.info(f"✅ Artifact store: evicted {dropped} artifacts, {len(orphans)} blobs")
+            return dropped
+        finally:
+            conn.close()
+    
+    def stats(self) -> Dict:
+        conn = self._connect()
+        try:
+            artifacts, hits = conn.execute("SELECT COUNT(*), COALESCE(SUM(hits), 0) FROM artifacts").fetchone()
+            blobs, size, stored = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(stored_size), 0) FROM blobs"
+            ).fetchone()
+            return {"artifacts": artifacts, "blobs": blobs, "hits": hits, "bytes": size,
+                    "stored_bytes": stored, "max_bytes": self.max_bytes}
+        finally:
+            conn.close()
+    
+    def entries(self) -> pd.DataFrame:
+        """The index, most recently used first"""
+        conn = self._connect()
+        try:
+            return pd.read_sql_query("""
+                SELECT a.kind, a.name, a.generator_version, a.input_digest, a.content_hash,
+                       b.size, b.stored_size, a.hits, a.created_at, a.last_access
+                FROM artifacts a JOIN blobs b ON b.content_hash = a.content_hash
+                ORDER BY a.last_access DESC
+            """, conn)
+        finally:
+            conn.close()
+
+
+# ============================================================================
+# MODULE API
+# ============================================================================
+
+def get_store(root: str = STORE_ROOT) -> ArtifactStore:
+    """The store at root, opened once per process"""
+    path = os.path.abspath(root)
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = ArtifactStore(root)
+        return store
+
+
+def cached_file(kind: str, generator_version: str, input_digest: str, path,
+                render: Callable[[], object]) -> Tuple[str, bool]:
+    """
+    Put the artifact for these inputs at path: copied from the store if it is
+    there, otherwise rendered by render() (which must write path) and stored.
+    Returns (path, served_from_store). A store failure never stops rendering.
+    """
+    try:
+        store = get_store()
+        if store.fetch_to(kind, generator_version, input_digest, path):
+            return str(path), True
+    except Exception as e:
+        logger.error(f"❌ Artifact store lookup failed: {e}")
+        store = None
+    
+    render()
+    if store is not None:
+        try:
+            store.put_file(kind, generator_version, input_digest, path)
+        except Exception as e:
+            logger.error(f"❌ Could not store artifact {path}: {e}")
+    return str(path), False
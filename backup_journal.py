@@ -0,0 +1,288 @@
+"""
+Backup Journal - Append-only, crash-safe CSV backups
+Each register save appends one checksummed JSON line to a journal segment and
+fsyncs it, instead of rewriting the whole backup CSV. A background compactor
+folds the journal into the CSV snapshot (written to a temp file and swapped in
+atomically), so the snapshot is never left half-written.
+
+Usage: python backup_journal.py      # compact every journal now
+"""
+
+import glob
+import json
+import os
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# A segment is sealed and a new one started past this size
+SEGMENT_MAX_BYTES = 1_000_000
+
+# The background compactor folds a journal once it holds this many entries
+COMPACT_AFTER_ENTRIES = 200
+COMPACT_INTERVAL_SECONDS = 300
+
+_journals: Dict[str, "BackupJournal"] = {}
+_compactor: Optional[threading.Thread] = None
+_compactor_lock = threading.Lock()
+
+
+def _fsync_dir(path: str):
+    """Make a rename durable; directories cannot be opened on Windows, where this is skipped"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+@contextmanager
+def _process_lock(path: str):
+    """
+    Exclusive lock on path shared with other processes (the app and a
+    `python backup_journal.py` run), on top of the in-process lock
+    """
+    with open(path, "a+b") as f:
+        try:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except ImportError:
+            import msvcrt  # Windows
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            try:
+                import fcntl
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            except ImportError:
+                import msvcrt
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _encode(entry: Dict) -> str:
+    payload = json.dumps(entry, sort_keys=True, default=str, ensure_ascii=False)
+    return f"{zlib.crc32(payload.encode('utf-8')):08x} {payload}\n"
+
+
+def _decode(line: str) -> Optional[Dict]:
+    """The entry on a journal line, or None if the line is torn or fails its checksum"""
+    crc, _, payload = line.rstrip("\n").partition(" ")
+    try:
+        if int(crc, 16) != zlib.crc32(payload.encode("utf-8")):
+            return None
+        return json.loads(payload)
+    except ValueError:
+        return None
+
+
+class BackupJournal:
+    """
+    Journaled backup of one register CSV. The CSV at csv_path stays the
+    snapshot; pending changes live in backup_data/journal/<csv name>/.
+    """
+    
+    def __init__(self, csv_path: str, key: str, columns: Optional[List[str]] = None):
+        self.csv_path = csv_path
+        self.key = key
+        self.columns = list(columns or [])
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        self.journal_dir = os.path.join(os.path.dirname(csv_path) or ".", "journal", name)
+        self._lock = threading.Lock()
+        _journals[csv_path] = self
+    
+    @contextmanager
+    def _locked(self):
+        with self._lock:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with _process_lock(os.path.join(self.journal_dir, ".lock")):
+                yield
+    
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+    
+    def _segments(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.journal_dir, "segment-*.jsonl")))
+    
+    def _new_segment_path(self, segments: List[str]) -> str:
+        last = int(os.path.basename(segments[-1])[8:-6]) if segments else 0
+        return os.path.join(self.journal_dir, f"segment-{last + 1:06d}.jsonl")
+    
+    @staticmethod
+    def _torn(path: str) -> bool:
+        """A segment whose last append was cut off; nothing more is written after the torn line"""
+        with open(path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b"\n"
+    
+    def _append(self, entry: Dict):
+        entry["ts"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        line = _encode(entry)
+        with self._locked():
+            segments = self._segments()
+            if not segments or os.path.getsize(segments[-1]) >= SEGMENT_MAX_BYTES or self._torn(segments[-1]):
+                segments.append(self._new_segment_path(segments))
+            with open(segments[-1], "a", encoding="utf-8") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+        start_background_compactor()
+    
+    def append_upsert(self, record: Dict):
+        """Journal the current state of one record (replaces any earlier copy of its key)"""
+        self._append({"op": "upsert", "key": str(record.get(self.key, "")), "record": record})
+    
+    def append_delete(self, key_value):
+        self._append({"op": "delete", "key": str(key_value)})
+    
+    def append_clear(self):
+        self._append({"op": "clear"})
+    
+    # ------------------------------------------------------------------
+    # Reading and compaction
+    # ------------------------------------------------------------------
+    
+    def _read_entries(self, segments: List[str]) -> List[Dict]:
+        entries = []
+        for path in segments:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    entry = _decode(line)
+                    if entry is None:
+                        # Only a crash mid-append leaves a bad line, and it is always the last one
+                        print(f"Backup journal: skipping damaged entry in {path}")
+                        break
+                    entries.append(entry)
+        return entries
+    
+    def _fold(self, snapshot: pd.DataFrame, entries: List[Dict]) -> pd.DataFrame:
+        columns = list(snapshot.columns) or list(self.columns)
+        records: Dict[str, Dict] = {}
+        unkeyed = []
+        for row in snapshot.to_dict("records"):
+            key_value = row.get(self.key)
+            if pd.isna(key_value) or str(key_value).strip() == "":
+                unkeyed.append(row)
+            else:
+                records[str(key_value)] = row
+        
+        for entry in entries:
+            op = entry.get("op")
+            if op == "upsert":
+                records.pop(entry["key"], None)  # re-saved records move to the end, as appended rows did
+                records[entry["key"]] = entry["record"]
+                columns += [c for c in entry["record"] if c not in columns]
+            elif op == "delete":
+                records.pop(entry["key"], None)
+            elif op == "clear":
+                records.clear()
+                unkeyed.clear()
+        
+        return pd.DataFrame(unkeyed + list(records.values()), columns=columns)
+    
+    def _read_snapshot(self) -> pd.DataFrame:
+        if os.path.exists(self.csv_path):
+            try:
+                return pd.read_csv(self.csv_path)
+            except pd.errors.EmptyDataError:
+                pass
+        return pd.DataFrame(columns=self.columns)
+    
+    def read(self) -> pd.DataFrame:
+        """The backup as of the latest save: snapshot with the journal replayed on top"""
+        with self._locked():
+            segments = self._segments()
+            return self._fold(self._read_snapshot(), self._read_entries(segments))
+    
+    def pending_entries(self) -> int:
+        """Journal entries not yet folded into the snapshot"""
+        with self._locked():
+            return len(self._read_entries(self._segments()))
+    
+    def compact(self) -> int:
+        """
+        Fold every journal entry into the CSV snapshot and remove the folded
+        segments; returns the number of entries folded.
+        
+        The active segment is sealed first by starting an empty one after it, so
+        appends made after the fold (from any process) land in a segment that is
+        never deleted here.
+        """
+        with self._locked():
+            segments = self._segments()
+            if not segments or (len(segments) == 1 and os.path.getsize(segments[0]) == 0):
+                return 0
+            if os.path.getsize(segments[-1]) > 0:
+                open(self._new_segment_path(segments), "a").close()
+            else:
+                segments = segments[:-1]
+            entries = self._read_entries(segments)
+            df = self._fold(self._read_snapshot(), entries)
+            
+            os.makedirs(os.path.dirname(self.csv_path) or ".", exist_ok=True)
+            tmp_path = f"{self.csv_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+                df.to_csv(f, index=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.csv_path)
+            _fsync_dir(os.path.dirname(self.csv_path) or ".")
+            
+            for path in segments:
+                os.remove(path)
+            return len(entries)
+
+
+# ============================================================================
+# COMPACTION
+# ============================================================================
+
+def compact_all(min_entries: int = 0) -> Dict[str, int]:
+    """Compact every journal with at least min_entries pending; returns entries folded per CSV"""
+    folded = {}
+    for csv_path, journal in list(_journals.items()):
+        try:
+            if journal.pending_entries() >= max(min_entries, 1):
+                folded[csv_path] = journal.compact()
+        except Exception as e:
+            print(f"Backup journal compaction failed for {csv_path}: {e}")
+    return folded
+
+
+def _compactor_loop(interval: float):
+    while True:
+        time.sleep(interval)
+        compact_all(COMPACT_AFTER_ENTRIES)
+
+
+def start_background_compactor(interval: float = COMPACT_INTERVAL_SECONDS):
+    """Start the compactor thread once per process (the first journal append does this)"""
+    global _compactor
+    with _compactor_lock:
+        if _compactor is None or not _compactor.is_alive():
+            _compactor = threading.Thread(target=_compactor_loop, args=(interval,),
+                                          name="backup-journal-compactor", daemon=True)
+            _compactor.start()
+
+
+if __name__ == "__main__":
+    # Register every backend's journal, then fold them all
+    import reg76_backend, reg74_backend, rega_backend, reg78_backend, spirit_transaction_backend  # noqa: F401
+    for path, count in compact_all().items():
+        print(f"✅ {path}: {count} journal entries folded")
@@ -0,0 +1,256 @@
+"""
+Changelog - Change data capture for the register tables
+Triggers append (table, pk, op, version, timestamp) to change_log on every
+insert, update and delete, so mirrors, caches and rollups can process just the
+rows changed since their last checkpoint instead of rereading whole tables
+"""
+
+import sqlite3
+from typing import Iterable, Optional
+import logging
+
+import pandas as pd
+
+from row_versions import ROW_VERSION_COLUMN
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# Register table -> (primary key column, register date column)
+TRACKED_TABLES = {
+    "reg76_receipts": ("reg76_id", "date_receipt"),
+    "reg74_operations": ("reg74_id", "operation_date"),
+    "rega_production": ("rega_id", "production_date"),
+    "reg78_synopsis": ("reg78_id", "synopsis_date"),
+    "spirit_transaction_daily": ("txn_date", "txn_date"),
+    "regb_production_fees": ("regb_fees_id", "date"),
+    "regb_bottle_stock": ("regb_stock_id", "date"),
+    "regb_daily_summary": ("regb_summary_id", "date"),
+    "excise_duty_ledger": ("duty_id", "date"),
+    "excise_duty_bottles": ("duty_bottle_id", "date"),
+    "excise_duty_summary": ("summary_id", "date"),
+}
+
+CHANGE_COLUMNS = ["seq", "table_name", "pk", "op", "row_version", "row_date", "changed_at"]
+
+# AUTOINCREMENT keeps seq increasing after old entries are purged, so cursors stay valid
+CREATE_CHANGELOG_TABLES = """
+CREATE TABLE IF NOT EXISTS change_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    pk TEXT NOT NULL,
+    op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+    row_version INTEGER,
+    row_date TEXT,
+    changed_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime'))
+);
+
+CREATE TABLE IF NOT EXISTS change_cursors (
+    consumer TEXT PRIMARY KEY,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+"""
+
+CREATE_CHANGELOG_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_change_log_table ON change_log(table_name, seq);
+"""
+
+TRIGGER_TEMPLATE = """
+CREATE TRIGGER IF NOT EXISTS trg_cdc_{table}_{suffix} AFTER {event} ON {table}
+BEGIN
+    INSERT INTO change_log (table_name, pk, op, row_version, row_date)
+    VALUES ('{table}', CAST({ref}.{pk} AS TEXT), '{op}', {version}, {ref}.{date_col});
+END;
+"""
+
+EVENTS = [("ins", "INSERT", "NEW", "I"), ("upd", "UPDATE", "NEW", "U"), ("del", "DELETE", "OLD", "D")]
+
+
+# ============================================================================
+# DATABASE INITIALIZATION
+# ============================================================================
+
+def init_changelog(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Create the changelog tables and a capture trigger set on every tracked
+    register table that exists. Changes made before a table's triggers exist
+    are not in the log.
+    """
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_CHANGELOG_TABLES)
+        conn.executescript(CREATE_CHANGELOG_INDEXES)
+        existing = dict(conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_cdc_%'"
+        ).fetchall())
+        
+        for table, (pk, date_col) in TRACKED_TABLES.items():
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+            if not columns:
+                continue
+            for suffix, event, ref, op in EVENTS:
+                version = f"{ref}.{ROW_VERSION_COLUMN}" if ROW_VERSION_COLUMN in columns else "NULL"
+                # Recreate triggers made before the table gained its row_version column
+                name = f"trg_cdc_{table}_{suffix}"
+                if name in existing and version not in existing[name]:
+                    conn.execute(f"DROP TRIGGER {name}")
+                conn.executescript(TRIGGER_TEMPLATE.format(
+                    table=table, suffix=suffix, event=event, ref=ref, op=op,
+                    pk=pk, date_col=date_col, version=version
+                ))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing changelog: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+# ============================================================================
+# CONSUMER API
+# ============================================================================
+
+def get_cursor(consumer: str) -> int:
+    """Last change seq the consumer has processed (0 for a new consumer)"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        row = conn.execute("SELECT last_seq FROM change_cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else 0
+    finally:
+        conn.close()
+
+
+def latest_seq() -> int:
+    """Seq of the newest change in the log"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        return conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _table_filter(tables: Optional[Iterable[str]]):
+    if not tables:
+        return "", []
+    tables = list(tables)
+    unknown = [t for t in tables if t not in TRACKED_TABLES]
+    if unknown:
+        raise ValueError(f"Not a tracked table: {', '.join(unknown)}")
+    return f" AND table_name IN ({', '.join('?' for _ in tables)})", tables
+
+
+def read_changes(consumer: str, tables: Optional[Iterable[str]] = None,
+                 limit: Optional[int] = None) -> pd.DataFrame:
+    """
+    Changes after the consumer's cursor, oldest first. The cursor does not move
+    until advance_cursor() is called with the last seq actually processed, so a
+    consumer that fails part way through sees the same changes again.
+    """
+    where, params = _table_filter(tables)
+    sql = f"SELECT {', '.join(CHANGE_COLUMNS)} FROM change_log WHERE seq > ?{where} ORDER BY seq"
+    if limit:
+        sql += f" LIMIT {int(limit)}"
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        row = conn.execute("SELECT last_seq FROM change_cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return pd.read_sql_query(sql, conn, params=[row[0] if row else 0] + params)
+    except Exception as e:
+        logger.error(f"❌ Error reading changes for {consumer}: {e}")
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    finally:
+        conn.close()
+
+
+def read_changed_rows(consumer: str, table: str) -> pd.DataFrame:
+    """
+    Net change per row of one table since the cursor: one line per pk with its
+    last op, version and date. A row inserted and then deleted shows as 'D'.
+    """
+    _table_filter([table])
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        row = conn.execute("SELECT last_seq FROM change_cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return pd.read_sql_query(f"""
+            SELECT {', '.join(CHANGE_COLUMNS)}
+            FROM change_log
+            WHERE seq IN (
+                SELECT MAX(seq) FROM change_log
+                WHERE table_name = ? AND seq > ?
+                GROUP BY pk
+            )
+            ORDER BY seq
+        """, conn, params=[table, row[0] if row else 0])
+    except Exception as e:
+        logger.error(f"❌ Error reading changed rows for {consumer}: {e}")
+        return pd.DataFrame(columns=CHANGE_COLUMNS)
+    finally:
+        conn.close()
+
+
+def advance_cursor(consumer: str, seq: int) -> bool:
+    """Checkpoint the consumer at seq; a cursor never moves backwards"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        with conn:
+            conn.execute("""
+                INSERT INTO change_cursors (consumer, last_seq, updated_at)
+                VALUES (?, ?, datetime('now', 'localtime'))
+                ON CONFLICT(consumer) DO UPDATE SET
+                    last_seq = MAX(last_seq, excluded.last_seq),
+                    updated_at = excluded.updated_at
+            """, (consumer, int(seq)))
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error advancing cursor for {consumer}: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def reset_cursor(consumer: str) -> bool:
+    """Forget a consumer's checkpoint; it should do a full pass before reading changes again"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        with conn:
+            conn.execute("DELETE FROM change_cursors WHERE consumer = ?", (consumer,))
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error resetting cursor for {consumer}: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def purge_changelog() -> int:
+    """Delete changes every registered consumer has processed; returns rows removed"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_changelog(conn)
+        with conn:
+            floor = conn.execute("SELECT MIN(last_seq) FROM change_cursors").fetchone()[0]
+            if floor is None:
+                return 0
+            removed = conn.execute("DELETE FROM change_log WHERE seq <= ?", (floor,)).rowcount
+        logger.info(f"✅ Changelog purged: {removed} entries")
+        return removed
+    except Exception as e:
+        logger.error(f"❌ Error purging changelog: {e}")
+        return 0
+    finally:
+        conn.close()
@@ -0,0 +1,118 @@
+"""
+Import-time audit for the backends and CLI tools
+Imports each module in a fresh interpreter with `python -X importtime`, reports
+its slowest dependencies and fails if a heavy optional dependency is loaded at
+import or the module takes too long over the baseline (pandas + streamlit,
+which every backend needs). Imports run from a copy of the modules in a temp
+directory, so modules that create tables at import (some locate the database
+next to their own file) never touch the working database.
+
+Usage: python check_import_time.py [module ...]
+"""
+
+import glob
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Import time allowed on top of the baseline, in milliseconds; the backends add
+# about 250 on their own, so this leaves room for machine noise
+DEFAULT_BUDGET_MS = 600
+
+# Imported first to measure the shared cost every module pays
+BASELINE = "import pandas, streamlit"
+
+# Only loaded when a sync or PDF actually runs
+DEFERRED_MODULES = ["gspread", "google.oauth2", "googleapiclient", "streamlit_gsheets", "reportlab"]
+
+# module -> deferred dependencies it legitimately needs at import
+TARGETS = {
+    "reg76_backend": [],
+    "reg74_backend": [],
+    "rega_backend": [],
+    "reg78_backend": [],
+    "regb_backend": [],
+    "excise_duty_backend": [],
+    "spirit_transaction_backend": [],
+    "maintenance_backend": [],
+    "rega_analytics": [],
+    "reg76_reconciliation": [],
+    "alcoholmetry": [],
+    "lineage": [],
+    "changelog": [],
+    "handbook_generator_v2": ["reportlab"],
+    "handbook_data": [],
+    "job_queue": [],
+    "register_search": [],
+    "consistency_scan": [],
+}
+
+
+def _importtime(code: str):
+    """{imported module: cumulative_ms} for running code in a fresh interpreter on a temp copy of the repo modules"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for path in glob.glob(os.path.join(REPO_DIR, "*.py")):
+            shutil.copy2(path, tmp_dir)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True, text=True, cwd=tmp_dir
+        )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, _, cumulative, name = [part.strip() for part in line.replace("import time:", "|").split("|")]
+        timings[name] = int(cumulative) / 1000
+    return timings
+
+
+def measure(module: str):
+    """
+    Return (own_ms, {imported module: cumulative_ms}) for importing module. The
+    baseline is imported first in the same interpreter, so own_ms is the time
+    the module adds on top of it.
+    """
+    timings = _importtime(f"{BASELINE}; import {module}")
+    return timings.get(module, 0.0), timings
+
+
+def audit(modules, budget_ms: float = DEFAULT_BUDGET_MS) -> bool:
+    """Print a report per module; True when every module passes"""
+    all_ok = True
+    for module in modules:
+        try:
+            total, timings = measure(module)
+        except Exception as e:
+            print(f"❌ {module}: import failed ({e})")
+            all_ok = False
+            continue
+        
+        allowed = TARGETS.get(module, [])
+        loaded = sorted({
+            dep for dep in DEFERRED_MODULES if dep not in allowed
+            for name in timings if name == dep or name.startswith(dep + ".")
+        })
+        ok = total <= budget_ms and not loaded
+        all_ok = all_ok and ok
+        
+        print(f"{'✅' if ok else '❌'} {module}: {total:.0f} ms over baseline (budget {budget_ms:.0f} ms)")
+        if loaded:
+            print(f"   loads deferred dependencies at import: {', '.join(loaded)}")
+        slowest = sorted(
+            ((ms, name) for name, ms in timings.items() if name != module and "." not in name),
+            reverse=True
+        )[:5]
+        print("   " + ", ".join(f"{name} {ms:.0f} ms" for ms, name in slowest))
+    return all_ok
+
+
+if __name__ == "__main__":
+    requested = sys.argv[1:] or list(TARGETS)
+    sys.exit(0 if audit(requested) else 1)
@@ -0,0 +1,351 @@
+"""
+Consistency Scan - Cross-register invariants over any date range
+Checks that the registers agree with each other, the way the daily handbook
+and the spirit transaction reconciliation do for a single day, but for a
+whole period at once: the range is split into months and the months are
+scanned in parallel, one process each. Every discrepancy found is ranked by
+the absolute alcohol at stake, largest first.
+
+Invariants:
+    Reg-76 receipts vs Reg-74 unloading   received AL must all be unloaded into a vat
+    Reg-74 BRT issues vs Reg-A MFM-2      AL issued for production per BRT vat and day
+    Reg-A bottles vs Reg-B receipts       bottles per brand, size and day
+    Reg-B issues vs excise duty bottles   bottles issued on duty per brand, size and day
+    VAT closing continuity                each operation opens at the vat's previous closing
+
+Usage:
+    python consistency_scan.py --from 2025-04-01 --to 2026-03-31
+    python consistency_scan.py --from 2025-04-01 --to 2026-03-31 --processes 4 --csv audit.csv
+"""
+
+import argparse
+import multiprocessing
+import os
+import sqlite3
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from spirit_transaction_schema import DEFAULT_RECON_TOLERANCE_AL
+
+DB_PATH = "excise_registers.db"
+
+BOTTLE_SIZES_ML = [180, 300, 375, 500, 600, 750, 1000]
+
+# Reg-74 operations whose opening and closing are those of the destination vat
+# (the others, reduction and issue for production, work on the source vat)
+DESTINATION_OPERATIONS = ("Unloading from Reg-76", "Transfer SST to BRT", "Inter-Transfer SST", "Inter-Transfer BRT")
+
+REPORT_COLUMNS = ["rank", "check", "date", "reference", "expected", "actual", "difference", "unit",
+                  "al_impact", "detail"]
+
+
+def _finding(check: str, day: str, reference: str, expected: float, actual: float, unit: str,
+             al_impact: float, detail: str) -> Dict:
+    return {
+        "check": check, "date": day, "reference": reference,
+        "expected": round(float(expected), 3), "actual": round(float(actual), 3),
+        "difference": round(float(actual) - float(expected), 3), "unit": unit,
+        "al_impact": round(abs(float(al_impact)), 3), "detail": detail,
+    }
+
+
+# ============================================================================
+# INVARIANTS
+# ============================================================================
+# Each check reads one partition [start, end] (ISO dates) and returns its
+# findings. Lookups on the other side of an invariant are not limited to the
+# partition, so a receipt unloaded early next month is still matched.
+# (+operation_type keeps SQLite off the low-selectivity operation_type index.)
+
+def check_reg76_reg74_receipts(conn: sqlite3.Connection, start: str, end: str) -> List[Dict]:
+    check = "Reg-76 receipts vs Reg-74 unloading"
+    findings = []
+    rows = conn.execute("""
+        WITH receipts AS (
+            SELECT reg76_id, date_receipt, COALESCE(rec_al, 0) AS received_al
+            FROM reg76_receipts WHERE date_receipt BETWEEN ? AND ?
+        ),
+        unloaded AS (
+            SELECT ref_reg76_id, SUM(COALESCE(receipt_al, 0)) AS al, COUNT(*) AS operations
+            FROM reg74_operations
+            WHERE ref_reg76_id IN (SELECT reg76_id FROM receipts) AND +operation_type = 'Unloading from Reg-76'
+            GROUP BY ref_reg76_id
+        )
+        SELECT r.date_receipt, r.reg76_id, r.received_al,
+               COALESCE(u.al, 0) AS unloaded_al, COALESCE(u.operations, 0) AS operations
+        FROM receipts r
+        LEFT JOIN unloaded u ON u.ref_reg76_id = r.reg76_id
+        WHERE u.operations IS NULL OR ABS(r.received_al - u.al) > ?
+    """, (start, end, DEFAULT_RECON_TOLERANCE_AL)).fetchall()
+    for day, reg76_id, received_al, unloaded_al, operations in rows:
+        detail = (f"Received {received_al:.3f} AL but not unloaded in Reg-74" if not operations
+                  else f"Received {received_al:.3f} AL, unloaded {unloaded_al:.3f} AL in {operations} Reg-74 operation(s)")
+        findings.append(_finding(check, day, reg76_id, received_al, unloaded_al, "AL",
+                                 received_al - unloaded_al, detail))
+    
+    orphans = conn.execute("""
+        SELECT o.operation_date, o.reg74_id, o.ref_reg76_id, COALESCE(o.receipt_al, 0)
+        FROM reg74_operations o
+        WHERE +o.operation_type = 'Unloading from Reg-76' AND o.operation_date BETWEEN ? AND ?
+          AND NOT EXISTS (SELECT 1 FROM reg76_receipts r WHERE r.reg76_id = o.ref_reg76_id)
+    """, (start, end)).fetchall()
+    for day, reg74_id, ref_reg76_id, receipt_al in orphans:
+        findings.append(_finding(check, day, reg74_id, 0.0, receipt_al, "AL", receipt_al,
+                                 f"Unloads {receipt_al:.3f} AL against Reg-76 '{ref_reg76_id or ''}', which does not exist"))
+    return findings
+
+
+def check_reg74_brt_rega_mfm2(conn: sqlite3.Connection, start: str, end: str) -> List[Dict]:
+    check = "Reg-74 BRT issues vs Reg-A MFM-2"
+    rows = conn.execute("""
+        SELECT day, vat, SUM(issued_al), SUM(mfm2_al)
+        FROM (
+            SELECT operation_date AS day, source_vat AS vat, COALESCE(issue_al, 0) AS issued_al, 0 AS mfm2_al
+            FROM reg74_operations
+            WHERE operation_type = 'Issue for Production' AND operation_date BETWEEN ? AND ?
+            UNION ALL
+            SELECT production_date, source_brt_vat, 0, COALESCE(mfm2_reading_al, 0)
+            FROM rega_production
+            WHERE production_date BETWEEN ? AND ?
+        )
+        GROUP BY day, vat
+        HAVING ABS(SUM(issued_al) - SUM(mfm2_al)) > ?
+    """, (start, end, start, end, DEFAULT_RECON_TOLERANCE_AL)).fetchall()
+    return [
+        _finding(check, day, vat or "", issued_al, mfm2_al, "AL", issued_al - mfm2_al,
+                 f"{vat}: Reg-74 issued {issued_al:.3f} AL for production, Reg-A MFM-2 passed {mfm2_al:.3f} AL")
+        for day, vat, issued_al, mfm2_al in rows
+    ]
+
+
+def _bottle_findings(check: str, rows, expected_register: str, actual_register: str) -> List[Dict]:
+    findings = []
+    for day, product, size_ml, strength, expected, actual in rows:
+        al_impact = (actual - expected) * size_ml / 1000 * (strength or 0) / 100
+        findings.append(_finding(
+            check, day, f"{product} {size_ml}ml", expected, actual, "bottles", al_impact,
+            f"{expected_register} {int(expected)} bottles, {actual_register} {int(actual)} bottles",
+        ))
+    return findings
+
+
+def check_rega_regb_bottles(conn: sqlite3.Connection, start: str, end: str) -> List[Dict]:
+    unpivot = "\n            UNION ALL\n".join(
+        f"            SELECT production_date AS day, COALESCE(brand_name, 'Unknown Brand') AS product, "
+        f"{size} AS size_ml, brt_opening_strength AS strength, COALESCE(bottles_{size}ml, 0) AS produced, 0 AS received "
+        f"FROM rega_production WHERE production_date BETWEEN :start AND :end"
+        for size in BOTTLE_SIZES_ML
+    )
+    rows = conn.execute(f"""
+        SELECT day, product, size_ml, MAX(strength), SUM(produced), SUM(received)
+        FROM (
+{unpivot}
+            UNION ALL
+            SELECT date, product_name, bottle_size_ml, strength, 0, COALESCE(quantity_received_bottles, 0)
+            FROM regb_bottle_stock WHERE date BETWEEN :start AND :end
+        )
+        GROUP BY day, product, size_ml
+        HAVING SUM(produced) != SUM(received)
+    """, {"start": start, "end": end}).fetchall()
+    return _bottle_findings("Reg-A bottles vs Reg-B receipts", rows, "Reg-A produced", "Reg-B received")
+
+
+def check_regb_duty_bottles(conn: sqlite3.Connection, start: str, end: str) -> List[Dict]:
+    rows = conn.execute("""
+        SELECT day, product, size_ml, MAX(strength), SUM(issued), SUM(duty_paid)
+        FROM (
+            SELECT date AS day, product_name AS product, bottle_size_ml AS size_ml, strength,
+                   COALESCE(issue_on_duty_bottles, 0) AS issued, 0 AS duty_paid
+            FROM regb_bottle_stock WHERE date BETWEEN :start AND :end
+            UNION ALL
+            SELECT date, product_name, bottle_size_ml, strength, 0, COALESCE(qty_issued, 0)
+            FROM excise_duty_bottles WHERE date BETWEEN :start AND :end
+        )
+        GROUP BY day, product, size_ml
+        HAVING SUM(issued) != SUM(duty_paid)
+    """, {"start": start, "end": end}).fetchall()
+    return _bottle_findings("Reg-B issues vs excise duty bottles", rows, "Reg-B issued", "Excise duty charged")
+
+
+def check_vat_continuity(conn: sqlite3.Connection, start: str, end: str) -> List[Dict]:
+    """
+    Each operation's opening must be the closing of the latest earlier
+    operation on the same vat (as source or destination), which is where the
+    Reg-74 form takes it from; a gap means an operation was edited, deleted or
+    back-dated after later ones were entered.
+
+    Only each vat's operations from the last day it was used before the
+    partition are read, found through the (vat, date) indexes.
+    """
+    check = "VAT closing continuity"
+    destination_ops = ", ".join(f"'{op}'" for op in DESTINATION_OPERATIONS)
+    rows = conn.execute(f"""
+        WITH vats AS (
+            SELECT source_vat AS vat FROM reg74_operations WHERE operation_date BETWEEN :start AND :end
+            UNION
+            SELECT destination_vat FROM reg74_operations WHERE operation_date BETWEEN :start AND :end
+        ),
+        bounds AS (
+            SELECT vat, COALESCE(NULLIF(MAX(
+                COALESCE((SELECT MAX(operation_date) FROM reg74_operations
+                          WHERE source_vat = vats.vat AND operation_date < :start), ''),
+                COALESCE((SELECT MAX(operation_date) FROM reg74_operations
+                          WHERE destination_vat = vats.vat AND operation_date < :start), '')
+            ), ''), :start) AS since
+            FROM vats
+            WHERE vat LIKE 'SST-%' OR vat LIKE 'BRT-%'
+        ),
+        touches AS (
+            SELECT o.rowid AS op_rowid, o.reg74_id, o.operation_date, b.vat, o.closing_al
+            FROM bounds b JOIN reg74_operations o
+              ON o.source_vat = b.vat AND o.operation_date BETWEEN b.since AND :end
+            UNION ALL
+            SELECT o.rowid, o.reg74_id, o.operation_date, b.vat, o.closing_al
+            FROM bounds b JOIN reg74_operations o
+              ON o.destination_vat = b.vat AND o.operation_date BETWEEN b.since AND :end
+            WHERE COALESCE(o.source_vat, '') != b.vat
+        ),
+        chained AS (
+            SELECT op_rowid, vat,
+                   LAG(reg74_id) OVER w AS previous_id,
+                   LAG(operation_date) OVER w AS previous_date,
+                   LAG(closing_al) OVER w AS previous_closing_al
+            FROM touches
+            WINDOW w AS (PARTITION BY vat ORDER BY operation_date, op_rowid)
+        )
+        SELECT o.operation_date, o.reg74_id, c.vat, COALESCE(o.source_opening_al, 0),
+               c.previous_id, c.previous_date, COALESCE(c.previous_closing_al, 0)
+        FROM reg74_operations o
+        JOIN chained c ON c.op_rowid = o.rowid
+         AND c.vat = CASE WHEN o.operation_type IN ({destination_ops}) THEN o.destination_vat ELSE o.source_vat END
+        WHERE o.operation_date BETWEEN :start AND :end
+          AND ABS(COALESCE(o.source_opening_al, 0) - COALESCE(c.previous_closing_al, 0)) > :tolerance
+    """, {"start": start, "end": end, "tolerance": DEFAULT_RECON_TOLERANCE_AL}).fetchall()
+    findings = []
+    for day, reg74_id, vat, opening_al, previous_id, previous_date, previous_closing_al in rows:
+        detail = (f"{vat} opened at {opening_al:.3f} AL; {previous_id} ({previous_date}) closed it at "
+                  f"{previous_closing_al:.3f} AL" if previous_id else
+                  f"{vat} opened at {opening_al:.3f} AL with no earlier operation on the vat")
+        findings.append(_finding(check, day, reg74_id, previous_closing_al, opening_al, "AL",
+                                 opening_al - previous_closing_al, detail))
+    return findings
+
+
+# name -> (check, tables it reads); only append here, --checks takes these names
+CHECKS: Dict[str, Tuple[Callable, Tuple[str, ...]]] = {
+    "reg76_reg74": (check_reg76_reg74_receipts, ("reg76_receipts", "reg74_operations")),
+    "reg74_rega": (check_reg74_brt_rega_mfm2, ("reg74_operations", "rega_production")),
+    "rega_regb": (check_rega_regb_bottles, ("rega_production", "regb_bottle_stock")),
+    "regb_duty": (check_regb_duty_bottles, ("regb_bottle_stock", "excise_duty_bottles")),
+    "vat_continuity": (check_vat_continuity, ("reg74_operations",)),
+}
+
+
+# ============================================================================
+# SCANNING
+# ============================================================================
+
+def month_partitions(start: date, end: date) -> List[Tuple[str, str]]:
+    """[start, end] cut at month boundaries, as ISO (first, last) pairs"""
+    partitions = []
+    first = start
+    while first <= end:
+        next_month = (first.replace(day=1) + timedelta(days=32)).replace(day=1)
+        last = min(end, next_month - timedelta(days=1))
+        partitions.append((first.isoformat(), last.isoformat()))
+        first = next_month
+    return partitions
+
+
+def _scan_partition(args) -> List[Dict]:
+    """Run the checks over one partition on a read-only connection of its own"""
+    db_path, start, end, names = args
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        findings = []
+        for name in names:
+            check, needs = CHECKS[name]
+            if all(table in tables for table in needs):
+                findings.extend(check(conn, start, end))
+        return findings
+    finally:
+        conn.close()
+
+
+def scan(start: date, end: date, processes: Optional[int] = None, checks: Optional[List[str]] = None,
+         progress: Optional[Callable[[float, str], None]] = None, db_path: str = DB_PATH) -> pd.DataFrame:
+    """
+    Ranked discrepancy report for [start, end]: one row per finding, largest
+    absolute alcohol at stake first (see REPORT_COLUMNS). Months are scanned
+    in a pool of processes (default: one per CPU, at most one per month); a
+    single month, processes=1, or a caller that is itself a daemon process
+    (such as a job worker, which may not start children) scans in-process.
+    progress(fraction, message) is called as months complete.
+    """
+    names = list(checks or CHECKS)
+    unknown = [name for name in names if name not in CHECKS]
+    if unknown:
+        raise ValueError(f"Unknown checks: {', '.join(unknown)} (choose from {', '.join(CHECKS)})")
+    if end < start:
+        raise ValueError("The scan range ends before it starts")
+    
+    partitions = month_partitions(start, end)
+    tasks = [(os.path.abspath(db_path), first, last, names) for first, last in partitions]
+    processes = min(processes or os.cpu_count() or 1, len(tasks))
+    findings = []
+    
+    def done(count):
+        if progress:
+            progress(count / len(tasks), f"Scanned {count} of {len(tasks)} months")
+    
+    if processes <= 1 or multiprocessing.current_process().daemon:
+        for count, task in enumerate(tasks, 1):
+            findings.extend(_scan_partition(task))
+            done(count)
+    else:
+        ctx = multiprocessing.get_context("spawn")
+        with ctx.Pool(processes) as pool:
+            for count, part in enumerate(pool.imap_unordered(_scan_partition, tasks), 1):
+                findings.extend(part)
+                done(count)
+    
+    report = pd.DataFrame(findings, columns=REPORT_COLUMNS[1:])
+    report = report.sort_values(["al_impact", "date", "check"], ascending=[False, True, True], kind="stable")
+    report.insert(0, "rank", range(1, len(report) + 1))
+    return report.reset_index(drop=True)
+
+
+def summarize(report: pd.DataFrame) -> pd.DataFrame:
+    """Findings and absolute alcohol at stake per check"""
+    if report.empty:
+        return pd.DataFrame(columns=["check", "findings", "al_impact"])
+    return (report.groupby("check", sort=False)
+            .agg(findings=("rank", "size"), al_impact=("al_impact", "sum"))
+            .sort_values("al_impact", ascending=False)
+            .reset_index())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan a date range for discrepancies between the registers.")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, required=True, help="First day (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, default=date.today(), help="Last day (default today)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument("--checks", nargs="+", choices=list(CHECKS), help="Run only these checks")
+    parser.add_argument("--top", type=int, default=25, help="Findings to print")
+    parser.add_argument("--csv", help="Write the full ranked report here")
+    args = parser.parse_args()
+    
+    started = time.time()
+    report = scan(args.start, args.end, processes=args.processes, checks=args.checks)
+    print(f"✅ Scanned {args.start} to {args.end} in {time.time() - started:.2f}s: {len(report)} discrepancies")
+    if not report.empty:
+        print(summarize(report).to_string(index=False))
+        print()
+        print(report.head(args.top).drop(columns=["detail"]).to_string(index=False))
+    if args.csv:
+        report.to_csv(args.csv, index=False)
+        print(f"📄 Report written to {args.csv}")
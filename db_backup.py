@@ -0,0 +1,334 @@
+"""
+Database Backup - Online, verified, rotating backups of excise_registers.db
+Copies the live database with the SQLite online backup API a few hundred pages
+at a time from one read snapshot, so a backup always finishes however busy the
+registers are. Each copy passes
+PRAGMA integrity_check before it is gzipped into the hourly/daily/monthly
+generations, and old generations are rotated out.
+
+Usage:
+    python db_backup.py backup [--generation daily]
+    python db_backup.py run-due
+    python db_backup.py list
+    python db_backup.py verify backup_data/db/daily/excise_registers-20260101-020000.db.gz
+    python db_backup.py restore backup_data/db/daily/excise_registers-20260101-020000.db.gz
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import List, Optional
+import logging
+
+import pandas as pd
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+BACKUP_ROOT = "backup_data/db"
+
+# generation -> (period a backup covers, as a strftime key; generations kept)
+GENERATIONS = {
+    "hourly": ("%Y%m%d%H", 24),
+    "daily": ("%Y%m%d", 14),
+    "monthly": ("%Y%m", 12),
+}
+
+# Restores keep a copy of the database they replaced here (not rotated)
+PRE_RESTORE_GENERATION = "pre_restore"
+
+# Pages copied per backup step and the pause between steps
+PAGES_PER_STEP = 256
+STEP_SLEEP_SECONDS = 0.005
+
+# A copy that restarts more often than this is abandoned and retried, at most MAX_ATTEMPTS times
+MAX_RESTARTS = 3
+MAX_ATTEMPTS = 3
+
+SCHEDULER_INTERVAL_SECONDS = 900
+
+FILE_PREFIX = "excise_registers-"
+FILE_SUFFIX = ".db.gz"
+TIMESTAMP_FORMAT = "%Y%m%d-%H%M%S"
+
+_backup_lock = threading.Lock()
+_scheduler: Optional[threading.Thread] = None
+_scheduler_lock = threading.Lock()
+
+
+# ============================================================================
+# SNAPSHOT AND VERIFICATION
+# ============================================================================
+
+def _copy_once(dest_path: str, db_path: str):
+    """
+    Copy db_path inside one read transaction on the source connection. Without
+    it, every commit from another session restarts the copy from page one, and
+    a busy database is never backed up.
+    """
+    src = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    dest = sqlite3.connect(dest_path)
+    restarts = 0
+    last_remaining = None
+    
+    def progress(status, remaining, total):
+        nonlocal restarts, last_remaining
+        if last_remaining is not None and remaining > last_remaining:
+            restarts += 1
+            if restarts > MAX_RESTARTS:
+                raise RuntimeError(f"backup restarted {restarts} times")
+        last_remaining = remaining
+    
+    try:
+        src.execute("BEGIN")
+        src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()  # takes the read snapshot
+        src.backup(dest, pages=PAGES_PER_STEP, sleep=STEP_SLEEP_SECONDS, progress=progress)
+        src.execute("COMMIT")
+    finally:
+        dest.close()
+        src.close()
+
+
+def _snapshot(dest_path: str, db_path: str = DB_PATH):
+    """Consistent copy of db_path via the online backup API, giving up after MAX_ATTEMPTS tries"""
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            _copy_once(dest_path, db_path)
+            return
+        except (RuntimeError, sqlite3.OperationalError) as e:
+            if os.path.exists(dest_path):
+                os.remove(dest_path)
+            if attempt == MAX_ATTEMPTS:
+                raise RuntimeError(f"backup did not complete after {MAX_ATTEMPTS} attempts: {e}")
+            logger.info(f"Database backup attempt {attempt} failed ({e}), retrying")
+            time.sleep(attempt)
+
+
+def _integrity_check(db_file: str) -> str:
+    """'ok' or the first problem PRAGMA integrity_check reports"""
+    conn = sqlite3.connect(db_file)
+    try:
+        return conn.execute("PRAGMA integrity_check").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def _gzip(src_path: str, dest_path: str):
+    tmp_path = f"{dest_path}.tmp"
+    with open(src_path, "rb") as src, gzip.open(tmp_path, "wb", compresslevel=6) as dest:
+        shutil.copyfileobj(src, dest, 1024 * 1024)
+    os.replace(tmp_path, dest_path)
+
+
+def _gunzip(src_path: str, dest_path: str):
+    with gzip.open(src_path, "rb") as src, open(dest_path, "wb") as dest:
+        shutil.copyfileobj(src, dest, 1024 * 1024)
+
+
+def verify_backup(path: str) -> str:
+    """Decompress a backup to a temp file and integrity-check it; returns 'ok' or the problem found"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, "verify.db")
+        try:
+            _gunzip(path, db_file)
+            return _integrity_check(db_file)
+        except Exception as e:
+            return str(e)
+
+
+# ============================================================================
+# GENERATIONS AND ROTATION
+# ============================================================================
+
+def _backup_time(path: str) -> Optional[datetime]:
+    name = os.path.basename(path)
+    try:
+        return datetime.strptime(name[len(FILE_PREFIX):-len(FILE_SUFFIX)], TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def _generation_files(generation: str) -> List[str]:
+    """Backups of one generation, oldest first"""
+    return sorted(glob.glob(os.path.join(BACKUP_ROOT, generation, f"{FILE_PREFIX}*{FILE_SUFFIX}")))
+
+
+def due_generations(now: Optional[datetime] = None) -> List[str]:
+    """Generations with no backup yet for the current hour/day/month"""
+    now = now or datetime.now()
+    due = []
+    for generation, (period, _) in GENERATIONS.items():
+        times = [t for t in map(_backup_time, _generation_files(generation)) if t]
+        if not times or max(times).strftime(period) != now.strftime(period):
+            due.append(generation)
+    return due
+
+
+def rotate(generation: str) -> int:
+    """Delete all but the newest backups the generation keeps; returns files removed"""
+    keep = GENERATIONS[generation][1]
+    files = _generation_files(generation)
+    stale = files[:-keep] if len(files) > keep else []
+    for path in stale:
+        os.remove(path)
+    return len(stale)
+
+
+def list_backups() -> pd.DataFrame:
+    """Every backup on disk, newest first"""
+    rows = []
+    for generation in list(GENERATIONS) + [PRE_RESTORE_GENERATION]:
+        for path in _generation_files(generation):
+            rows.append({
+                "generation": generation,
+                "taken_at": _backup_time(path),
+                "size_mb": round(os.path.getsize(path) / (1024 * 1024), 2),
+                "path": path,
+            })
+    df = pd.DataFrame(rows, columns=["generation", "taken_at", "size_mb", "path"])
+    return df.sort_values("taken_at", ascending=False, ignore_index=True)
+
+
+# ============================================================================
+# BACKUP AND RESTORE
+# ============================================================================
+
+def backup_database(generations: Optional[List[str]] = None, db_path: str = DB_PATH) -> Optional[str]:
+    """
+    Take one verified snapshot and store it in each of the given generations
+    (default: those due now), rotating each. Returns the first file written,
+    or None if nothing was due or the backup failed.
+    """
+    with _backup_lock:
+        generations = due_generations() if generations is None else list(generations)
+        if not generations:
+            return None
+        if not os.path.exists(db_path):
+            logger.error(f"❌ Database backup skipped: {db_path} not found")
+            return None
+        
+        name = f"{FILE_PREFIX}{datetime.now().strftime(TIMESTAMP_FORMAT)}{FILE_SUFFIX}"
+        written = []
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                db_file = os.path.join(tmp_dir, "snapshot.db")
+                start = time.perf_counter()
+                _snapshot(db_file, db_path)
+                
+                result = _integrity_check(db_file)
+                if result != "ok":
+                    logger.error(f"❌ Database backup failed integrity check: {result}")
+                    return None
+                
+                for generation in generations:
+                    target_dir = os.path.join(BACKUP_ROOT, generation)
+                    os.makedirs(target_dir, exist_ok=True)
+                    target = os.path.join(target_dir, name)
+                    if written:
+                        shutil.copy2(written[0], target)
+                    else:
+                        _gzip(db_file, target)
+                    written.append(target)
+                    if generation in GENERATIONS:
+                        rotate(generation)
+            
+            logger.info(f"✅ Database backed up to {', '.join(generations)} "
+                        f"in {time.perf_counter() - start:.1f}s")
+            return written[0]
+        except Exception as e:
+            logger.error(f"❌ Database backup failed: {e}")
+            return None
+
+
+def restore_backup(path: str, db_path: str = DB_PATH) -> bool:
+    """
+    Replace the database contents with a verified backup. The current database
+    is backed up to the pre_restore generation first. The restore goes through
+    the backup API, so open connections see the old or the new database, never a mix.
+    """
+    result = verify_backup(path)
+    if result != "ok":
+        logger.error(f"❌ Restore refused, {path} failed verification: {result}")
+        return False
+    
+    if os.path.exists(db_path) and backup_database([PRE_RESTORE_GENERATION], db_path) is None:
+        logger.error("❌ Restore aborted: could not back up the current database first")
+        return False
+    
+    with _backup_lock:
+        try:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                db_file = os.path.join(tmp_dir, "restore.db")
+                _gunzip(path, db_file)
+                src = sqlite3.connect(db_file)
+                dest = sqlite3.connect(db_path)
+                try:
+                    src.backup(dest)
+                finally:
+                    dest.close()
+                    src.close()
+            logger.info(f"✅ Database restored from {path}")
+            return True
+        except Exception as e:
+            logger.error(f"❌ Restore from {path} failed: {e}")
+            return False
+
+
+# ============================================================================
+# BACKGROUND SCHEDULER
+# ============================================================================
+
+def _scheduler_loop(interval: float):
+    while True:
+        backup_database()
+        time.sleep(interval)
+
+
+def start_backup_scheduler(interval: float = SCHEDULER_INTERVAL_SECONDS):
+    """Run due backups on a daemon thread, once per process, so the UI never waits on one"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = threading.Thread(target=_scheduler_loop, args=(interval,),
+                                          name="db-backup-scheduler", daemon=True)
+            _scheduler.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Online backups of the excise register database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_cmd = commands.add_parser("backup", help="Take a backup now.")
+    backup_cmd.add_argument("--generation", choices=list(GENERATIONS), action="append",
+                            help="Generation to store it in (repeatable; default: all).")
+    commands.add_parser("run-due", help="Back up only the generations due now.")
+    commands.add_parser("list", help="List backups on disk.")
+    verify_cmd = commands.add_parser("verify", help="Integrity-check a backup.")
+    verify_cmd.add_argument("path")
+    restore_cmd = commands.add_parser("restore", help="Restore the database from a backup.")
+    restore_cmd.add_argument("path")
+    args = parser.parse_args()
+    
+    if args.command == "backup":
+        ok = backup_database(args.generation or list(GENERATIONS)) is not None
+    elif args.command == "run-due":
+        ok = backup_database() is not None or not due_generations()
+    elif args.command == "list":
+        print(list_backups().to_string(index=False))
+        ok = True
+    elif args.command == "verify":
+        result = verify_backup(args.path)
+        print(f"{'✅' if result == 'ok' else '❌'} {args.path}: {result}")
+        ok = result == "ok"
+    else:
+        ok = restore_backup(args.path)
+    raise SystemExit(0 if ok else 1)
@@ -0,0 +1,197 @@
+"""
+Database Writer - One writer thread per database, with group commit
+Register saves from every Streamlit session are queued to a single writer that
+owns the only write connection. Writes that queue up while a transaction is
+committing go into the next transaction together, each inside its own
+savepoint, so one failed save never undoes another and sessions no longer
+fight over the write lock ("database is locked")
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+import logging
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# At most this many writes share one transaction
+MAX_BATCH_SIZE = 64
+
+# After the first write arrives, wait this long for others to join its transaction
+GROUP_COMMIT_WINDOW_SECONDS = 0.002
+
+# Wait this long for a lock held by another process (a CLI script, a backup)
+BUSY_TIMEOUT_SECONDS = 30
+
+_writers: Dict[str, "DatabaseWriter"] = {}
+_writers_lock = threading.Lock()
+
+
+class _WriteRequest:
+    __slots__ = ("fn", "args", "kwargs", "future")
+    
+    def __init__(self, fn: Callable, args: tuple, kwargs: Dict):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+
+
+class DatabaseWriter:
+    """
+    Serializes every write to one database. A write is a function called as
+    fn(conn, *args, **kwargs) on the writer's connection inside an open
+    transaction; it must not commit or roll back itself.
+    """
+    
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._queue: "queue.Queue[_WriteRequest]" = queue.Queue()
+        self._conn = None
+        self._thread = threading.Thread(target=self._run, name=f"db-writer-{os.path.basename(db_path)}",
+                                        daemon=True)
+        self._stats_lock = threading.Lock()
+        self._stats = {"writes": 0, "failed_writes": 0, "transactions": 0, "largest_batch": 0}
+        self._thread.start()
+    
+    # ------------------------------------------------------------------
+    # Submitting
+    # ------------------------------------------------------------------
+    
+    def submit(self, fn: Callable, *args, **kwargs) -> Future:
+        """Queue a write; the future resolves to fn's return value once its transaction commits"""
+        if threading.current_thread() is self._thread:
+            # A write issued from inside another write joins the open transaction
+            future = Future()
+            try:
+                future.set_result(fn(self._conn, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        request = _WriteRequest(fn, args, kwargs)
+        self._queue.put(request)
+        return request.future
+    
+    def write(self, fn: Callable, *args, **kwargs):
+        """Queue a write and wait for it; raises whatever the write raised"""
+        return self.submit(fn, *args, **kwargs).result()
+    
+    def stats(self) -> Dict[str, int]:
+        with self._stats_lock:
+            return dict(self._stats, queued=self._queue.qsize())
+    
+    # ------------------------------------------------------------------
+    # Writer thread
+    # ------------------------------------------------------------------
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None,
+                               check_same_thread=False)
+        # Readers in other sessions keep reading while a batch commits
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+    
+    def _next_batch(self) -> List[_WriteRequest]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + GROUP_COMMIT_WINDOW_SECONDS
+        while len(batch) < MAX_BATCH_SIZE:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return [request for request in batch if request.future.set_running_or_notify_cancel()]
+    
+    def _commit(self, batch: List[_WriteRequest]):
+        conn = self._conn
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for request in batch:
+                conn.execute("SAVEPOINT db_writer")
+                try:
+                    outcomes.append((True, request.fn(conn, *request.args, **request.kwargs)))
+                    conn.execute("RELEASE db_writer")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO db_writer")
+                    conn.execute("RELEASE db_writer")
+                    outcomes.append((False, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            logger.error(f"❌ Write batch of {len(batch)} rolled back: {e}")
+            for request in batch:
+                request.future.set_exception(e)
+            with self._stats_lock:
+                self._stats["failed_writes"] += len(batch)
+            return
+        
+        for request, (ok, value) in zip(batch, outcomes):
+            if ok:
+                request.future.set_result(value)
+            else:
+                request.future.set_exception(value)
+        with self._stats_lock:
+            self._stats["writes"] += len(batch)
+            self._stats["failed_writes"] += sum(1 for ok, _ in outcomes if not ok)
+            self._stats["transactions"] += 1
+            self._stats["largest_batch"] = max(self._stats["largest_batch"], len(batch))
+    
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                if self._conn is None:
+                    self._conn = self._connect()
+                self._commit(batch)
+            except Exception as e:
+                # Could not even open the database; fail this batch and try again on the next
+                logger.error(f"❌ Database writer error: {e}")
+                self._conn = None
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+
+# ============================================================================
+# MODULE API
+# ============================================================================
+
+def get_writer(db_path: str = DB_PATH) -> DatabaseWriter:
+    """The writer for db_path, started on first use (one per database per process)"""
+    path = os.path.abspath(db_path)
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            writer = _writers[path] = DatabaseWriter(path)
+        return writer
+
+
+def submit(fn: Callable, *args, db_path: str = DB_PATH, **kwargs) -> Future:
+    """Queue fn(conn, *args, **kwargs) on the writer for db_path; returns a Future"""
+    return get_writer(db_path).submit(fn, *args, **kwargs)
+
+
+def write(fn: Callable, *args, db_path: str = DB_PATH, **kwargs):
+    """Run fn(conn, *args, **kwargs) on the writer for db_path and wait for it to commit"""
+    return get_writer(db_path).write(fn, *args, **kwargs)
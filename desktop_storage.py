@@ -276,6 +276,23 @@ def save_regb_bottle_stock_to_excel(data_dict):
     except Exception as e:
         return False, str(e)
 
+def save_regb_bottle_stock_day_to_excel(day, records):
+    """Replace all stock rows for one day with a single workbook rewrite"""
+    ensure_regb_excel_exists()
+    try:
+        fees_df = pd.read_excel(REGB_EXCEL_FILE, sheet_name=REGB_FEES_SHEET)
+        stock_df = pd.read_excel(REGB_EXCEL_FILE, sheet_name=REGB_STOCK_SHEET)
+        
+        stock_df = stock_df[stock_df["date"].astype(str) != str(day)]
+        stock_df = pd.concat([stock_df, pd.DataFrame(records)], ignore_index=True)
+        
+        with pd.ExcelWriter(REGB_EXCEL_FILE, engine="openpyxl") as writer:
+            fees_df.to_excel(writer, index=False, sheet_name=REGB_FEES_SHEET)
+            stock_df.to_excel(writer, index=False, sheet_name=REGB_STOCK_SHEET)
+        return True, f"✅ Reg-B Stock saved ({len(records)} variants)"
+    except Exception as e:
+        return False, str(e)
+
 # --- EXCISE DUTY STORAGE ---
 EXCISE_LEDGER_SHEET = "Duty Ledger"
 EXCISE_BOTTLES_SHEET = "Issued Bottles"
@@ -0,0 +1,250 @@
+"""
+Excise Duty Rates - Effective-dated rate table with a cached interval index
+Rates are stored per strength band and validity window in excise_duty_rates;
+lookups go through an in-memory index that is rebuilt only after a change
+"""
+
+import sqlite3
+from bisect import bisect_right
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from decimal import Decimal
+import logging
+import threading
+
+from excise_duty_schema import (
+    CREATE_EXCISE_DUTY_RATES_TABLE,
+    DUTY_RATES,
+    DUTY_RATE_BANDS,
+    DUTY_RATES_EFFECTIVE_FROM
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# Cached index: sorted change dates, and for each the sorted bands in force from then
+#   {"dates": [d0, d1, ...], "bands": [[(min, max, rate), ...], ...]}
+_rate_index: Optional[Dict] = None
+_index_lock = threading.Lock()
+
+
+# ============================================================================
+# TABLE SETUP
+# ============================================================================
+
+def init_duty_rates_table(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Create excise_duty_rates and seed it from DUTY_RATES when empty"""
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_EXCISE_DUTY_RATES_TABLE)
+        
+        count = conn.execute("SELECT COUNT(*) FROM excise_duty_rates").fetchone()[0]
+        if count == 0:
+            now = datetime.now().isoformat()
+            conn.executemany("""
+                INSERT INTO excise_duty_rates (
+                    strength_min, strength_max, nominal_strength, rate_per_bl,
+                    effective_from, effective_to, notification_ref, created_at
+                ) VALUES (?, ?, ?, ?, ?, NULL, ?, ?)
+            """, [
+                (float(band_min), float(band_max), float(nominal), float(DUTY_RATES[nominal]),
+                 DUTY_RATES_EFFECTIVE_FROM, "Initial rate schedule", now)
+                for band_min, band_max, nominal in DUTY_RATE_BANDS
+            ])
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing duty rates table: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+# ============================================================================
+# INTERVAL INDEX
+# ============================================================================
+
+def _build_index(rows: List[Tuple]) -> Dict:
+    """Slice the rate rows into date intervals, each holding the bands in force"""
+    change_dates = set()
+    for _, _, _, eff_from, eff_to in rows:
+        change_dates.add(eff_from)
+        if eff_to:
+            change_dates.add((datetime.strptime(eff_to, "%Y-%m-%d").date() + timedelta(days=1)).isoformat())
+    
+    dates = sorted(change_dates)
+    bands = []
+    for start in dates:
+        active = [
+            (Decimal(str(s_min)), Decimal(str(s_max)), Decimal(str(rate)).quantize(Decimal("0.01")))
+            for s_min, s_max, rate, eff_from, eff_to in rows
+            if eff_from <= start and (eff_to is None or eff_to >= start)
+        ]
+        active.sort()
+        bands.append(active)
+    
+    return {"dates": dates, "bands": bands}
+
+
+def _get_index() -> Dict:
+    global _rate_index
+    index = _rate_index
+    if index is not None:
+        return index
+    
+    with _index_lock:
+        if _rate_index is None:
+            conn = sqlite3.connect(DB_PATH)
+            try:
+                init_duty_rates_table(conn)
+                rows = conn.execute("""
+                    SELECT strength_min, strength_max, rate_per_bl, effective_from, effective_to
+                    FROM excise_duty_rates
+                """).fetchall()
+            finally:
+                conn.close()
+            _rate_index = _build_index(rows)
+        return _rate_index
+
+
+def invalidate_rate_cache():
+    """Drop the cached index so the next lookup reloads excise_duty_rates"""
+    global _rate_index
+    with _index_lock:
+        _rate_index = None
+
+
+# ============================================================================
+# LOOKUPS
+# ============================================================================
+
+def lookup_duty_rate(strength: Decimal, on_date: Optional[date] = None) -> Decimal:
+    """
+    Duty rate per BL for a strength as in force on on_date (default today).
+    
+    Two binary searches: one over the rate change dates, one over the strength
+    bands in force for that interval. Strengths outside every band return 0.00.
+    """
+    index = _get_index()
+    day = (on_date or date.today()).isoformat()
+    
+    pos = bisect_right(index["dates"], day) - 1
+    if pos < 0:
+        return Decimal("0.00")
+    
+    bands = index["bands"][pos]
+    strength = Decimal(str(strength))
+    i = bisect_right(bands, (strength, Decimal("Infinity"), Decimal("Infinity"))) - 1
+    if i >= 0 and bands[i][0] <= strength < bands[i][1]:
+        return bands[i][2]
+    return Decimal("0.00")
+
+
+def get_rate_history() -> List[Dict]:
+    """All rate rows, newest validity first"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_duty_rates_table(conn)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("""
+            SELECT * FROM excise_duty_rates
+            ORDER BY effective_from DESC, strength_min DESC
+        """).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        logger.error(f"❌ Error getting duty rate history: {e}")
+        return []
+
+
+# ============================================================================
+# RATE CHANGES
+# ============================================================================
+
+def add_duty_rate(strength_min: Decimal, strength_max: Decimal, rate_per_bl: Decimal,
+                  effective_from: date, nominal_strength: Optional[Decimal] = None,
+                  notification_ref: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Bring a new rate into force for a strength band from effective_from.
+    
+    Rates overlapping the band are closed the day before, so calculations for
+    earlier dates keep using the rate that applied then. Where an old band only
+    partly overlaps, the strengths the new band does not cover carry on at the
+    old rate from effective_from, as new rows split off the old band. Bottles
+    already issued from effective_from on are re-rated, outside closed periods.
+    """
+    if Decimal(str(strength_min)) >= Decimal(str(strength_max)):
+        return False, "❌ strength_min must be below strength_max"
+    
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_duty_rates_table(conn)
+        
+        overlapping = conn.execute("""
+            SELECT rate_id, effective_from, strength_min, strength_max, nominal_strength,
+                   rate_per_bl, effective_to, notification_ref
+            FROM excise_duty_rates
+            WHERE strength_min < ? AND strength_max > ?
+              AND (effective_to IS NULL OR effective_to >= ?)
+        """, (float(strength_max), float(strength_min), effective_from.isoformat())).fetchall()
+        
+        for _, existing_from, *_ in overlapping:
+            if existing_from >= effective_from.isoformat():
+                conn.close()
+                return False, f"❌ A rate for this band already starts on {existing_from}"
+        
+        # Parts of the old bands below and above the new one keep their rate
+        remainders = []
+        for _, _, old_min, old_max, nominal, old_rate, old_to, old_ref in overlapping:
+            if old_min < float(strength_min):
+                remainders.append((old_min, float(strength_min), nominal, old_rate, old_to, old_ref))
+            if old_max > float(strength_max):
+                remainders.append((float(strength_max), old_max, nominal, old_rate, old_to, old_ref))
+        
+        with conn:
+            day_before = (effective_from - timedelta(days=1)).isoformat()
+            conn.executemany(
+                "UPDATE excise_duty_rates SET effective_to = ? WHERE rate_id = ?",
+                [(day_before, row[0]) for row in overlapping]
+            )
+            conn.executemany("""
+                INSERT INTO excise_duty_rates (
+                    strength_min, strength_max, nominal_strength, rate_per_bl,
+                    effective_from, effective_to, notification_ref, created_at
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (band_min, band_max, nominal, rate, effective_from.isoformat(), eff_to, ref,
+                 datetime.now().isoformat())
+                for band_min, band_max, nominal, rate, eff_to, ref in remainders
+            ])
+            conn.execute("""
+                INSERT INTO excise_duty_rates (
+                    strength_min, strength_max, nominal_strength, rate_per_bl,
+                    effective_from, effective_to, notification_ref, created_at
+                ) VALUES (?, ?, ?, ?, ?, NULL, ?, ?)
+            """, (
+                float(strength_min), float(strength_max),
+                float(nominal_strength) if nominal_strength is not None else None,
+                float(rate_per_bl), effective_from.isoformat(), notification_ref,
+                datetime.now().isoformat()
+            ))
+        conn.close()
+        
+        invalidate_rate_cache()
+        logger.info(f"✅ Duty rate ₹{rate_per_bl}/BL for {strength_min}-{strength_max}% v/v from {effective_from}")
+        
+        from excise_duty_backend import recompute_duty_bottle_rates  # imported here: it imports this module
+        rerated = recompute_duty_bottle_rates(effective_from)
+        if rerated:
+            return True, f"✅ Duty rate added from {effective_from}; {rerated} issued bottle rows re-rated"
+        return True, f"✅ Duty rate added from {effective_from}"
+    except Exception as e:
+        logger.error(f"❌ Error adding duty rate: {e}")
+        return False, f"❌ Error: {str(e)}"
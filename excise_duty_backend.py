@@ -17,6 +17,7 @@ from excise_duty_schema import (
     CREATE_EXCISE_DUTY_LEDGER_TABLE,
     CREATE_EXCISE_DUTY_BOTTLES_TABLE,
     CREATE_EXCISE_DUTY_SUMMARY_TABLE,
+    CREATE_EXCISE_DUTY_RATES_TABLE,
     CREATE_EXCISE_DUTY_INDEXES,
     DUTY_RATES,
     get_duty_rate_for_strength
@@ -26,7 +27,15 @@ from excise_duty_schema import (
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+import db_writer
 import desktop_storage
+import ledger_engine
+import lineage
+import period_close
+from changelog import init_changelog
+from period_close import init_period_close
+from register_search import init_register_search
+import duty_rates
 
 def _serialize_model(model) -> Dict:
     """Helper to convert Pydantic model to dict for Excel storage"""
@@ -55,10 +64,17 @@ def init_excise_duty_database():
         cursor.executescript(CREATE_EXCISE_DUTY_LEDGER_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_BOTTLES_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_SUMMARY_TABLE)
+        cursor.executescript(CREATE_EXCISE_DUTY_RATES_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_INDEXES)
+        init_changelog(conn)
+        init_period_close(conn)
+        init_register_search(conn)
         
         conn.commit()
         conn.close()
+        
+        # Seed the effective-dated rate table on first run
+        duty_rates.init_duty_rates_table()
         logger.info("✅ Excise Duty database initialized successfully")
         return True
     except Exception as e:
@@ -70,93 +86,101 @@ def init_excise_duty_database():
 # DUTY LEDGER OPERATIONS
 # ============================================================================
 
+def _save_ledger_row(conn: sqlite3.Connection, ledger: ExciseDutyLedger):
+    """Insert or update the ledger row of ledger.date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    now = datetime.now().isoformat()
+    
+    # Check if record exists
+    cursor.execute("SELECT duty_id FROM excise_duty_ledger WHERE date = ?", (str(ledger.date),))
+    existing = cursor.fetchone()
+    
+    if existing:
+        # Update existing record
+        cursor.execute("""
+            UPDATE excise_duty_ledger SET
+                opening_balance = ?,
+                deposit_amount = ?,
+                echallan_no = ?,
+                echallan_date = ?,
+                amount_credited = ?,
+                name_of_issue = ?,
+                warehouse_no = ?,
+                transport_permit_no = ?,
+                total_duty_amount = ?,
+                duty_debited = ?,
+                closing_balance = ?,
+                remarks = ?,
+                excise_officer_name = ?,
+                excise_officer_signature = ?,
+                status = ?,
+                updated_at = ?
+            WHERE date = ?
+        """, (
+            float(ledger.opening_balance),
+            float(ledger.deposit_amount),
+            ledger.echallan_no,
+            str(ledger.echallan_date) if ledger.echallan_date else None,
+            float(ledger.amount_credited),
+            ledger.name_of_issue,
+            ledger.warehouse_no,
+            ledger.transport_permit_no,
+            float(ledger.total_duty_amount),
+            float(ledger.duty_debited),
+            float(ledger.closing_balance),
+            ledger.remarks,
+            ledger.excise_officer_name,
+            ledger.excise_officer_signature,
+            ledger.status,
+            now,
+            str(ledger.date)
+        ))
+    else:
+        # Insert new record
+        cursor.execute("""
+            INSERT INTO excise_duty_ledger (
+                date, opening_balance, deposit_amount, echallan_no, echallan_date,
+                amount_credited, name_of_issue, warehouse_no, transport_permit_no,
+                total_duty_amount, duty_debited, closing_balance,
+                remarks, excise_officer_name, excise_officer_signature,
+                status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            str(ledger.date),
+            float(ledger.opening_balance),
+            float(ledger.deposit_amount),
+            ledger.echallan_no,
+            str(ledger.echallan_date) if ledger.echallan_date else None,
+            float(ledger.amount_credited),
+            ledger.name_of_issue,
+            ledger.warehouse_no,
+            ledger.transport_permit_no,
+            float(ledger.total_duty_amount),
+            float(ledger.duty_debited),
+            float(ledger.closing_balance),
+            ledger.remarks,
+            ledger.excise_officer_name,
+            ledger.excise_officer_signature,
+            ledger.status,
+            now,
+            now
+        ))
+
+
 def save_duty_ledger(ledger: ExciseDutyLedger) -> bool:
     """Save or update duty ledger"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
+        if ledger_engine.is_date_closed("excise_duty_ledger", ledger.date):
+            logger.error(f"❌ Duty ledger period containing {ledger.date} is closed")
+            return False
         
-        # Check if record exists
-        cursor.execute("SELECT duty_id FROM excise_duty_ledger WHERE date = ?", (str(ledger.date),))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE excise_duty_ledger SET
-                    opening_balance = ?,
-                    deposit_amount = ?,
-                    echallan_no = ?,
-                    echallan_date = ?,
-                    amount_credited = ?,
-                    name_of_issue = ?,
-                    warehouse_no = ?,
-                    transport_permit_no = ?,
-                    total_duty_amount = ?,
-                    duty_debited = ?,
-                    closing_balance = ?,
-                    remarks = ?,
-                    excise_officer_name = ?,
-                    excise_officer_signature = ?,
-                    status = ?,
-                    updated_at = ?
-                WHERE date = ?
-            """, (
-                float(ledger.opening_balance),
-                float(ledger.deposit_amount),
-                ledger.echallan_no,
-                str(ledger.echallan_date) if ledger.echallan_date else None,
-                float(ledger.amount_credited),
-                ledger.name_of_issue,
-                ledger.warehouse_no,
-                ledger.transport_permit_no,
-                float(ledger.total_duty_amount),
-                float(ledger.duty_debited),
-                float(ledger.closing_balance),
-                ledger.remarks,
-                ledger.excise_officer_name,
-                ledger.excise_officer_signature,
-                ledger.status,
-                now,
-                str(ledger.date)
-            ))
-        else:
-            # Insert new record
-            cursor.execute("""
-                INSERT INTO excise_duty_ledger (
-                    date, opening_balance, deposit_amount, echallan_no, echallan_date,
-                    amount_credited, name_of_issue, warehouse_no, transport_permit_no,
-                    total_duty_amount, duty_debited, closing_balance,
-                    remarks, excise_officer_name, excise_officer_signature,
-                    status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(ledger.date),
-                float(ledger.opening_balance),
-                float(ledger.deposit_amount),
-                ledger.echallan_no,
-                str(ledger.echallan_date) if ledger.echallan_date else None,
-                float(ledger.amount_credited),
-                ledger.name_of_issue,
-                ledger.warehouse_no,
-                ledger.transport_permit_no,
-                float(ledger.total_duty_amount),
-                float(ledger.duty_debited),
-                float(ledger.closing_balance),
-                ledger.remarks,
-                ledger.excise_officer_name,
-                ledger.excise_officer_signature,
-                ledger.status,
-                now,
-                now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(_save_ledger_row, ledger, db_path=DB_PATH)
         logger.info(f"✅ Duty ledger saved for {ledger.date}")
         
+        # Carry the new balance forward through every later day
+        ledger_engine.recompute_balances("excise_duty_ledger", ledger.date)
+        
         # Desktop storage sync
         try:
             desktop_storage.save_excise_ledger_to_excel(_serialize_model(ledger))
@@ -216,11 +240,9 @@ def get_duty_ledger(target_date: date) -> Optional[ExciseDutyLedger]:
 
 
 def get_previous_day_duty_closing(target_date: date) -> Decimal:
-    """Get previous day's closing balance"""
+    """Get closing balance of the latest duty ledger entry before target_date"""
     try:
-        previous_date = target_date - timedelta(days=1)
-        ledger = get_duty_ledger(previous_date)
-        return ledger.closing_balance if ledger else Decimal("0.00")
+        return ledger_engine.get_opening_balance("excise_duty_ledger", target_date)
     except Exception as e:
         logger.error(f"❌ Error getting previous closing balance: {e}")
         return Decimal("0.00")
@@ -230,74 +252,76 @@ def get_previous_day_duty_closing(target_date: date) -> Decimal:
 # BOTTLE ISSUES OPERATIONS
 # ============================================================================
 
+def _save_bottle_row(conn: sqlite3.Connection, bottle: ExciseDutyBottle):
+    """Insert or update one product/size issue of bottle.date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    now = datetime.now().isoformat()
+    
+    # Check if record exists
+    cursor.execute("""
+        SELECT duty_bottle_id FROM excise_duty_bottles 
+        WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
+    """, (str(bottle.date), bottle.product_name, float(bottle.strength), bottle.bottle_size_ml))
+    existing = cursor.fetchone()
+    
+    if existing:
+        # Update existing record
+        cursor.execute("""
+            UPDATE excise_duty_bottles SET
+                qty_issued = ?,
+                bl_issued = ?,
+                al_issued = ?,
+                duty_rate_per_bl = ?,
+                duty_amount = ?,
+                status = ?,
+                updated_at = ?
+            WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
+        """, (
+            bottle.qty_issued,
+            float(bottle.bl_issued),
+            float(bottle.al_issued),
+            float(bottle.duty_rate_per_bl),
+            float(bottle.duty_amount),
+            bottle.status,
+            now,
+            str(bottle.date),
+            bottle.product_name,
+            float(bottle.strength),
+            bottle.bottle_size_ml
+        ))
+    else:
+        # Insert new record
+        cursor.execute("""
+            INSERT INTO excise_duty_bottles (
+                duty_id, date, product_name, strength, bottle_size_ml,
+                qty_issued, bl_issued, al_issued,
+                duty_rate_per_bl, duty_amount,
+                status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            bottle.duty_id,
+            str(bottle.date),
+            bottle.product_name,
+            float(bottle.strength),
+            bottle.bottle_size_ml,
+            bottle.qty_issued,
+            float(bottle.bl_issued),
+            float(bottle.al_issued),
+            float(bottle.duty_rate_per_bl),
+            float(bottle.duty_amount),
+            bottle.status,
+            now,
+            now
+        ))
+
+
 def save_duty_bottle(bottle: ExciseDutyBottle) -> bool:
     """Save or update duty bottle issue"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        # Check if record exists
-        cursor.execute("""
-            SELECT duty_bottle_id FROM excise_duty_bottles 
-            WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
-        """, (str(bottle.date), bottle.product_name, float(bottle.strength), bottle.bottle_size_ml))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE excise_duty_bottles SET
-                    qty_issued = ?,
-                    bl_issued = ?,
-                    al_issued = ?,
-                    duty_rate_per_bl = ?,
-                    duty_amount = ?,
-                    status = ?,
-                    updated_at = ?
-                WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
-            """, (
-                bottle.qty_issued,
-                float(bottle.bl_issued),
-                float(bottle.al_issued),
-                float(bottle.duty_rate_per_bl),
-                float(bottle.duty_amount),
-                bottle.status,
-                now,
-                str(bottle.date),
-                bottle.product_name,
-                float(bottle.strength),
-                bottle.bottle_size_ml
-            ))
-        else:
-            # Insert new record
-            cursor.execute("""
-                INSERT INTO excise_duty_bottles (
-                    duty_id, date, product_name, strength, bottle_size_ml,
-                    qty_issued, bl_issued, al_issued,
-                    duty_rate_per_bl, duty_amount,
-                    status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                bottle.duty_id,
-                str(bottle.date),
-                bottle.product_name,
-                float(bottle.strength),
-                bottle.bottle_size_ml,
-                bottle.qty_issued,
-                float(bottle.bl_issued),
-                float(bottle.al_issued),
-                float(bottle.duty_rate_per_bl),
-                float(bottle.duty_amount),
-                bottle.status,
-                now,
-                now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(_save_bottle_row, bottle, db_path=DB_PATH)
         logger.info(f"✅ Duty bottle saved for {bottle.date} - {bottle.product_name} ({bottle.bottle_size_ml}ml)")
+        lineage.refresh_lineage(bottle.date)
         
         # Desktop storage sync
         try:
@@ -387,7 +411,7 @@ def get_regb_issued_bottles(target_date: date) -> List[Dict]:
         
         for row in rows:
             strength = Decimal(str(row['strength']))
-            duty_rate = get_duty_rate_for_strength(strength)
+            duty_rate = get_duty_rate_for_strength(strength, target_date)
             bl_issued = Decimal(str(row['issue_bl']))
             duty_amount = bl_issued * duty_rate
             
@@ -423,6 +447,95 @@ def get_regb_issued_bottles(target_date: date) -> List[Dict]:
         }
 
 
+def _rerate_duty_bottles(conn: sqlite3.Connection, start_date: date,
+                         end_date: Optional[date]) -> Tuple[int, List[str]]:
+    """Re-rate the bottles and re-total each changed day's duty; runs on the database writer"""
+    query = """
+        SELECT duty_bottle_id, date, strength, bl_issued, duty_rate_per_bl, duty_amount
+        FROM excise_duty_bottles
+        WHERE date >= ?
+    """
+    params = [str(start_date)]
+    if end_date:
+        query += " AND date <= ?"
+        params.append(str(end_date))
+    rows = conn.execute(query, params).fetchall()
+    
+    now = datetime.now().isoformat()
+    updates = []
+    changed_dates = set()
+    for bottle_id, row_date, strength, bl_issued, old_rate, old_amount in rows:
+        day = datetime.strptime(row_date, '%Y-%m-%d').date()
+        rate = duty_rates.lookup_duty_rate(Decimal(str(strength)), day)
+        amount = (Decimal(str(bl_issued)) * rate).quantize(Decimal("0.01"))
+        if Decimal(str(old_rate)) != rate or Decimal(str(old_amount)).quantize(Decimal("0.01")) != amount:
+            updates.append((float(rate), float(amount), now, bottle_id))
+            changed_dates.add(row_date)
+    
+    if not updates:
+        return 0, []
+    conn.executemany("""
+        UPDATE excise_duty_bottles
+        SET duty_rate_per_bl = ?, duty_amount = ?, updated_at = ?
+        WHERE duty_bottle_id = ?
+    """, updates)
+    
+    # The day's debit is the duty on its issues (as entered on the Excise Duty page)
+    day_totals = [(now, row_date) for row_date in sorted(changed_dates)]
+    conn.executemany("""
+        UPDATE excise_duty_ledger
+        SET total_duty_amount = (SELECT ROUND(SUM(duty_amount), 2) FROM excise_duty_bottles b
+                                 WHERE b.date = excise_duty_ledger.date),
+            duty_debited = (SELECT ROUND(SUM(duty_amount), 2) FROM excise_duty_bottles b
+                            WHERE b.date = excise_duty_ledger.date),
+            updated_at = ?
+        WHERE date = ?
+    """, day_totals)
+    conn.executemany("""
+        UPDATE excise_duty_summary
+        SET total_duty = (SELECT ROUND(SUM(duty_amount), 2) FROM excise_duty_bottles b
+                          WHERE b.date = excise_duty_summary.date),
+            updated_at = ?
+        WHERE date = ?
+    """, day_totals)
+    return len(updates), sorted(changed_dates)
+
+
+def recompute_duty_bottle_rates(start_date: date, end_date: Optional[date] = None) -> int:
+    """
+    Re-rate issued bottles from start_date (through end_date, if given) with the
+    duty rate in force on each day.
+    
+    The range starts after the last closed ledger period or sealed period, since
+    those rows are frozen. Re-rated days get their ledger debit and summary duty
+    re-totalled in the same transaction, and the ledger is then rebalanced from
+    the earliest changed day. Returns the number of bottle rows updated.
+    """
+    try:
+        frozen_through = max(
+            filter(None, [ledger_engine.get_closed_through("excise_duty_ledger"),
+                          period_close.get_sealed_through()]),
+            default=None
+        )
+        if frozen_through and start_date <= frozen_through:
+            start_date = frozen_through + timedelta(days=1)
+        if end_date and start_date > end_date:
+            logger.info(f"✅ Duty rates: nothing to re-rate after the closed period ending {frozen_through}")
+            return 0
+        
+        updated, changed_dates = db_writer.write(_rerate_duty_bottles, start_date, end_date, db_path=DB_PATH)
+        if changed_dates:
+            ledger_engine.recompute_balances(
+                "excise_duty_ledger", datetime.strptime(changed_dates[0], '%Y-%m-%d').date()
+            )
+        
+        logger.info(f"✅ Re-rated {updated} duty bottle rows on {len(changed_dates)} days from {start_date}")
+        return updated
+    except Exception as e:
+        logger.error(f"❌ Error recomputing duty rates: {e}")
+        return 0
+
+
 # ============================================================================
 # DAILY SUMMARY OPERATIONS
 # ============================================================================
@@ -464,50 +577,51 @@ def generate_duty_summary(target_date: date) -> Optional[ExciseDutyDailySummary]
         return None
 
 
+def _save_summary_row(conn: sqlite3.Connection, summary: ExciseDutyDailySummary):
+    """Insert or update the summary row of summary.date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    now = datetime.now().isoformat()
+    
+    # Check if exists
+    cursor.execute("SELECT summary_id FROM excise_duty_summary WHERE date = ?", (str(summary.date),))
+    existing = cursor.fetchone()
+    
+    if existing:
+        cursor.execute("""
+            UPDATE excise_duty_summary SET
+                opening_balance = ?, deposit_amount = ?, amount_credited = ?,
+                total_duty = ?, duty_debited = ?, closing_balance = ?,
+                total_bottles_issued = ?, total_bl_issued = ?, total_al_issued = ?,
+                number_of_issues = ?, status = ?, updated_at = ?
+            WHERE date = ?
+        """, (
+            float(summary.opening_balance), float(summary.deposit_amount), float(summary.amount_credited),
+            float(summary.total_duty), float(summary.duty_debited), float(summary.closing_balance),
+            summary.total_bottles_issued, float(summary.total_bl_issued), float(summary.total_al_issued),
+            summary.number_of_issues, summary.status, now, str(summary.date)
+        ))
+    else:
+        cursor.execute("""
+            INSERT INTO excise_duty_summary (
+                date, opening_balance, deposit_amount, amount_credited,
+                total_duty, duty_debited, closing_balance,
+                total_bottles_issued, total_bl_issued, total_al_issued,
+                number_of_issues, status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            str(summary.date),
+            float(summary.opening_balance), float(summary.deposit_amount), float(summary.amount_credited),
+            float(summary.total_duty), float(summary.duty_debited), float(summary.closing_balance),
+            summary.total_bottles_issued, float(summary.total_bl_issued), float(summary.total_al_issued),
+            summary.number_of_issues, summary.status, now, now
+        ))
+
+
 def save_duty_summary(summary: ExciseDutyDailySummary) -> bool:
     """Save daily summary to database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        # Check if exists
-        cursor.execute("SELECT summary_id FROM excise_duty_summary WHERE date = ?", (str(summary.date),))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute("""
-                UPDATE excise_duty_summary SET
-                    opening_balance = ?, deposit_amount = ?, amount_credited = ?,
-                    total_duty = ?, duty_debited = ?, closing_balance = ?,
-                    total_bottles_issued = ?, total_bl_issued = ?, total_al_issued = ?,
-                    number_of_issues = ?, status = ?, updated_at = ?
-                WHERE date = ?
-            """, (
-                float(summary.opening_balance), float(summary.deposit_amount), float(summary.amount_credited),
-                float(summary.total_duty), float(summary.duty_debited), float(summary.closing_balance),
-                summary.total_bottles_issued, float(summary.total_bl_issued), float(summary.total_al_issued),
-                summary.number_of_issues, summary.status, now, str(summary.date)
-            ))
-        else:
-            cursor.execute("""
-                INSERT INTO excise_duty_summary (
-                    date, opening_balance, deposit_amount, amount_credited,
-                    total_duty, duty_debited, closing_balance,
-                    total_bottles_issued, total_bl_issued, total_al_issued,
-                    number_of_issues, status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(summary.date),
-                float(summary.opening_balance), float(summary.deposit_amount), float(summary.amount_credited),
-                float(summary.total_duty), float(summary.duty_debited), float(summary.closing_balance),
-                summary.total_bottles_issued, float(summary.total_bl_issued), float(summary.total_al_issued),
-                summary.number_of_issues, summary.status, now, now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(_save_summary_row, summary, db_path=DB_PATH)
         logger.info(f"✅ Duty summary saved for {summary.date}")
         return True
     except Exception as e:
@@ -519,19 +633,27 @@ def save_duty_summary(summary: ExciseDutyDailySummary) -> bool:
 # UTILITY FUNCTIONS
 # ============================================================================
 
+def _delete_duty_rows(conn: sqlite3.Connection, target_date: date):
+    """Remove the ledger, bottle and summary rows of one date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    cursor.execute("DELETE FROM excise_duty_ledger WHERE date = ?", (str(target_date),))
+    cursor.execute("DELETE FROM excise_duty_bottles WHERE date = ?", (str(target_date),))
+    cursor.execute("DELETE FROM excise_duty_summary WHERE date = ?", (str(target_date),))
+
+
 def delete_duty_entry(target_date: date) -> bool:
     """Delete all duty entries for a specific date"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        cursor.execute("DELETE FROM excise_duty_ledger WHERE date = ?", (str(target_date),))
-        cursor.execute("DELETE FROM excise_duty_bottles WHERE date = ?", (str(target_date),))
-        cursor.execute("DELETE FROM excise_duty_summary WHERE date = ?", (str(target_date),))
+        if ledger_engine.is_date_closed("excise_duty_ledger", target_date):
+            logger.error(f"❌ Duty ledger period containing {target_date} is closed")
+            return False
         
-        conn.commit()
-        conn.close()
+        db_writer.write(_delete_duty_rows, target_date, db_path=DB_PATH)
         logger.info(f"✅ Deleted duty entries for {target_date}")
+        
+        ledger_engine.recompute_balances("excise_duty_ledger", target_date)
+        lineage.refresh_lineage(target_date)
         return True
     except Exception as e:
         logger.error(f"❌ Error deleting duty entry: {e}")
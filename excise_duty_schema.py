@@ -20,6 +20,19 @@ DUTY_RATES = {
     Decimal("11.4"): Decimal("17.00")   # 80° U.P. → ₹17/BL
 }
 
+# Strength bands used to seed the effective-dated excise_duty_rates table.
+# Each nominal strength covers half the 5.7% v/v step to its neighbours.
+# (strength_min inclusive, strength_max exclusive, nominal strength)
+DUTY_RATE_BANDS = [
+    (Decimal("25.65"), Decimal("31.35"), Decimal("28.5")),
+    (Decimal("19.95"), Decimal("25.65"), Decimal("22.8")),
+    (Decimal("14.25"), Decimal("19.95"), Decimal("17.1")),
+    (Decimal("8.55"), Decimal("14.25"), Decimal("11.4"))
+]
+
+# Seed rates apply from this date until a newer rate is entered
+DUTY_RATES_EFFECTIVE_FROM = "2000-01-01"
+
 BOTTLE_SIZES_ML = [750, 600, 500, 375, 300, 180]
 
 STRENGTH_OPTIONS = [
@@ -255,12 +268,35 @@ CREATE TABLE IF NOT EXISTS excise_duty_summary (
 );
 """
 
+CREATE_EXCISE_DUTY_RATES_TABLE = """
+CREATE TABLE IF NOT EXISTS excise_duty_rates (
+    rate_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    
+    -- Strength Band (% v/v): strength_min <= strength < strength_max
+    strength_min REAL NOT NULL,
+    strength_max REAL NOT NULL,
+    nominal_strength REAL,
+    
+    -- Rate & Validity (effective_to NULL = still in force)
+    rate_per_bl REAL NOT NULL,
+    effective_from TEXT NOT NULL,
+    effective_to TEXT,
+    
+    notification_ref TEXT,
+    created_at TEXT NOT NULL,
+    
+    CHECK (strength_min < strength_max),
+    CHECK (effective_to IS NULL OR effective_to >= effective_from)
+);
+"""
+
 # Indexes for faster queries
 CREATE_EXCISE_DUTY_INDEXES = """
 CREATE INDEX IF NOT EXISTS idx_duty_ledger_date ON excise_duty_ledger(date);
 CREATE INDEX IF NOT EXISTS idx_duty_bottles_date ON excise_duty_bottles(date);
 CREATE INDEX IF NOT EXISTS idx_duty_bottles_duty_id ON excise_duty_bottles(duty_id);
 CREATE INDEX IF NOT EXISTS idx_duty_summary_date ON excise_duty_summary(date);
+CREATE INDEX IF NOT EXISTS idx_duty_rates_band ON excise_duty_rates(strength_min, effective_from);
 """
 
 
@@ -268,9 +304,10 @@ CREATE INDEX IF NOT EXISTS idx_duty_summary_date ON excise_duty_summary(date);
 # HELPER FUNCTIONS
 # ============================================================================
 
-def get_duty_rate_for_strength(strength: Decimal) -> Decimal:
-    """Get duty rate per BL for a given strength"""
-    return DUTY_RATES.get(strength, Decimal("0.00"))
+def get_duty_rate_for_strength(strength: Decimal, on_date: Optional[date] = None) -> Decimal:
+    """Get duty rate per BL for a given strength, as in force on on_date (default today)"""
+    from duty_rates import lookup_duty_rate  # imported here: duty_rates imports this module
+    return lookup_duty_rate(strength, on_date)
 
 
 def get_strength_label(strength: Decimal) -> str:
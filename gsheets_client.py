@@ -0,0 +1,217 @@
+"""
+Google Sheets Client - One authorized client per process
+Credentials are loaded once and the gspread client, spreadsheet and worksheet
+handles are kept for reuse, so a sync goes straight to moving data instead of
+re-authorizing and re-opening the sheet every time
+"""
+
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+JSON_KEY = "the-program-482110-e4-7ef9d425d794.json"
+
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive"
+]
+
+
+def load_service_account_credentials():
+    """
+    Service-account credentials from Streamlit secrets (Streamlit Cloud) or the
+    local JSON key. Returns (credentials, source) or (None, None) if neither is set up.
+    """
+    from google.oauth2.service_account import Credentials
+    
+    try:
+        import streamlit as st
+        if "gsheets_credentials" in st.secrets:
+            return Credentials.from_service_account_info(st.secrets["gsheets_credentials"], scopes=SCOPES), "secrets"
+    except Exception:
+        pass  # no secrets file outside Streamlit Cloud
+    
+    if os.path.exists(JSON_KEY):
+        return Credentials.from_service_account_file(JSON_KEY, scopes=SCOPES), JSON_KEY
+    return None, None
+
+
+def authorize_gspread(credentials):
+    """gspread client over an authorized session; the session refreshes the token only when it expires"""
+    import gspread
+    return gspread.authorize(credentials)
+
+
+class GoogleClientManager:
+    """
+    Process-wide cache of the authorized client and the spreadsheet/worksheet
+    handles each register syncs to, with per-operation call and latency metrics.
+    
+    load_credentials and authorize can be replaced with stubs to run without Google.
+    """
+    
+    def __init__(self, load_credentials: Callable = load_service_account_credentials,
+                 authorize: Callable = authorize_gspread):
+        self._load_credentials = load_credentials
+        self._authorize = authorize
+        self._lock = threading.RLock()
+        self._credentials = None
+        self._credentials_source = None
+        self._client = None
+        self._spreadsheets: Dict[str, object] = {}
+        self._worksheets: Dict[tuple, object] = {}
+        self._metrics: Dict[str, Dict[str, float]] = {}
+        self._last_error: Optional[str] = None
+    
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+    
+    def _record(self, op: str, start: float, error: bool = False, hit: bool = False):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        m = self._metrics.setdefault(op, {"calls": 0, "cache_hits": 0, "errors": 0,
+                                          "total_ms": 0.0, "last_ms": 0.0, "max_ms": 0.0})
+        m["calls"] += 1
+        if hit:
+            m["cache_hits"] += 1
+            return
+        if error:
+            m["errors"] += 1
+        m["total_ms"] += elapsed_ms
+        m["last_ms"] = elapsed_ms
+        m["max_ms"] = max(m["max_ms"], elapsed_ms)
+    
+    def _call(self, op: str, fn: Callable):
+        """Run one Google call, recording its latency and any error"""
+        start = time.perf_counter()
+        try:
+            result = fn()
+        except Exception as e:
+            self._record(op, start, error=True)
+            self._last_error = f"{op}: {e}"
+            raise
+        self._record(op, start)
+        return result
+    
+    # ------------------------------------------------------------------
+    # Handles
+    # ------------------------------------------------------------------
+    
+    def client(self):
+        """The authorized gspread client, or None when no credentials are configured"""
+        with self._lock:
+            if self._client is not None:
+                self._record("authorize", time.perf_counter(), hit=True)
+                return self._client
+            if self._credentials is None:
+                self._credentials, self._credentials_source = self._call("load_credentials", self._load_credentials)
+                if self._credentials is None:
+                    return None
+            self._client = self._call("authorize", lambda: self._authorize(self._credentials))
+            return self._client
+    
+    def spreadsheet(self, url: str):
+        """Spreadsheet handle for url, opened once"""
+        with self._lock:
+            if url in self._spreadsheets:
+                self._record("open_spreadsheet", time.perf_counter(), hit=True)
+                return self._spreadsheets[url]
+            client = self.client()
+            if client is None:
+                return None
+            sh = self._call("open_spreadsheet", lambda: client.open_by_url(url))
+            self._spreadsheets[url] = sh
+            return sh
+    
+    def worksheet(self, url: str, title: Optional[str] = None, index: int = 0, cols: int = 26):
+        """
+        Worksheet handle by title (created with cols columns if missing) or, with no
+        title, by position. Returns None when no credentials are configured.
+        """
+        key = (url, title if title is not None else index)
+        with self._lock:
+            if key in self._worksheets:
+                self._record("open_worksheet", time.perf_counter(), hit=True)
+                return self._worksheets[key]
+            sh = self.spreadsheet(url)
+            if sh is None:
+                return None
+            
+            if title is None:
+                ws = self._call("open_worksheet", lambda: sh.get_worksheet(index))
+            else:
+                def find():
+                    try:
+                        return sh.worksheet(title)
+                    except Exception as e:
+                        # gspread.exceptions.WorksheetNotFound, matched by name so stubs need no gspread
+                        if type(e).__name__ != "WorksheetNotFound":
+                            raise
+                        return None
+                
+                ws = self._call("open_worksheet", find)
+                if ws is None:
+                    ws = self._call("add_worksheet", lambda: sh.add_worksheet(title=title, rows=1000, cols=cols))
+            self._worksheets[key] = ws
+            return ws
+    
+    def invalidate(self, url: Optional[str] = None):
+        """
+        Drop cached handles after a failed call so the next sync reopens them
+        (all handles and the client when url is None).
+        """
+        with self._lock:
+            if url is None:
+                self._client = None
+                self._spreadsheets.clear()
+                self._worksheets.clear()
+                return
+            self._spreadsheets.pop(url, None)
+            for key in [k for k in self._worksheets if k[0] == url]:
+                del self._worksheets[key]
+    
+    def timed(self, op: str, fn: Callable):
+        """Run a call on a cached handle (clear, update, ...) under the manager's metrics"""
+        return self._call(op, fn)
+    
+    # ------------------------------------------------------------------
+    # Health
+    # ------------------------------------------------------------------
+    
+    def health(self) -> Dict:
+        """Connection state, token expiry and per-operation metrics"""
+        with self._lock:
+            creds = self._credentials
+            expiry = getattr(creds, "expiry", None)
+            return {
+                "configured": creds is not None,
+                "credentials_source": self._credentials_source,
+                "authorized": self._client is not None,
+                "token_valid": bool(getattr(creds, "valid", False)),
+                "token_expiry": expiry.isoformat() if expiry else None,
+                "spreadsheets_cached": len(self._spreadsheets),
+                "worksheets_cached": len(self._worksheets),
+                "last_error": self._last_error,
+                "metrics": {op: dict(m) for op, m in self._metrics.items()},
+            }
+
+
+_manager: Optional[GoogleClientManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_manager() -> GoogleClientManager:
+    """The process-wide client manager"""
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = GoogleClientManager()
+        return _manager
+
+
+def set_manager(manager: Optional[GoogleClientManager]):
+    """Replace the process-wide manager (a stub in tests; None to start fresh)"""
+    global _manager
+    with _manager_lock:
+        _manager = manager
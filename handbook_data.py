@@ -0,0 +1,497 @@
+"""
+Daily Handbook Data Model
+Everything the Daily Handbook shows, read from the registers into plain,
+JSON-serializable sections (title, header rows, body rows of display strings).
+The PDF renderer in handbook_generator_v2 and the HTML / st.dataframe preview
+on the Daily Handbook page both draw from the same model; building it needs no
+ReportLab and takes milliseconds.
+"""
+
+import html
+import json
+import sqlite3
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+BOTTLE_SIZES = [750, 600, 500, 375, 300, 180]
+
+
+class HandbookData:
+    """Read the registers for one handbook date and build its sections"""
+    
+    def __init__(self, handbook_date=None):
+        self.handbook_date = handbook_date or date.today()
+        self.db_path = "excise_registers.db"
+        
+        # Company details
+        self.company_name = "SIP2LIFE DISTILLERIES PVT. LTD."
+        self.document_title = "Daily Hand Book Detail"
+        
+        # Previous day for comparisons
+        self.previous_date = self.handbook_date - timedelta(days=1)
+    
+    def get_db_connection(self):
+        """Get database connection"""
+        return sqlite3.connect(self.db_path)
+    
+    def safe_float(self, value, default=0.0):
+        """Safely convert to float"""
+        try:
+            return float(value) if pd.notna(value) else default
+        except:
+            return default
+    
+    # ------------------------------------------------------------------
+    # Register reads
+    # ------------------------------------------------------------------
+    
+    def fetch_reg78_data(self):
+        """Fetch Reg-78 synopsis data from SQLite"""
+        try:
+            conn = self.get_db_connection()
+            query = "SELECT * FROM reg78_synopsis WHERE synopsis_date = ?"
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-78 data from SQLite: {e}")
+        return pd.DataFrame()
+    
+    def fetch_reg74_stock(self):
+        """Fetch latest Reg-74 stock for all vats from SQLite"""
+        try:
+            conn = self.get_db_connection()
+            query = """
+            SELECT * FROM reg74_operations
+            WHERE operation_date <= ?
+            ORDER BY operation_date DESC
+            """
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            
+            if not df.empty and 'source_vat' in df.columns:
+                latest = df.groupby('source_vat').first().reset_index()
+                return latest
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-74 stock from SQLite: {e}")
+        return pd.DataFrame()
+    
+    def fetch_reg74_raw(self):
+        """Fetch full Reg-74 data for the day for reconciliation"""
+        try:
+            conn = self.get_db_connection()
+            query = "SELECT * FROM reg74_operations WHERE operation_date = ?"
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-74 raw from SQLite: {e}")
+        return pd.DataFrame()
+    
+    def fetch_rega_production(self):
+        """Fetch Reg-A production data from SQLite"""
+        try:
+            conn = self.get_db_connection()
+            query = "SELECT * FROM rega_production WHERE production_date = ?"
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-A data from SQLite: {e}")
+        return pd.DataFrame()
+    
+    def fetch_regb_stock(self):
+        """Fetch Reg-B bottle stock data from SQLite"""
+        try:
+            conn = self.get_db_connection()
+            query = "SELECT * FROM regb_bottle_stock WHERE date = ?"
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-B stock from SQLite: {e}")
+            return pd.DataFrame()
+    
+    def fetch_regb_fees(self):
+        """Fetch Reg-B production fees data from SQLite"""
+        try:
+            conn = self.get_db_connection()
+            query = "SELECT * FROM regb_production_fees WHERE date = ? ORDER BY created_at DESC LIMIT 1"
+            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
+            conn.close()
+            return df
+        except Exception as e:
+            print(f"Warning: Could not fetch Reg-B fees from SQLite: {e}")
+            return pd.DataFrame()
+    
+    def fetch_excise_duty(self):
+        """Fetch excise duty ledger and bottles for the day from SQLite"""
+        ledger = pd.DataFrame()
+        bottles = pd.DataFrame()
+        try:
+            conn = self.get_db_connection()
+            l_query = "SELECT * FROM excise_duty_ledger WHERE date = ? ORDER BY created_at DESC LIMIT 1"
+            ledger = pd.read_sql_query(l_query, conn, params=(str(self.handbook_date),))
+            
+            b_query = "SELECT * FROM excise_duty_bottles WHERE date = ?"
+            bottles = pd.read_sql_query(b_query, conn, params=(str(self.handbook_date),))
+            conn.close()
+        except Exception as e:
+            print(f"Warning: Could not fetch Excise Duty data from SQLite: {e}")
+        return ledger, bottles
+    
+    def compute_reg78_reconciliation(self, stock_df, reg78_df):
+        """Reconcile Reg-78 closing balance against SST/BRT totals"""
+        totals = {"sst_al": 0.0, "brt_al": 0.0, "total_al": 0.0}
+        operational_increase_al = 0.0
+        operational_wastage_al = 0.0
+        
+        if not stock_df.empty:
+            for _, row in stock_df.iterrows():
+                vat = str(row.get('source_vat', ''))
+                closing_al = self.safe_float(row.get('closing_al', 0))
+                if vat.startswith('SST-'):
+                    totals["sst_al"] += closing_al
+                elif vat.startswith('BRT-'):
+                    totals["brt_al"] += closing_al
+            
+            # Monthly operational adjustments from raw Reg-74 records of the day
+            raw_df = self.fetch_reg74_raw()
+            if not raw_df.empty:
+                storage_wastage_al = raw_df.get('storage_wastage_al', pd.Series(dtype=float)).fillna(0)
+                # Negative wastage (increase)
+                operational_increase_al = storage_wastage_al[storage_wastage_al < 0].abs().sum()
+                # Positive wastage
+                operational_wastage_al = raw_df.get('wastage_al', pd.Series(dtype=float)).fillna(0).sum()
+        
+        totals["total_al"] = totals["sst_al"] + totals["brt_al"]
+        expected_closing = totals["total_al"] # Simplified for daily handbook
+        
+        reg78_closing = 0.0
+        if not reg78_df.empty:
+            reg78_closing = self.safe_float(reg78_df.iloc[0].get('closing_balance_al', 0))
+        
+        difference = reg78_closing - totals["total_al"]
+        
+        return {
+            "sst_al": totals["sst_al"],
+            "brt_al": totals["brt_al"],
+            "total_al": totals["total_al"],
+            "operational_increase_al": float(operational_increase_al),
+            "operational_wastage_al": float(operational_wastage_al),
+            "expected_closing_al": totals["total_al"],
+            "reg78_closing_al": reg78_closing,
+            "difference_al": difference,
+        }
+    
+    # ------------------------------------------------------------------
+    # Sections
+    # ------------------------------------------------------------------
+    
+    def _vat_rows(self, stock_df, prefix, vat_numbers):
+        rows, total_bl, total_al = [], 0.0, 0.0
+        for vat_num in vat_numbers:
+            vat_name = f'{prefix}-{vat_num}'
+            vat_data = pd.DataFrame()
+            if not stock_df.empty and 'source_vat' in stock_df.columns:
+                vat_data = stock_df[stock_df['source_vat'] == vat_name]
+            if vat_data.empty:
+                rows.append([vat_name, '-', '0.00', '0.00', '0.00'])
+                continue
+            row = vat_data.iloc[0]
+            bl = self.safe_float(row.get('closing_bl', 0))
+            al = self.safe_float(row.get('closing_al', 0))
+            strength = self.safe_float(row.get('closing_strength', 0))
+            dip = self.safe_float(row.get('dip_reading_cm', 0))
+            total_bl += bl
+            total_al += al
+            rows.append([vat_name, f"{dip:.2f}" if dip > 0 else '-', f"{bl:.2f}", f"{strength:.2f}", f"{al:.2f}"])
+        return rows, total_bl, total_al
+    
+    def build_sst_brt_section(self) -> Dict:
+        """Closing stock of every SST and BRT vat, with subtotals"""
+        stock_df = self.fetch_reg74_stock()
+        
+        sst_rows, sst_total_bl, sst_total_al = self._vat_rows(stock_df, 'SST', range(5, 11))  # SST-5 to SST-10
+        brt_rows, brt_total_bl, brt_total_al = self._vat_rows(stock_df, 'BRT', range(11, 18))  # BRT-11 to BRT-17
+        
+        rows = sst_rows
+        rows.append(['A. Total (SST)', '', f"{sst_total_bl:.2f}", '', f"{sst_total_al:.2f}"])
+        rows += brt_rows
+        rows.append(['B. Total (BRT)', '', f"{brt_total_bl:.2f}", '', f"{brt_total_al:.2f}"])
+        rows.append(['Grand Total', '', f"{sst_total_bl + brt_total_bl:.2f}", '', f"{sst_total_al + brt_total_al:.2f}"])
+        
+        return {
+            "key": "sst_brt",
+            "title": "SST & BRT Detail",
+            "header": [['Vats', 'Dip (cm)', 'B.L.', '%v/v', 'A.L.']],
+            "rows": rows,
+        }
+    
+    def build_production_section(self) -> Dict:
+        """Bottling line production from Reg-A"""
+        prod_df = self.fetch_rega_production()
+        
+        rows = []
+        if not prod_df.empty:
+            for idx, row in prod_df.iterrows():
+                # Use mfm2_strength if available, fallback to brt_opening_strength or strength
+                strength = self.safe_float(row.get('mfm2_strength', row.get('brt_opening_strength', row.get('strength', 0))))
+                bottles = [str(int(self.safe_float(row.get(f'bottles_{size}ml', 0)))) for size in BOTTLE_SIZES]
+                prod_al = self.safe_float(row.get('bottles_total_al', row.get('bottles_al', 0)))
+                wastage_al = self.safe_float(row.get('wastage_al', 0))
+                rows.append([f"Line-{idx+1}", f"{strength:.2f}"] + bottles + [f"{prod_al:.2f}", f"{wastage_al:.2f}"])
+            
+            totals = [str(int(prod_df.get(f'bottles_{size}ml', pd.Series(dtype=float)).sum())) for size in BOTTLE_SIZES]
+            total_al = prod_df.get('bottles_total_al', pd.Series(dtype=float)).sum()
+            total_wastage = prod_df.get('wastage_al', pd.Series(dtype=float)).sum()
+            rows.append(['Total', ''] + totals + [f"{total_al:.2f}", f"{total_wastage:.2f}"])
+        else:
+            rows.append(['Line-1', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00'])
+            rows.append(['Total', '', '0', '0', '0', '0', '0', '0', '0.00', '0.00'])
+        
+        return {
+            "key": "production",
+            "title": "Production Detail",
+            "header": [
+                ['Bottling\nLine', 'Nominal\nStrength\n(%v/v)', 'IML Bottles Production Quantity', '', '', '', '', '', 'Production\nin A.L.', 'Production\nWastg.\nin A.L.'],
+                ['', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '']
+            ],
+            "rows": rows,
+        }
+    
+    def build_production_fees_section(self) -> Dict:
+        """Production fee account from Reg-B, with bottle counts from Reg-A"""
+        fees_df = self.fetch_regb_fees()
+        prod_df = self.fetch_rega_production()
+        
+        if not fees_df.empty:
+            row = fees_df.iloc[0]
+            opening = self.safe_float(row.get('opening_balance', 0))
+            deposit = self.safe_float(row.get('deposit_amount', 0))
+            closing = self.safe_float(row.get('closing_balance', 0))
+            fee_debited = self.safe_float(row.get('total_fees_debited', row.get('fee_debited', 0)))
+            
+            # Bottle counts from Reg-A production
+            bottles = [
+                str(int(self.safe_float(prod_df.get(f'bottles_{size}ml', pd.Series(dtype=float)).sum())))
+                for size in BOTTLE_SIZES
+            ]
+            total_bl = self.safe_float(prod_df.get('bottles_total_bl', pd.Series(dtype=float)).sum())
+            
+            rows = [[f"{opening:.2f}", f"{deposit:.2f}"] + bottles + [f"{total_bl:.2f}", f"{fee_debited:.2f}", f"{closing:.2f}"]]
+        else:
+            rows = [['0.00', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00', '0.00']]
+        
+        return {
+            "key": "production_fees",
+            "title": "Production Fee's Detail",
+            "header": [
+                ['Opening\nBalance\n(Rs.)', 'Deposit\nAmount\n(Rs.)', 'IML Bottles Production Quantity', '', '', '', '', '', 'Bottles\nProduction\nin B.L.', 'Fee for\nBottling\nDebited\n(Rs.)', 'Closing\nBalance\n(Rs.)'],
+                ['', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '', '']
+            ],
+            "rows": rows,
+        }
+    
+    def build_issued_bottles_section(self) -> Dict:
+        """Bottle stock by size from Reg-B"""
+        stock_df = self.fetch_regb_stock()
+        
+        rows = []
+        totals = {"opening": 0, "received": 0, "accounted": 0, "wastage": 0, "issued": 0, "closing": 0}
+        
+        for size in BOTTLE_SIZES:
+            size_df = stock_df[stock_df['bottle_size_ml'] == size] if not stock_df.empty else pd.DataFrame()
+            if not size_df.empty:
+                opening = int(self.safe_float(size_df.get('opening_balance_bottles', pd.Series(dtype=float)).sum()))
+                received = int(self.safe_float(size_df.get('quantity_received_bottles', pd.Series(dtype=float)).sum()))
+                accounted = int(self.safe_float(size_df.get('total_accounted_bottles', pd.Series(dtype=float)).sum()))
+                wastage = int(self.safe_float(size_df.get('wastage_breakage_bottles', pd.Series(dtype=float)).sum()))
+                issued = int(self.safe_float(size_df.get('issue_on_duty_bottles', pd.Series(dtype=float)).sum()))
+                closing = int(self.safe_float(size_df.get('closing_balance_bottles', pd.Series(dtype=float)).sum()))
+                strength = self.safe_float(size_df.iloc[0].get('strength', 0))
+            else:
+                opening = received = accounted = wastage = issued = closing = 0
+                strength = 0.0
+            
+            totals["opening"] += opening
+            totals["received"] += received
+            totals["accounted"] += accounted
+            totals["wastage"] += wastage
+            totals["issued"] += issued
+            totals["closing"] += closing
+            
+            rows.append([
+                str(size), f"{strength:.2f}" if strength > 0 else '-', str(opening), str(received), str(accounted), str(wastage), str(issued), str(closing)
+            ])
+        
+        rows.append([
+            'Total', '', str(totals["opening"]), str(totals["received"]), str(totals["accounted"]), str(totals["wastage"]), str(totals["issued"]), str(totals["closing"])
+        ])
+        
+        total_al_in_hand = 0.0
+        if not stock_df.empty:
+            total_al_in_hand = self.safe_float(stock_df.get('closing_al', pd.Series(dtype=float)).sum())
+        rows.append(['Total Spirit in Hand (A.L.)', '', '', '', '', '', '', f"{total_al_in_hand:.2f}"])
+        
+        return {
+            "key": "issued_bottles",
+            "title": "Issued Bottle Details",
+            "header": [['Size\n(ml)', 'Nominal\nStrength\n(%v/v)', 'Opening\nBalance', 'Quantity\nReceived', 'Total to be\nAccounted', 'Wastage/\nBreakage', 'Issue on\nPayment', 'Closing\nBalance']],
+            "rows": rows,
+        }
+    
+    def build_excise_duty_section(self) -> Dict:
+        """Excise duty ledger with the day's issues by bottle size"""
+        ledger_df, bottles_df = self.fetch_excise_duty()
+        
+        if not ledger_df.empty:
+            row = ledger_df.iloc[0]
+            opening = self.safe_float(row.get('opening_balance', 0))
+            deposit = self.safe_float(row.get('deposit_amount', 0))
+            credited = self.safe_float(row.get('amount_credited', row.get('total_credited', 0)))
+            closing = self.safe_float(row.get('closing_balance', 0))
+            duty = self.safe_float(row.get('duty_debited', row.get('total_duty_amount', 0)))
+            
+            # Use bottle issues if ledger doesn't have details
+            issued_by_size = {size: 0 for size in BOTTLE_SIZES}
+            if not bottles_df.empty:
+                issued_al = self.safe_float(bottles_df.get('al_issued', pd.Series(dtype=float)).sum())
+                for size in issued_by_size:
+                    size_qty = bottles_df[bottles_df['bottle_size_ml'] == size].get('qty_issued', pd.Series(dtype=float)).sum()
+                    issued_by_size[size] = int(self.safe_float(size_qty))
+            else:
+                issued_al = self.safe_float(row.get('issued_al', 0))
+            
+            rows = [
+                [f"{opening:.2f}", f"{deposit:.2f}", f"{credited:.2f}"]
+                + [str(issued_by_size[size]) for size in BOTTLE_SIZES]
+                + [f"{issued_al:.2f}", f"{duty:.2f}", f"{closing:.2f}"]
+            ]
+        else:
+            rows = [['0.00', '0.00', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00', '0.00']]
+        
+        return {
+            "key": "excise_duty",
+            "title": "Excise Duty Detail",
+            "header": [
+                ['Opening\nBalance\n(Rs.)', 'Deposit\nAmount\n(Rs.)', 'Total\nCredited\n(Rs.)', 'Issued Bottle Quantity', '', '', '', '', '', 'Bottles\nIssued\nin A.L.', 'Duty\nDebited\n(Rs.)', 'Closing\nBalance\n(Rs.)'],
+                ['', '', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '', '']
+            ],
+            "rows": rows,
+        }
+    
+    def build_reconciliation_section(self) -> Dict:
+        """Reg-78 synopsis closing against the vat totals"""
+        recon = self.compute_reg78_reconciliation(self.fetch_reg74_stock(), self.fetch_reg78_data())
+        return {
+            "key": "reg78_reconciliation",
+            "title": "Reg-78 Reconciliation (Spirit AL)",
+            "header": [["Reg-78 Reconciliation (Spirit AL)", "A.L."]],
+            "rows": [
+                ["SST Total AL (Tanks)", f"{recon['sst_al']:.2f}"],
+                ["BRT Total AL (Tanks)", f"{recon['brt_al']:.2f}"],
+                ["Operational Adjustments (Increase) AL", f"{recon['operational_increase_al']:.2f}"],
+                ["Operational Adjustments (Wastage) AL", f"{recon['operational_wastage_al']:.2f}"],
+                ["Reg-78 Synopsis Closing AL", f"{recon['reg78_closing_al']:.2f}"],
+                ["Difference (Synopsis vs Vats) AL", f"{recon['difference_al']:.2f}"]
+            ],
+            "values": recon,
+        }
+    
+    def build(self, progress: Optional[Callable] = None) -> Dict:
+        """
+        The whole handbook as plain data (safe to json.dumps). progress(fraction,
+        message), if given, is called before each section is read.
+        """
+        builders = [
+            self.build_sst_brt_section,
+            self.build_production_section,
+            self.build_production_fees_section,
+            self.build_issued_bottles_section,
+            self.build_excise_duty_section,
+            self.build_reconciliation_section,
+        ]
+        sections = []
+        for i, builder in enumerate(builders):
+            if progress:
+                progress(i / len(builders), f"Reading registers ({i + 1}/{len(builders)})")
+            sections.append(builder())
+        return {
+            "handbook_date": str(self.handbook_date),
+            "company_name": self.company_name,
+            "document_title": self.document_title,
+            "sections": sections,
+        }
+    
+    def to_json(self, indent: int = 2) -> str:
+        return json.dumps(self.build(), indent=indent)
+
+
+# ============================================================================
+# PREVIEW RENDERERS
+# ============================================================================
+
+def section_columns(section: Dict) -> List[str]:
+    """One flat, unique column name per column (the lowest non-blank header label)"""
+    columns = []
+    for i in range(len(section["header"][0])):
+        labels = [row[i] for row in section["header"] if row[i]]
+        name = " ".join(labels[-1].split()) if labels else ""
+        columns.append(name if name and name not in columns else f"{name} ({i + 1})".strip())
+    return columns
+
+
+def section_frame(section: Dict) -> pd.DataFrame:
+    """A section as a DataFrame, for st.dataframe"""
+    return pd.DataFrame(section["rows"], columns=section_columns(section))
+
+
+def _header_html(header: List[List[str]]) -> str:
+    """Header rows with a group label spanning the blank cells after it, and single labels spanning both rows"""
+    def label(text):
+        return html.escape(text).replace("\n", "<br>")
+    
+    if len(header) == 1:
+        return "<tr>" + "".join(f"<th>{label(text)}</th>" for text in header[0]) + "</tr>"
+    
+    top, bottom = header[0], header[1]
+    cells, i = [], 0
+    while i < len(top):
+        if not bottom[i]:
+            cells.append(f"<th rowspan='2'>{label(top[i])}</th>")
+            i += 1
+            continue
+        span = 1
+        while i + span < len(top) and not top[i + span] and bottom[i + span]:
+            span += 1
+        cells.append(f"<th colspan='{span}'>{label(top[i])}</th>")
+        i += span
+    lower = "".join(f"<th>{label(text)}</th>" for text in bottom if text)
+    return f"<tr>{''.join(cells)}</tr><tr>{lower}</tr>"
+
+
+def handbook_html(model: Dict) -> str:
+    """The handbook laid out like the printed register, as one HTML fragment"""
+    parts = [
+        "<div class='handbook-preview'>",
+        f"<h3 style='text-align:center;margin:0'>{html.escape(model['company_name'])}</h3>",
+        f"<p style='text-align:center;margin:0 0 8px 0'><strong>{html.escape(model['document_title'])}</strong></p>",
+        f"<p><strong>Date: {pd.to_datetime(model['handbook_date']).strftime('%d.%m.%Y')}</strong></p>",
+    ]
+    for section in model["sections"]:
+        body = []
+        for row in section["rows"]:
+            style = " style='font-weight:bold;background:#F4B942;color:#000'" if "Total" in row[0] else ""
+            body.append(f"<tr{style}>" + "".join(f"<td>{html.escape(str(cell))}</td>" for cell in row) + "</tr>")
+        parts.append(
+            f"<h4 style='background:#2C3E50;color:#fff;text-align:center;padding:6px;margin:12px 0 4px 0'>"
+            f"{html.escape(section['title'])}</h4>"
+            "<table style='width:100%;border-collapse:collapse;text-align:center;font-size:0.85rem' border='1'>"
+            f"<thead style='background:#2C3E50;color:#fff'>{_header_html(section['header'])}</thead>"
+            f"<tbody>{''.join(body)}</tbody></table>"
+        )
+    parts.append("</div>")
+    return "".join(parts)
@@ -23,19 +23,35 @@ import pandas as pd
 from datetime import datetime, date, timedelta
 import os
 
-class EnhancedHandbookGenerator:
-    """Generate comprehensive daily handbook with full register integration"""
+import artifact_store
+import handbook_data
+from handbook_data import HandbookData
+
+HANDBOOK_VERSION = "2.1"
+
+# Tables the handbook reads, with the date column that bounds what it reads
+HANDBOOK_INPUT_TABLES = {
+    "reg78_synopsis": "synopsis_date",
+    "reg74_operations": "operation_date",
+    "rega_production": "production_date",
+    "regb_bottle_stock": "date",
+    "regb_production_fees": "date",
+    "excise_duty_ledger": "date",
+    "excise_duty_bottles": "date",
+}
+
+class EnhancedHandbookGenerator(HandbookData):
+    """
+    Generate comprehensive daily handbook with full register integration.
+    The registers are read into plain sections by HandbookData (handbook_data.py);
+    the create_* methods here only lay those sections out as PDF tables.
+    """
     
     def __init__(self, handbook_date=None):
         """Initialize enhanced handbook generator"""
-        self.handbook_date = handbook_date or date.today()
-        self.db_path = "excise_registers.db"
+        super().__init__(handbook_date)
         self.output_filename = f"Daily_Handbook_{self.handbook_date.strftime('%d_%m_%Y')}.pdf"
         
-        # Company details
-        self.company_name = "SIP2LIFE DISTILLERIES PVT. LTD."
-        self.document_title = "Daily Hand Book Detail"
-        
         # Enhanced color scheme
         self.header_gold = colors.HexColor('#F4B942')
         self.dark_navy = colors.HexColor('#2C3E50')
@@ -43,159 +59,6 @@ class EnhancedHandbookGenerator:
         self.medium_blue = colors.HexColor('#85C1E9')
         self.white = colors.white
         self.black = colors.black
-        
-        # Previous day for comparisons
-        self.previous_date = self.handbook_date - timedelta(days=1)
-        
-    def get_db_connection(self):
-        """Get database connection"""
-        return sqlite3.connect(self.db_path)
-    
-    def safe_float(self, value, default=0.0):
-        """Safely convert to float"""
-        try:
-            return float(value) if pd.notna(value) else default
-        except:
-            return default
-    
-    def fetch_reg78_data(self):
-        """Fetch Reg-78 synopsis data from SQLite"""
-        try:
-            conn = self.get_db_connection()
-            query = "SELECT * FROM reg78_synopsis WHERE synopsis_date = ?"
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            return df
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-78 data from SQLite: {e}")
-        return pd.DataFrame()
-    
-    def fetch_reg74_stock(self):
-        """Fetch latest Reg-74 stock for all vats from SQLite"""
-        try:
-            conn = self.get_db_connection()
-            query = """
-            SELECT * FROM reg74_operations 
-            WHERE operation_date <= ? 
-            ORDER BY operation_date DESC
-            """
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            
-            if not df.empty and 'source_vat' in df.columns:
-                latest = df.groupby('source_vat').first().reset_index()
-                return latest
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-74 stock from SQLite: {e}")
-        return pd.DataFrame()
-
-    def fetch_reg74_raw(self):
-        """Fetch full Reg-74 data for the day for reconciliation"""
-        try:
-            conn = self.get_db_connection()
-            query = "SELECT * FROM reg74_operations WHERE operation_date = ?"
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            return df
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-74 raw from SQLite: {e}")
-        return pd.DataFrame()
-    
-    def fetch_rega_production(self):
-        """Fetch Reg-A production data from SQLite"""
-        try:
-            conn = self.get_db_connection()
-            query = "SELECT * FROM rega_production WHERE production_date = ?"
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            return df
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-A data from SQLite: {e}")
-        return pd.DataFrame()
-    
-    def fetch_regb_stock(self):
-        """Fetch Reg-B bottle stock data from SQLite"""
-        try:
-            conn = self.get_db_connection()
-            query = "SELECT * FROM regb_bottle_stock WHERE date = ?"
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            return df
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-B stock from SQLite: {e}")
-            return pd.DataFrame()
-
-    def fetch_regb_fees(self):
-        """Fetch Reg-B production fees data from SQLite"""
-        try:
-            conn = self.get_db_connection()
-            query = "SELECT * FROM regb_production_fees WHERE date = ? ORDER BY created_at DESC LIMIT 1"
-            df = pd.read_sql_query(query, conn, params=(str(self.handbook_date),))
-            conn.close()
-            return df
-        except Exception as e:
-            print(f"Warning: Could not fetch Reg-B fees from SQLite: {e}")
-            return pd.DataFrame()
-
-    def fetch_excise_duty(self):
-        """Fetch excise duty ledger and bottles for the day from SQLite"""
-        ledger = pd.DataFrame()
-        bottles = pd.DataFrame()
-        try:
-            conn = self.get_db_connection()
-            l_query = "SELECT * FROM excise_duty_ledger WHERE date = ? ORDER BY created_at DESC LIMIT 1"
-            ledger = pd.read_sql_query(l_query, conn, params=(str(self.handbook_date),))
-            
-            b_query = "SELECT * FROM excise_duty_bottles WHERE date = ?"
-            bottles = pd.read_sql_query(b_query, conn, params=(str(self.handbook_date),))
-            conn.close()
-        except Exception as e:
-            print(f"Warning: Could not fetch Excise Duty data from SQLite: {e}")
-        return ledger, bottles
-
-    def compute_reg78_reconciliation(self, stock_df, reg78_df):
-        """Reconcile Reg-78 closing balance against SST/BRT totals"""
-        totals = {"sst_al": 0.0, "brt_al": 0.0, "total_al": 0.0}
-        operational_increase_al = 0.0
-        operational_wastage_al = 0.0
-
-        if not stock_df.empty:
-            for _, row in stock_df.iterrows():
-                vat = str(row.get('source_vat', ''))
-                closing_al = self.safe_float(row.get('closing_al', 0))
-                if vat.startswith('SST-'):
-                    totals["sst_al"] += closing_al
-                elif vat.startswith('BRT-'):
-                    totals["brt_al"] += closing_al
-
-            # Monthly operational adjustments from raw Reg-74 records of the day
-            raw_df = self.fetch_reg74_raw()
-            if not raw_df.empty:
-                storage_wastage_al = raw_df.get('storage_wastage_al', pd.Series(dtype=float)).fillna(0)
-                # Negative wastage (increase)
-                operational_increase_al = storage_wastage_al[storage_wastage_al < 0].abs().sum()
-                # Positive wastage
-                operational_wastage_al = raw_df.get('wastage_al', pd.Series(dtype=float)).fillna(0).sum()
-
-        totals["total_al"] = totals["sst_al"] + totals["brt_al"]
-        expected_closing = totals["total_al"] # Simplified for daily handbook
-        
-        reg78_closing = 0.0
-        if not reg78_df.empty:
-            reg78_closing = self.safe_float(reg78_df.iloc[0].get('closing_balance_al', 0))
-        
-        difference = reg78_closing - totals["total_al"]
-        
-        return {
-            "sst_al": totals["sst_al"],
-            "brt_al": totals["brt_al"],
-            "total_al": totals["total_al"],
-            "operational_increase_al": operational_increase_al,
-            "operational_wastage_al": operational_wastage_al,
-            "expected_closing_al": totals["total_al"],
-            "reg78_closing_al": reg78_closing,
-            "difference_al": difference,
-        }
     
     def create_header(self):
         """Create professional header"""
@@ -238,12 +101,9 @@ class EnhancedHandbookGenerator:
         
         return elements
     
-    def create_sst_brt_detail(self):
-        """Create comprehensive SST & BRT detail section"""
-        elements = []
-        
-        # Section header
-        header_table = Table([["SST & BRT Detail"]], colWidths=[10*inch])
+    def create_section_header(self, title):
+        """Navy title bar above a section table"""
+        header_table = Table([[title]], colWidths=[10*inch])
         header_table.setStyle(TableStyle([
             ('BACKGROUND', (0, 0), (-1, -1), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, -1), self.white),
@@ -254,89 +114,21 @@ class EnhancedHandbookGenerator:
             ('TOPPADDING', (0, 0), (-1, -1), 8),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
         ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Fetch stock data
-        stock_df = self.fetch_reg74_stock()
-        
-        # Create main table
-        table_data = [
-            ['Vats', 'Dip (cm)', 'B.L.', '%v/v', 'A.L.']
-        ]
-        
-        # SST Vats
-        sst_total_bl = 0
-        sst_total_al = 0
-        for vat_num in range(5, 11):  # SST-5 to SST-10
-            vat_name = f'SST-{vat_num}'
-            if not stock_df.empty and 'source_vat' in stock_df.columns:
-                vat_data = stock_df[stock_df['source_vat'] == vat_name]
-                if not vat_data.empty:
-                    row = vat_data.iloc[0]
-                    bl = self.safe_float(row.get('closing_bl', 0))
-                    al = self.safe_float(row.get('closing_al', 0))
-                    strength = self.safe_float(row.get('closing_strength', 0))
-                    dip = self.safe_float(row.get('dip_reading_cm', 0))
-                    
-                    sst_total_bl += bl
-                    sst_total_al += al
-                    
-                    table_data.append([
-                        vat_name,
-                        f"{dip:.2f}" if dip > 0 else '-',
-                        f"{bl:.2f}",
-                        f"{strength:.2f}",
-                        f"{al:.2f}"
-                    ])
-                else:
-                    table_data.append([vat_name, '-', '0.00', '0.00', '0.00'])
-            else:
-                table_data.append([vat_name, '-', '0.00', '0.00', '0.00'])
-        
-        # SST Subtotal
-        table_data.append(['A. Total (SST)', '', f"{sst_total_bl:.2f}", '', f"{sst_total_al:.2f}"])
-        
-        # BRT Vats
-        brt_total_bl = 0
-        brt_total_al = 0
-        for vat_num in range(11, 18):  # BRT-11 to BRT-17
-            vat_name = f'BRT-{vat_num}'
-            if not stock_df.empty and 'source_vat' in stock_df.columns:
-                vat_data = stock_df[stock_df['source_vat'] == vat_name]
-                if not vat_data.empty:
-                    row = vat_data.iloc[0]
-                    bl = self.safe_float(row.get('closing_bl', 0))
-                    al = self.safe_float(row.get('closing_al', 0))
-                    strength = self.safe_float(row.get('closing_strength', 0))
-                    dip = self.safe_float(row.get('dip_reading_cm', 0))
-                    
-                    brt_total_bl += bl
-                    brt_total_al += al
-                    
-                    table_data.append([
-                        vat_name,
-                        f"{dip:.2f}" if dip > 0 else '-',
-                        f"{bl:.2f}",
-                        f"{strength:.2f}",
-                        f"{al:.2f}"
-                    ])
-                else:
-                    table_data.append([vat_name, '-', '0.00', '0.00', '0.00'])
-            else:
-                table_data.append([vat_name, '-', '0.00', '0.00', '0.00'])
-        
-        # BRT Subtotal
-        table_data.append(['B. Total (BRT)', '', f"{brt_total_bl:.2f}", '', f"{brt_total_al:.2f}"])
-        
-        # Grand Total
-        grand_total_bl = sst_total_bl + brt_total_bl
-        grand_total_al = sst_total_al + brt_total_al
-        table_data.append(['Grand Total', '', f"{grand_total_bl:.2f}", '', f"{grand_total_al:.2f}"])
-        
-        # Create table
-        table = Table(table_data, colWidths=[1.5*inch, 1.2*inch, 1.5*inch, 1.2*inch, 1.5*inch])
-        table.setStyle(TableStyle([
+        return [header_table, Spacer(1, 0.1*inch)]
+    
+    def create_section_table(self, section, col_widths, style):
+        """Section header, then its header and body rows as one styled table"""
+        elements = self.create_section_header(section["title"])
+        table = Table(section["header"] + section["rows"], colWidths=col_widths)
+        table.setStyle(TableStyle(style))
+        elements.append(table)
+        elements.append(Spacer(1, 0.2*inch))
+        return elements
+    
+    def create_sst_brt_detail(self, section=None):
+        """Create comprehensive SST & BRT detail section"""
+        section = section or self.build_sst_brt_section()
+        return self.create_section_table(section, [1.5*inch, 1.2*inch, 1.5*inch, 1.2*inch, 1.5*inch], [
             ('BACKGROUND', (0, 0), (-1, 0), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, 0), self.white),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -357,98 +149,12 @@ class EnhancedHandbookGenerator:
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('TOPPADDING', (0, 0), (-1, -1), 6),
             ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        ])
     
-    def create_production_detail(self):
+    def create_production_detail(self, section=None):
         """Create production detail section with Reg-A data"""
-        elements = []
-        
-        # Section header
-        header_table = Table([["Production Detail"]], colWidths=[10*inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), self.dark_navy),
-            ('TEXTCOLOR', (0, 0), (-1, -1), self.white),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Fetch production data
-        prod_df = self.fetch_rega_production()
-        
-        # Bottling Line Table
-        table_data = [
-            ['Bottling\nLine', 'Nominal\nStrength\n(%v/v)', 'IML Bottles Production Quantity', '', '', '', '', '', 'Production\nin A.L.', 'Production\nWastg.\nin A.L.'],
-            ['', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '']
-        ]
-        
-        if not prod_df.empty:
-            for idx, row in prod_df.iterrows():
-                line_name = f"Line-{idx+1}"
-                # Use mfm2_strength if available, fallback to brt_opening_strength or strength
-                strength = self.safe_float(row.get('mfm2_strength', row.get('brt_opening_strength', row.get('strength', 0))))
-                b_750 = int(self.safe_float(row.get('bottles_750ml', 0)))
-                b_600 = int(self.safe_float(row.get('bottles_600ml', 0)))
-                b_500 = int(self.safe_float(row.get('bottles_500ml', 0)))
-                b_375 = int(self.safe_float(row.get('bottles_375ml', 0)))
-                b_300 = int(self.safe_float(row.get('bottles_300ml', 0)))
-                b_180 = int(self.safe_float(row.get('bottles_180ml', 0)))
-                prod_al = self.safe_float(row.get('bottles_total_al', row.get('bottles_al', 0)))
-                wastage_al = self.safe_float(row.get('wastage_al', 0))
-                
-                table_data.append([
-                    line_name,
-                    f"{strength:.2f}",
-                    str(b_750),
-                    str(b_600),
-                    str(b_500),
-                    str(b_375),
-                    str(b_300),
-                    str(b_180),
-                    f"{prod_al:.2f}",
-                    f"{wastage_al:.2f}"
-                ])
-        else:
-            table_data.append(['Line-1', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00'])
-        
-        # Total row
-        if not prod_df.empty:
-            total_750 = int(prod_df.get('bottles_750ml', pd.Series(dtype=float)).sum())
-            total_600 = int(prod_df.get('bottles_600ml', pd.Series(dtype=float)).sum())
-            total_500 = int(prod_df.get('bottles_500ml', pd.Series(dtype=float)).sum())
-            total_375 = int(prod_df.get('bottles_375ml', pd.Series(dtype=float)).sum())
-            total_300 = int(prod_df.get('bottles_300ml', pd.Series(dtype=float)).sum())
-            total_180 = int(prod_df.get('bottles_180ml', pd.Series(dtype=float)).sum())
-            total_al = prod_df.get('bottles_total_al', pd.Series(dtype=float)).sum()
-            total_wastage = prod_df.get('wastage_al', pd.Series(dtype=float)).sum()
-            
-            table_data.append([
-                'Total',
-                '',
-                str(total_750),
-                str(total_600),
-                str(total_500),
-                str(total_375),
-                str(total_300),
-                str(total_180),
-                f"{total_al:.2f}",
-                f"{total_wastage:.2f}"
-            ])
-        else:
-            table_data.append(['Total', '', '0', '0', '0', '0', '0', '0', '0.00', '0.00'])
-        
-        table = Table(table_data, colWidths=[0.9*inch, 0.9*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
+        section = section or self.build_production_section()
+        return self.create_section_table(section, [0.9*inch, 0.9*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 0.8*inch, 1*inch, 1*inch], [
             ('BACKGROUND', (0, 0), (-1, 1), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, 1), self.white),
             ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
@@ -460,75 +166,12 @@ class EnhancedHandbookGenerator:
             ('GRID', (0, 0), (-1, -1), 0.5, self.black),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('SPAN', (2, 0), (7, 0)),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        ])
     
-    def create_production_fees_detail(self):
+    def create_production_fees_detail(self, section=None):
         """Create production fees detail from Reg-B and Reg-A"""
-        elements = []
-        
-        # Section header
-        header_table = Table([["Production Fee's Detail"]], colWidths=[10*inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), self.dark_navy),
-            ('TEXTCOLOR', (0, 0), (-1, -1), self.white),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Fetch data
-        fees_df = self.fetch_regb_fees()
-        prod_df = self.fetch_rega_production()
-        
-        table_data = [
-            ['Opening\nBalance\n(Rs.)', 'Deposit\nAmount\n(Rs.)', 'IML Bottles Production Quantity', '', '', '', '', '', 'Bottles\nProduction\nin B.L.', 'Fee for\nBottling\nDebited\n(Rs.)', 'Closing\nBalance\n(Rs.)'],
-            ['', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '', '']
-        ]
-        
-        if not fees_df.empty:
-            row = fees_df.iloc[0]
-            opening = self.safe_float(row.get('opening_balance', 0))
-            deposit = self.safe_float(row.get('deposit_amount', 0))
-            closing = self.safe_float(row.get('closing_balance', 0))
-            fee_debited = self.safe_float(row.get('total_fees_debited', row.get('fee_debited', 0)))
-            
-            # Bottle counts from Reg-A production
-            b_750 = int(self.safe_float(prod_df.get('bottles_750ml', pd.Series(dtype=float)).sum()))
-            b_600 = int(self.safe_float(prod_df.get('bottles_600ml', pd.Series(dtype=float)).sum()))
-            b_500 = int(self.safe_float(prod_df.get('bottles_500ml', pd.Series(dtype=float)).sum()))
-            b_375 = int(self.safe_float(prod_df.get('bottles_375ml', pd.Series(dtype=float)).sum()))
-            b_300 = int(self.safe_float(prod_df.get('bottles_300ml', pd.Series(dtype=float)).sum()))
-            b_180 = int(self.safe_float(prod_df.get('bottles_180ml', pd.Series(dtype=float)).sum()))
-            total_bl = self.safe_float(prod_df.get('bottles_total_bl', pd.Series(dtype=float)).sum())
-            
-            table_data.append([
-                f"{opening:.2f}",
-                f"{deposit:.2f}",
-                str(b_750),
-                str(b_600),
-                str(b_500),
-                str(b_375),
-                str(b_300),
-                str(b_180),
-                f"{total_bl:.2f}",
-                f"{fee_debited:.2f}",
-                f"{closing:.2f}"
-            ])
-        else:
-            table_data.append(['0.00', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00', '0.00'])
-        
-        table = Table(table_data, colWidths=[0.9*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.9*inch, 0.9*inch, 0.9*inch])
-        table.setStyle(TableStyle([
+        section = section or self.build_production_fees_section()
+        return self.create_section_table(section, [0.9*inch, 0.9*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.9*inch, 0.9*inch, 0.9*inch], [
             ('BACKGROUND', (0, 0), (-1, 1), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, 1), self.white),
             ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
@@ -538,84 +181,12 @@ class EnhancedHandbookGenerator:
             ('GRID', (0, 0), (-1, -1), 0.5, self.black),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('SPAN', (2, 0), (7, 0)),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        ])
     
-    def create_issued_bottles_detail(self):
+    def create_issued_bottles_detail(self, section=None):
         """Create issued bottles detail from Reg-B stock inventory"""
-        elements = []
-        
-        # Section header
-        header_table = Table([["Issued Bottle Details"]], colWidths=[10*inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), self.dark_navy),
-            ('TEXTCOLOR', (0, 0), (-1, -1), self.white),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        # Fetch stock data
-        stock_df = self.fetch_regb_stock()
-        
-        table_data = [
-            ['Size\n(ml)', 'Nominal\nStrength\n(%v/v)', 'Opening\nBalance', 'Quantity\nReceived', 'Total to be\nAccounted', 'Wastage/\nBreakage', 'Issue on\nPayment', 'Closing\nBalance']
-        ]
-        
-        sizes = [750, 600, 500, 375, 300, 180]
-        totals = {"opening": 0, "received": 0, "accounted": 0, "wastage": 0, "issued": 0, "closing": 0}
-        
-        for size in sizes:
-            if not stock_df.empty:
-                size_df = stock_df[stock_df['bottle_size_ml'] == size]
-                if not size_df.empty:
-                    opening = int(self.safe_float(size_df.get('opening_balance_bottles', pd.Series(dtype=float)).sum()))
-                    received = int(self.safe_float(size_df.get('quantity_received_bottles', pd.Series(dtype=float)).sum()))
-                    accounted = int(self.safe_float(size_df.get('total_accounted_bottles', pd.Series(dtype=float)).sum()))
-                    wastage = int(self.safe_float(size_df.get('wastage_breakage_bottles', pd.Series(dtype=float)).sum()))
-                    issued = int(self.safe_float(size_df.get('issue_on_duty_bottles', pd.Series(dtype=float)).sum()))
-                    closing = int(self.safe_float(size_df.get('closing_balance_bottles', pd.Series(dtype=float)).sum()))
-                    strength = self.safe_float(size_df.iloc[0].get('strength', 0))
-                else:
-                    opening = received = accounted = wastage = issued = closing = 0
-                    strength = 0.0
-            else:
-                opening = received = accounted = wastage = issued = closing = 0
-                strength = 0.0
-
-            totals["opening"] += opening
-            totals["received"] += received
-            totals["accounted"] += accounted
-            totals["wastage"] += wastage
-            totals["issued"] += issued
-            totals["closing"] += closing
-
-            table_data.append([
-                str(size), f"{strength:.2f}" if strength > 0 else '-', str(opening), str(received), str(accounted), str(wastage), str(issued), str(closing)
-            ])
-        
-        # Total row
-        table_data.append([
-            'Total', '', str(totals["opening"]), str(totals["received"]), str(totals["accounted"]), str(totals["wastage"]), str(totals["issued"]), str(totals["closing"])
-        ])
-        
-        total_al_in_hand = 0.0
-        if not stock_df.empty:
-            total_al_in_hand = self.safe_float(stock_df.get('closing_al', pd.Series(dtype=float)).sum())
-        
-        table_data.append(['Total Spirit in Hand (A.L.)', '', '', '', '', '', '', f"{total_al_in_hand:.2f}"])
-        
-        table = Table(table_data, colWidths=[0.8*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch])
-        table.setStyle(TableStyle([
+        section = section or self.build_issued_bottles_section()
+        return self.create_section_table(section, [0.8*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch, 1*inch], [
             ('BACKGROUND', (0, 0), (-1, 0), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, 0), self.white),
             ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -627,77 +198,12 @@ class EnhancedHandbookGenerator:
             ('GRID', (0, 0), (-1, -1), 0.5, self.black),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('SPAN', (0, -1), (6, -1)),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        ])
     
-    def create_excise_duty_detail(self):
+    def create_excise_duty_detail(self, section=None):
         """Create excise duty detail with ledger and bottle breakdown"""
-        elements = []
-        
-        # Section header
-        header_table = Table([["Excise Duty Detail"]], colWidths=[10*inch])
-        header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), self.dark_navy),
-            ('TEXTCOLOR', (0, 0), (-1, -1), self.white),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elements.append(header_table)
-        elements.append(Spacer(1, 0.1*inch))
-        
-        ledger_df, bottles_df = self.fetch_excise_duty()
-        
-        table_data = [
-            ['Opening\nBalance\n(Rs.)', 'Deposit\nAmount\n(Rs.)', 'Total\nCredited\n(Rs.)', 'Issued Bottle Quantity', '', '', '', '', '', 'Bottles\nIssued\nin A.L.', 'Duty\nDebited\n(Rs.)', 'Closing\nBalance\n(Rs.)'],
-            ['', '', '', '750ml', '600ml', '500ml', '375ml', '300ml', '180ml', '', '', '']
-        ]
-        
-        if not ledger_df.empty:
-            row = ledger_df.iloc[0]
-            opening = self.safe_float(row.get('opening_balance', 0))
-            deposit = self.safe_float(row.get('deposit_amount', 0))
-            credited = self.safe_float(row.get('amount_credited', row.get('total_credited', 0)))
-            closing = self.safe_float(row.get('closing_balance', 0))
-            duty = self.safe_float(row.get('duty_debited', row.get('total_duty_amount', 0)))
-            
-            # Use bottle issues if ledger doesn't have details
-            issued_al = 0.0
-            issued_by_size = {750: 0, 600: 0, 500: 0, 375: 0, 300: 0, 180: 0}
-            if not bottles_df.empty:
-                issued_al = self.safe_float(bottles_df.get('al_issued', pd.Series(dtype=float)).sum())
-                for size in issued_by_size:
-                    size_qty = bottles_df[bottles_df['bottle_size_ml'] == size].get('qty_issued', pd.Series(dtype=float)).sum()
-                    issued_by_size[size] = int(self.safe_float(size_qty))
-            else:
-                issued_al = self.safe_float(row.get('issued_al', 0))
-
-            table_data.append([
-                f"{opening:.2f}",
-                f"{deposit:.2f}",
-                f"{credited:.2f}",
-                str(issued_by_size[750]),
-                str(issued_by_size[600]),
-                str(issued_by_size[500]),
-                str(issued_by_size[375]),
-                str(issued_by_size[300]),
-                str(issued_by_size[180]),
-                f"{issued_al:.2f}",
-                f"{duty:.2f}",
-                f"{closing:.2f}"
-            ])
-        else:
-            table_data.append(['0.00', '0.00', '0.00', '0', '0', '0', '0', '0', '0', '0.00', '0.00', '0.00'])
-        
-        table = Table(table_data, colWidths=[0.8*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.8*inch, 0.8*inch, 0.8*inch])
-        table.setStyle(TableStyle([
+        section = section or self.build_excise_duty_section()
+        return self.create_section_table(section, [0.8*inch, 0.8*inch, 0.8*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.7*inch, 0.8*inch, 0.8*inch, 0.8*inch], [
             ('BACKGROUND', (0, 0), (-1, 1), self.dark_navy),
             ('TEXTCOLOR', (0, 0), (-1, 1), self.white),
             ('FONTNAME', (0, 0), (-1, 1), 'Helvetica-Bold'),
@@ -707,15 +213,58 @@ class EnhancedHandbookGenerator:
             ('GRID', (0, 0), (-1, -1), 0.5, self.black),
             ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
             ('SPAN', (3, 0), (8, 0)),
+        ])
+    
+    def create_reconciliation_summary(self, section=None):
+        """Reg-78 reconciliation as a two-column table (no section bar)"""
+        section = section or self.build_reconciliation_section()
+        recon_table = Table(section["header"] + section["rows"], colWidths=[5*inch, 2*inch])
+        recon_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), self.dark_navy),
+            ('TEXTCOLOR', (0, 0), (-1, 0), self.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 11),
+            ('BACKGROUND', (0, 1), (-1, -1), self.light_blue),
+            ('GRID', (0, 0), (-1, -1), 0.5, self.black)
         ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.2*inch))
-        
-        return elements
+        return [Spacer(1, 0.2*inch), recon_table]
+    
+    def generator_version(self):
+        """Handbook version plus a digest of the data and layout code, so a code change never serves an old handbook"""
+        code = artifact_store.digest_inputs(artifact_store.file_digest(__file__), artifact_store.file_digest(handbook_data.__file__))
+        return f"{HANDBOOK_VERSION}-{code[:12]}"
+    
+    def input_digest(self):
+        """Digest of every register row the handbook for this date can read"""
+        conn = self.get_db_connection()
+        try:
+            states = {
+                table: artifact_store.table_state(conn, table, date_col, str(self.handbook_date))
+                for table, date_col in HANDBOOK_INPUT_TABLES.items()
+            }
+        finally:
+            conn.close()
+        return artifact_store.digest_inputs(str(self.handbook_date), states)
+    
+    def generate_handbook(self, progress=None):
+        """
+        Generate the complete enhanced handbook. A handbook already rendered
+        from the same register data is copied from the artifact store instead.
+        progress(fraction, message), if given, is passed on to render_handbook.
+        """
+        _, cached = artifact_store.cached_file(
+            "daily_handbook", self.generator_version(), self.input_digest(),
+            self.output_filename, lambda: self.render_handbook(progress=progress)
+        )
+        if cached:
+            print(f"✅ Enhanced Handbook unchanged since last generated, served from store: {self.output_filename}")
+        return self.output_filename
     
-    def generate_handbook(self):
-        """Generate the complete enhanced handbook"""
+    def render_handbook(self, model=None, progress=None):
+        """
+        Render the handbook PDF to output_filename (from model, if one was already
+        built). progress(fraction, message), if given, is called between sections.
+        """
         print(f"🔄 Generating Enhanced Daily Handbook for {self.handbook_date.strftime('%d-%m-%Y')}...")
         
         # Create PDF document
@@ -734,41 +283,19 @@ class EnhancedHandbookGenerator:
         # Header
         elements.extend(self.create_header())
         
-        # Sections
-        elements.extend(self.create_sst_brt_detail())
-        elements.extend(self.create_production_detail())
-        elements.extend(self.create_production_fees_detail())
-        elements.extend(self.create_issued_bottles_detail())
-        elements.extend(self.create_excise_duty_detail())
+        # Sections, from the same data model the page previews
+        if model is None:
+            model = self.build(progress=(lambda fraction, message: progress(0.8 * fraction, message)) if progress else None)
+        sections = {section["key"]: section for section in model["sections"]}
+        elements.extend(self.create_sst_brt_detail(sections["sst_brt"]))
+        elements.extend(self.create_production_detail(sections["production"]))
+        elements.extend(self.create_production_fees_detail(sections["production_fees"]))
+        elements.extend(self.create_issued_bottles_detail(sections["issued_bottles"]))
+        elements.extend(self.create_excise_duty_detail(sections["excise_duty"]))
         
         # Reg-78 Reconciliation Summary
-        stock_df = self.fetch_reg74_stock()
-        reg78_df = self.fetch_reg78_data()
-        recon = self.compute_reg78_reconciliation(stock_df, reg78_df)
-        
-        recon_data = [
-            ["Reg-78 Reconciliation (Spirit AL)", ""],
-            ["SST Total AL (Tanks)", f"{recon['sst_al']:.2f}"],
-            ["BRT Total AL (Tanks)", f"{recon['brt_al']:.2f}"],
-            ["Operational Adjustments (Increase) AL", f"{recon['operational_increase_al']:.2f}"],
-            ["Operational Adjustments (Wastage) AL", f"{recon['operational_wastage_al']:.2f}"],
-            ["Reg-78 Synopsis Closing AL", f"{recon['reg78_closing_al']:.2f}"],
-            ["Difference (Synopsis vs Vats) AL", f"{recon['difference_al']:.2f}"]
-        ]
+        elements.extend(self.create_reconciliation_summary(sections["reg78_reconciliation"]))
         
-        recon_table = Table(recon_data, colWidths=[5*inch, 2*inch])
-        recon_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), self.dark_navy),
-            ('TEXTCOLOR', (0, 0), (-1, 0), self.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 11),
-            ('BACKGROUND', (0, 1), (-1, -1), self.light_blue),
-            ('GRID', (0, 0), (-1, -1), 0.5, self.black)
-        ]))
-        
-        elements.append(Spacer(1, 0.2*inch))
-        elements.append(recon_table)
-
         # Footer
         styles = getSampleStyleSheet()
         footer_style = ParagraphStyle(
@@ -786,6 +313,8 @@ class EnhancedHandbookGenerator:
         ))
         
         # Build PDF
+        if progress:
+            progress(0.85, "Laying out PDF")
         doc.build(elements)
         
         print(f"✅ Enhanced Handbook generated successfully: {self.output_filename}")
@@ -26,8 +26,14 @@ from excise_duty_schema import (
     CREATE_EXCISE_DUTY_LEDGER_TABLE,
     CREATE_EXCISE_DUTY_BOTTLES_TABLE,
     CREATE_EXCISE_DUTY_SUMMARY_TABLE,
+    CREATE_EXCISE_DUTY_RATES_TABLE,
     CREATE_EXCISE_DUTY_INDEXES
 )
+from ledger_engine import CREATE_LEDGER_CLOSED_PERIODS_TABLE, CREATE_LEDGER_INDEXES
+from lineage import CREATE_LINEAGE_EDGES_TABLE, CREATE_LINEAGE_INDEXES
+from work_queues import init_work_queues
+from changelog import init_changelog
+from register_search import init_register_search
 
 # Database path
 DB_PATH = "excise_registers.db"
@@ -86,12 +92,38 @@ def init_all_databases():
         cursor.executescript(CREATE_EXCISE_DUTY_LEDGER_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_BOTTLES_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_SUMMARY_TABLE)
+        cursor.executescript(CREATE_EXCISE_DUTY_RATES_TABLE)
         cursor.executescript(CREATE_EXCISE_DUTY_INDEXES)
         print("✅ Excise Duty tables created")
         
+        # Create Ledger Engine tables
+        print("\n📊 Creating Ledger closed period tables...")
+        cursor.executescript(CREATE_LEDGER_CLOSED_PERIODS_TABLE)
+        cursor.executescript(CREATE_LEDGER_INDEXES)
+        print("✅ Ledger tables created")
+        
+        # Create Lineage graph
+        print("\n🔗 Creating Lineage edges table...")
+        cursor.executescript(CREATE_LINEAGE_EDGES_TABLE)
+        cursor.executescript(CREATE_LINEAGE_INDEXES)
+        print("✅ Lineage table created")
+        
         conn.commit()
         conn.close()
         
+        # Work queues for the Reg-74 / Reg-A entry forms
+        init_work_queues()
+        
+        # Change capture triggers on every register table created above
+        init_changelog()
+        
+        # Full-text search index over the registers, kept current by triggers
+        init_register_search()
+        
+        # Seed effective-dated duty rates
+        from duty_rates import init_duty_rates_table
+        init_duty_rates_table()
+        
         # Initialize Excel files
         desktop_storage.init_all_excel_files()
         
@@ -106,6 +138,9 @@ def init_all_databases():
         print("  - Spirit Transaction (Daily Summary)")
         print("  - Reg-B (Finished Goods + Production Fees)")
         print("  - Excise Duty (Ledger + Bottles)")
+        print("  - Ledger Closed Periods")
+        print("  - Lineage Edges")
+        print("  - Change Log")
         print("\n🎯 Database ready for use!")
         
         return True
@@ -0,0 +1,491 @@
+"""
+Job Queue - Persistent background jobs for reports, exports and syncs
+Heavy work (Daily Handbook PDFs, the Register Format export, maintenance
+reports, the System-Wide Sync, consistency scans) is queued in job_queue.db
+and run by a small pool of worker processes, so pages submit a job and poll
+it instead of freezing the script thread, and a rerun no longer throws the
+work away.
+
+Jobs have a priority (lower runs first), identical pending jobs are merged,
+handlers report progress and are cancelled at their next progress report, and
+results are kept for KEEP_FINISHED_DAYS.
+
+Usage: python job_queue.py --workers 2     # run workers in the foreground
+       python job_queue.py --list          # show recent jobs
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+JOBS_DB_PATH = "job_queue.db"
+
+# Worker processes started by the first submit in a process
+WORKER_PROCESSES = 2
+
+# Idle workers look for new jobs this often
+POLL_INTERVAL_SECONDS = 0.5
+
+# A running job's worker refreshes its heartbeat this often; a job whose
+# heartbeat is older than STALE_AFTER_SECONDS lost its worker and is requeued
+HEARTBEAT_SECONDS = 5
+STALE_AFTER_SECONDS = 60
+MAX_ATTEMPTS = 3
+
+KEEP_FINISHED_DAYS = 7
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+ACTIVE_STATUSES = ("queued", "running")
+
+CREATE_JOB_TABLES = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 5,
+    status TEXT NOT NULL DEFAULT 'queued'
+        CHECK (status IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_pid INTEGER,
+    submitted_by TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    heartbeat_at TEXT,
+    finished_at TEXT
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_pending_dedup ON jobs(dedup_key)
+    WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, priority, job_id);
+"""
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+_workers: List[multiprocessing.Process] = []
+_workers_lock = threading.Lock()
+
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a handler, at a progress report, once its job has been
+    cancelled. A BaseException (like KeyboardInterrupt), so report code that
+    catches Exception to return an error message does not swallow it.
+    """
+
+
+def _now() -> str:
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _connect(db_path: str = JOBS_DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    with _init_lock:
+        path = os.path.abspath(db_path)
+        if path not in _initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(CREATE_JOB_TABLES)
+            conn.commit()
+            _initialized.add(path)
+    return conn
+
+
+def _job_dict(row: sqlite3.Row) -> Dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+# ============================================================================
+# HANDLERS
+# ============================================================================
+# Each handler is called as handler(params, progress) in a worker process and
+# returns a JSON-serializable result. progress(fraction, message) records how
+# far it got and raises JobCancelled if the job was cancelled meanwhile.
+
+def _run_daily_handbook(params: Dict, progress: Callable) -> Dict:
+    from handbook_generator_v2 import EnhancedHandbookGenerator
+    handbook_date = date.fromisoformat(params["date"])
+    progress(0.05, "Reading registers")
+    output_file = EnhancedHandbookGenerator(handbook_date).generate_handbook(
+        progress=lambda fraction, message: progress(0.05 + 0.9 * fraction, message)
+    )
+    return {"path": os.path.abspath(output_file), "file_name": os.path.basename(output_file)}
+
+
+def _run_register_export(params: Dict, progress: Callable) -> Dict:
+    from pathlib import Path
+    from export_register_format import DEFAULT_OUTPUT, export_register_format
+    progress(0.05, "Filling Register Format template")
+    output_path = export_register_format(
+        Path(params.get("output_path") or DEFAULT_OUTPUT),
+        progress=lambda fraction, message: progress(0.05 + 0.9 * fraction, message)
+    )
+    return {"path": str(Path(output_path).resolve()), "file_name": Path(output_path).name}
+
+
+def _run_maintenance_report(params: Dict, progress: Callable) -> Dict:
+    from maintenance_pdf import generate_maintenance_pdf
+    start, end = date.fromisoformat(params["start"]), date.fromisoformat(params["end"])
+    output_path = params.get("output_path") or f"maintenance_report_{start}_{end}.pdf"
+    progress(0.05, "Building maintenance report")
+    success, message, pdf_path = generate_maintenance_pdf(
+        start, end, output_path, progress=lambda fraction, message: progress(0.05 + 0.9 * fraction, message)
+    )
+    if not success:
+        raise RuntimeError(message.lstrip("❌ "))
+    return {"path": os.path.abspath(pdf_path), "file_name": os.path.basename(pdf_path), "message": message}
+
+
+def _run_system_sync(params: Dict, progress: Callable) -> Dict:
+    import reg78_backend
+    import regb_backend
+    import excise_duty_backend
+    sync_date = date.fromisoformat(params["date"])
+    done = []
+    
+    # 1. Update Reg-78 Synopsis
+    progress(0.05, "Updating Reg-78 synopsis")
+    synopsis = reg78_backend.generate_daily_synopsis(sync_date)
+    if synopsis:
+        synopsis["synopsis_date"] = str(sync_date)
+        reg78_backend.save_record(synopsis)
+        done.append("Reg-78 synopsis")
+    
+    # 2. Update Reg-B Statistics
+    progress(0.4, "Updating Reg-B daily summary")
+    regb_summary = regb_backend.generate_daily_summary(sync_date)
+    if regb_summary:
+        regb_backend.save_daily_summary(regb_summary)
+        done.append("Reg-B summary")
+    
+    # 3. Update Excise Duty Summary
+    progress(0.7, "Updating excise duty summary")
+    duty_summary = excise_duty_backend.generate_duty_summary(sync_date)
+    if duty_summary:
+        excise_duty_backend.save_duty_summary(duty_summary)
+        done.append("Excise duty summary")
+    
+    return {"updated": done, "message": f"System-Wide Sync Complete ({', '.join(done) or 'nothing to update'})"}
+
+
+def _run_consistency_scan(params: Dict, progress: Callable) -> Dict:
+    from consistency_scan import scan
+    start, end = date.fromisoformat(params["start"]), date.fromisoformat(params["end"])
+    output_path = params.get("output_path") or f"consistency_report_{start}_{end}.csv"
+    report = scan(start, end, progress=lambda fraction, message: progress(0.95 * fraction, message))
+    report.to_csv(output_path, index=False)
+    return {"path": os.path.abspath(output_path), "file_name": os.path.basename(output_path),
+            "message": f"{len(report)} discrepancies between {start} and {end}"}
+
+
+JOB_TYPES: Dict[str, Callable] = {
+    "daily_handbook": _run_daily_handbook,
+    "register_export": _run_register_export,
+    "maintenance_report": _run_maintenance_report,
+    "system_sync": _run_system_sync,
+    "consistency_scan": _run_consistency_scan,
+}
+
+
+# ============================================================================
+# SUBMITTING AND POLLING
+# ============================================================================
+
+def submit(kind: str, params: Optional[Dict] = None, priority: int = PRIORITY_NORMAL,
+           submitted_by: Optional[str] = None, db_path: str = JOBS_DB_PATH, start_workers: bool = True) -> int:
+    """
+    Queue a job and return its id. If the same job (kind and params) is already
+    queued or running, that job's id is returned instead (and a queued one
+    takes the higher of the two priorities).
+    """
+    if kind not in JOB_TYPES:
+        raise ValueError(f"Unknown job type: {kind}")
+    params_json = json.dumps(params or {}, sort_keys=True, default=str)
+    dedup_key = hashlib.sha256(f"{kind}\n{params_json}".encode("utf-8")).hexdigest()
+    
+    conn = _connect(db_path)
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        existing = conn.execute(
+            "SELECT job_id, priority, status FROM jobs WHERE dedup_key = ? AND status IN ('queued', 'running')",
+            (dedup_key,)
+        ).fetchone()
+        if existing:
+            if existing["status"] == "queued" and priority < existing["priority"]:
+                conn.execute("UPDATE jobs SET priority = ? WHERE job_id = ?", (priority, existing["job_id"]))
+            job_id = existing["job_id"]
+        else:
+            job_id = conn.execute("""
+                INSERT INTO jobs (kind, params, dedup_key, priority, submitted_by, created_at, message)
+                VALUES (?, ?, ?, ?, ?, ?, 'Queued')
+            """, (kind, params_json, dedup_key, priority, submitted_by, _now())).lastrowid
+        conn.commit()
+    finally:
+        conn.close()
+    
+    if start_workers:
+        ensure_workers(db_path=db_path)
+    return job_id
+
+
+def get_job(job_id: int, db_path: str = JOBS_DB_PATH) -> Optional[Dict]:
+    """The job's current state (params and result decoded), or None"""
+    conn = _connect(db_path)
+    try:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return _job_dict(row) if row else None
+    finally:
+        conn.close()
+
+
+def cancel(job_id: int, db_path: str = JOBS_DB_PATH) -> bool:
+    """
+    Cancel a job: a queued job is cancelled at once, a running one at its
+    handler's next progress report. False if the job already finished.
+    """
+    conn = _connect(db_path)
+    try:
+        with conn:
+            cur = conn.execute("""
+                UPDATE jobs SET status = 'cancelled', message = 'Cancelled', finished_at = ?
+                WHERE job_id = ? AND status = 'queued'
+            """, (_now(), job_id))
+            if cur.rowcount:
+                return True
+            cur = conn.execute("""
+                UPDATE jobs SET cancel_requested = 1, message = 'Cancelling...'
+                WHERE job_id = ? AND status = 'running'
+            """, (job_id,))
+            return cur.rowcount > 0
+    finally:
+        conn.close()
+
+
+def list_jobs(limit: int = 50, db_path: str = JOBS_DB_PATH) -> pd.DataFrame:
+    """Most recent jobs first"""
+    conn = _connect(db_path)
+    try:
+        return pd.read_sql_query("""
+            SELECT job_id, kind, params, priority, status, progress, message, error,
+                   submitted_by, created_at, started_at, finished_at
+            FROM jobs ORDER BY job_id DESC LIMIT ?
+        """, conn, params=(limit,))
+    finally:
+        conn.close()
+
+
+def purge_finished(older_than_days: int = KEEP_FINISHED_DAYS, db_path: str = JOBS_DB_PATH) -> int:
+    """Delete finished jobs older than the given age; returns how many"""
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime("%Y-%m-%d %H:%M:%S")
+    conn = _connect(db_path)
+    try:
+        with conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN ('queued', 'running') AND finished_at < ?", (cutoff,)
+            ).rowcount
+    finally:
+        conn.close()
+
+
+# ============================================================================
+# WORKERS
+# ============================================================================
+
+def _claim_next(conn: sqlite3.Connection, pid: int) -> Optional[Dict]:
+    """Requeue jobs whose worker died, then take the most urgent queued job"""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stale_before = (datetime.now() - timedelta(seconds=STALE_AFTER_SECONDS)).strftime("%Y-%m-%d %H:%M:%S")
+        conn.execute("""
+            UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                   error = CASE WHEN attempts >= ? THEN 'Worker stopped responding' ELSE error END,
+                   finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END,
+                   message = 'Requeued after worker stopped', worker_pid = NULL
+            WHERE status = 'running' AND heartbeat_at < ?
+        """, (MAX_ATTEMPTS, MAX_ATTEMPTS, MAX_ATTEMPTS, _now(), stale_before))
+        row = conn.execute("""
+            SELECT * FROM jobs WHERE status = 'queued'
+            ORDER BY priority, job_id LIMIT 1
+        """).fetchone()
+        if row is None:
+            conn.commit()
+            return None
+        now = _now()
+        conn.execute("""
+            UPDATE jobs SET status = 'running', worker_pid = ?, attempts = attempts + 1,
+                   started_at = ?, heartbeat_at = ?, message = 'Started'
+            WHERE job_id = ?
+        """, (pid, now, now, row["job_id"]))
+        conn.commit()
+        return _job_dict(row)
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _heartbeat_loop(db_path: str, current: Dict, stop: threading.Event):
+    conn = _connect(db_path)
+    while not stop.wait(HEARTBEAT_SECONDS):
+        job_id = current.get("job_id")
+        if job_id is not None:
+            try:
+                with conn:
+                    conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE job_id = ? AND status = 'running'",
+                                 (_now(), job_id))
+            except sqlite3.Error as e:
+                print(f"Job heartbeat failed: {e}")
+    conn.close()
+
+
+def _run_job(conn: sqlite3.Connection, job: Dict):
+    job_id = job["job_id"]
+    
+    def progress(fraction: Optional[float] = None, message: Optional[str] = None):
+        with conn:
+            conn.execute("""
+                UPDATE jobs SET progress = COALESCE(?, progress), message = COALESCE(?, message), heartbeat_at = ?
+                WHERE job_id = ?
+            """, (None if fraction is None else max(0.0, min(1.0, float(fraction))), message, _now(), job_id))
+        if conn.execute("SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)).fetchone()[0]:
+            raise JobCancelled()
+    
+    try:
+        progress(0.0)
+        result = JOB_TYPES[job["kind"]](job["params"], progress)
+        status, result_json, error, message = "done", json.dumps(result, default=str), None, "Done"
+    except JobCancelled:
+        status, result_json, error, message = "cancelled", None, None, "Cancelled"
+    except Exception as e:
+        status, result_json, error, message = "failed", None, f"{e}\n{traceback.format_exc()}", "Failed"
+        print(f"❌ Job {job_id} ({job['kind']}) failed: {e}")
+    with conn:
+        conn.execute("""
+            UPDATE jobs SET status = ?, result = ?, error = ?, message = ?, finished_at = ?,
+                   progress = CASE WHEN ? = 'done' THEN 1 ELSE progress END
+            WHERE job_id = ?
+        """, (status, result_json, error, message, _now(), status, job_id))
+
+
+def worker_loop(db_path: str = JOBS_DB_PATH, cwd: Optional[str] = None, stop: Optional[threading.Event] = None):
+    """Claim and run jobs until stopped (runs in each worker process)"""
+    if cwd:
+        os.chdir(cwd)  # Handlers use the app's relative paths (excise_registers.db, report files)
+    conn = _connect(db_path)
+    current: Dict = {}
+    heartbeat_stop = threading.Event()
+    threading.Thread(target=_heartbeat_loop, args=(db_path, current, heartbeat_stop),
+                     name="job-heartbeat", daemon=True).start()
+    try:
+        while stop is None or not stop.is_set():
+            job = _claim_next(conn, os.getpid())
+            if job is None:
+                time.sleep(POLL_INTERVAL_SECONDS)
+                continue
+            current["job_id"] = job["job_id"]
+            try:
+                _run_job(conn, job)
+            finally:
+                current.pop("job_id", None)
+    finally:
+        heartbeat_stop.set()
+        conn.close()
+
+
+def ensure_workers(count: int = WORKER_PROCESSES, db_path: str = JOBS_DB_PATH):
+    """Start (or replace dead) worker processes for this process; they exit with it"""
+    with _workers_lock:
+        _workers[:] = [p for p in _workers if p.is_alive()]
+        context = multiprocessing.get_context("spawn")
+        while len(_workers) < count:
+            process = context.Process(target=worker_loop, args=(os.path.abspath(db_path), os.getcwd()),
+                                      name=f"job-worker-{len(_workers) + 1}", daemon=True)
+            process.start()
+            _workers.append(process)
+
+
+# ============================================================================
+# STREAMLIT
+# ============================================================================
+
+def job_panel(job_id: int, key: str, download_label: Optional[str] = None, mime: str = "application/octet-stream",
+              db_path: str = JOBS_DB_PATH):
+    """
+    Status, progress bar and Cancel button for one job, then its download or
+    error once it finishes. Re-polls itself every second (as a fragment, so
+    the rest of the page does not rerun) where Streamlit supports it.
+    """
+    import streamlit as st
+    
+    def panel():
+        job = get_job(job_id, db_path)
+        if job is None:
+            st.warning(f"Job {job_id} no longer exists")
+            return
+        if job["status"] in ACTIVE_STATUSES:
+            st.progress(job["progress"], text=f"⏳ {job['message'] or job['status'].title()}")
+            if st.button("✖ Cancel", key=f"{key}_cancel_{job_id}", disabled=bool(job["cancel_requested"])):
+                cancel(job_id, db_path)
+            if not hasattr(st, "fragment"):
+                st.button("🔄 Refresh status", key=f"{key}_refresh_{job_id}")
+        elif job["status"] == "done":
+            result = job["result"] or {}
+            path = result.get("path")
+            if download_label and path and os.path.exists(path):
+                with open(path, "rb") as f:
+                    st.download_button(download_label, data=f.read(), file_name=result.get("file_name"),
+                                       mime=mime, key=f"{key}_download_{job_id}", use_container_width=True)
+            else:
+                st.success(f"✅ {result.get('message') or 'Done'}")
+        elif job["status"] == "failed":
+            st.error(f"❌ {job['error'].splitlines()[0] if job['error'] else 'Job failed'}")
+        else:
+            st.warning("Job cancelled")
+    
+    if hasattr(st, "fragment"):
+        st.fragment(panel, run_every=1)()
+    else:
+        panel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run or inspect the background job queue.")
+    parser.add_argument("--workers", type=int, default=0, help="Run this many workers in the foreground")
+    parser.add_argument("--list", action="store_true", help="Show the most recent jobs")
+    parser.add_argument("--cancel", type=int, default=None, help="Cancel a job by id")
+    args = parser.parse_args()
+    
+    if args.cancel is not None:
+        print("✅ Cancelled" if cancel(args.cancel) else "❌ Job not found or already finished")
+    if args.list:
+        print(list_jobs().drop(columns=["error"]).to_string(index=False))
+    if args.workers:
+        print(f"✅ Running {args.workers} job workers on {os.path.abspath(JOBS_DB_PATH)} (Ctrl+C to stop)")
+        ensure_workers(args.workers)
+        try:
+            while True:
+                time.sleep(HEARTBEAT_SECONDS)
+                ensure_workers(args.workers)
+        except KeyboardInterrupt:
+            pass
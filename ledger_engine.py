@@ -0,0 +1,338 @@
+"""
+Ledger Engine - Running balances for the daily financial ledgers
+Recomputes opening/closing balances of the Excise Duty ledger and the Reg-B
+production fees account (and the copies kept in their daily summaries), and
+freezes closed periods
+"""
+
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+from decimal import Decimal, ROUND_HALF_UP
+import logging
+
+import db_writer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# ============================================================================
+# LEDGER DEFINITIONS
+# ============================================================================
+
+# Each ledger keeps one row per date:
+#   opening = previous row's closing
+#   credited = opening + credit
+#   closing = credited - debit
+# The daily summary repeats the ledger's figures (summary column -> ledger column)
+LEDGERS = {
+    "excise_duty_ledger": {
+        "table": "excise_duty_ledger",
+        "credit_col": "deposit_amount",
+        "credited_col": "amount_credited",
+        "debit_col": "duty_debited",
+        "summary_table": "excise_duty_summary",
+        "summary_cols": {
+            "opening_balance": "opening_balance",
+            "deposit_amount": "deposit_amount",
+            "amount_credited": "amount_credited",
+            "duty_debited": "duty_debited",
+            "closing_balance": "closing_balance",
+        },
+    },
+    "regb_production_fees": {
+        "table": "regb_production_fees",
+        "credit_col": "deposit_amount",
+        "credited_col": "total_credited",
+        "debit_col": "total_fees_debited",
+        "summary_table": "regb_daily_summary",
+        "summary_cols": {
+            "production_fees_opening": "opening_balance",
+            "production_fees_deposit": "deposit_amount",
+            "production_fees_credited": "total_credited",
+            "production_fees_debited": "total_fees_debited",
+            "production_fees_closing": "closing_balance",
+        },
+    },
+}
+
+CREATE_LEDGER_CLOSED_PERIODS_TABLE = """
+CREATE TABLE IF NOT EXISTS ledger_closed_periods (
+    closed_period_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ledger TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    closing_balance REAL NOT NULL DEFAULT 0.00,
+    closed_by TEXT,
+    closed_at TEXT NOT NULL,
+    
+    UNIQUE(ledger, period_end)
+);
+"""
+
+CREATE_LEDGER_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_ledger_closed_ledger ON ledger_closed_periods(ledger, period_end);
+"""
+
+MONEY = Decimal("0.01")
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(MONEY, rounding=ROUND_HALF_UP)
+
+
+def _spec(ledger: str) -> Dict:
+    if ledger not in LEDGERS:
+        raise ValueError(f"Unknown ledger: {ledger}")
+    return LEDGERS[ledger]
+
+
+# ============================================================================
+# DATABASE INITIALIZATION
+# ============================================================================
+
+def init_ledger_engine(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Create the closed periods table"""
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_LEDGER_CLOSED_PERIODS_TABLE)
+        conn.executescript(CREATE_LEDGER_INDEXES)
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing ledger engine: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+# ============================================================================
+# CLOSED PERIODS
+# ============================================================================
+
+def _closed_through(conn: sqlite3.Connection, ledger: str) -> Optional[date]:
+    row = conn.execute(
+        "SELECT MAX(period_end) FROM ledger_closed_periods WHERE ledger = ?", (ledger,)
+    ).fetchone()
+    return datetime.strptime(row[0], "%Y-%m-%d").date() if row and row[0] else None
+
+
+def get_closed_through(ledger: str, conn: Optional[sqlite3.Connection] = None) -> Optional[date]:
+    """Last date of the most recent closed period, or None if nothing is closed"""
+    _spec(ledger)
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        init_ledger_engine(conn)
+        return _closed_through(conn, ledger)
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def is_date_closed(ledger: str, target_date: date) -> bool:
+    """True if target_date falls inside a closed period"""
+    closed_through = get_closed_through(ledger)
+    return closed_through is not None and target_date <= closed_through
+
+
+def get_closed_periods(ledger: str) -> List[Dict]:
+    """All closed periods for a ledger, newest first"""
+    _spec(ledger)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_ledger_engine(conn)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("""
+            SELECT * FROM ledger_closed_periods
+            WHERE ledger = ?
+            ORDER BY period_end DESC
+        """, (ledger,)).fetchall()
+        conn.close()
+        return [dict(row) for row in rows]
+    except Exception as e:
+        logger.error(f"❌ Error getting closed periods: {e}")
+        return []
+
+
+def close_period(ledger: str, period_end: date, closed_by: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Freeze a ledger up to and including period_end.
+    
+    Balances are brought up to date first; afterwards no recomputation or save
+    touches rows dated on or before period_end.
+    """
+    spec = _spec(ledger)
+    try:
+        closed_through = get_closed_through(ledger)
+        if closed_through and period_end <= closed_through:
+            return False, f"❌ {ledger} is already closed through {closed_through}"
+        
+        start = closed_through + timedelta(days=1) if closed_through else date.min
+        recompute_balances(ledger, start)
+        
+        conn = sqlite3.connect(DB_PATH)
+        with conn:
+            row = conn.execute(f"""
+                SELECT closing_balance FROM {spec['table']}
+                WHERE date <= ?
+                ORDER BY date DESC
+                LIMIT 1
+            """, (str(period_end),)).fetchone()
+            closing = _money(row[0]) if row else Decimal("0.00")
+            
+            conn.execute("""
+                INSERT INTO ledger_closed_periods (ledger, period_end, closing_balance, closed_by, closed_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, (ledger, str(period_end), float(closing), closed_by, datetime.now().isoformat()))
+        conn.close()
+        
+        logger.info(f"✅ {ledger} closed through {period_end} (closing ₹{closing:,.2f})")
+        return True, f"✅ {ledger} closed through {period_end}"
+    except Exception as e:
+        logger.error(f"❌ Error closing period: {e}")
+        return False, f"❌ Error: {str(e)}"
+
+
+def reopen_period(ledger: str, from_date: date) -> int:
+    """Lift every closed period of a ledger ending on or after from_date; returns periods reopened"""
+    _spec(ledger)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_ledger_engine(conn)
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM ledger_closed_periods WHERE ledger = ? AND period_end >= ?", (ledger, str(from_date))
+            )
+        conn.close()
+        if cursor.rowcount:
+            logger.info(f"✅ {ledger} reopened from {from_date}")
+        return cursor.rowcount
+    except Exception as e:
+        logger.error(f"❌ Error reopening period: {e}")
+        return 0
+
+
+# ============================================================================
+# BALANCE COMPUTATION
+# ============================================================================
+
+def _sync_summaries(conn: sqlite3.Connection, spec: Dict, from_date: date, to_date: Optional[date], now: str) -> int:
+    """Copy the ledger's figures into the daily summary rows of the same dates that differ; returns rows updated"""
+    summary = spec["summary_table"]
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (summary,)).fetchone():
+        return 0
+    assignments = ", ".join(f"{col} = l.{ledger_col}" for col, ledger_col in spec["summary_cols"].items())
+    differs = " OR ".join(f"{summary}.{col} IS NOT l.{ledger_col}" for col, ledger_col in spec["summary_cols"].items())
+    query = f"""
+        UPDATE {summary} SET {assignments}, updated_at = ?
+        FROM {spec['table']} AS l
+        WHERE l.date = {summary}.date AND l.date >= ?
+    """
+    params = [now, str(from_date)]
+    if to_date:
+        query += " AND l.date <= ?"
+        params.append(str(to_date))
+    return conn.execute(f"{query} AND ({differs})", params).rowcount
+
+
+def get_opening_balance(ledger: str, target_date: date, conn: Optional[sqlite3.Connection] = None) -> Decimal:
+    """Closing balance of the latest ledger row dated before target_date"""
+    spec = _spec(ledger)
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        row = conn.execute(f"""
+            SELECT closing_balance FROM {spec['table']}
+            WHERE date < ?
+            ORDER BY date DESC
+            LIMIT 1
+        """, (str(target_date),)).fetchone()
+        return _money(row[0]) if row else Decimal("0.00")
+    except Exception as e:
+        logger.error(f"❌ Error getting opening balance: {e}")
+        return Decimal("0.00")
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+def _rebalance(conn: sqlite3.Connection, ledger: str, from_date: date, to_date: Optional[date]) -> int:
+    """Rewrite the balances that differ from the running total; runs on the database writer"""
+    spec = _spec(ledger)
+    closed_through = _closed_through(conn, ledger)
+    if closed_through and from_date <= closed_through:
+        from_date = closed_through + timedelta(days=1)
+    
+    query = f"""
+        SELECT date, opening_balance, {spec['credit_col']}, {spec['credited_col']},
+               {spec['debit_col']}, closing_balance
+        FROM {spec['table']}
+        WHERE date >= ?
+    """
+    params = [str(from_date)]
+    if to_date:
+        query += " AND date <= ?"
+        params.append(str(to_date))
+    query += " ORDER BY date"
+    
+    rows = conn.execute(query, params).fetchall()
+    if not rows:
+        return 0
+    
+    balance = get_opening_balance(ledger, from_date, conn)
+    now = datetime.now().isoformat()
+    updates = []
+    
+    for row_date, opening, credit, credited, debit, closing in rows:
+        new_opening = balance
+        new_credited = new_opening + _money(credit)
+        new_closing = new_credited - _money(debit)
+        balance = new_closing
+        
+        if (_money(opening) != new_opening or _money(credited) != new_credited
+                or _money(closing) != new_closing):
+            updates.append((float(new_opening), float(new_credited), float(new_closing), now, row_date))
+    
+    if updates:
+        conn.executemany(f"""
+            UPDATE {spec['table']} SET
+                opening_balance = ?,
+                {spec['credited_col']} = ?,
+                closing_balance = ?,
+                updated_at = ?
+            WHERE date = ?
+        """, updates)
+    summaries = _sync_summaries(conn, spec, from_date, to_date, now)
+    if updates or summaries:
+        logger.info(f"✅ {ledger}: rebalanced {len(updates)} rows and {summaries} summaries from {from_date}")
+    return len(updates)
+
+
+def recompute_balances(ledger: str, from_date: date, to_date: Optional[date] = None) -> int:
+    """
+    Re-derive opening, credited and closing balances from from_date onwards.
+    
+    One ordered scan carries the running balance forward from the last row before
+    the start date, and only rows whose stored balances differ are rewritten, in a
+    single executemany. The daily summaries of the same dates are brought in line
+    in the same transaction, on the database writer (called from inside another
+    write, it joins that write's transaction). The start is clamped past the last
+    closed period, so frozen rows are never modified. Returns the number of
+    ledger rows updated.
+    """
+    try:
+        _spec(ledger)
+        init_ledger_engine()
+        return db_writer.write(_rebalance, ledger, from_date, to_date, db_path=DB_PATH)
+    except Exception as e:
+        logger.error(f"❌ Error recomputing {ledger} balances: {e}")
+        return 0
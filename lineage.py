@@ -0,0 +1,270 @@
+"""
+Lineage - Batch traceability across the registers
+Spirit movements are kept as edges between register records
+(permit → Reg-76 → Reg-74 → batch → Reg-A → Reg-B stock day → duty issue)
+so a consignment or a batch can be traced with one recursive query
+"""
+
+import sqlite3
+from datetime import date
+from typing import Optional
+import logging
+
+import pandas as pd
+
+import db_writer
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# Node types, in the order spirit flows through them
+NODE_TYPES = ["permit", "reg76", "reg74", "batch", "rega", "regb", "duty"]
+
+CREATE_LINEAGE_EDGES_TABLE = """
+CREATE TABLE IF NOT EXISTS lineage_edges (
+    src_type TEXT NOT NULL,
+    src_id TEXT NOT NULL,
+    dst_type TEXT NOT NULL,
+    dst_id TEXT NOT NULL,
+    qty_al REAL,
+    edge_date TEXT NOT NULL,
+    
+    PRIMARY KEY (src_type, src_id, dst_type, dst_id)
+) WITHOUT ROWID;
+"""
+
+# The primary key is the forward adjacency index; this one serves backward traces
+CREATE_LINEAGE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_lineage_dst ON lineage_edges(dst_type, dst_id, src_type, src_id);
+CREATE INDEX IF NOT EXISTS idx_lineage_date ON lineage_edges(edge_date);
+"""
+
+# Reg-B stock is traced per day, product and strength
+REGB_NODE_SQL = "{date} || '|' || {product} || '|' || printf('%.2f', {strength})"
+
+# A VAT or Reg-B variant at or below this closing balance is empty, which ends its chain
+EMPTY_BALANCE = 0.001
+
+# Each statement derives the edges whose destination record is dated on or after :from_date.
+# Reg-74 operations follow the spirit through each VAT they touch: an operation
+# inherits from the previous operation on its source VAT and on its destination VAT,
+# unless that operation left the VAT empty. A transfer's source VAT closes at its
+# opening less the issue; every other touch closes at the operation's closing_al.
+EDGE_DERIVATIONS = [
+    """
+    SELECT 'permit', permit_no, 'reg76', reg76_id, rec_al, date_receipt
+    FROM reg76_receipts
+    WHERE permit_no IS NOT NULL AND permit_no <> '' AND date_receipt >= :from_date
+    """,
+    """
+    SELECT 'reg76', ref_reg76_id, 'reg74', reg74_id, receipt_al, operation_date
+    FROM reg74_operations
+    WHERE ref_reg76_id IS NOT NULL AND ref_reg76_id <> '' AND operation_date >= :from_date
+    """,
+    f"""
+    WITH touches AS (
+        SELECT reg74_id, source_vat AS vat, operation_date, created_at,
+               CASE WHEN destination_vat IS NULL OR destination_vat IN ('', source_vat) THEN closing_al
+                    ELSE COALESCE(source_opening_al, 0) - COALESCE(issue_al, 0) END AS vat_closing_al
+        FROM reg74_operations
+        WHERE source_vat IS NOT NULL AND source_vat <> ''
+        UNION
+        SELECT reg74_id, destination_vat, operation_date, created_at, closing_al FROM reg74_operations
+        WHERE destination_vat IS NOT NULL AND destination_vat <> ''
+    ), ordered AS (
+        SELECT reg74_id, operation_date,
+               LAG(reg74_id) OVER w AS prev_id,
+               LAG(vat_closing_al) OVER w AS prev_closing_al
+        FROM touches
+        WINDOW w AS (PARTITION BY vat ORDER BY operation_date, created_at, reg74_id)
+    )
+    SELECT 'reg74', prev_id, 'reg74', reg74_id, NULL, operation_date
+    FROM ordered
+    WHERE prev_id IS NOT NULL AND prev_id <> reg74_id AND COALESCE(prev_closing_al, 0) > {EMPTY_BALANCE}
+      AND operation_date >= :from_date
+    """,
+    """
+    SELECT 'reg74', reg74_id, 'batch', batch_no, closing_al, operation_date
+    FROM reg74_operations
+    WHERE batch_no IS NOT NULL AND batch_no <> '' AND operation_date >= :from_date
+    """,
+    """
+    SELECT 'batch', batch_no, 'rega', rega_id, mfm2_reading_al, production_date
+    FROM rega_production
+    WHERE batch_no IS NOT NULL AND batch_no <> '' AND production_date >= :from_date
+    """,
+    """
+    SELECT 'reg74', ref_reg74_id, 'rega', rega_id, mfm2_reading_al, production_date
+    FROM rega_production
+    WHERE ref_reg74_id IS NOT NULL AND ref_reg74_id <> '' AND production_date >= :from_date
+    """,
+    f"""
+    SELECT 'rega', rega_id, 'regb',
+           {REGB_NODE_SQL.format(date="production_date", product="brand_name", strength="brt_opening_strength")},
+           bottles_total_al, production_date
+    FROM rega_production
+    WHERE brand_name IS NOT NULL AND brand_name <> '' AND production_date >= :from_date
+    """,
+    f"""
+    WITH days AS (
+        SELECT date, product_name, strength, SUM(closing_balance_bottles) AS closing_bottles
+        FROM regb_bottle_stock
+        GROUP BY date, product_name, strength
+    ), ordered AS (
+        SELECT date, product_name, strength,
+               LAG(date) OVER w AS prev_date,
+               LAG(closing_bottles) OVER w AS prev_closing_bottles
+        FROM days
+        WINDOW w AS (PARTITION BY product_name, strength ORDER BY date)
+    )
+    SELECT 'regb', {REGB_NODE_SQL.format(date="prev_date", product="product_name", strength="strength")},
+           'regb', {REGB_NODE_SQL.format(date="date", product="product_name", strength="strength")},
+           NULL, date
+    FROM ordered
+    WHERE prev_date IS NOT NULL AND COALESCE(prev_closing_bottles, 0) > 0 AND date >= :from_date
+    """,
+    f"""
+    SELECT 'regb', {REGB_NODE_SQL.format(date="date", product="product_name", strength="strength")},
+           'duty', CAST(duty_bottle_id AS TEXT), al_issued, date
+    FROM excise_duty_bottles
+    WHERE date >= :from_date
+    """,
+]
+
+# Tables the derivations read; a missing one just contributes no edges
+SOURCE_TABLES = ["reg76_receipts", "reg74_operations", "rega_production", "regb_bottle_stock", "excise_duty_bottles"]
+
+
+# ============================================================================
+# DATABASE INITIALIZATION
+# ============================================================================
+
+def init_lineage(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """Create the lineage edges table"""
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_LINEAGE_EDGES_TABLE)
+        conn.executescript(CREATE_LINEAGE_INDEXES)
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing lineage: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+# ============================================================================
+# EDGE MAINTENANCE
+# ============================================================================
+
+def _refresh_edges(conn: sqlite3.Connection, start: str) -> int:
+    """Replace the edges dated from start; runs on the database writer"""
+    existing = {
+        row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    }
+    
+    conn.execute("DELETE FROM lineage_edges WHERE edge_date >= ?", (start,))
+    before = conn.execute("SELECT COUNT(*) FROM lineage_edges").fetchone()[0]
+    for sql in EDGE_DERIVATIONS:
+        if not all(table in existing for table in SOURCE_TABLES if table in sql):
+            continue
+        conn.execute(f"""
+            INSERT OR REPLACE INTO lineage_edges (src_type, src_id, dst_type, dst_id, qty_al, edge_date)
+            {sql}
+        """, {"from_date": start})
+    after = conn.execute("SELECT COUNT(*) FROM lineage_edges").fetchone()[0]
+    return after - before
+
+
+def refresh_lineage(from_date: Optional[date] = None) -> int:
+    """
+    Re-derive every edge whose destination record is dated on or after from_date
+    (all edges when None) in one transaction on the database writer. Called
+    after each register save; returns the number of edges written.
+    """
+    start = str(from_date) if from_date else ""
+    try:
+        init_lineage()
+        return db_writer.write(_refresh_edges, start, db_path=DB_PATH)
+    except Exception as e:
+        logger.error(f"❌ Error refreshing lineage: {e}")
+        return 0
+
+
+def rebuild_lineage() -> int:
+    """Drop and re-derive the whole lineage graph"""
+    written = refresh_lineage(None)
+    logger.info(f"✅ Lineage rebuilt: {written} edges")
+    return written
+
+
+# ============================================================================
+# TRACING
+# ============================================================================
+
+# UNION drops nodes already reached, so the recursion ends on its own, even
+# around a cycle, however long the chain is
+TRACE_SQL = """
+    WITH RECURSIVE reach(node_type, node_id) AS (
+        SELECT :node_type, :node_id
+        UNION
+        SELECT e.{next_type}, e.{next_id}
+        FROM lineage_edges e
+        JOIN reach r ON e.{this_type} = r.node_type AND e.{this_id} = r.node_id
+    )
+    SELECT node_type, node_id
+    FROM reach
+    WHERE NOT (node_type = :node_type AND node_id = :node_id)
+"""
+
+
+def _trace(node_type: str, node_id: str, forward: bool) -> pd.DataFrame:
+    if node_type not in NODE_TYPES:
+        raise ValueError(f"Unknown node type: {node_type}")
+    
+    if forward:
+        sql = TRACE_SQL.format(this_type="src_type", this_id="src_id", next_type="dst_type", next_id="dst_id")
+    else:
+        sql = TRACE_SQL.format(this_type="dst_type", this_id="dst_id", next_type="src_type", next_id="src_id")
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_lineage(conn)
+        df = pd.read_sql_query(sql, conn, params={"node_type": node_type, "node_id": str(node_id)})
+        # Flow order: permits first, duty issues last
+        df["stage"] = df["node_type"].map(NODE_TYPES.index)
+        return df.sort_values(["stage", "node_id"]).drop(columns="stage").reset_index(drop=True)
+    except Exception as e:
+        logger.error(f"❌ Error tracing lineage: {e}")
+        return pd.DataFrame(columns=["node_type", "node_id"])
+    finally:
+        conn.close()
+
+
+def trace_forward(node_type: str, node_id: str) -> pd.DataFrame:
+    """Every record downstream of a node, in flow order"""
+    return _trace(node_type, node_id, True)
+
+
+def trace_backward(node_type: str, node_id: str) -> pd.DataFrame:
+    """Every record upstream of a node, in flow order"""
+    return _trace(node_type, node_id, False)
+
+
+def where_did_permit_go(permit_no: str) -> pd.DataFrame:
+    """Reg-74 operations, batches, Reg-A sessions, Reg-B stock days and duty issues fed by a permit"""
+    return trace_forward("permit", permit_no)
+
+
+def receipts_feeding_batch(batch_no: str) -> pd.DataFrame:
+    """Reg-76 receipts (and their permits) whose spirit went into a batch"""
+    upstream = trace_backward("batch", batch_no)
+    return upstream[upstream["node_type"].isin(["reg76", "permit"])].reset_index(drop=True)
@@ -0,0 +1,339 @@
+"""
+Load Test - Many operators saving and reading at once
+Drives the register backends from N simulated sessions (threads, optionally
+spread over several processes) with a realistic read/write mix, against a
+throwaway database, a temp Desktop folder and a stubbed Google Sheets. Reports
+throughput, tail latency and how often SQLite answered "database is locked".
+
+Usage:
+    python load_test.py --sessions 8 --duration 30
+    python load_test.py --sessions 4 --processes 3 --profile month-end
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+from typing import Dict, List
+
+import pandas as pd
+
+# Operation weights per workload profile
+PROFILES = {
+    "daily": {"filter_records": 70, "save_record": 15, "generate_daily_synopsis": 8,
+              "refresh_for_date": 5, "generate_handbook": 2},
+    "month-end": {"filter_records": 40, "save_record": 35, "generate_daily_synopsis": 10,
+                  "refresh_for_date": 10, "generate_handbook": 5},
+}
+
+LOCK_MESSAGES = ("database is locked", "database table is locked")
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# (is_error, message) pairs reported by the operation running on this thread
+_collected = threading.local()
+_prepared = False
+
+
+# ============================================================================
+# STUBS AND ENVIRONMENT
+# ============================================================================
+
+class StubWorksheet:
+    """Accepts clear/update like a gspread worksheet, after a simulated round trip"""
+    
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.rows = []
+    
+    def clear(self):
+        time.sleep(self.latency)
+        self.rows = []
+    
+    def update(self, range_name, values, value_input_option=None):
+        time.sleep(self.latency)
+        self.rows = values
+    
+    def get_all_values(self):
+        time.sleep(self.latency)
+        return self.rows
+
+
+class StubSpreadsheet:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.sheets: Dict = {}
+    
+    def get_worksheet(self, index):
+        return self.sheets.setdefault(index, StubWorksheet(self.latency))
+    
+    def worksheet(self, title):
+        return self.sheets.setdefault(title, StubWorksheet(self.latency))
+    
+    def add_worksheet(self, title, rows=1000, cols=26):
+        return self.worksheet(title)
+
+
+class StubClient:
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.spreadsheets: Dict[str, StubSpreadsheet] = {}
+    
+    def open_by_url(self, url):
+        time.sleep(self.latency)
+        return self.spreadsheets.setdefault(url, StubSpreadsheet(self.latency))
+
+
+class _CollectingHandler(logging.Handler):
+    def emit(self, record):
+        messages = getattr(_collected, "messages", None)
+        if messages is not None and record.levelno >= logging.WARNING:
+            messages.append((record.levelno >= logging.ERROR, record.getMessage()))
+
+
+def _prepare_environment(work_dir: str, sheets_latency: float):
+    """
+    Point this process at work_dir: relative database and backup paths resolve
+    there, the Desktop folder lives under it, Google Sheets is stubbed, and
+    errors the backends only display are collected for the report.
+    """
+    global _prepared
+    os.chdir(work_dir)
+    if _prepared:
+        return
+    _prepared = True
+    os.environ["HOME"] = os.environ["USERPROFILE"] = os.path.join(work_dir, "home")
+    os.makedirs(os.environ["HOME"], exist_ok=True)
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    
+    import gsheets_client
+    gsheets_client.set_manager(gsheets_client.GoogleClientManager(
+        load_credentials=lambda: (object(), "stub"),
+        authorize=lambda credentials: StubClient(sheets_latency),
+    ))
+    
+    import streamlit as st
+    for name in ("error", "warning"):
+        shown = getattr(st, name)
+        
+        def collect(body, *args, _shown=shown, _is_error=name == "error", **kwargs):
+            messages = getattr(_collected, "messages", None)
+            if messages is not None:
+                messages.append((_is_error, str(body)))
+            return _shown(body, *args, **kwargs)
+        
+        setattr(st, name, collect)
+    logging.getLogger().addHandler(_CollectingHandler())
+    logging.getLogger().setLevel(logging.WARNING)
+
+
+def _receipt(rng: random.Random, day: date) -> Dict:
+    """A plausible Reg-76 tanker receipt"""
+    adv_bl = round(rng.uniform(20000, 30000), 2)
+    strength = round(rng.uniform(94.0, 96.0), 2)
+    rec_bl = round(adv_bl - rng.uniform(0, 60), 2)
+    return {
+        "permit_no": f"LT-{rng.randrange(10 ** 6):06d}",
+        "distillery": "Load Test Distillery",
+        "spirit_nature": "ENA",
+        "vehicle_no": f"WB-{rng.randrange(10 ** 4):04d}",
+        "date_receipt": str(day),
+        "adv_bl": adv_bl,
+        "adv_strength": strength,
+        "adv_al": round(adv_bl * strength / 100, 2),
+        "rec_bl": rec_bl,
+        "rec_strength": strength,
+        "rec_al": round(rec_bl * strength / 100, 2),
+        "storage_vat_no": rng.choice(["SST-5", "SST-6", "SST-7"]),
+        "status": "submitted",
+    }
+
+
+def seed_database(records: int, days: List[date], seed: int = 0):
+    """Create every register table and fill Reg-76 so reads have work to do"""
+    import reg76_backend, reg74_backend, rega_backend, reg78_backend, spirit_transaction_backend
+    for backend in (reg76_backend, reg74_backend, rega_backend, reg78_backend, spirit_transaction_backend):
+        backend.init_sqlite_db()
+    
+    rng = random.Random(seed)
+    for _ in range(records):
+        record = _receipt(rng, rng.choice(days))
+        record["created_at"] = f"{record['date_receipt']} 10:00:00"
+        reg76_backend.save_to_sqlite(record)
+
+
+# ============================================================================
+# SESSIONS
+# ============================================================================
+
+def _operations():
+    import reg76_backend, reg74_backend, rega_backend, reg78_backend, spirit_transaction_backend
+    from handbook_generator_v2 import EnhancedHandbookGenerator
+    
+    def filter_records(rng, day):
+        backend = rng.choice([reg76_backend, reg74_backend, rega_backend, reg78_backend])
+        if backend is reg78_backend:
+            return backend.filter_records(date_from=day, date_to=day)
+        return backend.filter_records(date_from=day)
+    
+    def save_record(rng, day):
+        if reg76_backend.save_record(_receipt(rng, day)) is None:
+            raise RuntimeError("save_record returned no record ID")
+    
+    return {
+        "filter_records": filter_records,
+        "save_record": save_record,
+        "generate_daily_synopsis": lambda rng, day: reg78_backend.generate_daily_synopsis(day),
+        "refresh_for_date": lambda rng, day: spirit_transaction_backend.refresh_for_date(day),
+        "generate_handbook": lambda rng, day: EnhancedHandbookGenerator(day).generate_handbook(),
+    }
+
+
+def _session(session_id: int, config: Dict, operations: Dict, samples: List):
+    """One operator: pick an operation by weight, run it, think, repeat until the deadline"""
+    rng = random.Random(config["seed"] * 1000 + session_id)
+    weights = PROFILES[config["profile"]]
+    names = list(weights)
+    days = config["days"]
+    deadline = config["deadline"]
+    
+    while time.time() < deadline:
+        op = rng.choices(names, weights=[weights[n] for n in names])[0]
+        day = rng.choice(days)
+        _collected.messages = []
+        error = None
+        start = time.perf_counter()
+        try:
+            operations[op](rng, day)
+        except Exception as e:
+            error = str(e)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        messages = _collected.messages + ([(True, error)] if error else [])
+        _collected.messages = None
+        
+        failed = any(is_error for is_error, _ in messages)
+        locked = any(lock in m for _, m in messages for lock in LOCK_MESSAGES)
+        samples.append((op, elapsed_ms, failed, locked))
+        
+        if config["think_ms"]:
+            time.sleep(rng.expovariate(1000 / config["think_ms"]))
+
+
+def _run_sessions(config: Dict, first_session: int) -> Dict:
+    """Run config['sessions'] session threads in this process; returns their samples and writer stats"""
+    _prepare_environment(config["work_dir"], config["sheets_latency_ms"] / 1000)
+    import db_writer
+    
+    operations = _operations()
+    samples: List = []
+    threads = [threading.Thread(target=_session, args=(first_session + i, config, operations, samples),
+                                name=f"load-session-{first_session + i}")
+               for i in range(config["sessions"])]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return {"samples": samples, "writer": db_writer.get_writer().stats()}
+
+
+def _process_main(args):
+    config, first_session = args
+    return _run_sessions(config, first_session)
+
+
+# ============================================================================
+# REPORT
+# ============================================================================
+
+def summarize(samples: List, wall_seconds: float) -> pd.DataFrame:
+    """Per-operation and total throughput, latency percentiles and error rates"""
+    df = pd.DataFrame(samples, columns=["operation", "ms", "failed", "locked"])
+    
+    def stats(group: pd.DataFrame) -> Dict:
+        return {
+            "count": len(group),
+            "ops_per_s": round(len(group) / wall_seconds, 2),
+            "p50_ms": round(group["ms"].quantile(0.50), 1),
+            "p95_ms": round(group["ms"].quantile(0.95), 1),
+            "p99_ms": round(group["ms"].quantile(0.99), 1),
+            "max_ms": round(group["ms"].max(), 1),
+            "error_rate": round(group["failed"].mean(), 4),
+            "lock_error_rate": round(group["locked"].mean(), 4),
+        }
+    
+    rows = [{"operation": op, **stats(group)} for op, group in df.groupby("operation")]
+    if not df.empty:
+        rows.append({"operation": "TOTAL", **stats(df)})
+    return pd.DataFrame(rows)
+
+
+def run_load_test(sessions: int = 8, processes: int = 1, duration: float = 30, profile: str = "daily",
+                  days: int = 30, seed_records: int = 500, think_ms: float = 50,
+                  sheets_latency_ms: float = 30, seed: int = 0, keep: bool = False) -> Dict:
+    """
+    Run the load test and return {"report": DataFrame, "writer": stats, "work_dir": path}.
+    sessions is per process, so processes > 1 simulates sessions * processes operators.
+    """
+    work_dir = tempfile.mkdtemp(prefix="excise-load-")
+    end = date.today()
+    config = {
+        "work_dir": work_dir, "sessions": sessions, "profile": profile, "seed": seed,
+        "days": [end - timedelta(days=i) for i in range(days)],
+        "think_ms": think_ms, "sheets_latency_ms": sheets_latency_ms,
+    }
+    cwd = os.getcwd()
+    try:
+        _prepare_environment(work_dir, sheets_latency_ms / 1000)
+        seed_database(seed_records, config["days"], seed)
+        
+        start = time.time()
+        config["deadline"] = start + duration
+        if processes <= 1:
+            results = [_run_sessions(config, 0)]
+        else:
+            ctx = multiprocessing.get_context("spawn")
+            with ctx.Pool(processes) as pool:
+                results = pool.map(_process_main, [(config, p * sessions) for p in range(processes)])
+        wall = time.time() - start
+        
+        samples = [s for r in results for s in r["samples"]]
+        writer = {}
+        for r in results:
+            for k, v in r["writer"].items():
+                writer[k] = max(writer.get(k, 0), v) if k == "largest_batch" else writer.get(k, 0) + v
+        return {"report": summarize(samples, wall), "writer": writer, "work_dir": work_dir}
+    finally:
+        os.chdir(cwd)
+        if not keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-session load test of the register backends.")
+    parser.add_argument("--sessions", type=int, default=8, help="Session threads per process.")
+    parser.add_argument("--processes", type=int, default=1, help="Processes, each running --sessions sessions.")
+    parser.add_argument("--duration", type=float, default=30, help="Seconds to run.")
+    parser.add_argument("--profile", choices=list(PROFILES), default="daily")
+    parser.add_argument("--days", type=int, default=30, help="Spread operations over this many recent days.")
+    parser.add_argument("--seed-records", type=int, default=500, help="Reg-76 receipts loaded before the run.")
+    parser.add_argument("--think-ms", type=float, default=50, help="Mean pause between a session's operations.")
+    parser.add_argument("--sheets-latency-ms", type=float, default=30, help="Simulated Google Sheets round trip.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="Keep the temp working directory.")
+    args = parser.parse_args()
+    
+    result = run_load_test(args.sessions, args.processes, args.duration, args.profile, args.days,
+                           args.seed_records, args.think_ms, args.sheets_latency_ms, args.seed, args.keep)
+    print(f"\n{args.sessions * max(args.processes, 1)} sessions, profile {args.profile}, {args.duration:.0f}s")
+    print(result["report"].to_string(index=False))
+    print(f"Writer: {result['writer']}")
+    if args.keep:
+        print(f"Working directory kept at {result['work_dir']}")
@@ -4,10 +4,11 @@ Database operations for maintenance tracking
 """
 
 import sqlite3
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from typing import List, Optional, Tuple
 import pandas as pd
 from maintenance_schema import MaintenanceActivity
+from register_search import init_register_search
 
 import os
 
@@ -39,6 +40,13 @@ def init_maintenance_db():
         )
     """)
     
+    # Rollups filter and group on date, so keep it indexed
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_maintenance_date
+        ON maintenance_activities(date)
+    """)
+    
+    init_register_search(conn)
     conn.commit()
     conn.close()
     return True
@@ -110,44 +118,122 @@ def get_maintenance_activities(start_date: Optional[date] = None,
         print(f"Error fetching activities: {e}")
         return pd.DataFrame()
 
-def get_monthly_summary(year: int, month: int) -> dict:
-    """Get monthly maintenance summary statistics"""
+def _empty_totals() -> dict:
+    return {'total_activities': 0, 'total_hours': 0.0, 'avg_time': 0.0, 'unique_days': 0}
+
+def get_activity_rollup(start_date: Optional[date] = None,
+                        end_date: Optional[date] = None) -> dict:
+    """
+    Aggregate maintenance activities for a date range with GROUP BY queries.
+    
+    Returns a dict with:
+        totals: total_activities, total_hours, avg_time, unique_days
+        by_month: DataFrame [month, activities, hours, avg_time, unique_days]
+        by_category: DataFrame [billing_category, billing_section, activities, hours]
+        by_instrument: DataFrame [instrument, activities, hours]
+    
+    Each activity row lists two instruments joined by " and "; the per-instrument
+    rollup splits them in SQL so both get credited with the activity's hours.
+    """
+    rollup = {
+        'totals': _empty_totals(),
+        'by_month': pd.DataFrame(columns=['month', 'activities', 'hours', 'avg_time', 'unique_days']),
+        'by_category': pd.DataFrame(columns=['billing_category', 'billing_section', 'activities', 'hours']),
+        'by_instrument': pd.DataFrame(columns=['instrument', 'activities', 'hours'])
+    }
+    
+    # Each bound applies on its own, so an open-ended range still filters
+    conditions = []
+    params = []
+    if start_date:
+        conditions.append("date >= ?")
+        params.append(start_date.isoformat())
+    if end_date:
+        conditions.append("date <= ?")
+        params.append(end_date.isoformat())
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    
     try:
         conn = sqlite3.connect(DATABASE_PATH)
+        cursor = conn.cursor()
         
-        # Get date range for the month
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1)
-        else:
-            end_date = date(year, month + 1, 1)
-        
-        df = pd.read_sql_query(
-            "SELECT * FROM maintenance_activities WHERE date >= ? AND date < ?",
-            conn,
-            params=[start_date.isoformat(), end_date.isoformat()]
-        )
+        cursor.execute(f"""
+            SELECT COUNT(*),
+                   COALESCE(SUM(time_spent_hours), 0),
+                   COALESCE(AVG(time_spent_hours), 0),
+                   COUNT(DISTINCT date)
+            FROM maintenance_activities
+            {where}
+        """, params)
+        total_activities, total_hours, avg_time, unique_days = cursor.fetchone()
+        rollup['totals'] = {
+            'total_activities': total_activities,
+            'total_hours': float(total_hours),
+            'avg_time': float(avg_time),
+            'unique_days': unique_days
+        }
         
-        conn.close()
+        if total_activities:
+            rollup['by_month'] = pd.read_sql_query(f"""
+                SELECT substr(date, 1, 7) AS month,
+                       COUNT(*) AS activities,
+                       SUM(time_spent_hours) AS hours,
+                       AVG(time_spent_hours) AS avg_time,
+                       COUNT(DISTINCT date) AS unique_days
+                FROM maintenance_activities
+                {where}
+                GROUP BY month
+                ORDER BY month
+            """, conn, params=params if params else None)
+            
+            rollup['by_category'] = pd.read_sql_query(f"""
+                SELECT billing_category,
+                       MAX(billing_section) AS billing_section,
+                       COUNT(*) AS activities,
+                       SUM(time_spent_hours) AS hours
+                FROM maintenance_activities
+                {where}
+                GROUP BY billing_category
+                ORDER BY billing_category
+            """, conn, params=params if params else None)
+            
+            rollup['by_instrument'] = pd.read_sql_query(f"""
+                WITH RECURSIVE split(instrument, rest, hours) AS (
+                    SELECT '', instruments || ' and ', time_spent_hours
+                    FROM maintenance_activities
+                    {where}
+                    UNION ALL
+                    SELECT trim(substr(rest, 1, instr(rest, ' and ') - 1)),
+                           substr(rest, instr(rest, ' and ') + 5),
+                           hours
+                    FROM split
+                    WHERE rest <> ''
+                )
+                SELECT instrument,
+                       COUNT(*) AS activities,
+                       SUM(hours) AS hours
+                FROM split
+                WHERE instrument <> ''
+                GROUP BY instrument
+                ORDER BY hours DESC, instrument
+            """, conn, params=params if params else None)
         
-        if df.empty:
-            return {
-                'total_activities': 0,
-                'total_hours': 0.0,
-                'avg_time': 0.0,
-                'unique_days': 0
-            }
-        
-        return {
-            'total_activities': len(df),
-            'total_hours': df['time_spent_hours'].sum(),
-            'avg_time': df['time_spent_hours'].mean(),
-            'unique_days': df['date'].nunique()
-        }
+        conn.close()
+        return rollup
         
     except Exception as e:
-        print(f"Error getting monthly summary: {e}")
-        return {'total_activities': 0, 'total_hours': 0.0, 'avg_time': 0.0, 'unique_days': 0}
+        print(f"Error building activity rollup: {e}")
+        return rollup
+
+def get_monthly_summary(year: int, month: int) -> dict:
+    """Get monthly maintenance summary statistics"""
+    start_date = date(year, month, 1)
+    if month == 12:
+        end_date = date(year, 12, 31)
+    else:
+        end_date = date(year, month + 1, 1) - timedelta(days=1)
+    
+    return get_activity_rollup(start_date, end_date)['totals']
 
 def delete_activity(activity_id: int) -> Tuple[bool, str]:
     """Delete a maintenance activity"""
@@ -13,7 +13,8 @@ from reportlab.pdfgen import canvas
 from collections import Counter
 import pandas as pd
 from datetime import datetime, date
-from maintenance_backend import get_maintenance_activities
+from maintenance_backend import get_maintenance_activities, get_activity_rollup
+import artifact_store
 
 # E+H Brand Colors
 EH_BLUE = colors.HexColor('#00509E')
@@ -62,8 +63,9 @@ class StunningCanvas(canvas.Canvas):
         self.drawCentredString(A4[0]/2, 12*mm, "E+H")
 
 def generate_maintenance_pdf(start_date: date, end_date: date, 
-                            output_path: str = "maintenance_report.pdf") -> tuple:
-    """Generate professional PDF report"""
+                            output_path: str = "maintenance_report.pdf", progress=None) -> tuple:
+    """Generate professional PDF report; progress(fraction, message), if given, is called between sections"""
+    report = progress or (lambda fraction, message: None)
     
     try:
         # Fetch data
@@ -72,10 +74,21 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         if df.empty:
             return False, f"❌ No data found between {start_date} and {end_date}", None
         
+        # The same activities always give the same report; reuse a stored copy
+        report_version = artifact_store.file_digest(__file__)[:12]
+        input_digest = artifact_store.digest_inputs(str(start_date), str(end_date), artifact_store.frame_digest(df))
+        try:
+            if artifact_store.get_store().fetch_to("maintenance_report", report_version, input_digest, output_path):
+                return True, f"✅ PDF ready (unchanged, served from store): {output_path}", output_path
+        except Exception as e:
+            print(f"Artifact store lookup failed: {e}")
+        
         # Calculate metrics
-        total_activities = len(df)
-        total_hours = df['time_spent_hours'].sum()
-        avg_time = total_hours / total_activities if total_activities > 0 else 0
+        report(0.1, "Summarising activities")
+        rollup = get_activity_rollup(start_date, end_date)
+        total_activities = rollup['totals']['total_activities']
+        total_hours = rollup['totals']['total_hours']
+        avg_time = rollup['totals']['avg_time']
         
         # Create PDF
         doc = SimpleDocTemplate(
@@ -118,6 +131,7 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         )
         
         # ========== COVER PAGE ==========
+        report(0.2, "Cover page")
         elements.append(Paragraph("ENDRESS+HAUSER", cover_title))
         elements.append(Spacer(1, 0.2*inch))
         elements.append(Paragraph("MAINTENANCE ACTIVITY", cover_title))
@@ -173,6 +187,7 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         elements.append(PageBreak())
         
         # ========== DETAILED ACTIVITY LOG ==========
+        report(0.3, "Activity log")
         elements.append(Paragraph("📋 DETAILED ACTIVITY LOG", section_header))
         elements.append(Spacer(1, 0.2*inch))
         
@@ -219,7 +234,63 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         elements.append(activity_log_table)
         elements.append(PageBreak())
         
+        # ========== BILLING SUMMARY ==========
+        report(0.5, "Billing summary")
+        elements.append(Paragraph("📊 BILLING SUMMARY", section_header))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        billing_data = [['Billing Category', 'Activities', 'Hours']]
+        for _, row in rollup['by_category'].iterrows():
+            billing_data.append([
+                str(row['billing_category']).upper(),
+                str(int(row['activities'])),
+                f"{row['hours']:.1f}"
+            ])
+        billing_data.append(['TOTAL', str(total_activities), f"{total_hours:.1f}"])
+        
+        billing_table = Table(billing_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
+        billing_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), EH_DARK_BLUE),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), EH_LIGHT_BLUE),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, EH_GRAY]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('BOX', (0, 0), (-1, -1), 2, EH_BLUE),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]))
+        elements.append(billing_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        instrument_data = [['Instrument', 'Activities', 'Hours']]
+        for _, row in rollup['by_instrument'].iterrows():
+            instrument_data.append([
+                str(row['instrument']),
+                str(int(row['activities'])),
+                f"{row['hours']:.1f}"
+            ])
+        
+        instrument_table = Table(instrument_data, colWidths=[3.5*inch, 1.0*inch, 1.0*inch], repeatRows=1)
+        instrument_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), EH_DARK_BLUE),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, EH_GRAY]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('BOX', (0, 0), (-1, -1), 2, EH_BLUE),
+        ]))
+        elements.append(instrument_table)
+        elements.append(PageBreak())
+        
         # ========== SIGNATURES ==========
+        report(0.6, "Signatures")
         elements.append(Paragraph("🔐 AUTHORIZATION & SIGNATURES", section_header))
         elements.append(Spacer(1, 0.3*inch))
         
@@ -264,7 +335,12 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         elements.append(sig_table)
         
         # Build PDF
+        report(0.7, "Laying out PDF")
         doc.build(elements, canvasmaker=StunningCanvas)
+        try:
+            artifact_store.get_store().put_file("maintenance_report", report_version, input_digest, output_path)
+        except Exception as e:
+            print(f"Could not store report {output_path}: {e}")
         
         return True, f"✅ PDF generated: {output_path}", output_path
         
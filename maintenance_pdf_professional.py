@@ -8,7 +8,7 @@ from pathlib import Path
 from jinja2 import Template
 from weasyprint import HTML
 import pandas as pd
-from maintenance_backend import get_maintenance_activities
+from maintenance_backend import get_maintenance_activities, get_activity_rollup
 
 def generate_professional_pdf(start_date: date, end_date: date, output_path: str = "maintenance_report.pdf"):
     """Generate professional PDF using modern template-based architecture"""
@@ -19,10 +19,11 @@ def generate_professional_pdf(start_date: date, end_date: date, output_path: str
             return False, "No data found", None
         
         # Calculate metrics
-        total_activities = len(df)
-        total_hours = df['time_spent_hours'].sum()
-        avg_time = total_hours / total_activities if total_activities > 0 else 0
-        unique_days = df['date'].nunique()
+        totals = get_activity_rollup(start_date, end_date)['totals']
+        total_activities = totals['total_activities']
+        total_hours = totals['total_hours']
+        avg_time = totals['avg_time']
+        unique_days = totals['unique_days']
         
         # Prepare activity data
         activities = []
@@ -13,7 +13,7 @@ from reportlab.pdfgen import canvas
 from collections import Counter
 import pandas as pd
 from datetime import datetime, date
-from maintenance_backend import get_maintenance_activities
+from maintenance_backend import get_maintenance_activities, get_activity_rollup
 
 # E+H Brand Colors
 EH_BLUE = colors.HexColor('#00509E')
@@ -73,9 +73,10 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
             return False, f"❌ No data found between {start_date} and {end_date}", None
         
         # Calculate metrics
-        total_activities = len(df)
-        total_hours = df['time_spent_hours'].sum()
-        avg_time = total_hours / total_activities if total_activities > 0 else 0
+        rollup = get_activity_rollup(start_date, end_date)
+        total_activities = rollup['totals']['total_activities']
+        total_hours = rollup['totals']['total_hours']
+        avg_time = rollup['totals']['avg_time']
         
         # Create PDF
         doc = SimpleDocTemplate(
@@ -219,6 +220,60 @@ def generate_maintenance_pdf(start_date: date, end_date: date,
         elements.append(activity_log_table)
         elements.append(PageBreak())
         
+        # ========== BILLING SUMMARY ==========
+        elements.append(Paragraph("📊 BILLING SUMMARY", section_header))
+        elements.append(Spacer(1, 0.2*inch))
+        
+        billing_data = [['Billing Category', 'Activities', 'Hours']]
+        for _, row in rollup['by_category'].iterrows():
+            billing_data.append([
+                str(row['billing_category']).upper(),
+                str(int(row['activities'])),
+                f"{row['hours']:.1f}"
+            ])
+        billing_data.append(['TOTAL', str(total_activities), f"{total_hours:.1f}"])
+        
+        billing_table = Table(billing_data, colWidths=[2.5*inch, 1.5*inch, 1.5*inch])
+        billing_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), EH_DARK_BLUE),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0, -1), (-1, -1), EH_LIGHT_BLUE),
+            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -2), [colors.white, EH_GRAY]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('BOX', (0, 0), (-1, -1), 2, EH_BLUE),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]))
+        elements.append(billing_table)
+        elements.append(Spacer(1, 0.3*inch))
+        
+        instrument_data = [['Instrument', 'Activities', 'Hours']]
+        for _, row in rollup['by_instrument'].iterrows():
+            instrument_data.append([
+                str(row['instrument']),
+                str(int(row['activities'])),
+                f"{row['hours']:.1f}"
+            ])
+        
+        instrument_table = Table(instrument_data, colWidths=[3.5*inch, 1.0*inch, 1.0*inch], repeatRows=1)
+        instrument_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), EH_DARK_BLUE),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('ALIGN', (0, 0), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, EH_GRAY]),
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.lightgrey),
+            ('BOX', (0, 0), (-1, -1), 2, EH_BLUE),
+        ]))
+        elements.append(instrument_table)
+        elements.append(PageBreak())
+        
         # ========== SIGNATURES ==========
         elements.append(Paragraph("🔐 AUTHORIZATION & SIGNATURES", section_header))
         elements.append(Spacer(1, 0.3*inch))
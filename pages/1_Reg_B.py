@@ -23,6 +23,7 @@ from regb_backend import (
     get_production_fees,
     get_previous_day_closing_balance,
     save_bottle_stock,
+    save_bottle_stock_day,
     get_bottle_stock_for_date,
     get_previous_day_stock,
     get_rega_production_data,
@@ -671,6 +672,39 @@ if view_mode == "Data Entry":
         
         stock_df = pd.DataFrame(stock_df_data)
         st.dataframe(stock_df, use_container_width=True, hide_index=True)
+    
+    # Save every variant for the day in one transaction
+    st.markdown("---")
+    st.markdown("#### ⚡ Save Whole Day")
+    st.caption("Carries forward every variant's previous closing, adds today's Reg-A production "
+               "and keeps wastage/issues already entered for today.")
+    
+    if st.button("💾 Save All Variants for the Day", use_container_width=True):
+        day_movements = {}
+        for stock in existing_stocks:
+            day_movements[(stock.product_name, stock.strength, stock.bottle_size_ml)] = {
+                'product_name': stock.product_name,
+                'strength': stock.strength,
+                'bottle_size_ml': stock.bottle_size_ml,
+                'received_bottles': stock.quantity_received_bottles,
+                'wastage_bottles': stock.wastage_breakage_bottles,
+                'issued_bottles': stock.issue_on_duty_bottles
+            }
+        if auto_fill_production and production_data:
+            for item in production_data.get('production_items', []):
+                key = (item['product_name'], item['strength'], item['bottle_size_ml'])
+                day_movements.setdefault(key, {
+                    'product_name': item['product_name'],
+                    'strength': item['strength'],
+                    'bottle_size_ml': item['bottle_size_ml']
+                })['received_bottles'] = item['bottles']
+        
+        success, saved_count = save_bottle_stock_day(selected_date, list(day_movements.values()))
+        if success:
+            st.success(f"✅ Saved {saved_count} variants for {selected_date.strftime('%d-%m-%Y')}")
+            st.rerun()
+        else:
+            st.error("❌ Failed to save stock for the day")
 
 elif view_mode == "Summary View":
     
@@ -10,6 +10,9 @@ import time
 import importlib
 from utils import calculate_bl, calculate_al
 import rega_backend
+import rega_analytics
+import lineage
+import alcoholmetry
 from rega_schema import (
     PRODUCTION_SHIFTS, BOTTLE_SIZES, BOTTLES_PER_CASE, BRT_VATS,
     DISPATCH_TYPES, PRODUCT_TYPES, PRODUCTION_WASTAGE_LIMIT,
@@ -303,11 +306,7 @@ with tab_entry:
         production_shift = st.selectbox("Production Shift*", PRODUCTION_SHIFTS)
     with col3:
         # Get available batches from Reg-74
-        available_batches = rega_backend.get_available_batches()
-        if not available_batches.empty and 'batch_no' in available_batches.columns:
-            batch_list = ["Select Batch"] + available_batches['batch_no'].dropna().unique().tolist()
-        else:
-            batch_list = ["Select Batch"]
+        batch_list = ["Select Batch"] + rega_backend.get_available_batch_numbers()
         
         batch_no = st.selectbox("Batch Number*", batch_list,
                                help="Select batch from Reg-74 reduction operations")
@@ -388,6 +387,12 @@ with tab_entry:
             with p3:
                 st.number_input("Strength (% v/v)", value=brt_opening_strength, disabled=True, format="%.2f")
             
+            if mfm2_density > 0:
+                table_s = alcoholmetry.strength_from_density(mfm2_density, mfm2_temp)
+                if table_s == table_s:  # not NaN
+                    st.caption(f"🧪 Alcoholmetry table: {mfm2_density:.4f} gm/cc @ {mfm2_temp:.1f}°C → "
+                               f"**{table_s:.2f}% v/v** (BRT strength {brt_opening_strength:.2f}%)")
+            
             # Validation
             if mfm2_bl > brt_opening_bl:
                 st.error(f"❌ MFM2 reading ({mfm2_bl:.3f} BL) exceeds available BRT stock ({brt_opening_bl:.3f} BL)!")
@@ -655,3 +660,52 @@ with tab_admin:
                             st.rerun()
                         else:
                             st.error("GSheet sync failed.")
+    
+    # Batch traceability
+    with st.expander("🔗 Trace Batch Sources", expanded=False):
+        trace_batch = st.text_input("Batch No.", key="trace_batch")
+        if trace_batch:
+            sources = lineage.receipts_feeding_batch(trace_batch.strip())
+            if sources.empty:
+                st.info("No Reg-76 receipts found upstream of this batch.")
+            else:
+                st.dataframe(sources, use_container_width=True, hide_index=True)
+    
+    # Batch-level wastage dashboard
+    st.divider()
+    with st.expander("📊 Wastage Analytics", expanded=False):
+        wa1, wa2, wa3 = st.columns(3)
+        with wa1: wa_from = st.date_input("From", value=datetime.now().replace(day=1), key="wa_from")
+        with wa2: wa_to = st.date_input("To", value=datetime.now(), key="wa_to")
+        with wa3: wa_window = st.number_input("Rolling window (days)", min_value=1, max_value=90, value=7, key="wa_window")
+        
+        analytics = rega_analytics.get_wastage_analytics(wa_from, wa_to, window_days=int(wa_window))
+        totals = analytics["totals"]
+        if totals["sessions"] == 0:
+            st.info("No production sessions in this period.")
+        else:
+            k1, k2, k3, k4, k5 = st.columns(5)
+            with k1: st.metric("Sessions", totals["sessions"])
+            with k2: st.metric("MFM2 AL", f"{totals['mfm2_al']:.3f}")
+            with k3: st.metric("Bottled AL", f"{totals['bottles_al']:.3f}")
+            with k4: st.metric("Wastage %", f"{totals['wastage_pct']:.4f}%", f"Limit: {PRODUCTION_WASTAGE_LIMIT}%", delta_color="off")
+            with k5: st.metric("Chargeable (AL)", f"{totals['chargeable_al']:.3f}")
+            
+            if totals["sessions_over_limit"]:
+                st.warning(f"⚠️ {totals['sessions_over_limit']} session(s) over the allowable limit, "
+                           f"{totals['critical_sessions']} critical")
+            
+            trend = analytics["trend"].set_index("production_date")
+            st.markdown("**Wastage % Trend**")
+            st.line_chart(trend[["wastage_pct", "rolling_wastage_pct"]])
+            
+            b1, b2 = st.columns(2)
+            with b1:
+                st.markdown("**By Batch**")
+                st.dataframe(analytics["by_batch"], use_container_width=True, hide_index=True)
+            with b2:
+                st.markdown("**By Brand**")
+                st.dataframe(analytics["by_brand"], use_container_width=True, hide_index=True)
+            
+            st.markdown("**By Bottle Size**")
+            st.dataframe(analytics["by_size"], use_container_width=True, hide_index=True)
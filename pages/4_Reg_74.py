@@ -10,6 +10,9 @@ import time
 import importlib
 from utils import calculate_bl, calculate_al
 import reg74_backend
+import gsheets_client
+import tank_calibration
+import alcoholmetry
 from reg74_schema import OPERATION_TYPES, SST_VATS, BRT_VATS, ALL_VATS, TARGET_STRENGTHS
 
 # Reload backend to get latest changes
@@ -209,6 +212,10 @@ with st.sidebar:
     gs_client = reg74_backend.get_google_client()
     if gs_client:
         st.success("🟢 Connected to Google Sheets")
+        sync_health = gsheets_client.get_manager().health()
+        last_write = sync_health["metrics"].get("update", {})
+        if last_write.get("calls"):
+            st.caption(f"Last sheet write {last_write['last_ms']:.0f} ms · {last_write['errors']:.0f} failed of {last_write['calls']:.0f}")
     else:
         st.warning("🟡 Using Local Storage (CSV)")
     
@@ -307,6 +314,15 @@ def display_storage_wastage_section(vat_no, vat_type="SST/BRT"):
     with c4:
         dip_temp = st.number_input(f"Temp (°C)", value=20.0, step=0.1, key=f"dip_temp_{vat_no}")
     
+    # Calibrated volume for the dip, as a check on the entered actual BL
+    if dip_reading > 0:
+        dip_bl = tank_calibration.dip_to_bl(vat_no, dip_reading)
+        if dip_bl == dip_bl:  # not NaN
+            st.caption(f"📏 Calibration chart: {dip_reading:.1f} cm → **{dip_bl:.3f} BL** "
+                       f"(entered actual differs by {actual_bl - dip_bl:+.3f} L)")
+        else:
+            st.caption(f"📏 No calibration chart covers {dip_reading:.1f} cm for {vat_no}")
+    
     # Calculate wastage
     if actual_bl > 0 or actual_al > 0:
         wastage_result = calculate_storage_wastage(expected_bl, expected_al, actual_bl, actual_al)
@@ -352,6 +368,8 @@ def display_storage_wastage_section(vat_no, vat_type="SST/BRT"):
             "wastage_al": wastage_result['wastage_al'],
             "wastage_percentage": wastage_result['wastage_percentage'],
             "storage_days": storage_days,
+            "opening_dip_cm": dip_reading,
+            "opening_temp": dip_temp,
             "wastage_note": wastage_note,
             "has_wastage": wastage_result['has_wastage']
         }
@@ -437,6 +455,12 @@ with tab_entry:
         with c8:
             evc_no = st.text_input("EVC No.")
         
+        if receipt_density > 0:
+            table_s = alcoholmetry.strength_from_density(receipt_density, receipt_temp)
+            if table_s == table_s:  # not NaN
+                st.caption(f"🧪 Alcoholmetry table: {receipt_density:.4f} gm/cc @ {receipt_temp:.1f}°C → "
+                           f"**{table_s:.2f}% v/v**")
+        
         # Auto-populate from Reg-76 if selected
         if ref_reg76_id and 'reg76_data' in locals():
             if receipt_bl == 0.0:
@@ -736,6 +760,22 @@ with tab_entry:
         dip_reading = st.number_input("Dip Reading (cm)", min_value=0.0, step=0.1)
         dip_temp = st.number_input("Dip Temp (°C)", value=20.0, step=0.1)
     
+    # Dip → BL from the calibration chart of the VAT holding the closing stock
+    dip_vat = destination_vat if 'destination_vat' in locals() and destination_vat in ALL_VATS else (
+        source_vat if 'source_vat' in locals() else "")
+    dip_calculated_bl = 0.0
+    dip_variance_bl = 0.0
+    if dip_reading > 0 and dip_vat:
+        calibrated_bl = tank_calibration.dip_to_bl(dip_vat, dip_reading)
+        if calibrated_bl == calibrated_bl:  # not NaN
+            dip_calculated_bl = round(calibrated_bl, 3)
+            dip_variance_bl = round((closing_bl if 'closing_bl' in locals() else 0.0) - dip_calculated_bl, 3)
+            d1, d2 = st.columns(2)
+            with d1: display_calc_result(f"Dip Volume ({dip_vat})", dip_calculated_bl, "L")
+            with d2: display_calc_result("Book − Dip Variance", dip_variance_bl, "L")
+        else:
+            st.caption(f"📏 No calibration chart covers {dip_reading:.1f} cm for {dip_vat}")
+    
     st.markdown('</div>', unsafe_allow_html=True)
     
     # SUBMISSION
@@ -792,6 +832,8 @@ with tab_entry:
                     "storage_wastage_al": swdata.get("wastage_al", 0.0),
                     "storage_wastage_percentage": swdata.get("wastage_percentage", 0.0),
                     "storage_days": swdata.get("storage_days", 0),
+                    "opening_dip_cm": swdata.get("opening_dip_cm", 0.0),
+                    "opening_temp": swdata.get("opening_temp", 0.0),
                     "storage_wastage_note": swdata.get("wastage_note", ""),
                     
                     "receipt_date": str(operation_date),
@@ -822,8 +864,8 @@ with tab_entry:
                     "wastage_remarks": "",
                     "dip_reading_cm": dip_reading,
                     "dip_temp": dip_temp,
-                    "dip_calculated_bl": 0.0,
-                    "dip_variance_bl": 0.0,
+                    "dip_calculated_bl": dip_calculated_bl,
+                    "dip_variance_bl": dip_variance_bl,
                     "permit_no": permit_no if 'permit_no' in locals() else "",
                     "pass_no": permit_no if 'permit_no' in locals() else "",
                     "pass_date": str(operation_date),
@@ -892,3 +934,25 @@ with tab_admin:
                             st.rerun()
                         else:
                             st.error("GSheet sync failed.")
+    
+    # Tank Calibration Charts
+    st.divider()
+    with st.expander("📏 Tank Calibration Charts", expanded=False):
+        calibrated = tank_calibration.get_calibrated_vats()
+        st.caption(f"Calibrated VATs: {', '.join(calibrated) if calibrated else 'None'}")
+        
+        chart_file = st.file_uploader("Import chart CSV (vat_no, dip_cm, volume_bl)", type=["csv"])
+        if chart_file is not None and st.button("📥 Import Calibration Charts"):
+            ok, msg = tank_calibration.import_calibration_csv(chart_file, chart_ref=chart_file.name)
+            if ok:
+                st.success(msg)
+            else:
+                st.error(msg)
+        
+        if st.button("🔁 Re-derive Dip Volumes for All Records"):
+            with st.spinner("Re-deriving dip volumes..."):
+                audit = tank_calibration.rederive_dip_volumes(write_back=True)
+            if audit.empty:
+                st.info("No records with dip readings found.")
+            else:
+                st.dataframe(audit, use_container_width=True, hide_index=True)
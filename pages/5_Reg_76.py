@@ -9,6 +9,10 @@ from datetime import datetime
 import time
 from utils import calculate_bl, calculate_al, calculate_transit_days, calculate_wastage, validate_wb
 import reg76_backend
+import gsheets_client
+import alcoholmetry
+import reg76_reconciliation
+import lineage
 
 # Page Configuration
 st.set_page_config(
@@ -181,6 +185,10 @@ with st.sidebar:
     gs_client = reg76_backend.get_google_client()
     if gs_client:
         st.success("🟢 Connected to Google Sheets")
+        sync_health = gsheets_client.get_manager().health()
+        last_write = sync_health["metrics"].get("update", {})
+        if last_write.get("calls"):
+            st.caption(f"Last sheet write {last_write['last_ms']:.0f} ms · {last_write['errors']:.0f} failed of {last_write['calls']:.0f}")
     else:
         st.warning("🟡 Using Local Storage (CSV)")
         with st.expander("How to Sync with GSheets"):
@@ -334,7 +342,7 @@ with tab_entry:
             net_p = wb_l_p - wb_u_p
             st.caption(f"Net Weight: {net_p:.2f} kg")
         
-        if abs(net_c - adv_w) > 50:
+        if abs(net_c - adv_w) > reg76_reconciliation.WEIGHT_DEVIATION_LIMIT_KG:
             st.warning(f"⚠️ Net weight deviation detected: {abs(net_c - adv_w):.2f} kg")
         st.markdown('</div>', unsafe_allow_html=True)
 
@@ -354,6 +362,19 @@ with tab_entry:
         rec_bl = calculate_bl(rec_m, rec_d_t)
         rec_al = calculate_al(rec_bl, rec_s)
         
+        # Alcoholmetry cross-check of the MFM readings
+        if rec_d_t > 0:
+            table_s = alcoholmetry.strength_from_density(rec_d_t, rec_t)
+            if table_s == table_s:  # not NaN
+                table_d20 = alcoholmetry.density_at(table_s, alcoholmetry.REFERENCE_TEMP_C)
+                st.caption(f"🧪 Alcoholmetry table: {rec_d_t:.4f} gm/cc @ {rec_t:.1f}°C → "
+                           f"**{table_s:.2f}% v/v**, density @ 20°C **{table_d20:.4f}**, "
+                           f"BL @ 20°C **{rec_m / table_d20:.2f}**")
+                if rec_s > 0 and abs(rec_s - table_s) > 0.5:
+                    st.warning(f"⚠️ MFM strength {rec_s:.2f}% differs from the table strength {table_s:.2f}% by more than 0.5%")
+            else:
+                st.caption(f"🧪 {rec_d_t:.4f} gm/cc @ {rec_t:.1f}°C is outside the alcoholmetry table")
+        
         # BL at 20C manual entry for received
         rec_bl_20c = st.number_input(
             "Volume in BL at 20°C (Manual Entry)*", 
@@ -374,20 +395,13 @@ with tab_entry:
         st.markdown('<div class="section-container">', unsafe_allow_html=True)
         st.markdown('<div class="section-header">SECTION 6 – TRANSIT WASTAGE / INCREASE</div>', unsafe_allow_html=True)
         
-        diff_al_raw = adv_al - rec_al
-        if diff_al_raw >= 0:
-            wastage_al = diff_al_raw
-            increase_val = 0.0
+        wastage_al, increase_val, allowable_al, chargeable_al = reg76_reconciliation.split_transit_difference(adv_al, rec_al)
+        if increase_val == 0:
             label_w = "Transit Wastage (AL)"
             color_w = "normal"
         else:
-            wastage_al = 0.0
-            increase_val = abs(diff_al_raw)
             label_w = "Transit Increase (AL)"
             color_w = "inverse"
-            
-        allowable_al = 0.0
-        chargeable_al = max(0.0, wastage_al - allowable_al)
         
         v1, v2, v3, v4 = st.columns(4)
         with v1: st.metric(label_w, f"{wastage_al:.3f}", delta=f"-{wastage_al:.3f}" if wastage_al > 0 else None, delta_color=color_w)
@@ -495,6 +509,52 @@ with tab_admin:
         and synced to Google Sheets. Local file serves as backup and ensures zero data loss.
         """)
     
+    # Transit loss review over a date range
+    with st.expander("📉 Transit Loss Review", expanded=False):
+        tl1, tl2 = st.columns(2)
+        with tl1: tl_from = st.date_input("From", value=datetime.now().replace(day=1), key="tl_from")
+        with tl2: tl_to = st.date_input("To", value=datetime.now(), key="tl_to")
+        
+        report = reg76_reconciliation.get_transit_variance_report(tl_from, tl_to)
+        totals = report["totals"]
+        if totals["receipts"] == 0:
+            st.info("No receipts in this period.")
+        else:
+            k1, k2, k3, k4, k5 = st.columns(5)
+            with k1: st.metric("Receipts", totals["receipts"])
+            with k2: st.metric("Advised AL", f"{totals['adv_al']:.3f}")
+            with k3: st.metric("Received AL", f"{totals['rec_al']:.3f}")
+            with k4: st.metric("Transit Wastage (AL)", f"{totals['transit_wastage_al']:.3f}")
+            with k5: st.metric("Weight Flags", totals["weight_flags"])
+            
+            st.markdown("**By Distillery**")
+            st.dataframe(report["by_distillery"], use_container_width=True, hide_index=True)
+            st.markdown("**By Tanker**")
+            st.dataframe(report["by_tanker"], use_container_width=True, hide_index=True)
+            
+            flagged = report["receipts"][report["receipts"]["weight_flag"]]
+            if not flagged.empty:
+                st.warning(f"⚠️ {len(flagged)} receipt(s) with net weight deviation above "
+                           f"{reg76_reconciliation.WEIGHT_DEVIATION_LIMIT_KG:.0f} kg")
+                st.dataframe(
+                    flagged[["reg76_id", "date_receipt", "vehicle_no", "adv_weight_kg",
+                             "net_weight_consignee_kg", "weight_deviation_kg"]],
+                    use_container_width=True,
+                    hide_index=True
+                )
+    
+    # Consignment traceability
+    with st.expander("🔗 Trace Consignment", expanded=False):
+        trace_permit = st.text_input("Permit No.", key="trace_permit")
+        if trace_permit:
+            downstream = lineage.where_did_permit_go(trace_permit.strip())
+            if downstream.empty:
+                st.info("No downstream records found for this permit.")
+            else:
+                counts = downstream["node_type"].value_counts()
+                st.caption(" | ".join(f"**{t}**: {counts.get(t, 0)}" for t in lineage.NODE_TYPES if counts.get(t, 0)))
+                st.dataframe(downstream, use_container_width=True, hide_index=True)
+    
     # DELETE RECORD SECTION - NOW ALWAYS VISIBLE FOR TESTING
     st.divider()
     
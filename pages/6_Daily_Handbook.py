@@ -5,13 +5,14 @@ from auth import login_required
 login_required()
 
 from datetime import date, datetime, timedelta
+import json
 import os
 import sys
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from handbook_generator import EnhancedHandbookGenerator
+import job_queue
 
 # Page configuration
 st.set_page_config(
@@ -180,33 +181,27 @@ with col1:
     with st.sidebar:
         st.markdown("### 🛠️ System Control")
         if st.button("🔄 System-Wide Sync", help="Pull latest data from all physical registers to update the Handbook summaries", use_container_width=True):
-            with st.spinner("Synchronizing all registers..."):
-                try:
-                    import reg78_backend
-                    import regb_backend
-                    import excise_duty_backend
-                    
-                    # 1. Update Reg-78 Synopsis
-                    synopsis = reg78_backend.generate_daily_synopsis(handbook_date)
-                    if synopsis:
-                        synopsis["synopsis_date"] = str(handbook_date)
-                        reg78_backend.save_record(synopsis)
-                    
-                    # 2. Update Reg-B Statistics
-                    regb_summary = regb_backend.generate_daily_summary(handbook_date)
-                    if regb_summary:
-                        regb_backend.save_daily_summary(regb_summary)
-                    
-                    # 3. Update Excise Duty Summary
-                    duty_summary = excise_duty_backend.generate_duty_summary(handbook_date)
-                    if duty_summary:
-                        excise_duty_backend.save_duty_summary(duty_summary)
-                        
-                    st.success("✅ System-Wide Sync Complete!")
-                    time.sleep(1)
-                    st.rerun()
-                except Exception as e:
-                    st.error(f"Sync Error: {e}")
+            st.session_state['sync_job'] = job_queue.submit("system_sync", {"date": str(handbook_date)},
+                                                            priority=job_queue.PRIORITY_HIGH)
+        if 'sync_job' in st.session_state:
+            job_queue.job_panel(st.session_state['sync_job'], key="sync")
+        
+        if st.button("📤 Export Register Format", help="Fill the official Register Format.xlsx with all register data", use_container_width=True):
+            st.session_state['export_job'] = job_queue.submit("register_export", priority=job_queue.PRIORITY_LOW)
+        if 'export_job' in st.session_state:
+            job_queue.job_panel(st.session_state['export_job'], key="export", download_label="📥 Download Register Format",
+                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")
+        
+        fy_start = date(handbook_date.year if handbook_date.month >= 4 else handbook_date.year - 1, 4, 1)
+        scan_range = st.date_input("Consistency scan period", value=(fy_start, handbook_date), key="scan_range")
+        if st.button("🧮 Scan Register Consistency", help="Check every register against the others over the period and rank the discrepancies",
+                     use_container_width=True, disabled=len(scan_range) != 2):
+            st.session_state['scan_job'] = job_queue.submit("consistency_scan",
+                                                            {"start": str(scan_range[0]), "end": str(scan_range[1])},
+                                                            priority=job_queue.PRIORITY_LOW)
+        if 'scan_job' in st.session_state:
+            job_queue.job_panel(st.session_state['scan_job'], key="scan", download_label="📥 Download Discrepancy Report",
+                                mime="text/csv")
 
         st.divider()
         st.info("""
@@ -251,9 +246,9 @@ with col2:
     
     st.markdown("<br>", unsafe_allow_html=True)
     
-    # Generate button
-    if st.button("🚀 Generate Handbook V2", type="primary", use_container_width=True):
-        with st.spinner("📄 Analyzing all registers and generating professional PDF..."):
+    # Preview button: builds the handbook data only (no PDF)
+    if st.button("🔍 Preview Handbook", type="primary", use_container_width=True):
+        with st.spinner("📄 Analyzing all registers..."):
             try:
                 # AUTOMATION: Sync before generation to ensure accuracy
                 import reg78_backend
@@ -262,54 +257,49 @@ with col2:
                     syn["synopsis_date"] = str(handbook_date)
                     reg78_backend.save_record(syn)
                 
-                # Generate handbook
-                generator = EnhancedHandbookGenerator(handbook_date)
-                output_file = generator.generate_handbook()
-                
-                # Success message
-                st.markdown(f"""
-                <div class='success-box'>
-                    <strong>✅ Handbook V2 Generated!</strong><br>
-                    <small>File: {output_file}</small>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Store in session state
-                st.session_state['generated_file'] = output_file
+                from handbook_data import HandbookData
+                st.session_state['handbook_model'] = HandbookData(handbook_date).build()
                 st.session_state['generated_date'] = handbook_date
-                st.balloons()
+                st.session_state.pop('handbook_job', None)
                 
             except Exception as e:
-                st.error(f"❌ Error generating handbook: {str(e)}")
+                st.error(f"❌ Error building handbook: {str(e)}")
                 st.exception(e)
     
-    # Download section
-    if 'generated_file' in st.session_state and os.path.exists(st.session_state['generated_file']):
+    # Download section: the PDF is rendered only when asked for
+    if st.session_state.get('generated_date') == handbook_date and 'handbook_model' in st.session_state:
         st.markdown("---")
         st.markdown("### 📥 Download Handbook")
         
-        # Read file
-        with open(st.session_state['generated_file'], 'rb') as f:
-            pdf_data = f.read()
+        # Rendered by a background worker; this page only polls the job
+        if st.button("📄 Build PDF", use_container_width=True):
+            st.session_state['handbook_job'] = job_queue.submit("daily_handbook", {"date": str(handbook_date)},
+                                                                priority=job_queue.PRIORITY_HIGH)
+        if 'handbook_job' in st.session_state:
+            job_queue.job_panel(st.session_state['handbook_job'], key="handbook",
+                                download_label="📄 Download PDF", mime="application/pdf")
         
-        # Download button
         st.download_button(
-            label="📄 Download PDF",
-            data=pdf_data,
-            file_name=st.session_state['generated_file'],
-            mime="application/pdf",
+            label="🧾 Download Data (JSON)",
+            data=json.dumps(st.session_state['handbook_model'], indent=2),
+            file_name=f"Daily_Handbook_{handbook_date.strftime('%d_%m_%Y')}.json",
+            mime="application/json",
             use_container_width=True
         )
-        
-        # File info
-        file_size = os.path.getsize(st.session_state['generated_file']) / 1024  # KB
-        st.markdown(f"""
-        <div class='info-box'>
-            <strong>File Information</strong><br>
-            <small>Size: {file_size:.2f} KB</small><br>
-            <small>Date: {st.session_state['generated_date'].strftime('%d-%m-%Y')}</small>
-        </div>
-        """, unsafe_allow_html=True)
+
+# Handbook preview, straight from the data model
+if st.session_state.get('generated_date') == handbook_date and 'handbook_model' in st.session_state:
+    from handbook_data import handbook_html, section_frame
+    model = st.session_state['handbook_model']
+    st.markdown("---")
+    st.markdown(f"### 👁️ Handbook Preview — {handbook_date.strftime('%d-%m-%Y')}")
+    view = st.radio("View", ["📄 Register Layout", "📊 Tables"], horizontal=True, label_visibility="collapsed")
+    if view == "📄 Register Layout":
+        st.markdown(handbook_html(model), unsafe_allow_html=True)
+    else:
+        for section in model["sections"]:
+            st.markdown(f"**{section['title']}**")
+            st.dataframe(section_frame(section), hide_index=True, use_container_width=True)
 
 # Footer section
 st.markdown("---")
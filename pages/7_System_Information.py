@@ -79,6 +79,81 @@ else:
     st.error("⚠️ System Flowchart PDF not found. Please generate it first.")
 st.markdown('</div>', unsafe_allow_html=True)
 
+# Database Backups Card
+st.markdown('<div class="documentation-card">', unsafe_allow_html=True)
+st.markdown('<div class="doc-title">💾 Database Backups</div>', unsafe_allow_html=True)
+st.markdown("""
+<p class="doc-description">
+    Verified, compressed copies of the register database are taken in the 
+    background every hour, day and month. Restore with 
+    <code>python db_backup.py restore &lt;file&gt;</code>.
+</p>
+""", unsafe_allow_html=True)
+
+import db_backup
+backups = db_backup.list_backups()
+if backups.empty:
+    st.info("No database backups yet.")
+else:
+    st.dataframe(backups, use_container_width=True, hide_index=True)
+if st.button("💾 Back Up Now", use_container_width=True):
+    with st.spinner("Backing up database..."):
+        path = db_backup.backup_database(list(db_backup.GENERATIONS))
+    if path:
+        st.success(f"✅ Backup saved: {path}")
+    else:
+        st.error("❌ Backup failed. See the application log.")
+st.markdown('</div>', unsafe_allow_html=True)
+
+# Period Close Card
+st.markdown('<div class="documentation-card">', unsafe_allow_html=True)
+st.markdown('<div class="doc-title">🔒 Period Close</div>', unsafe_allow_html=True)
+st.markdown("""
+<p class="doc-description">
+    Closing a day or month seals a signed snapshot of every balance as of its 
+    last day. Records dated in a closed period cannot be changed until it is reopened.
+</p>
+""", unsafe_allow_html=True)
+
+import period_close
+from datetime import date as _date
+sealed_through = period_close.get_sealed_through()
+st.info(f"Closed through: **{sealed_through}**" if sealed_through else "No period has been closed yet.")
+
+close_col1, close_col2, close_col3 = st.columns(3)
+with close_col1:
+    close_type = st.selectbox("Period", list(period_close.PERIOD_TYPES), format_func=str.title)
+with close_col2:
+    close_date = st.date_input("Date in period", value=_date.today())
+with close_col3:
+    close_by = st.text_input("Closed by")
+if st.button("🔒 Close Period", use_container_width=True):
+    ok, message = period_close.close_period(close_date, close_type, close_by or None)
+    if ok:
+        st.success(message)
+    else:
+        st.error(message)
+
+snapshots = period_close.get_snapshots(include_reopened=True)
+if snapshots:
+    st.dataframe(
+        [{k: s[k] for k in ("period_type", "period_start", "period_end", "sealed_by", "sealed_at",
+                            "reopened_by", "reopened_at", "reopen_reason")} for s in snapshots],
+        use_container_width=True, hide_index=True
+    )
+    with st.expander("Reopen a closed period"):
+        live_ends = [s["period_end"] for s in snapshots if not s["reopened_at"]]
+        reopen_end = st.selectbox("Period ending", live_ends) if live_ends else None
+        reopen_by = st.text_input("Reopened by")
+        reopen_reason = st.text_area("Reason")
+        if reopen_end and st.button("🔓 Reopen", use_container_width=True):
+            ok, message = period_close.reopen_period(_date.fromisoformat(reopen_end), reopen_by or None, reopen_reason)
+            if ok:
+                st.success(message)
+            else:
+                st.error(message)
+st.markdown('</div>', unsafe_allow_html=True)
+
 # Full System Overview Text
 st.markdown("---")
 st.markdown("### 💡 About the Integrated System")
@@ -6,6 +6,7 @@ login_required()
 from datetime import datetime
 import time
 import spirit_transaction_backend as st_backend
+from row_versions import ConcurrentUpdateError
 
 st.set_page_config(
     page_title="Spirit Transaction",
@@ -111,6 +112,8 @@ with tab_entry:
                 st.session_state.spirit_txn_data = st_backend.compute_spirit_transaction_row(
                     txn_date
                 )
+                # Version the day was read at; saving fails if a register save rewrites it meanwhile
+                st.session_state.spirit_txn_data["row_version"] = st_backend.get_row_version(txn_date)
                 time.sleep(0.5)
                 st.rerun()
 
@@ -335,10 +338,15 @@ with tab_entry:
             "recon_status": recon_status,
             "recon_note": recon_note,
             "status": "Submitted",
+            "row_version": row.get("row_version"),
         }
 
         with st.spinner("Saving Spirit Transaction..."):
-            record_id = st_backend.save_record(payload)
+            try:
+                record_id = st_backend.save_record(payload)
+            except ConcurrentUpdateError as e:
+                st.error(f"⚠️ {e} Click AUTO-COMPUTE to load the latest figures.")
+                record_id = None
             if record_id:
                 st.success(f"✅ Spirit Transaction saved for {record_id}")
                 time.sleep(0.5)
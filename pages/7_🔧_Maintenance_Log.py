@@ -10,10 +10,9 @@ from maintenance_schema import MaintenanceActivity
 from maintenance_backend import (
     add_maintenance_activity,
     get_maintenance_activities,
-    get_monthly_summary,
+    get_activity_rollup,
     delete_activity
 )
-from maintenance_pdf import generate_maintenance_pdf
 from maintenance_auto_generator import auto_populate_maintenance_data, generate_maintenance_with_custom_entries
 
 # Page config
@@ -209,18 +208,57 @@ with tab2:
     df = get_maintenance_activities(view_start, view_end)
     
     if not df.empty:
+        rollup = get_activity_rollup(view_start, view_end)
+        totals = rollup['totals']
+        
         # Summary metrics
         st.subheader("Summary")
         col1, col2, col3, col4 = st.columns(4)
         
         with col1:
-            st.metric("Total Activities", len(df))
+            st.metric("Total Activities", totals['total_activities'])
         with col2:
-            st.metric("Total Hours", f"{df['time_spent_hours'].sum():.1f}")
+            st.metric("Total Hours", f"{totals['total_hours']:.1f}")
         with col3:
-            st.metric("Avg Time", f"{df['time_spent_hours'].mean():.1f}h")
+            st.metric("Avg Time", f"{totals['avg_time']:.1f}h")
         with col4:
-            st.metric("Unique Days", df['date'].nunique())
+            st.metric("Unique Days", totals['unique_days'])
+        
+        # Billing rollups
+        with st.expander("📊 Billing Rollup", expanded=False):
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("**By Billing Category**")
+                category_df = rollup['by_category'][['billing_category', 'activities', 'hours']].copy()
+                category_df.columns = ['Category', 'Activities', 'Hours']
+                st.dataframe(
+                    category_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={"Hours": st.column_config.NumberColumn(format="%.1f")}
+                )
+                
+                st.markdown("**By Month**")
+                month_df = rollup['by_month'][['month', 'activities', 'hours', 'unique_days']].copy()
+                month_df.columns = ['Month', 'Activities', 'Hours', 'Days']
+                st.dataframe(
+                    month_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={"Hours": st.column_config.NumberColumn(format="%.1f")}
+                )
+            
+            with col2:
+                st.markdown("**By Instrument**")
+                instrument_df = rollup['by_instrument'].copy()
+                instrument_df.columns = ['Instrument', 'Activities', 'Hours']
+                st.dataframe(
+                    instrument_df,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={"Hours": st.column_config.NumberColumn(format="%.1f")}
+                )
         
         st.markdown("---")
         
@@ -282,40 +320,30 @@ with tab3:
     if not df_preview.empty:
         st.subheader("Report Preview")
         
+        preview_totals = get_activity_rollup(report_start, report_end)['totals']
+        
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Activities", len(df_preview))
+            st.metric("Activities", preview_totals['total_activities'])
         with col2:
-            st.metric("Total Hours", f"{df_preview['time_spent_hours'].sum():.1f}")
+            st.metric("Total Hours", f"{preview_totals['total_hours']:.1f}")
         with col3:
-            st.metric("Avg Time", f"{df_preview['time_spent_hours'].mean():.1f}h")
+            st.metric("Avg Time", f"{preview_totals['avg_time']:.1f}h")
         
         st.markdown("---")
         
         # Generate PDF button
         if st.button("📄 Generate PDF Report", type="primary", use_container_width=True):
-            with st.spinner("Generating professional PDF report..."):
-                output_path = f"maintenance_report_{report_start}_{report_end}.pdf"
-                success, message, pdf_path = generate_maintenance_pdf(
-                    report_start, 
-                    report_end, 
-                    output_path
-                )
-                
-                if success:
-                    st.success(message)
-                    
-                    # Provide download button
-                    with open(pdf_path, "rb") as file:
-                        st.download_button(
-                            label="📥 Download Report",
-                            data=file,
-                            file_name=output_path,
-                            mime="application/pdf",
-                            use_container_width=True
-                        )
-                else:
-                    st.error(message)
+            # Built by a background worker; the page polls the job below
+            import job_queue
+            st.session_state['maintenance_report_job'] = job_queue.submit(
+                "maintenance_report", {"start": str(report_start), "end": str(report_end)}
+            )
+        
+        if 'maintenance_report_job' in st.session_state:
+            import job_queue
+            job_queue.job_panel(st.session_state['maintenance_report_job'], key="maintenance_report",
+                                download_label="📥 Download Report", mime="application/pdf")
     else:
         st.warning("No data available for the selected period. Please add activities first.")
 
@@ -0,0 +1,483 @@
+"""
+Period Close - Sealed end-of-day / end-of-month snapshots of every balance
+Closing a period writes one signed snapshot of the Reg-78 closing, VAT
+balances, ledger balances and Reg-B stock as of its last day. Triggers then
+reject any insert, update or delete of register rows dated inside it until the
+period is reopened, and later computations start from the snapshot instead of
+rescanning history
+"""
+
+import calendar
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import db_writer
+import ledger_engine
+from changelog import TRACKED_TABLES
+from reg78_schema import ALL_VATS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Database path
+DB_PATH = "excise_registers.db"
+
+# Snapshots are signed with HMAC-SHA256 using this key (env var), or a key generated once into SIGNING_KEY_PATH
+SIGNING_KEY_ENV = "EXCISE_SNAPSHOT_KEY"
+SIGNING_KEY_PATH = "snapshot_signing.key"
+
+PERIOD_TYPES = ("day", "month")
+
+CLOSED_MESSAGE = "Period closed: reopen it before changing records dated in it"
+
+CREATE_PERIOD_SNAPSHOTS_TABLE = """
+CREATE TABLE IF NOT EXISTS period_snapshots (
+    snapshot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    period_type TEXT NOT NULL CHECK (period_type IN ('day', 'month')),
+    period_start TEXT NOT NULL,
+    period_end TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    previous_signature TEXT,
+    signature TEXT NOT NULL,
+    sealed_by TEXT,
+    sealed_at TEXT NOT NULL,
+    reopened_by TEXT,
+    reopened_at TEXT,
+    reopen_reason TEXT
+);
+"""
+
+# Only one live (not reopened) snapshot per period end
+CREATE_PERIOD_SNAPSHOTS_INDEXES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_period_snapshots_live
+    ON period_snapshots(period_end) WHERE reopened_at IS NULL;
+"""
+
+# A snapshot is never deleted, and the only change allowed is marking it reopened, once
+CREATE_PERIOD_SNAPSHOTS_TRIGGERS = """
+CREATE TRIGGER IF NOT EXISTS trg_period_snapshots_no_delete BEFORE DELETE ON period_snapshots
+BEGIN
+    SELECT RAISE(ABORT, 'Sealed period snapshots cannot be deleted');
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_period_snapshots_immutable BEFORE UPDATE ON period_snapshots
+WHEN OLD.reopened_at IS NOT NULL
+    OR NEW.reopened_at IS NULL
+    OR NEW.snapshot_id IS NOT OLD.snapshot_id
+    OR NEW.period_type IS NOT OLD.period_type
+    OR NEW.period_start IS NOT OLD.period_start
+    OR NEW.period_end IS NOT OLD.period_end
+    OR NEW.payload IS NOT OLD.payload
+    OR NEW.previous_signature IS NOT OLD.previous_signature
+    OR NEW.signature IS NOT OLD.signature
+    OR NEW.sealed_by IS NOT OLD.sealed_by
+    OR NEW.sealed_at IS NOT OLD.sealed_at
+BEGIN
+    SELECT RAISE(ABORT, 'Sealed period snapshots are immutable');
+END;
+"""
+
+SEALED_THROUGH_SQL = "(SELECT MAX(period_end) FROM period_snapshots WHERE reopened_at IS NULL)"
+
+GUARD_TRIGGER_TEMPLATE = """
+CREATE TRIGGER IF NOT EXISTS trg_close_{table}_{suffix} BEFORE {event} ON {table}
+WHEN {condition}
+BEGIN
+    SELECT RAISE(ABORT, '{message}');
+END;
+"""
+
+GUARD_EVENTS = [
+    ("ins", "INSERT", ["NEW"]),
+    ("upd", "UPDATE", ["NEW", "OLD"]),
+    ("del", "DELETE", ["OLD"]),
+]
+
+
+# ============================================================================
+# DATABASE INITIALIZATION
+# ============================================================================
+
+def init_period_close(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Create the snapshot table and a guard trigger set on every register table
+    that exists, rejecting changes to rows dated on or before the last sealed day
+    """
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_PERIOD_SNAPSHOTS_TABLE)
+        conn.executescript(CREATE_PERIOD_SNAPSHOTS_INDEXES)
+        conn.executescript(CREATE_PERIOD_SNAPSHOTS_TRIGGERS)
+        
+        for table, (_, date_col) in TRACKED_TABLES.items():
+            if not conn.execute(f"PRAGMA table_info({table})").fetchone():
+                continue
+            for suffix, event, refs in GUARD_EVENTS:
+                condition = " OR ".join(f"{ref}.{date_col} <= {SEALED_THROUGH_SQL}" for ref in refs)
+                conn.executescript(GUARD_TRIGGER_TEMPLATE.format(
+                    table=table, suffix=suffix, event=event, condition=condition, message=CLOSED_MESSAGE
+                ))
+        conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"❌ Error initializing period close: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+# ============================================================================
+# SIGNING
+# ============================================================================
+
+def _signing_key() -> bytes:
+    key = os.environ.get(SIGNING_KEY_ENV)
+    if key:
+        return key.encode("utf-8")
+    if not os.path.exists(SIGNING_KEY_PATH):
+        fd = os.open(SIGNING_KEY_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(SIGNING_KEY_PATH) as f:
+        return f.read().strip().encode("utf-8")
+
+
+def _canonical(payload: Dict) -> str:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def _sign(payload_json: str, previous_signature: Optional[str]) -> str:
+    """HMAC over the payload chained to the previous snapshot, so no snapshot can be swapped or dropped unnoticed"""
+    message = f"{previous_signature or ''}\n{payload_json}".encode("utf-8")
+    return hmac.new(_signing_key(), message, hashlib.sha256).hexdigest()
+
+
+# ============================================================================
+# SNAPSHOT CONTENTS
+# ============================================================================
+
+def _table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone() is not None
+
+
+def _vat_balances(conn: sqlite3.Connection, as_of: date) -> Dict[str, float]:
+    """Each VAT's closing AL on its latest Reg-74 operation on or before as_of"""
+    balances = {vat: 0.0 for vat in ALL_VATS}
+    if not _table_exists(conn, "reg74_operations"):
+        return balances
+    for vat in ALL_VATS:
+        row = conn.execute("""
+            SELECT closing_al FROM reg74_operations
+            WHERE operation_date <= ? AND (source_vat = ? OR destination_vat = ?)
+            ORDER BY operation_date DESC, rowid DESC
+            LIMIT 1
+        """, (str(as_of), vat, vat)).fetchone()
+        balances[vat] = float(row[0] or 0.0) if row else 0.0
+    return balances
+
+
+def _reg78_closing(conn: sqlite3.Connection, as_of: date) -> Optional[Dict]:
+    if not _table_exists(conn, "reg78_synopsis"):
+        return None
+    row = conn.execute("""
+        SELECT synopsis_date, closing_balance_bl, closing_balance_al FROM reg78_synopsis
+        WHERE synopsis_date <= ?
+        ORDER BY synopsis_date DESC, rowid DESC
+        LIMIT 1
+    """, (str(as_of),)).fetchone()
+    if not row:
+        return None
+    return {"date": row[0], "bl": float(row[1] or 0.0), "al": float(row[2] or 0.0)}
+
+
+def _regb_stock(conn: sqlite3.Connection, as_of: date) -> List[Dict]:
+    if not _table_exists(conn, "regb_bottle_stock"):
+        return []
+    rows = conn.execute("""
+        SELECT product_name, strength, bottle_size_ml, closing_balance_bottles, closing_bl, closing_al
+        FROM (
+            SELECT *,
+                   ROW_NUMBER() OVER (
+                       PARTITION BY product_name, strength, bottle_size_ml
+                       ORDER BY date DESC
+                   ) AS rn
+            FROM regb_bottle_stock
+            WHERE date <= ?
+        )
+        WHERE rn = 1
+        ORDER BY product_name, strength, bottle_size_ml
+    """, (str(as_of),)).fetchall()
+    return [{"product_name": r[0], "strength": float(r[1]), "bottle_size_ml": r[2],
+             "closing_balance_bottles": r[3], "closing_bl": float(r[4] or 0.0), "closing_al": float(r[5] or 0.0)}
+            for r in rows]
+
+
+def _spirit_transaction(conn: sqlite3.Connection, as_of: date) -> Optional[Dict]:
+    if not _table_exists(conn, "spirit_transaction_daily"):
+        return None
+    conn.row_factory = sqlite3.Row
+    try:
+        row = conn.execute("SELECT * FROM spirit_transaction_daily WHERE txn_date = ?", (str(as_of),)).fetchone()
+    finally:
+        conn.row_factory = None
+    return dict(row) if row else None
+
+
+def compute_balances(conn: sqlite3.Connection, as_of: date) -> Dict:
+    """Every balance and summary a snapshot seals, as of the end of as_of"""
+    ledgers = {}
+    for ledger, spec in ledger_engine.LEDGERS.items():
+        if _table_exists(conn, spec["table"]):
+            ledgers[ledger] = float(ledger_engine.get_opening_balance(ledger, as_of + timedelta(days=1), conn))
+    
+    row_counts = {}
+    for table, (_, date_col) in TRACKED_TABLES.items():
+        if _table_exists(conn, table):
+            row_counts[table] = conn.execute(
+                f"SELECT COUNT(*) FROM {table} WHERE {date_col} <= ?", (str(as_of),)
+            ).fetchone()[0]
+    
+    return {
+        "as_of": str(as_of),
+        "reg78_closing": _reg78_closing(conn, as_of),
+        "vat_closing_al": _vat_balances(conn, as_of),
+        "ledger_closing": ledgers,
+        "regb_stock": _regb_stock(conn, as_of),
+        "spirit_transaction": _spirit_transaction(conn, as_of),
+        "row_counts": row_counts,
+    }
+
+
+# ============================================================================
+# CLOSE AND REOPEN
+# ============================================================================
+
+def period_bounds(period_type: str, period_date: date) -> Tuple[date, date]:
+    """First and last day of the day or month containing period_date"""
+    if period_type not in PERIOD_TYPES:
+        raise ValueError(f"Unknown period type: {period_type}")
+    if period_type == "day":
+        return period_date, period_date
+    last_day = calendar.monthrange(period_date.year, period_date.month)[1]
+    return period_date.replace(day=1), period_date.replace(day=last_day)
+
+
+def _sealed_through(conn: sqlite3.Connection) -> Optional[date]:
+    row = conn.execute(f"SELECT {SEALED_THROUGH_SQL}").fetchone()
+    return datetime.strptime(row[0], "%Y-%m-%d").date() if row and row[0] else None
+
+
+def get_sealed_through() -> Optional[date]:
+    """Last day of the most recent sealed period, or None if nothing is sealed"""
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_period_close(conn)
+        return _sealed_through(conn)
+    finally:
+        conn.close()
+
+
+def is_date_sealed(target_date: date) -> bool:
+    """True if target_date falls inside a sealed period"""
+    sealed_through = get_sealed_through()
+    return sealed_through is not None and target_date <= sealed_through
+
+
+def _seal(conn: sqlite3.Connection, period_type: str, period_start: date, period_end: date,
+          sealed_by: Optional[str]) -> Dict:
+    """Compute and insert the snapshot; runs on the database writer, so no edit lands in between"""
+    sealed_through = _sealed_through(conn)
+    if sealed_through and period_end <= sealed_through:
+        raise ValueError(f"Already closed through {sealed_through}")
+    
+    previous = conn.execute("""
+        SELECT signature FROM period_snapshots
+        WHERE reopened_at IS NULL
+        ORDER BY period_end DESC
+        LIMIT 1
+    """).fetchone()
+    previous_signature = previous[0] if previous else None
+    
+    payload = compute_balances(conn, period_end)
+    payload_json = _canonical(payload)
+    signature = _sign(payload_json, previous_signature)
+    conn.execute("""
+        INSERT INTO period_snapshots (period_type, period_start, period_end, payload,
+                                      previous_signature, signature, sealed_by, sealed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    """, (period_type, str(period_start), str(period_end), payload_json, previous_signature,
+          signature, sealed_by, datetime.now().isoformat()))
+    return payload
+
+
+def close_period(period_date: date, period_type: str = "day", sealed_by: Optional[str] = None) -> Tuple[bool, str]:
+    """
+    Seal the day or month containing period_date: close the financial ledgers
+    through its last day, then write the signed snapshot. Records dated on or
+    before that day are read-only until the period is reopened.
+    """
+    try:
+        period_start, period_end = period_bounds(period_type, period_date)
+        if period_end > date.today():
+            return False, f"❌ {period_end} has not ended yet"
+        init_period_close()
+        sealed_through = get_sealed_through()
+        if sealed_through and period_end <= sealed_through:
+            return False, f"❌ Already closed through {sealed_through}"
+        
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            ledgers = [ledger for ledger, spec in ledger_engine.LEDGERS.items() if _table_exists(conn, spec["table"])]
+        finally:
+            conn.close()
+        for ledger in ledgers:
+            closed_through = ledger_engine.get_closed_through(ledger)
+            if closed_through is None or closed_through < period_end:
+                ok, message = ledger_engine.close_period(ledger, period_end, sealed_by)
+                if not ok:
+                    return False, message
+        
+        db_writer.write(_seal, period_type, period_start, period_end, sealed_by, db_path=DB_PATH)
+        logger.info(f"✅ Period {period_start} to {period_end} sealed")
+        return True, f"✅ Closed through {period_end}"
+    except Exception as e:
+        logger.error(f"❌ Error closing period: {e}")
+        return False, f"❌ Error: {str(e)}"
+
+
+def _reopen(conn: sqlite3.Connection, period_end: date, reopened_by: Optional[str], reason: str) -> int:
+    now = datetime.now().isoformat()
+    cursor = conn.execute("""
+        UPDATE period_snapshots SET reopened_by = ?, reopened_at = ?, reopen_reason = ?
+        WHERE reopened_at IS NULL AND period_end >= ?
+    """, (reopened_by, now, reason, str(period_end)))
+    return cursor.rowcount
+
+
+def reopen_period(period_end: date, reopened_by: Optional[str], reason: str) -> Tuple[bool, str]:
+    """
+    Reopen the sealed period ending on period_end and every period sealed after
+    it (their snapshots were built on it). The snapshots stay on record, marked
+    reopened; closing again writes new ones.
+    """
+    if not reason or not reason.strip():
+        return False, "❌ A reason is required to reopen a closed period"
+    try:
+        init_period_close()
+        reopened = db_writer.write(_reopen, period_end, reopened_by, reason.strip(), db_path=DB_PATH)
+        if not reopened:
+            return False, f"❌ No sealed period ends on {period_end}"
+        for ledger in ledger_engine.LEDGERS:
+            ledger_engine.reopen_period(ledger, period_end)
+        logger.info(f"✅ Reopened {reopened} sealed period(s) from {period_end}")
+        return True, f"✅ Reopened from {period_end}"
+    except Exception as e:
+        logger.error(f"❌ Error reopening period: {e}")
+        return False, f"❌ Error: {str(e)}"
+
+
+# ============================================================================
+# READING SNAPSHOTS
+# ============================================================================
+
+def _row_to_snapshot(row: sqlite3.Row) -> Dict:
+    snapshot = dict(row)
+    snapshot["payload"] = json.loads(snapshot["payload"])
+    return snapshot
+
+
+def get_snapshots(include_reopened: bool = False) -> List[Dict]:
+    """Snapshots, newest first"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_period_close(conn)
+        conn.row_factory = sqlite3.Row
+        query = "SELECT * FROM period_snapshots"
+        if not include_reopened:
+            query += " WHERE reopened_at IS NULL"
+        rows = conn.execute(query + " ORDER BY period_end DESC, snapshot_id DESC").fetchall()
+        conn.close()
+        return [_row_to_snapshot(row) for row in rows]
+    except Exception as e:
+        logger.error(f"❌ Error getting period snapshots: {e}")
+        return []
+
+
+def latest_snapshot(before: date, conn: Optional[sqlite3.Connection] = None) -> Optional[Dict]:
+    """
+    The live snapshot with the latest period end before the given date, or None.
+    A snapshot whose signature does not verify is never used.
+    """
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        if not _table_exists(conn, "period_snapshots"):
+            return None
+        conn.row_factory = sqlite3.Row
+        row = conn.execute("""
+            SELECT * FROM period_snapshots
+            WHERE reopened_at IS NULL AND period_end < ?
+            ORDER BY period_end DESC
+            LIMIT 1
+        """, (str(before),)).fetchone()
+        if row is None:
+            return None
+        snapshot = dict(row)
+        if not hmac.compare_digest(snapshot["signature"], _sign(snapshot["payload"], snapshot["previous_signature"])):
+            logger.error(f"❌ Snapshot for {snapshot['period_end']} failed signature check; ignoring it")
+            return None
+        snapshot["payload"] = json.loads(snapshot["payload"])
+        return snapshot
+    except Exception as e:
+        logger.error(f"❌ Error reading period snapshot: {e}")
+        return None
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+        elif conn is not None:
+            conn.row_factory = None
+
+
+def verify_snapshots() -> List[Dict]:
+    """
+    Check the live snapshot chain oldest first. Each entry reports whether the
+    signature verifies, whether it chains to the snapshot before it, and which
+    sealed balances no longer match the registers (a sign of edits made around
+    the guard triggers).
+    """
+    results = []
+    previous_signature = None
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        init_period_close(conn)
+        conn.row_factory = sqlite3.Row
+        rows = conn.execute("""
+            SELECT * FROM period_snapshots WHERE reopened_at IS NULL ORDER BY period_end
+        """).fetchall()
+        conn.row_factory = None
+        for row in rows:
+            signature_ok = hmac.compare_digest(row["signature"], _sign(row["payload"], row["previous_signature"]))
+            payload = json.loads(row["payload"])
+            current = json.loads(_canonical(compute_balances(conn, datetime.strptime(row["period_end"], "%Y-%m-%d").date())))
+            results.append({
+                "period_end": row["period_end"],
+                "signature_ok": signature_ok,
+                "chain_ok": row["previous_signature"] == previous_signature,
+                "drifted": sorted(key for key in payload if payload[key] != current.get(key)),
+            })
+            previous_signature = row["signature"]
+        return results
+    finally:
+        conn.close()
@@ -4,53 +4,29 @@ import pandas as pd
 from datetime import datetime
 from reg74_schema import REG74_COLUMNS
 import streamlit as st
-try:
-    from streamlit_gsheets import GSheetsConnection
-    GSHEETS_AVAILABLE = True
-except ImportError:
-    GSHEETS_AVAILABLE = False
-    
-try:
-    import gspread
-    from google.oauth2.service_account import Credentials
-    GSPREAD_AVAILABLE = True
-except ImportError:
-    GSPREAD_AVAILABLE = False
 
 import desktop_storage  # New desktop storage module
+import gsheets_client
 from reg74_sqlite_schema import CREATE_REG74_TABLE, CREATE_REG74_INDEXES
+from row_versions import ConcurrentUpdateError, ensure_row_version, save_row
+from backup_journal import BackupJournal
+from changelog import init_changelog
+from period_close import init_period_close
+from register_search import init_register_search
+import db_writer
+import work_queues
 
 CSV_PATH = "backup_data/reg74_data.csv"
+BACKUP = BackupJournal(CSV_PATH, "reg74_id", REG74_COLUMNS)
 DB_PATH = "excise_registers.db"
 JSON_KEY = "the-program-482110-e4-7ef9d425d794.json"
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1Ecmrq9JUhCerhq4mebO1Jtpw8sD_tTo-79_x3Jabr68"
 WORKSHEET_NAME = "Reg74"  # Different worksheet for Reg-74
 
 def get_google_client():
-    """Returns a direct gspread client using service account"""
-    if not GSPREAD_AVAILABLE:
-        return None
-        
+    """Returns the shared gspread client (cached per process), or None if sync is not configured"""
     try:
-        # Try Streamlit secrets first (for Streamlit Cloud)
-        if "gsheets_credentials" in st.secrets:
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            creds = Credentials.from_service_account_info(
-                st.secrets["gsheets_credentials"],
-                scopes=scopes
-            )
-            return gspread.authorize(creds)
-        # Fallback to local JSON file
-        elif os.path.exists(JSON_KEY):
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            creds = Credentials.from_service_account_file(JSON_KEY, scopes=scopes)
-            return gspread.authorize(creds)
+        return gsheets_client.get_manager().client()
     except Exception as e:
         st.warning(f"Google Sheets not available: {e}. Using local CSV.")
     return None
@@ -63,6 +39,11 @@ def init_sqlite_db():
         cursor.executescript(CREATE_REG74_TABLE)
         cursor.executescript(CREATE_REG74_INDEXES)
         conn.commit()
+        ensure_row_version(conn, "reg74_operations")
+        work_queues.init_work_queues(conn)
+        init_changelog(conn)
+        init_period_close(conn)
+        init_register_search(conn)
         conn.close()
     except Exception as e:
         st.error(f"SQLite initialization error: {e}")
@@ -78,34 +59,28 @@ def get_data_from_sqlite():
         st.warning(f"SQLite read error: {e}")
         return pd.DataFrame(columns=REG74_COLUMNS)
 
-def save_to_sqlite(data_dict):
-    """Save record to SQLite database"""
+def save_to_sqlite(data_dict, expected_version=None):
+    """
+    Save record to SQLite database as an upsert. A record without an ID is
+    inserted under the next free R74 ID; with expected_version set, the
+    write only succeeds if nobody has saved the record since that version was read.
+    Raises ConcurrentUpdateError otherwise.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Prepare column names and values
-        columns = list(data_dict.keys())
-        placeholders = ', '.join(['?' for _ in columns])
-        column_names = ', '.join(columns)
-        values = [data_dict[col] for col in columns]
-        
-        # Insert or replace record
-        query = f"INSERT OR REPLACE INTO reg74_operations ({column_names}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(save_row, "reg74_operations", "reg74_id", data_dict, expected_version,
+                        id_prefix=f"R74-{datetime.now().strftime('%Y%m')}", db_path=DB_PATH)
         return True
+    except ConcurrentUpdateError:
+        raise
     except Exception as e:
         st.error(f"SQLite save error: {e}")
         return False
 
 def get_data_local():
-    """Load local CSV fallback"""
-    if os.path.exists(CSV_PATH):
+    """Load local CSV fallback (snapshot plus any journaled saves not yet compacted)"""
+    if os.path.exists(CSV_PATH) or os.path.exists(BACKUP.journal_dir):
         try:
-            return pd.read_csv(CSV_PATH)
+            return BACKUP.read()
         except Exception:
             return pd.DataFrame(columns=REG74_COLUMNS)
     return pd.DataFrame(columns=REG74_COLUMNS)
@@ -119,24 +94,20 @@ def get_data():
 def save_record(data_dict):
     """Save record to SQLite (primary), Desktop Excel (presentation), CSV (backup), and Google Sheets (sync)"""
     
-    # 1. Generate ID and set timestamps if missing
-    if "reg74_id" not in data_dict or not data_dict["reg74_id"]:
-        prefix = "R74-"
-        count = len(get_data()) + 1
-        data_dict["reg74_id"] = f"{prefix}{datetime.now().strftime('%Y%m')}{count:04d}"
-        
+    # 1. Set timestamps (a new record gets its ID inside the SQLite write)
     data_dict["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["status"] = data_dict.get("status", "draft")
-    record_id = data_dict["reg74_id"]
+    expected_version = data_dict.pop("row_version", None)
     
-    # 2. Save to SQLite (PRIMARY STORAGE)
+    # 2. Save to SQLite (PRIMARY STORAGE) - raises ConcurrentUpdateError on a stale version
     init_sqlite_db()
-    success_sqlite = save_to_sqlite(data_dict)
+    success_sqlite = save_to_sqlite(data_dict, expected_version)
     
     if not success_sqlite:
         st.error("❌ Failed to save to SQLite database!")
         return None
+    record_id = data_dict["reg74_id"]
 
     # 3. Save to Desktop Excel (PRESENTATION LAYER)
     try:
@@ -146,12 +117,9 @@ def save_record(data_dict):
     except Exception as e:
         st.warning(f"⚠️ Desktop Excel save failed: {e}")
         
-    # 4. Save to Local CSV (BACKUP)
+    # 4. Save to Local CSV (BACKUP) - appended to the journal, compacted into the CSV in the background
     try:
-        df_local = get_data_local()
-        new_row = pd.DataFrame([data_dict])
-        df_local = pd.concat([df_local, new_row], ignore_index=True)
-        df_local.to_csv(CSV_PATH, index=False)
+        BACKUP.append_upsert(data_dict)
     except Exception as e:
         st.warning(f"⚠️ CSV backup failed: {e}")
     
@@ -178,7 +146,7 @@ def save_record(data_dict):
         # Auto-update Spirit Transaction daily summary
         try:
             import spirit_transaction_backend
-            spirit_transaction_backend.refresh_for_date(target_date)
+            spirit_transaction_backend.refresh_changed_dates()
             st.info("📈 Spirit Transaction auto-updated!")
         except Exception as e:
             st.warning(f"⚠️ Spirit Transaction update failed: {e}")
@@ -190,6 +158,13 @@ def save_record(data_dict):
             st.info("📑 Daily Handbook auto-generated!")
         except Exception as e:
             st.warning(f"⚠️ Handbook generation failed: {e}")
+        
+        # Keep the traceability graph current
+        try:
+            import lineage
+            lineage.refresh_lineage(target_date)
+        except Exception as e:
+            st.warning(f"⚠️ Lineage update failed: {e}")
     except Exception as e:
         st.warning(f"⚠️ Automation hooks failed: {e}")
     # -------------------------
@@ -204,16 +179,12 @@ def save_record(data_dict):
 
 def sync_to_gsheet(df):
     """Sync a dataframe to the Google Sheet using direct gspread"""
+    manager = gsheets_client.get_manager()
     client = get_google_client()
     if client:
         try:
-            sh = client.open_by_url(SPREADSHEET_URL)
-            
-            # Try to get Reg74 worksheet, create if doesn't exist
-            try:
-                worksheet = sh.worksheet(WORKSHEET_NAME)
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = sh.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=len(REG74_COLUMNS))
+            # Cached Reg74 worksheet handle, created if it doesn't exist
+            worksheet = manager.worksheet(SPREADSHEET_URL, WORKSHEET_NAME, cols=len(REG74_COLUMNS))
             
             # Clean data
             df_str = df.astype(str)
@@ -226,11 +197,12 @@ def sync_to_gsheet(df):
             cleaned_data = [df_str.columns.values.tolist()] + df_str.values.tolist()
             
             # Update sheet
-            worksheet.clear()
-            worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED')
+            manager.timed("clear", worksheet.clear)
+            manager.timed("update", lambda: worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED'))
             st.toast("✅ Synchronized with Google Sheets (Reg-74)")
             return True
         except Exception as e:
+            manager.invalidate(SPREADSHEET_URL)  # reopen the sheet on the next sync
             st.sidebar.error(f"Sync failed: {e}")
             return False
     else:
@@ -284,23 +256,15 @@ def get_vat_current_stock(vat_no):
 def get_available_reg76_records():
     """Get Reg-76 records that haven't been processed in Reg-74 yet from SQLite"""
     try:
-        # Load Reg-76 data from SQLite
+        # Open receipts are kept in a trigger-maintained work queue
+        work_queues.ensure_work_queues()
         conn = sqlite3.connect(DB_PATH) # excise_registers.db
-        reg76_df = pd.read_sql_query("SELECT * FROM reg76_receipts", conn)
+        available = pd.read_sql_query("""
+            SELECT r.* FROM wq_open_receipts q
+            JOIN reg76_receipts r ON r.reg76_id = q.reg76_id
+            ORDER BY q.date_receipt
+        """, conn)
         conn.close()
-        
-        reg74_df = get_data() # Already uses SQLite
-        
-        if reg76_df.empty:
-            return pd.DataFrame()
-        
-        # Get Reg-76 IDs already processed
-        processed_ids = []
-        if not reg74_df.empty and 'ref_reg76_id' in reg74_df.columns:
-            processed_ids = reg74_df['ref_reg76_id'].dropna().unique().tolist()
-        
-        # Filter unprocessed records
-        available = reg76_df[~reg76_df['reg76_id'].isin(processed_ids)]
         return available
     except Exception as e:
         print(f"Error fetching available Reg-76 from SQLite: {e}")
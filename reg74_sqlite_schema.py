@@ -95,7 +95,8 @@ CREATE TABLE IF NOT EXISTS reg74_operations (
     officer_signature_date TEXT,
     status TEXT NOT NULL DEFAULT 'draft',
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    row_version INTEGER NOT NULL DEFAULT 1
 );
 """
 
@@ -108,4 +109,7 @@ CREATE INDEX IF NOT EXISTS idx_reg74_destination_vat ON reg74_operations(destina
 CREATE INDEX IF NOT EXISTS idx_reg74_ref_reg76 ON reg74_operations(ref_reg76_id);
 CREATE INDEX IF NOT EXISTS idx_reg74_batch_no ON reg74_operations(batch_no);
 CREATE INDEX IF NOT EXISTS idx_reg74_status ON reg74_operations(status);
+-- A vat's operations in date order (the latest balance of a vat, VAT continuity scans)
+CREATE INDEX IF NOT EXISTS idx_reg74_source_vat_date ON reg74_operations(source_vat, operation_date);
+CREATE INDEX IF NOT EXISTS idx_reg74_destination_vat_date ON reg74_operations(destination_vat, operation_date);
 """
@@ -4,27 +4,28 @@ import pandas as pd
 from datetime import datetime
 from schema import COLUMNS
 import streamlit as st
-from streamlit_gsheets import GSheetsConnection
-import gspread
-from google.oauth2.service_account import Credentials
 import desktop_storage  # New desktop storage module
+import gsheets_client
 from reg76_sqlite_schema import CREATE_REG76_TABLE, CREATE_REG76_INDEXES
+from row_versions import ConcurrentUpdateError, ensure_row_version, save_row
+from backup_journal import BackupJournal
+from changelog import init_changelog
+import period_close
+from period_close import init_period_close
+from register_search import init_register_search
+import db_writer
+import work_queues
 
 CSV_PATH = "backup_data/reg76_data.csv"
+BACKUP = BackupJournal(CSV_PATH, "reg76_id", COLUMNS)
 DB_PATH = "excise_registers.db"
 JSON_KEY = "the-program-482110-e4-7ef9d425d794.json"
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1Ecmrq9JUhCerhq4mebO1Jtpw8sD_tTo-79_x3Jabr68"
 
 def get_google_client():
-    """Returns a direct gspread client using service account"""
+    """Returns the shared gspread client (cached per process), or None if sync is not configured"""
     try:
-        if os.path.exists(JSON_KEY):
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            creds = Credentials.from_service_account_file(JSON_KEY, scopes=scopes)
-            return gspread.authorize(creds)
+        return gsheets_client.get_manager().client()
     except Exception as e:
         st.error(f"GSpread Auth Error: {e}")
     return None
@@ -32,6 +33,7 @@ def get_google_client():
 def get_gsheet_connection():
     """Fallback for reading using st.connection"""
     try:
+        from streamlit_gsheets import GSheetsConnection
         if os.path.exists(JSON_KEY):
             return st.connection("gsheets", type=GSheetsConnection, service_account=JSON_KEY)
         return st.connection("gsheets", type=GSheetsConnection)
@@ -46,6 +48,11 @@ def init_sqlite_db():
         cursor.executescript(CREATE_REG76_TABLE)
         cursor.executescript(CREATE_REG76_INDEXES)
         conn.commit()
+        ensure_row_version(conn, "reg76_receipts")
+        work_queues.init_work_queues(conn)
+        init_changelog(conn)
+        init_period_close(conn)
+        init_register_search(conn)
         conn.close()
     except Exception as e:
         st.error(f"SQLite initialization error: {e}")
@@ -61,34 +68,28 @@ def get_data_from_sqlite():
         st.warning(f"SQLite read error: {e}")
         return pd.DataFrame(columns=COLUMNS)
 
-def save_to_sqlite(data_dict):
-    """Save record to SQLite database"""
+def save_to_sqlite(data_dict, expected_version=None):
+    """
+    Save record to SQLite database as an upsert. A record without an ID is
+    inserted under the next free R76 ID; with expected_version set, the
+    write only succeeds if nobody has saved the record since that version was read.
+    Raises ConcurrentUpdateError otherwise.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Prepare column names and values
-        columns = list(data_dict.keys())
-        placeholders = ', '.join(['?' for _ in columns])
-        column_names = ', '.join(columns)
-        values = [data_dict[col] for col in columns]
-        
-        # Insert or replace record
-        query = f"INSERT OR REPLACE INTO reg76_receipts ({column_names}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(save_row, "reg76_receipts", "reg76_id", data_dict, expected_version,
+                        id_prefix=f"R76-{datetime.now().strftime('%Y%m')}", db_path=DB_PATH)
         return True
+    except ConcurrentUpdateError:
+        raise
     except Exception as e:
         st.error(f"SQLite save error: {e}")
         return False
 
 def get_data_local():
-    """Load local CSV fallback"""
-    if os.path.exists(CSV_PATH):
+    """Load local CSV fallback (snapshot plus any journaled saves not yet compacted)"""
+    if os.path.exists(CSV_PATH) or os.path.exists(BACKUP.journal_dir):
         try:
-            df = pd.read_csv(CSV_PATH)
+            df = BACKUP.read()
             # Remove empty rows (rows where all values are NaN or empty)
             df = df.dropna(how='all')
             # Remove rows where reg76_id is empty/NaN
@@ -110,24 +111,19 @@ def get_data():
 def save_record(data_dict):
     """Save record to SQLite (primary), Desktop Excel (presentation), CSV (backup), and Google Sheets (sync)"""
     
-    # Generate ID if not present
-    if "reg76_id" not in data_dict or not data_dict["reg76_id"]:
-        prefix = "R76-"
-        count = len(get_data()) + 1
-        data_dict["reg76_id"] = f"{prefix}{datetime.now().strftime('%Y%m')}{count:04d}"
-    
-    # Add timestamps
+    # Add timestamps (a new record gets its ID inside the SQLite write)
     data_dict["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["status"] = data_dict.get("status", "draft")
-    record_id = data_dict["reg76_id"]
+    expected_version = data_dict.pop("row_version", None)
     
-    # 1. Save to SQLite (PRIMARY STORAGE)
+    # 1. Save to SQLite (PRIMARY STORAGE) - raises ConcurrentUpdateError on a stale version
     init_sqlite_db()  # Ensure tables exist
-    success_sqlite = save_to_sqlite(data_dict)
+    success_sqlite = save_to_sqlite(data_dict, expected_version)
     
     if not success_sqlite:
         st.error("❌ Failed to save to SQLite database!")
         return None
+    record_id = data_dict["reg76_id"]
     
     # 2. Save to Desktop Excel (PRESENTATION LAYER)
     try:
@@ -137,12 +133,9 @@ def save_record(data_dict):
     except Exception as e:
         st.warning(f"⚠️ Desktop Excel save failed: {e}")
     
-    # 3. Save to Local CSV (BACKUP)
+    # 3. Save to Local CSV (BACKUP) - appended to the journal, compacted into the CSV in the background
     try:
-        df_local = get_data_local()
-        new_row = pd.DataFrame([data_dict])
-        df_local = pd.concat([df_local, new_row], ignore_index=True)
-        df_local.to_csv(CSV_PATH, index=False)
+        BACKUP.append_upsert(data_dict)
     except Exception as e:
         st.warning(f"⚠️ CSV backup failed: {e}")
     
@@ -169,7 +162,7 @@ def save_record(data_dict):
         # Auto-update Spirit Transaction daily summary
         try:
             import spirit_transaction_backend
-            spirit_transaction_backend.refresh_for_date(target_date)
+            spirit_transaction_backend.refresh_changed_dates()
             st.info("📈 Spirit Transaction auto-updated!")
         except Exception as e:
             st.warning(f"⚠️ Spirit Transaction update failed: {e}")
@@ -181,6 +174,13 @@ def save_record(data_dict):
             st.info("📑 Daily Handbook auto-generated!")
         except Exception as e:
             st.warning(f"⚠️ Handbook generation failed: {e}")
+        
+        # Keep the traceability graph current
+        try:
+            import lineage
+            lineage.refresh_lineage(target_date)
+        except Exception as e:
+            st.warning(f"⚠️ Lineage update failed: {e}")
     except Exception as e:
         st.warning(f"⚠️ Automation hooks failed: {e}")
     # -------------------------
@@ -194,25 +194,47 @@ def save_record(data_dict):
             
     return record_id
 
+def _delete_receipt(conn, reg76_id):
+    """Delete the receipt on the database writer; returns its date_receipt (None if it was not in SQLite)"""
+    row = conn.execute("SELECT date_receipt FROM reg76_receipts WHERE reg76_id = ?", (reg76_id,)).fetchone()
+    conn.execute("DELETE FROM reg76_receipts WHERE reg76_id = ?", (reg76_id,))
+    return row[0] if row else None
+
 def delete_record(reg76_id):
-    """Delete a record from Desktop Excel, CSV, and Google Sheets"""
+    """Delete a record from SQLite, Desktop Excel, CSV, and Google Sheets"""
     try:
-        # 1. Delete from Desktop Excel (PRIMARY)
+        # 1. Refuse receipts in a sealed period before any store is touched
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            row = conn.execute("SELECT date_receipt FROM reg76_receipts WHERE reg76_id = ?", (reg76_id,)).fetchone()
+        finally:
+            conn.close()
+        if row and row[0] and period_close.is_date_sealed(pd.to_datetime(row[0]).date()):
+            return False, f"❌ {reg76_id} is dated {row[0]}, inside a closed period; reopen the period to delete it"
+        
+        # 2. Delete from SQLite first, so a rejected delete leaves every store as it was
+        try:
+            date_receipt = db_writer.write(_delete_receipt, reg76_id, db_path=DB_PATH)
+        except Exception as e:
+            return False, f"❌ SQLite delete failed: {e}"
+        if date_receipt:
+            # Drop the lineage edges it fed from its date on
+            import lineage
+            lineage.refresh_lineage(date_receipt)
+        
+        # 3. Delete from Desktop Excel (PRIMARY)
         success_excel, message_excel = desktop_storage.delete_record_from_excel(reg76_id)
         
         if not success_excel:
-            return False, message_excel
+            return False, f"⚠️ Removed from SQLite, but the Desktop Excel delete failed: {message_excel}"
         
-        # 2. Delete from local CSV (BACKUP)
+        # 4. Delete from local CSV (BACKUP)
         try:
-            df_local = get_data_local()
-            if not df_local.empty and reg76_id in df_local['reg76_id'].values:
-                df_local = df_local[df_local['reg76_id'] != reg76_id]
-                df_local.to_csv(CSV_PATH, index=False)
+            BACKUP.append_delete(reg76_id)
         except Exception as e:
             pass  # CSV is backup, don't fail if it errors
         
-        # 3. Sync to Google Sheets
+        # 5. Sync to Google Sheets
         df_excel = desktop_storage.get_data_from_excel()
         sync_success = sync_to_gsheet(df_excel)
         
@@ -235,8 +257,7 @@ def clear_all_data():
         
         # 2. Clear CSV (BACKUP)
         try:
-            empty_df = pd.DataFrame(columns=COLUMNS)
-            empty_df.to_csv(CSV_PATH, index=False)
+            BACKUP.append_clear()
         except Exception as e:
             pass  # CSV is backup
         
@@ -254,11 +275,11 @@ def clear_all_data():
 
 def sync_to_gsheet(df):
     """Sync a dataframe to the Google Sheet using direct gspread"""
+    manager = gsheets_client.get_manager()
     client = get_google_client()
     if client:
         try:
-            sh = client.open_by_url(SPREADSHEET_URL)
-            worksheet = sh.get_worksheet(0) # Get first sheet
+            worksheet = manager.worksheet(SPREADSHEET_URL, index=0) # Get first sheet
             
             # AGGRESSIVE NaN cleaning - convert entire dataframe to strings first
             df_str = df.astype(str)
@@ -271,13 +292,14 @@ def sync_to_gsheet(df):
             cleaned_data = [df_str.columns.values.tolist()] + df_str.values.tolist()
             
             # Clear the sheet first
-            worksheet.clear()
+            manager.timed("clear", worksheet.clear)
             
             # Update sheet
-            worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED')
+            manager.timed("update", lambda: worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED'))
             st.toast("✅ Synchronized with Google Sheets")
             return True
         except Exception as e:
+            manager.invalidate(SPREADSHEET_URL)  # reopen the sheet on the next sync
             st.sidebar.error(f"Sync failed: {e}")
             return False
     else:
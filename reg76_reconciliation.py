@@ -0,0 +1,164 @@
+"""
+Reg-76 Reconciliation - Tanker mass-to-volume conversion and transit variance
+The same formulas serve a single form submit and a whole date range of
+reg76_receipts, evaluated column-wise over NumPy arrays
+"""
+
+import sqlite3
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import calculate_bl, calculate_al
+
+DB_PATH = "excise_registers.db"
+
+# Net weighbridge weight may differ from the advised weight by this much before it is flagged
+WEIGHT_DEVIATION_LIMIT_KG = 50.0
+
+# Allowable transit wastage as a fraction of advised AL (none allowed at present)
+ALLOWABLE_TRANSIT_WASTAGE = 0.0
+
+RECEIPT_COLUMNS = [
+    "reg76_id", "permit_no", "distillery", "vehicle_no", "date_receipt", "days_in_transit",
+    "empty_tanker_weight_kg", "adv_weight_kg", "adv_avg_density", "adv_strength", "adv_bl_20c",
+    "wb_laden_consignee", "wb_unladen_consignee", "wb_laden_pass", "wb_unladen_pass",
+    "rec_mass_kg", "rec_density_at_temp", "rec_density_20c", "rec_strength", "rec_bl_20c",
+]
+
+
+# ============================================================================
+# TRANSIT VARIANCE (scalar or array)
+# ============================================================================
+
+def split_transit_difference(adv_al, rec_al, allowable_fraction: float = ALLOWABLE_TRANSIT_WASTAGE):
+    """
+    Split advised minus received AL into transit wastage or increase.
+    
+    Returns (wastage_al, increase_al, allowable_al, chargeable_al), each a scalar
+    or array matching the inputs.
+    """
+    adv = np.asarray(adv_al, dtype=float)
+    diff = adv - np.asarray(rec_al, dtype=float)
+    wastage = np.maximum(diff, 0.0)
+    increase = np.maximum(-diff, 0.0)
+    allowable = adv * allowable_fraction
+    chargeable = np.maximum(wastage - allowable, 0.0)
+    
+    parts = (wastage, increase, allowable, chargeable)
+    if diff.ndim == 0:
+        return tuple(float(p) for p in parts)
+    return parts
+
+
+# ============================================================================
+# BATCH RECONCILIATION
+# ============================================================================
+
+def reconcile_receipts(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Recompute advised and received BL/AL, weighbridge net weights and transit
+    wastage/increase for every receipt in df, one vectorized pass per column.
+    """
+    out = df.copy()
+    num = out.reindex(columns=[c for c in RECEIPT_COLUMNS if c not in
+                               ("reg76_id", "permit_no", "distillery", "vehicle_no", "date_receipt")])
+    num = num.apply(pd.to_numeric, errors="coerce").fillna(0.0)
+    
+    out["net_weight_consignee_kg"] = num["wb_laden_consignee"] - num["wb_unladen_consignee"]
+    out["net_weight_pass_kg"] = num["wb_laden_pass"] - num["wb_unladen_pass"]
+    out["weight_deviation_kg"] = np.where(
+        out["net_weight_consignee_kg"] > 0, out["net_weight_consignee_kg"] - num["adv_weight_kg"], 0.0
+    )
+    out["weight_flag"] = np.abs(out["weight_deviation_kg"]) > WEIGHT_DEVIATION_LIMIT_KG
+    
+    out["calc_adv_bl"] = calculate_bl(num["adv_weight_kg"], num["adv_avg_density"])
+    out["calc_adv_al"] = calculate_al(out["calc_adv_bl"], num["adv_strength"])
+    out["calc_rec_bl"] = calculate_bl(num["rec_mass_kg"], num["rec_density_at_temp"])
+    out["calc_rec_al"] = calculate_al(out["calc_rec_bl"], num["rec_strength"])
+    out["calc_rec_bl_20c"] = calculate_bl(num["rec_mass_kg"], num["rec_density_20c"])
+    
+    wastage, increase, allowable, chargeable = split_transit_difference(out["calc_adv_al"], out["calc_rec_al"])
+    out["calc_transit_wastage_al"] = wastage
+    out["calc_transit_increase_al"] = increase
+    out["calc_allowable_wastage_al"] = allowable
+    out["calc_chargeable_wastage_al"] = chargeable
+    out["variance_al"] = out["calc_rec_al"] - out["calc_adv_al"]
+    out["variance_pct"] = np.where(
+        out["calc_adv_al"] > 0, out["variance_al"] / out["calc_adv_al"].where(out["calc_adv_al"] > 0, 1.0) * 100, 0.0
+    )
+    return out
+
+
+def load_receipts(start_date: Optional[date] = None, end_date: Optional[date] = None) -> pd.DataFrame:
+    """Reg-76 receipts in a date range (all receipts if no range), oldest first"""
+    query = f"SELECT {', '.join(RECEIPT_COLUMNS)} FROM reg76_receipts"
+    params = []
+    if start_date and end_date:
+        query += " WHERE date_receipt BETWEEN ? AND ?"
+        params = [str(start_date), str(end_date)]
+    query += " ORDER BY date_receipt"
+    
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return pd.read_sql_query(query, conn, params=params if params else None)
+    except Exception as e:
+        print(f"Error loading Reg-76 receipts: {e}")
+        return pd.DataFrame(columns=RECEIPT_COLUMNS)
+    finally:
+        conn.close()
+
+
+def _summarise(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    grouped = df.groupby(df[key].fillna("").replace("", "(not recorded)"))
+    summary = grouped.agg(
+        receipts=("reg76_id", "count"),
+        adv_al=("calc_adv_al", "sum"),
+        rec_al=("calc_rec_al", "sum"),
+        transit_wastage_al=("calc_transit_wastage_al", "sum"),
+        transit_increase_al=("calc_transit_increase_al", "sum"),
+        chargeable_wastage_al=("calc_chargeable_wastage_al", "sum"),
+        avg_weight_deviation_kg=("weight_deviation_kg", "mean"),
+        weight_flags=("weight_flag", "sum"),
+    ).reset_index()
+    summary["variance_al"] = summary["rec_al"] - summary["adv_al"]
+    summary["variance_pct"] = np.where(
+        summary["adv_al"] > 0, summary["variance_al"] / summary["adv_al"].where(summary["adv_al"] > 0, 1.0) * 100, 0.0
+    )
+    return summary.sort_values("variance_al").round(3)
+
+
+def get_transit_variance_report(start_date: Optional[date] = None, end_date: Optional[date] = None) -> Dict:
+    """
+    Transit loss review for a date range of Reg-76 receipts.
+    
+    Returns {'receipts': per-receipt DataFrame, 'by_distillery': DataFrame,
+    'by_tanker': DataFrame, 'totals': dict}; grouped tables are sorted with the
+    largest loss first.
+    """
+    receipts = reconcile_receipts(load_receipts(start_date, end_date))
+    if receipts.empty:
+        empty = pd.DataFrame()
+        return {
+            "receipts": empty, "by_distillery": empty, "by_tanker": empty,
+            "totals": {"receipts": 0, "adv_al": 0.0, "rec_al": 0.0, "transit_wastage_al": 0.0,
+                       "transit_increase_al": 0.0, "chargeable_wastage_al": 0.0, "weight_flags": 0},
+        }
+    
+    totals = {
+        "receipts": int(len(receipts)),
+        "adv_al": round(float(receipts["calc_adv_al"].sum()), 3),
+        "rec_al": round(float(receipts["calc_rec_al"].sum()), 3),
+        "transit_wastage_al": round(float(receipts["calc_transit_wastage_al"].sum()), 3),
+        "transit_increase_al": round(float(receipts["calc_transit_increase_al"].sum()), 3),
+        "chargeable_wastage_al": round(float(receipts["calc_chargeable_wastage_al"].sum()), 3),
+        "weight_flags": int(receipts["weight_flag"].sum()),
+    }
+    return {
+        "receipts": receipts,
+        "by_distillery": _summarise(receipts, "distillery"),
+        "by_tanker": _summarise(receipts, "vehicle_no"),
+        "totals": totals,
+    }
@@ -85,7 +85,8 @@ CREATE TABLE IF NOT EXISTS reg76_receipts (
     -- Status & Tracking
     status TEXT NOT NULL DEFAULT 'draft',
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    row_version INTEGER NOT NULL DEFAULT 1
 );
 """
 
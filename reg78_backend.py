@@ -4,27 +4,26 @@ import pandas as pd
 from datetime import datetime, timedelta
 from reg78_schema import REG78_COLUMNS, PRODUCTION_FEES_RATE_PER_BL, ALL_VATS, SST_VATS, BRT_VATS
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 import desktop_storage
+import gsheets_client
 from reg78_sqlite_schema import CREATE_REG78_TABLE, CREATE_REG78_INDEXES
+from row_versions import ConcurrentUpdateError, ensure_row_version, save_row
+from backup_journal import BackupJournal
+from changelog import init_changelog
+import period_close
+import db_writer
 
 CSV_PATH = "backup_data/reg78_data.csv"
+BACKUP = BackupJournal(CSV_PATH, "reg78_id", REG78_COLUMNS)
 DB_PATH = "excise_registers.db"
 JSON_KEY = "the-program-482110-e4-7ef9d425d794.json"
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1Ecmrq9JUhCerhq4mebO1Jtpw8sD_tTo-79_x3Jabr68"
 WORKSHEET_NAME = "Reg78"  # Daily synopsis worksheet
 
 def get_google_client():
-    """Returns a direct gspread client using service account"""
+    """Returns the shared gspread client (cached per process), or None if sync is not configured"""
     try:
-        if os.path.exists(JSON_KEY):
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            creds = Credentials.from_service_account_file(JSON_KEY, scopes=scopes)
-            return gspread.authorize(creds)
+        return gsheets_client.get_manager().client()
     except Exception as e:
         st.error(f"GSpread Auth Error: {e}")
     return None
@@ -37,6 +36,9 @@ def init_sqlite_db():
         cursor.executescript(CREATE_REG78_TABLE)
         cursor.executescript(CREATE_REG78_INDEXES)
         conn.commit()
+        ensure_row_version(conn, "reg78_synopsis")
+        init_changelog(conn)
+        period_close.init_period_close(conn)
         conn.close()
     except Exception as e:
         st.error(f"SQLite initialization error: {e}")
@@ -52,34 +54,30 @@ def get_data_from_sqlite():
         st.warning(f"SQLite read error: {e}")
         return pd.DataFrame(columns=REG78_COLUMNS)
 
-def save_to_sqlite(data_dict):
-    """Save record to SQLite database"""
+def save_to_sqlite(data_dict, expected_version=None):
+    """
+    Save record to SQLite database as an upsert. A record without an ID updates
+    the synopsis already saved for its date, or is inserted under the next free
+    R78 ID; with expected_version set, the write only succeeds if nobody has
+    saved the record since that version was read.
+    Raises ConcurrentUpdateError otherwise.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Prepare column names and values
-        columns = list(data_dict.keys())
-        placeholders = ', '.join(['?' for _ in columns])
-        column_names = ', '.join(columns)
-        values = [data_dict[col] for col in columns]
-        
-        # Insert or replace record
-        query = f"INSERT OR REPLACE INTO reg78_synopsis ({column_names}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(save_row, "reg78_synopsis", "reg78_id", data_dict, expected_version,
+                        id_prefix=f"R78-{datetime.now().strftime('%Y%m')}", natural_key="synopsis_date",
+                        db_path=DB_PATH)
         return True
+    except ConcurrentUpdateError:
+        raise
     except Exception as e:
         st.error(f"SQLite save error: {e}")
         return False
 
 def get_data_local():
-    """Load local CSV fallback"""
-    if os.path.exists(CSV_PATH):
+    """Load local CSV fallback (snapshot plus any journaled saves not yet compacted)"""
+    if os.path.exists(CSV_PATH) or os.path.exists(BACKUP.journal_dir):
         try:
-            return pd.read_csv(CSV_PATH)
+            return BACKUP.read()
         except Exception:
             return pd.DataFrame(columns=REG78_COLUMNS)
     return pd.DataFrame(columns=REG78_COLUMNS)
@@ -92,24 +90,20 @@ def get_data():
 def save_record(data_dict):
     """Save record to SQLite (primary), Desktop Excel (presentation), CSV (backup), and Google Sheets (sync)"""
     
-    # ID Generation and Timestamps
-    if "reg78_id" not in data_dict or not data_dict["reg78_id"]:
-        prefix = "R78-"
-        count = len(get_data()) + 1
-        data_dict["reg78_id"] = f"{prefix}{datetime.now().strftime('%Y%m')}{count:04d}"
-    
+    # Timestamps (a new record gets its ID inside the SQLite write)
     data_dict["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["status"] = data_dict.get("status", "draft")
-    record_id = data_dict["reg78_id"]
+    expected_version = data_dict.pop("row_version", None)
 
-    # 1. Save to SQLite (PRIMARY STORAGE)
+    # 1. Save to SQLite (PRIMARY STORAGE) - raises ConcurrentUpdateError on a stale version
     init_sqlite_db()
-    success_sqlite = save_to_sqlite(data_dict)
+    success_sqlite = save_to_sqlite(data_dict, expected_version)
     
     if not success_sqlite:
         st.error("❌ Failed to save to SQLite database!")
         return None
+    record_id = data_dict["reg78_id"]
 
     # 2. Save to Desktop Excel (PRESENTATION LAYER)
     try:
@@ -119,12 +113,9 @@ def save_record(data_dict):
     except Exception as e:
         st.warning(f"⚠️ Desktop Excel save failed: {e}")
 
-    # 3. Update Local CSV (BACKUP)
+    # 3. Update Local CSV (BACKUP) - appended to the journal, compacted into the CSV in the background
     try:
-        df_local = get_data_local()
-        new_row = pd.DataFrame([data_dict])
-        df_local = pd.concat([df_local, new_row], ignore_index=True)
-        df_local.to_csv(CSV_PATH, index=False)
+        BACKUP.append_upsert(data_dict)
     except Exception as e:
         st.warning(f"⚠️ CSV backup failed: {e}")
     
@@ -146,16 +137,12 @@ def save_record(data_dict):
 
 def sync_to_gsheet(df):
     """Sync a dataframe to the Google Sheet using direct gspread"""
+    manager = gsheets_client.get_manager()
     client = get_google_client()
     if client:
         try:
-            sh = client.open_by_url(SPREADSHEET_URL)
-            
-            # Try to get Reg78 worksheet, create if doesn't exist
-            try:
-                worksheet = sh.worksheet(WORKSHEET_NAME)
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = sh.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=len(REG78_COLUMNS))
+            # Cached Reg78 worksheet handle, created if it doesn't exist
+            worksheet = manager.worksheet(SPREADSHEET_URL, WORKSHEET_NAME, cols=len(REG78_COLUMNS))
             
             # Clean data
             df_str = df.astype(str)
@@ -168,11 +155,12 @@ def sync_to_gsheet(df):
             cleaned_data = [df_str.columns.values.tolist()] + df_str.values.tolist()
             
             # Update sheet
-            worksheet.clear()
-            worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED')
+            manager.timed("clear", worksheet.clear)
+            manager.timed("update", lambda: worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED'))
             st.toast("✅ Synchronized with Google Sheets (Reg-78)")
             return True
         except Exception as e:
+            manager.invalidate(SPREADSHEET_URL)  # reopen the sheet on the next sync
             st.sidebar.error(f"Sync failed: {e}")
             return False
     else:
@@ -180,27 +168,34 @@ def sync_to_gsheet(df):
         return False
 
 def get_previous_day_closing(target_date):
-    """Get closing balance from previous day's Reg-78"""
-    df = get_data()
-    if df.empty:
-        return {"bl": 0.0, "al": 0.0}
+    """
+    Get closing balance from previous day's Reg-78. A day that ends a sealed
+    period is read from its snapshot; any other day is one indexed lookup.
+    """
+    previous_date = (pd.to_datetime(target_date) - timedelta(days=1)).date()
     
-    # Convert target_date to datetime for comparison
-    target_dt = pd.to_datetime(target_date)
-    previous_date = (target_dt - timedelta(days=1)).date()
+    snapshot = period_close.latest_snapshot(before=previous_date + timedelta(days=1))
+    if snapshot and snapshot["period_end"] == str(previous_date):
+        closing = snapshot["payload"].get("reg78_closing")
+        if closing and closing["date"] == str(previous_date):
+            return {"bl": closing["bl"], "al": closing["al"]}
     
-    # Filter for previous date
-    if 'synopsis_date' in df.columns:
-        df['synopsis_date_dt'] = pd.to_datetime(df['synopsis_date']).dt.date
-        prev_records = df[df['synopsis_date_dt'] == previous_date]
-        
-        if not prev_records.empty:
-            latest = prev_records.iloc[-1]
-            return {
-                "bl": float(latest.get('closing_balance_bl', 0) or 0),
-                "al": float(latest.get('closing_balance_al', 0) or 0)
-            }
+    try:
+        init_sqlite_db()
+        conn = sqlite3.connect(DB_PATH)
+        row = conn.execute("""
+            SELECT closing_balance_bl, closing_balance_al FROM reg78_synopsis
+            WHERE synopsis_date = ?
+            ORDER BY rowid DESC
+            LIMIT 1
+        """, (str(previous_date),)).fetchone()
+        conn.close()
+    except Exception as e:
+        st.warning(f"SQLite read error: {e}")
+        row = None
     
+    if row:
+        return {"bl": float(row[0] or 0), "al": float(row[1] or 0)}
     return {"bl": 0.0, "al": 0.0}
 
 def get_reg76_daily_summary(target_date):
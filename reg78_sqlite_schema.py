@@ -129,7 +129,8 @@ CREATE TABLE IF NOT EXISTS reg78_synopsis (
     -- Status & Timestamps
     status TEXT NOT NULL DEFAULT 'draft',
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    row_version INTEGER NOT NULL DEFAULT 1
 );
 """
 
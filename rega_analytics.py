@@ -0,0 +1,156 @@
+"""
+Reg-A Analytics - Production wastage over any range of rega_production
+Session wastage, allowable and chargeable AL are derived in SQL; batch, brand,
+bottle-size and trend views are grouped from that one result without row loops
+"""
+
+import sqlite3
+from datetime import date
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from rega_schema import BOTTLE_SIZES, PRODUCTION_WASTAGE_LIMIT, CRITICAL_WASTAGE_THRESHOLD
+
+DB_PATH = "excise_registers.db"
+
+BOTTLE_SIZES_ML = [int(size[:-2]) for size in BOTTLE_SIZES]
+
+TOTAL_COLUMNS = ["mfm2_al", "bottles_al", "wastage_al", "increase_al", "allowable_al", "chargeable_al"]
+
+# Per-session metrics; wastage_pct keeps the sign of MFM2 AL minus bottled AL
+SESSION_METRICS_SQL = f"""
+    WITH sessions AS (
+        SELECT rega_id, production_date, production_shift, session_number, batch_no, brand_name,
+               brt_opening_strength AS strength,
+               COALESCE(mfm2_reading_bl, 0) AS mfm2_bl,
+               COALESCE(mfm2_reading_al, 0) AS mfm2_al,
+               COALESCE(bottles_total_bl, 0) AS bottles_bl,
+               COALESCE(bottles_total_al, 0) AS bottles_al,
+               COALESCE(total_bottles, 0) AS total_bottles,
+               COALESCE(allowable_limit, :limit) AS allowable_pct,
+               {", ".join(f"COALESCE(bottles_{size}ml, 0) AS bottles_{size}ml" for size in BOTTLE_SIZES_ML)}
+        FROM rega_production
+        WHERE production_date BETWEEN :start AND :end
+          AND (:brand IS NULL OR brand_name = :brand)
+    ), metrics AS (
+        SELECT *,
+               MAX(mfm2_al - bottles_al, 0) AS wastage_al,
+               MAX(bottles_al - mfm2_al, 0) AS increase_al,
+               mfm2_al * allowable_pct / 100 AS allowable_al,
+               CASE WHEN mfm2_al > 0 THEN (mfm2_al - bottles_al) * 100.0 / mfm2_al ELSE 0 END AS wastage_pct
+        FROM sessions
+    )
+    SELECT *, MAX(wastage_al - allowable_al, 0) AS chargeable_al
+    FROM metrics
+    ORDER BY production_date, batch_no, session_number
+"""
+
+
+def _wastage_pct(frame: pd.DataFrame) -> pd.Series:
+    mfm2 = frame["mfm2_al"]
+    return ((mfm2 - frame["bottles_al"]) / mfm2.where(mfm2 > 0) * 100).fillna(0.0)
+
+
+def _group_totals(sessions: pd.DataFrame, key: str) -> pd.DataFrame:
+    grouped = sessions.groupby(sessions[key].fillna("(not recorded)"))
+    summary = grouped[TOTAL_COLUMNS + ["total_bottles"]].sum()
+    summary.insert(0, "sessions", grouped.size())
+    summary.insert(1, "first_date", grouped["production_date"].min())
+    summary.insert(2, "last_date", grouped["production_date"].max())
+    summary["wastage_pct"] = _wastage_pct(summary)
+    summary["sessions_over_limit"] = grouped["over_limit"].sum()
+    return summary.reset_index().sort_values("chargeable_al", ascending=False).round(4)
+
+
+def _by_bottle_size(sessions: pd.DataFrame) -> pd.DataFrame:
+    """Bottled volume per size, with each session's wastage allocated by bottled BL share"""
+    bottles = sessions[[f"bottles_{size}ml" for size in BOTTLE_SIZES_ML]].to_numpy(dtype=float)
+    sizes_l = np.array(BOTTLE_SIZES_ML, dtype=float) / 1000
+    bl = bottles * sizes_l
+    al = bl * sessions["strength"].fillna(0).to_numpy(dtype=float)[:, None] / 100
+    
+    total_bl = bl.sum(axis=1, keepdims=True)
+    share = np.divide(bl, total_bl, out=np.zeros_like(bl), where=total_bl > 0)
+    wastage = share * sessions["wastage_al"].to_numpy(dtype=float)[:, None]
+    chargeable = share * sessions["chargeable_al"].to_numpy(dtype=float)[:, None]
+    
+    result = pd.DataFrame({
+        "bottle_size_ml": BOTTLE_SIZES_ML,
+        "bottles": bottles.sum(axis=0).astype(int),
+        "bl": bl.sum(axis=0),
+        "al": al.sum(axis=0),
+        "allocated_wastage_al": wastage.sum(axis=0),
+        "allocated_chargeable_al": chargeable.sum(axis=0),
+    })
+    return result[result["bottles"] > 0].round(4).reset_index(drop=True)
+
+
+def _daily_trend(sessions: pd.DataFrame, window_days: int) -> pd.DataFrame:
+    daily = sessions.groupby(pd.to_datetime(sessions["production_date"]))[TOTAL_COLUMNS].sum()
+    daily["wastage_pct"] = _wastage_pct(daily)
+    
+    rolling = daily[["mfm2_al", "bottles_al", "chargeable_al"]].rolling(f"{window_days}D").sum()
+    daily["rolling_wastage_pct"] = _wastage_pct(rolling)
+    daily["rolling_chargeable_al"] = rolling["chargeable_al"]
+    
+    daily.index = daily.index.date
+    daily.index.name = "production_date"
+    return daily.reset_index().round(4)
+
+
+def get_wastage_analytics(start_date: date, end_date: date, brand_name: Optional[str] = None,
+                          window_days: int = 7) -> Dict:
+    """
+    Production wastage analytics for start_date..end_date (inclusive).
+    
+    Returns {'sessions', 'by_batch', 'by_brand', 'by_size', 'trend': DataFrames,
+    'totals': dict}. Allowable wastage uses each session's stored allowable_limit
+    (% of MFM2 AL), falling back to PRODUCTION_WASTAGE_LIMIT; the trend carries
+    a rolling window_days wastage % alongside the daily figure.
+    """
+    empty = {
+        "sessions": pd.DataFrame(), "by_batch": pd.DataFrame(), "by_brand": pd.DataFrame(),
+        "by_size": pd.DataFrame(), "trend": pd.DataFrame(),
+        "totals": {"sessions": 0, "wastage_pct": 0.0, "sessions_over_limit": 0, "critical_sessions": 0,
+                   **{col: 0.0 for col in TOTAL_COLUMNS}},
+    }
+    
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        sessions = pd.read_sql_query(SESSION_METRICS_SQL, conn, params={
+            "start": str(start_date), "end": str(end_date), "brand": brand_name or None,
+            "limit": PRODUCTION_WASTAGE_LIMIT
+        })
+        conn.close()
+    except Exception as e:
+        print(f"Error loading Reg-A wastage analytics: {e}")
+        return empty
+    
+    if sessions.empty:
+        return empty
+    
+    sessions["over_limit"] = sessions["wastage_pct"] > sessions["allowable_pct"]
+    sessions["wastage_status"] = np.select(
+        [sessions["wastage_pct"] > CRITICAL_WASTAGE_THRESHOLD, sessions["over_limit"]],
+        ["Critical", "Exceeds Limit"],
+        default="Within Limit"
+    )
+    
+    totals = {col: round(float(sessions[col].sum()), 3) for col in TOTAL_COLUMNS}
+    totals.update({
+        "sessions": int(len(sessions)),
+        "wastage_pct": round(float(_wastage_pct(sessions[["mfm2_al", "bottles_al"]].sum().to_frame().T).iloc[0]), 4),
+        "sessions_over_limit": int(sessions["over_limit"].sum()),
+        "critical_sessions": int((sessions["wastage_status"] == "Critical").sum()),
+    })
+    
+    return {
+        "sessions": sessions,
+        "by_batch": _group_totals(sessions, "batch_no"),
+        "by_brand": _group_totals(sessions, "brand_name"),
+        "by_size": _by_bottle_size(sessions),
+        "trend": _daily_trend(sessions, window_days),
+        "totals": totals,
+    }
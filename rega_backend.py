@@ -2,29 +2,30 @@ import os
 import sqlite3
 import pandas as pd
 from datetime import datetime
-from rega_schema import REGA_COLUMNS
+from rega_schema import REGA_COLUMNS, PRODUCTION_WASTAGE_LIMIT, CRITICAL_WASTAGE_THRESHOLD
 import streamlit as st
-import gspread
-from google.oauth2.service_account import Credentials
 import desktop_storage
+import gsheets_client
 from rega_sqlite_schema import CREATE_REGA_TABLE, CREATE_REGA_INDEXES
+from row_versions import ConcurrentUpdateError, ensure_row_version, save_row
+from backup_journal import BackupJournal
+from changelog import init_changelog
+from period_close import init_period_close
+from register_search import init_register_search
+import db_writer
+import work_queues
 
 CSV_PATH = "backup_data/rega_data.csv"
+BACKUP = BackupJournal(CSV_PATH, "rega_id", REGA_COLUMNS)
 DB_PATH = "excise_registers.db"
 JSON_KEY = "the-program-482110-e4-7ef9d425d794.json"
 SPREADSHEET_URL = "https://docs.google.com/spreadsheets/d/1Ecmrq9JUhCerhq4mebO1Jtpw8sD_tTo-79_x3Jabr68"
 WORKSHEET_NAME = "RegA"  # Production register worksheet
 
 def get_google_client():
-    """Returns a direct gspread client using service account"""
+    """Returns the shared gspread client (cached per process), or None if sync is not configured"""
     try:
-        if os.path.exists(JSON_KEY):
-            scopes = [
-                "https://www.googleapis.com/auth/spreadsheets",
-                "https://www.googleapis.com/auth/drive"
-            ]
-            creds = Credentials.from_service_account_file(JSON_KEY, scopes=scopes)
-            return gspread.authorize(creds)
+        return gsheets_client.get_manager().client()
     except Exception as e:
         st.error(f"GSpread Auth Error: {e}")
     return None
@@ -37,6 +38,11 @@ def init_sqlite_db():
         cursor.executescript(CREATE_REGA_TABLE)
         cursor.executescript(CREATE_REGA_INDEXES)
         conn.commit()
+        ensure_row_version(conn, "rega_production")
+        work_queues.init_work_queues(conn)
+        init_changelog(conn)
+        init_period_close(conn)
+        init_register_search(conn)
         conn.close()
     except Exception as e:
         st.error(f"SQLite initialization error: {e}")
@@ -52,34 +58,28 @@ def get_data_from_sqlite():
         st.warning(f"SQLite read error: {e}")
         return pd.DataFrame(columns=REGA_COLUMNS)
 
-def save_to_sqlite(data_dict):
-    """Save record to SQLite database"""
+def save_to_sqlite(data_dict, expected_version=None):
+    """
+    Save record to SQLite database as an upsert. A record without an ID is
+    inserted under the next free RA ID; with expected_version set, the
+    write only succeeds if nobody has saved the record since that version was read.
+    Raises ConcurrentUpdateError otherwise.
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        # Prepare column names and values
-        columns = list(data_dict.keys())
-        placeholders = ', '.join(['?' for _ in columns])
-        column_names = ', '.join(columns)
-        values = [data_dict[col] for col in columns]
-        
-        # Insert or replace record
-        query = f"INSERT OR REPLACE INTO rega_production ({column_names}) VALUES ({placeholders})"
-        cursor.execute(query, values)
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(save_row, "rega_production", "rega_id", data_dict, expected_version,
+                        id_prefix=f"RA-{datetime.now().strftime('%Y%m')}", db_path=DB_PATH)
         return True
+    except ConcurrentUpdateError:
+        raise
     except Exception as e:
         st.error(f"SQLite save error: {e}")
         return False
 
 def get_data_local():
-    """Load local CSV fallback"""
-    if os.path.exists(CSV_PATH):
+    """Load local CSV fallback (snapshot plus any journaled saves not yet compacted)"""
+    if os.path.exists(CSV_PATH) or os.path.exists(BACKUP.journal_dir):
         try:
-            return pd.read_csv(CSV_PATH)
+            return BACKUP.read()
         except Exception:
             return pd.DataFrame(columns=REGA_COLUMNS)
     return pd.DataFrame(columns=REGA_COLUMNS)
@@ -92,24 +92,20 @@ def get_data():
 def save_record(data_dict):
     """Save record to SQLite (primary), Desktop Excel (presentation), CSV (backup), and Google Sheets (sync)"""
     
-    # ID Generation and Timestamps
-    if "rega_id" not in data_dict or not data_dict["rega_id"]:
-        prefix = "RA-"
-        count = len(get_data()) + 1
-        data_dict["rega_id"] = f"{prefix}{datetime.now().strftime('%Y%m')}{count:04d}"
-    
+    # Timestamps (a new record gets its ID inside the SQLite write)
     data_dict["created_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["updated_at"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     data_dict["status"] = data_dict.get("status", "draft")
-    record_id = data_dict["rega_id"]
+    expected_version = data_dict.pop("row_version", None)
 
-    # 1. Save to SQLite (PRIMARY STORAGE)
+    # 1. Save to SQLite (PRIMARY STORAGE) - raises ConcurrentUpdateError on a stale version
     init_sqlite_db()
-    success_sqlite = save_to_sqlite(data_dict)
+    success_sqlite = save_to_sqlite(data_dict, expected_version)
     
     if not success_sqlite:
         st.error("❌ Failed to save to SQLite database!")
         return None
+    record_id = data_dict["rega_id"]
 
     # 2. Save to Desktop Excel (PRESENTATION LAYER)
     try:
@@ -119,12 +115,9 @@ def save_record(data_dict):
     except Exception as e:
         st.warning(f"⚠️ Desktop Excel save failed: {e}")
 
-    # 3. Update Local CSV (BACKUP)
+    # 3. Update Local CSV (BACKUP) - appended to the journal, compacted into the CSV in the background
     try:
-        df_local = get_data_local()
-        new_row = pd.DataFrame([data_dict])
-        df_local = pd.concat([df_local, new_row], ignore_index=True)
-        df_local.to_csv(CSV_PATH, index=False)
+        BACKUP.append_upsert(data_dict)
     except Exception as e:
         st.warning(f"⚠️ CSV backup failed: {e}")
     
@@ -142,7 +135,7 @@ def save_record(data_dict):
         # Auto-update Spirit Transaction daily summary
         try:
             import spirit_transaction_backend
-            spirit_transaction_backend.refresh_for_date(target_date)
+            spirit_transaction_backend.refresh_changed_dates()
             st.info("📈 Spirit Transaction auto-updated!")
         except Exception as e:
             st.warning(f"⚠️ Spirit Transaction update failed: {e}")
@@ -154,6 +147,13 @@ def save_record(data_dict):
             st.info("📑 Daily Handbook auto-generated!")
         except Exception as e:
             st.warning(f"⚠️ Handbook generation failed: {e}")
+        
+        # Keep the traceability graph current
+        try:
+            import lineage
+            lineage.refresh_lineage(target_date)
+        except Exception as e:
+            st.warning(f"⚠️ Lineage update failed: {e}")
             
     except Exception as e:
         st.warning(f"Automation Hook Warning: {e}")
@@ -177,16 +177,12 @@ def save_record(data_dict):
 
 def sync_to_gsheet(df):
     """Sync a dataframe to the Google Sheet using direct gspread"""
+    manager = gsheets_client.get_manager()
     client = get_google_client()
     if client:
         try:
-            sh = client.open_by_url(SPREADSHEET_URL)
-            
-            # Try to get RegA worksheet, create if doesn't exist
-            try:
-                worksheet = sh.worksheet(WORKSHEET_NAME)
-            except gspread.exceptions.WorksheetNotFound:
-                worksheet = sh.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=len(REGA_COLUMNS))
+            # Cached RegA worksheet handle, created if it doesn't exist
+            worksheet = manager.worksheet(SPREADSHEET_URL, WORKSHEET_NAME, cols=len(REGA_COLUMNS))
             
             # Clean data
             df_str = df.astype(str)
@@ -199,11 +195,12 @@ def sync_to_gsheet(df):
             cleaned_data = [df_str.columns.values.tolist()] + df_str.values.tolist()
             
             # Update sheet
-            worksheet.clear()
-            worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED')
+            manager.timed("clear", worksheet.clear)
+            manager.timed("update", lambda: worksheet.update('A1', cleaned_data, value_input_option='USER_ENTERED'))
             st.toast("✅ Synchronized with Google Sheets (Reg-A)")
             return True
         except Exception as e:
+            manager.invalidate(SPREADSHEET_URL)  # reopen the sheet on the next sync
             st.sidebar.error(f"Sync failed: {e}")
             return False
     else:
@@ -234,28 +231,24 @@ def filter_records(date_from=None, batch_no=None, shift=None):
 def get_available_batches():
     """Get batches from Reg-74 that are ready for production from SQLite"""
     try:
+        # Reduction/blending and transfer operations with stock left in the BRT
         conn = sqlite3.connect(DB_PATH) # excise_registers.db
-        reg74_df = pd.read_sql_query("SELECT * FROM reg74_operations", conn)
+        placeholders = ", ".join("?" for _ in work_queues.BATCH_OPERATION_TYPES)
+        available = pd.read_sql_query(f"""
+            SELECT * FROM reg74_operations
+            WHERE operation_type IN ({placeholders}) AND closing_bl > 0
+            ORDER BY operation_date DESC
+        """, conn, params=work_queues.BATCH_OPERATION_TYPES)
         conn.close()
-        
-        if reg74_df.empty:
-            return pd.DataFrame()
-        
-        # Filter for reduction/blending operations with available stock
-        available = reg74_df[
-            (reg74_df['operation_type'] == 'Reduction/Blending') |
-            (reg74_df['operation_type'] == 'Transfer SST to BRT')
-        ].copy()
-        
-        # Filter out batches with zero closing balance
-        if 'closing_bl' in available.columns:
-            available = available[available['closing_bl'] > 0]
-        
         return available
     except Exception as e:
         print(f"Error fetching available batches from SQLite: {e}")
         return pd.DataFrame()
 
+def get_available_batch_numbers():
+    """Batch numbers ready for production, from the open batches work queue"""
+    return work_queues.get_open_batch_numbers()
+
 def get_brt_current_stock(brt_vat):
     """Get current stock for a specific BRT from Reg-74 SQLite"""
     try:
@@ -304,35 +297,48 @@ def get_batch_details(batch_no):
         print(f"Error fetching batch details from SQLite: {e}")
         return None
 
-def calculate_production_wastage(mfm2_bl, mfm2_al, bottles_bl, bottles_al):
-    """Calculate production wastage based on MFM2 vs Bottles"""
+def calculate_production_wastage(mfm2_bl, mfm2_al, bottles_bl, bottles_al, allowable_limit=PRODUCTION_WASTAGE_LIMIT):
+    """Calculate production wastage based on MFM2 vs Bottles (allowable_limit is % of MFM2 AL)"""
     wastage_bl = mfm2_bl - bottles_bl
     wastage_al = mfm2_al - bottles_al
     wastage_percentage = (wastage_al / mfm2_al * 100) if mfm2_al > 0 else 0
-    
-    allowable_limit = 0.1  # 0.1% of MFM2 AL
+    allowable_al = mfm2_al * allowable_limit / 100
     
     return {
         "wastage_bl": wastage_bl,
         "wastage_al": wastage_al,
         "wastage_percentage": wastage_percentage,
+        "allowable_al": allowable_al,
+        "chargeable_al": max(0.0, wastage_al - allowable_al),
         "within_limit": wastage_percentage <= allowable_limit,
-        "critical": wastage_percentage > 1.0
+        "critical": wastage_percentage > CRITICAL_WASTAGE_THRESHOLD
     }
 
 def get_batch_production_history(batch_no):
     """Get all production sessions for a batch"""
-    df = get_data()
-    if df.empty:
+    try:
+        init_sqlite_db()
+        conn = sqlite3.connect(DB_PATH)
+        df = pd.read_sql_query(
+            "SELECT * FROM rega_production WHERE batch_no = ? ORDER BY production_date, session_number",
+            conn, params=(batch_no,)
+        )
+        conn.close()
+        return df
+    except Exception as e:
+        print(f"Error fetching batch history from SQLite: {e}")
         return pd.DataFrame()
-    
-    return df[df['batch_no'] == batch_no].sort_values('production_date')
 
 def get_next_session_number(batch_no):
     """Get the next session number for a batch"""
-    history = get_batch_production_history(batch_no)
-    if history.empty:
+    try:
+        init_sqlite_db()
+        conn = sqlite3.connect(DB_PATH)
+        row = conn.execute(
+            "SELECT MAX(session_number) FROM rega_production WHERE batch_no = ?", (batch_no,)
+        ).fetchone()
+        conn.close()
+        return int(row[0]) + 1 if row and row[0] is not None else 1
+    except Exception as e:
+        print(f"Error fetching next session number from SQLite: {e}")
         return 1
-    
-    max_session = history['session_number'].max()
-    return int(max_session) + 1 if pd.notna(max_session) else 1
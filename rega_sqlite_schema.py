@@ -116,7 +116,8 @@ CREATE TABLE IF NOT EXISTS rega_production (
     -- Status & Timestamps
     status TEXT NOT NULL DEFAULT 'draft',
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    row_version INTEGER NOT NULL DEFAULT 1
 );
 """
 
@@ -128,4 +129,5 @@ CREATE INDEX IF NOT EXISTS idx_rega_source_brt_vat ON rega_production(source_brt
 CREATE INDEX IF NOT EXISTS idx_rega_ref_reg74 ON rega_production(ref_reg74_id);
 CREATE INDEX IF NOT EXISTS idx_rega_brand_name ON rega_production(brand_name);
 CREATE INDEX IF NOT EXISTS idx_rega_status ON rega_production(status);
+CREATE INDEX IF NOT EXISTS idx_rega_date_brand ON rega_production(production_date, brand_name, brt_opening_strength);
 """
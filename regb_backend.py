@@ -20,12 +20,19 @@ from regb_schema import (
     CREATE_REGB_INDEXES,
     FEE_PER_BOTTLE
 )
+from regb_utils import calculate_complete_stock_movement, validate_stock_balance
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 import desktop_storage
+import ledger_engine
+import lineage
+from changelog import init_changelog
+from period_close import init_period_close
+from register_search import init_register_search
+import db_writer
 
 def _serialize_model(model) -> Dict:
     """Helper to convert Pydantic model to dict for Excel storage"""
@@ -55,6 +62,9 @@ def init_regb_database():
         cursor.executescript(CREATE_REGB_BOTTLE_STOCK_TABLE)
         cursor.executescript(CREATE_REGB_DAILY_SUMMARY_TABLE)
         cursor.executescript(CREATE_REGB_INDEXES)
+        init_changelog(conn)
+        init_period_close(conn)
+        init_register_search(conn)
         
         conn.commit()
         conn.close()
@@ -69,90 +79,98 @@ def init_regb_database():
 # PRODUCTION FEES ACCOUNT OPERATIONS
 # ============================================================================
 
+def _save_fees_row(conn: sqlite3.Connection, fees_data: ProductionFeesAccount):
+    """Insert or update the production fees row of fees_data.date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    now = datetime.now().isoformat()
+    
+    # Check if record exists
+    cursor.execute("SELECT regb_fees_id FROM regb_production_fees WHERE date = ?", (str(fees_data.date),))
+    existing = cursor.fetchone()
+    
+    if existing:
+        # Update existing record
+        cursor.execute("""
+            UPDATE regb_production_fees SET
+                opening_balance = ?,
+                deposit_amount = ?,
+                echallan_no = ?,
+                echallan_date = ?,
+                total_credited = ?,
+                iml_bottles_qty = ?,
+                total_bottles_produced = ?,
+                fee_per_bottle = ?,
+                total_fees_debited = ?,
+                closing_balance = ?,
+                remarks = ?,
+                excise_officer_name = ?,
+                excise_officer_signature = ?,
+                status = ?,
+                updated_at = ?
+            WHERE date = ?
+        """, (
+            float(fees_data.opening_balance),
+            float(fees_data.deposit_amount),
+            fees_data.echallan_no,
+            str(fees_data.echallan_date) if fees_data.echallan_date else None,
+            float(fees_data.total_credited),
+            fees_data.iml_bottles_qty,
+            fees_data.total_bottles_produced,
+            float(fees_data.fee_per_bottle),
+            float(fees_data.total_fees_debited),
+            float(fees_data.closing_balance),
+            fees_data.remarks,
+            fees_data.excise_officer_name,
+            fees_data.excise_officer_signature,
+            fees_data.status,
+            now,
+            str(fees_data.date)
+        ))
+    else:
+        # Insert new record
+        cursor.execute("""
+            INSERT INTO regb_production_fees (
+                date, opening_balance, deposit_amount, echallan_no, echallan_date,
+                total_credited, iml_bottles_qty, total_bottles_produced,
+                fee_per_bottle, total_fees_debited, closing_balance,
+                remarks, excise_officer_name, excise_officer_signature,
+                status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            str(fees_data.date),
+            float(fees_data.opening_balance),
+            float(fees_data.deposit_amount),
+            fees_data.echallan_no,
+            str(fees_data.echallan_date) if fees_data.echallan_date else None,
+            float(fees_data.total_credited),
+            fees_data.iml_bottles_qty,
+            fees_data.total_bottles_produced,
+            float(fees_data.fee_per_bottle),
+            float(fees_data.total_fees_debited),
+            float(fees_data.closing_balance),
+            fees_data.remarks,
+            fees_data.excise_officer_name,
+            fees_data.excise_officer_signature,
+            fees_data.status,
+            now,
+            now
+        ))
+
+
 def save_production_fees(fees_data: ProductionFeesAccount) -> bool:
     """Save or update production fees account"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
+        if ledger_engine.is_date_closed("regb_production_fees", fees_data.date):
+            logger.error(f"❌ Production fees period containing {fees_data.date} is closed")
+            return False
         
-        # Check if record exists
-        cursor.execute("SELECT regb_fees_id FROM regb_production_fees WHERE date = ?", (str(fees_data.date),))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE regb_production_fees SET
-                    opening_balance = ?,
-                    deposit_amount = ?,
-                    echallan_no = ?,
-                    echallan_date = ?,
-                    total_credited = ?,
-                    iml_bottles_qty = ?,
-                    total_bottles_produced = ?,
-                    fee_per_bottle = ?,
-                    total_fees_debited = ?,
-                    closing_balance = ?,
-                    remarks = ?,
-                    excise_officer_name = ?,
-                    excise_officer_signature = ?,
-                    status = ?,
-                    updated_at = ?
-                WHERE date = ?
-            """, (
-                float(fees_data.opening_balance),
-                float(fees_data.deposit_amount),
-                fees_data.echallan_no,
-                str(fees_data.echallan_date) if fees_data.echallan_date else None,
-                float(fees_data.total_credited),
-                fees_data.iml_bottles_qty,
-                fees_data.total_bottles_produced,
-                float(fees_data.fee_per_bottle),
-                float(fees_data.total_fees_debited),
-                float(fees_data.closing_balance),
-                fees_data.remarks,
-                fees_data.excise_officer_name,
-                fees_data.excise_officer_signature,
-                fees_data.status,
-                now,
-                str(fees_data.date)
-            ))
-        else:
-            # Insert new record
-            cursor.execute("""
-                INSERT INTO regb_production_fees (
-                    date, opening_balance, deposit_amount, echallan_no, echallan_date,
-                    total_credited, iml_bottles_qty, total_bottles_produced,
-                    fee_per_bottle, total_fees_debited, closing_balance,
-                    remarks, excise_officer_name, excise_officer_signature,
-                    status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(fees_data.date),
-                float(fees_data.opening_balance),
-                float(fees_data.deposit_amount),
-                fees_data.echallan_no,
-                str(fees_data.echallan_date) if fees_data.echallan_date else None,
-                float(fees_data.total_credited),
-                fees_data.iml_bottles_qty,
-                fees_data.total_bottles_produced,
-                float(fees_data.fee_per_bottle),
-                float(fees_data.total_fees_debited),
-                float(fees_data.closing_balance),
-                fees_data.remarks,
-                fees_data.excise_officer_name,
-                fees_data.excise_officer_signature,
-                fees_data.status,
-                now,
-                now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(_save_fees_row, fees_data, db_path=DB_PATH)
         logger.info(f"✅ Production fees saved for {fees_data.date}")
         
+        # Carry the new balance forward through every later day
+        ledger_engine.recompute_balances("regb_production_fees", fees_data.date)
+        
         # Desktop storage sync
         try:
             desktop_storage.save_regb_fees_to_excel(_serialize_model(fees_data))
@@ -211,11 +229,9 @@ def get_production_fees(target_date: date) -> Optional[ProductionFeesAccount]:
 
 
 def get_previous_day_closing_balance(target_date: date) -> Decimal:
-    """Get previous day's closing balance for production fees"""
+    """Get closing balance of the latest production fees entry before target_date"""
     try:
-        previous_date = target_date - timedelta(days=1)
-        fees = get_production_fees(previous_date)
-        return fees.closing_balance if fees else Decimal("0.00")
+        return ledger_engine.get_opening_balance("regb_production_fees", target_date)
     except Exception as e:
         logger.error(f"❌ Error getting previous closing balance: {e}")
         return Decimal("0.00")
@@ -225,114 +241,79 @@ def get_previous_day_closing_balance(target_date: date) -> Decimal:
 # BOTTLE STOCK INVENTORY OPERATIONS
 # ============================================================================
 
+# Column order shared by the single-variant and whole-day upserts
+BOTTLE_STOCK_UPSERT_SQL = """
+    INSERT INTO regb_bottle_stock (
+        date, product_name, strength, bottle_size_ml,
+        opening_balance_bottles, quantity_received_bottles, total_accounted_bottles,
+        wastage_breakage_bottles, issue_on_duty_bottles, closing_balance_bottles,
+        opening_balance_bl, received_bl, total_bl, wastage_bl, issue_bl, closing_bl,
+        opening_balance_al, received_al, total_al, wastage_al, issue_al, closing_al,
+        status, created_at, updated_at
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT(date, product_name, strength, bottle_size_ml) DO UPDATE SET
+        opening_balance_bottles = excluded.opening_balance_bottles,
+        quantity_received_bottles = excluded.quantity_received_bottles,
+        total_accounted_bottles = excluded.total_accounted_bottles,
+        wastage_breakage_bottles = excluded.wastage_breakage_bottles,
+        issue_on_duty_bottles = excluded.issue_on_duty_bottles,
+        closing_balance_bottles = excluded.closing_balance_bottles,
+        opening_balance_bl = excluded.opening_balance_bl,
+        received_bl = excluded.received_bl,
+        total_bl = excluded.total_bl,
+        wastage_bl = excluded.wastage_bl,
+        issue_bl = excluded.issue_bl,
+        closing_bl = excluded.closing_bl,
+        opening_balance_al = excluded.opening_balance_al,
+        received_al = excluded.received_al,
+        total_al = excluded.total_al,
+        wastage_al = excluded.wastage_al,
+        issue_al = excluded.issue_al,
+        closing_al = excluded.closing_al,
+        status = excluded.status,
+        updated_at = excluded.updated_at
+"""
+
+
+def _bottle_stock_params(stock_data: BottleStockInventory, now: str) -> Tuple:
+    """Parameter tuple for BOTTLE_STOCK_UPSERT_SQL"""
+    return (
+        str(stock_data.date),
+        stock_data.product_name,
+        float(stock_data.strength),
+        stock_data.bottle_size_ml,
+        stock_data.opening_balance_bottles,
+        stock_data.quantity_received_bottles,
+        stock_data.total_accounted_bottles,
+        stock_data.wastage_breakage_bottles,
+        stock_data.issue_on_duty_bottles,
+        stock_data.closing_balance_bottles,
+        float(stock_data.opening_balance_bl),
+        float(stock_data.received_bl),
+        float(stock_data.total_bl),
+        float(stock_data.wastage_bl),
+        float(stock_data.issue_bl),
+        float(stock_data.closing_bl),
+        float(stock_data.opening_balance_al),
+        float(stock_data.received_al),
+        float(stock_data.total_al),
+        float(stock_data.wastage_al),
+        float(stock_data.issue_al),
+        float(stock_data.closing_al),
+        stock_data.status,
+        now,
+        now
+    )
+
+
 def save_bottle_stock(stock_data: BottleStockInventory) -> bool:
     """Save or update bottle stock inventory"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
         now = datetime.now().isoformat()
-        
-        # Check if record exists
-        cursor.execute("""
-            SELECT regb_stock_id FROM regb_bottle_stock 
-            WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
-        """, (str(stock_data.date), stock_data.product_name, float(stock_data.strength), stock_data.bottle_size_ml))
-        existing = cursor.fetchone()
-        
-        if existing:
-            # Update existing record
-            cursor.execute("""
-                UPDATE regb_bottle_stock SET
-                    opening_balance_bottles = ?,
-                    quantity_received_bottles = ?,
-                    total_accounted_bottles = ?,
-                    wastage_breakage_bottles = ?,
-                    issue_on_duty_bottles = ?,
-                    closing_balance_bottles = ?,
-                    opening_balance_bl = ?,
-                    received_bl = ?,
-                    total_bl = ?,
-                    wastage_bl = ?,
-                    issue_bl = ?,
-                    closing_bl = ?,
-                    opening_balance_al = ?,
-                    received_al = ?,
-                    total_al = ?,
-                    wastage_al = ?,
-                    issue_al = ?,
-                    closing_al = ?,
-                    status = ?,
-                    updated_at = ?
-                WHERE date = ? AND product_name = ? AND strength = ? AND bottle_size_ml = ?
-            """, (
-                stock_data.opening_balance_bottles,
-                stock_data.quantity_received_bottles,
-                stock_data.total_accounted_bottles,
-                stock_data.wastage_breakage_bottles,
-                stock_data.issue_on_duty_bottles,
-                stock_data.closing_balance_bottles,
-                float(stock_data.opening_balance_bl),
-                float(stock_data.received_bl),
-                float(stock_data.total_bl),
-                float(stock_data.wastage_bl),
-                float(stock_data.issue_bl),
-                float(stock_data.closing_bl),
-                float(stock_data.opening_balance_al),
-                float(stock_data.received_al),
-                float(stock_data.total_al),
-                float(stock_data.wastage_al),
-                float(stock_data.issue_al),
-                float(stock_data.closing_al),
-                stock_data.status,
-                now,
-                str(stock_data.date),
-                stock_data.product_name,
-                float(stock_data.strength),
-                stock_data.bottle_size_ml
-            ))
-        else:
-            # Insert new record
-            cursor.execute("""
-                INSERT INTO regb_bottle_stock (
-                    date, product_name, strength, bottle_size_ml,
-                    opening_balance_bottles, quantity_received_bottles, total_accounted_bottles,
-                    wastage_breakage_bottles, issue_on_duty_bottles, closing_balance_bottles,
-                    opening_balance_bl, received_bl, total_bl, wastage_bl, issue_bl, closing_bl,
-                    opening_balance_al, received_al, total_al, wastage_al, issue_al, closing_al,
-                    status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(stock_data.date),
-                stock_data.product_name,
-                float(stock_data.strength),
-                stock_data.bottle_size_ml,
-                stock_data.opening_balance_bottles,
-                stock_data.quantity_received_bottles,
-                stock_data.total_accounted_bottles,
-                stock_data.wastage_breakage_bottles,
-                stock_data.issue_on_duty_bottles,
-                stock_data.closing_balance_bottles,
-                float(stock_data.opening_balance_bl),
-                float(stock_data.received_bl),
-                float(stock_data.total_bl),
-                float(stock_data.wastage_bl),
-                float(stock_data.issue_bl),
-                float(stock_data.closing_bl),
-                float(stock_data.opening_balance_al),
-                float(stock_data.received_al),
-                float(stock_data.total_al),
-                float(stock_data.wastage_al),
-                float(stock_data.issue_al),
-                float(stock_data.closing_al),
-                stock_data.status,
-                now,
-                now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(lambda conn: conn.execute(BOTTLE_STOCK_UPSERT_SQL, _bottle_stock_params(stock_data, now)),
+                        db_path=DB_PATH)
         logger.info(f"✅ Bottle stock saved for {stock_data.date} - {stock_data.product_name} ({stock_data.bottle_size_ml}ml)")
+        lineage.refresh_lineage(stock_data.date)
         
         # Desktop storage sync
         try:
@@ -364,6 +345,152 @@ def save_bottle_stock(stock_data: BottleStockInventory) -> bool:
         return False
 
 
+def get_previous_closing_stock_map(target_date: date) -> Dict[Tuple[str, Decimal, int], Dict]:
+    """
+    Latest closing stock before target_date for every product variant.
+    
+    One windowed query picks each (product, strength, size) variant's most recent
+    row dated before target_date. Keys are (product_name, strength, bottle_size_ml).
+    """
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT date, product_name, strength, bottle_size_ml,
+                   closing_balance_bottles, closing_bl, closing_al
+            FROM (
+                SELECT *,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY product_name, strength, bottle_size_ml
+                           ORDER BY date DESC
+                       ) AS rn
+                FROM regb_bottle_stock
+                WHERE date < ?
+            )
+            WHERE rn = 1
+        """, (str(target_date),))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        closings = {}
+        for row in rows:
+            key = (row['product_name'], Decimal(str(row['strength'])), row['bottle_size_ml'])
+            closings[key] = {
+                'date': row['date'],
+                'closing_balance_bottles': row['closing_balance_bottles'],
+                'closing_bl': Decimal(str(row['closing_bl'])),
+                'closing_al': Decimal(str(row['closing_al']))
+            }
+        return closings
+    except Exception as e:
+        logger.error(f"❌ Error getting previous closing stock: {e}")
+        return {}
+
+
+def save_bottle_stock_day(target_date: date, movements: List[Dict], status: str = "submitted") -> Tuple[bool, int]:
+    """
+    Save every product variant's bottle stock for a day in one transaction.
+    
+    Each movement dict needs product_name, strength and bottle_size_ml, plus any of
+    received_bottles, wastage_bottles and issued_bottles (default 0). Opening stock
+    is carried forward from the variant's latest earlier closing unless the movement
+    supplies opening_bottles. Variants with stock left at their previous closing but
+    no movement today are carried forward unchanged so the day stays complete;
+    variants that closed at zero are not, so sold-out lines stop accruing rows.
+    
+    Returns (success, number of variants saved).
+    """
+    try:
+        previous = get_previous_closing_stock_map(target_date)
+        
+        by_variant = {}
+        for movement in movements:
+            key = (movement['product_name'], Decimal(str(movement['strength'])), int(movement['bottle_size_ml']))
+            by_variant[key] = movement
+        for key, prev in previous.items():
+            if prev['closing_balance_bottles']:
+                by_variant.setdefault(key, {})
+        
+        stocks = []
+        for (product_name, strength, bottle_size_ml), movement in sorted(by_variant.items()):
+            prev = previous.get((product_name, strength, bottle_size_ml))
+            opening = movement.get('opening_bottles')
+            if opening is None:
+                opening = prev['closing_balance_bottles'] if prev else 0
+            
+            calc = calculate_complete_stock_movement(
+                int(opening),
+                int(movement.get('received_bottles', 0)),
+                int(movement.get('wastage_bottles', 0)),
+                int(movement.get('issued_bottles', 0)),
+                bottle_size_ml,
+                strength
+            )
+            
+            if not validate_stock_balance(calc['total_accounted_bottles'], calc['wastage_bottles'],
+                                          calc['issued_bottles'], calc['closing_bottles']):
+                logger.error(f"❌ Stock balance invalid for {product_name} {strength}% {bottle_size_ml}ml on {target_date}")
+                return False, 0
+            
+            stocks.append(BottleStockInventory(
+                date=target_date,
+                product_name=product_name,
+                strength=strength,
+                bottle_size_ml=bottle_size_ml,
+                opening_balance_bottles=calc['opening_bottles'],
+                quantity_received_bottles=calc['received_bottles'],
+                total_accounted_bottles=calc['total_accounted_bottles'],
+                wastage_breakage_bottles=calc['wastage_bottles'],
+                issue_on_duty_bottles=calc['issued_bottles'],
+                closing_balance_bottles=calc['closing_bottles'],
+                opening_balance_bl=calc['opening_bl'],
+                received_bl=calc['received_bl'],
+                total_bl=calc['total_bl'],
+                wastage_bl=calc['wastage_bl'],
+                issue_bl=calc['issued_bl'],
+                closing_bl=calc['closing_bl'],
+                opening_balance_al=calc['opening_al'],
+                received_al=calc['received_al'],
+                total_al=calc['total_al'],
+                wastage_al=calc['wastage_al'],
+                issue_al=calc['issued_al'],
+                closing_al=calc['closing_al'],
+                status=status
+            ))
+        
+        if not stocks:
+            return True, 0
+        
+        now = datetime.now().isoformat()
+        params = [_bottle_stock_params(stock, now) for stock in stocks]
+        db_writer.write(lambda conn: conn.executemany(BOTTLE_STOCK_UPSERT_SQL, params), db_path=DB_PATH)
+        logger.info(f"✅ Bottle stock saved for {target_date} - {len(stocks)} variants")
+        lineage.refresh_lineage(target_date)
+        
+        # Desktop storage sync
+        try:
+            desktop_storage.save_regb_bottle_stock_day_to_excel(
+                str(target_date), [_serialize_model(stock) for stock in stocks]
+            )
+        except Exception as e:
+            logger.warning(f"Desktop storage sync failed: {e}")
+        
+        # Handbook automation
+        try:
+            from handbook_generator_v2 import EnhancedHandbookGenerator
+            EnhancedHandbookGenerator(target_date).generate_handbook()
+        except Exception as e:
+            logger.warning(f"Handbook generation failed: {e}")
+        
+        return True, len(stocks)
+    except Exception as e:
+        logger.error(f"❌ Error saving bottle stock for day: {e}")
+        return False, 0
+
+
 def get_bottle_stock_for_date(target_date: date) -> List[BottleStockInventory]:
     """Get all bottle stock entries for a specific date"""
     try:
@@ -465,59 +592,70 @@ def get_previous_day_stock(target_date: date, product_name: str, strength: Decim
 # REG-A INTEGRATION (Auto-fill from production data)
 # ============================================================================
 
-def get_rega_production_data(target_date: date) -> Dict:
-    """Fetch production data from Reg-A for auto-filling Reg-B (Reads from CSV)"""
-    try:
-        csv_path = "rega_data.csv"
-        if not os.path.exists(csv_path):
-            logger.warning(f"⚠️ Reg-A CSV not found at {csv_path}")
-            return {'production_items': [], 'total_bottles_produced': 0, 'production_fees': Decimal("0.00")}
-
-        df = pd.read_csv(csv_path)
-        if df.empty:
-            return {'production_items': [], 'total_bottles_produced': 0, 'production_fees': Decimal("0.00")}
+# Reg-A bottle size columns unpivoted into (bottle_size_ml, bottles) rows
+REGA_BOTTLE_SIZES_ML = [180, 300, 375, 500, 600, 750, 1000]
 
-        # Convert date column and filter
-        df['production_date'] = pd.to_datetime(df['production_date']).dt.date
-        daily_df = df[df['production_date'] == target_date]
-
-        if daily_df.empty:
-            return {'production_items': [], 'total_bottles_produced': 0, 'production_fees': Decimal("0.00")}
 
+def get_rega_production_data(target_date: date, end_date: Optional[date] = None) -> Dict:
+    """
+    Fetch production data from Reg-A for auto-filling Reg-B.
+    
+    Aggregates rega_production per brand, strength and bottle size for a single
+    day, or for the inclusive range target_date..end_date when end_date is given.
+    """
+    empty = {'production_items': [], 'total_bottles_produced': 0, 'production_fees': Decimal("0.00")}
+    
+    try:
+        start = target_date.isoformat()
+        end = (end_date or target_date).isoformat()
+        
+        unpivot = "\n            UNION ALL\n".join(
+            f"            SELECT brand_name, brt_opening_strength AS strength, "
+            f"{size} AS bottle_size_ml, bottles_{size}ml AS bottles FROM day_rows"
+            for size in REGA_BOTTLE_SIZES_ML
+        )
+        
+        conn = sqlite3.connect(DB_PATH)
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        cursor.execute(f"""
+            WITH day_rows AS (
+                SELECT * FROM rega_production
+                WHERE production_date BETWEEN ? AND ?
+            )
+            SELECT brand_name, strength, bottle_size_ml, SUM(bottles) AS bottles
+            FROM (
+{unpivot}
+            )
+            GROUP BY brand_name, strength, bottle_size_ml
+            HAVING SUM(bottles) > 0
+            ORDER BY brand_name, strength, bottle_size_ml DESC
+        """, (start, end))
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
         production_summary = []
         total_bottles = 0
-
-        # Group by common attributes to aggregate production for the day
-        # In Reg-A, we might have multiple sessions per day for the same product
-        for name, group in daily_df.groupby(['brand_name', 'brt_opening_strength']):
-            brand, strength = name
-            
-            # Map Reg-A sizes to Reg-B sizes
-            sizes = {
-                '750ml': group['bottles_750ml'].sum(),
-                '1000ml': group['bottles_1000ml'].sum(),
-                '375ml': group['bottles_375ml'].sum(),
-                '180ml': group['bottles_180ml'].sum()
-            }
+        
+        for row in rows:
+            count = int(row['bottles'])
+            size_ml = row['bottle_size_ml']
+            strength = Decimal(str(row['strength'] or 0))
+            bl = Decimal(str(count)) * Decimal(str(size_ml)) / Decimal("1000")
+            al = bl * strength / Decimal("100")
             
-            for size_label, count in sizes.items():
-                if count > 0:
-                    size_ml = int(size_label.replace('ml', ''))
-                    # Calculate BL and AL for this variant
-                    bl = Decimal(str(count)) * Decimal(str(size_ml)) / Decimal("1000")
-                    al = bl * Decimal(str(strength)) / Decimal("100")
-                    
-                    item = {
-                        'product_name': brand or "Unknown Brand",
-                        'strength': Decimal(str(strength)),
-                        'bottle_size_ml': size_ml,
-                        'bottles': int(count),
-                        'bl': bl,
-                        'al': al
-                    }
-                    production_summary.append(item)
-                    total_bottles += int(count)
-
+            production_summary.append({
+                'product_name': row['brand_name'] or "Unknown Brand",
+                'strength': strength,
+                'bottle_size_ml': size_ml,
+                'bottles': count,
+                'bl': bl,
+                'al': al
+            })
+            total_bottles += count
+        
         return {
             'production_items': production_summary,
             'total_bottles_produced': total_bottles,
@@ -525,12 +663,8 @@ def get_rega_production_data(target_date: date) -> Dict:
         }
         
     except Exception as e:
-        logger.error(f"❌ Error fetching Reg-A production data from CSV: {e}")
-        return {
-            'production_items': [],
-            'total_bottles_produced': 0,
-            'production_fees': Decimal("0.00")
-        }
+        logger.error(f"❌ Error fetching Reg-A production data: {e}")
+        return empty
 
 
 # ============================================================================
@@ -590,70 +724,71 @@ def generate_daily_summary(target_date: date) -> Optional[RegBDailySummary]:
         return None
 
 
+def _save_summary_row(conn: sqlite3.Connection, summary: RegBDailySummary):
+    """Insert or update the summary row of summary.date; runs on the database writer"""
+    cursor = conn.cursor()
+    
+    now = datetime.now().isoformat()
+    
+    # Check if exists
+    cursor.execute("SELECT regb_summary_id FROM regb_daily_summary WHERE date = ?", (str(summary.date),))
+    existing = cursor.fetchone()
+    
+    if existing:
+        cursor.execute("""
+            UPDATE regb_daily_summary SET
+                total_opening_bottles = ?, total_received_bottles = ?, total_accounted_bottles = ?,
+                total_wastage_bottles = ?, total_issued_bottles = ?, total_closing_bottles = ?,
+                total_opening_bl = ?, total_received_bl = ?, total_accounted_bl = ?,
+                total_wastage_bl = ?, total_issued_bl = ?, total_closing_bl = ?,
+                total_opening_al = ?, total_received_al = ?, total_accounted_al = ?,
+                total_wastage_al = ?, total_issued_al = ?, total_closing_al = ?,
+                production_fees_opening = ?, production_fees_deposit = ?, production_fees_credited = ?,
+                production_fees_debited = ?, production_fees_closing = ?,
+                status = ?, updated_at = ?
+            WHERE date = ?
+        """, (
+            summary.total_opening_bottles, summary.total_received_bottles, summary.total_accounted_bottles,
+            summary.total_wastage_bottles, summary.total_issued_bottles, summary.total_closing_bottles,
+            float(summary.total_opening_bl), float(summary.total_received_bl), float(summary.total_accounted_bl),
+            float(summary.total_wastage_bl), float(summary.total_issued_bl), float(summary.total_closing_bl),
+            float(summary.total_opening_al), float(summary.total_received_al), float(summary.total_accounted_al),
+            float(summary.total_wastage_al), float(summary.total_issued_al), float(summary.total_closing_al),
+            float(summary.production_fees_opening), float(summary.production_fees_deposit), float(summary.production_fees_credited),
+            float(summary.production_fees_debited), float(summary.production_fees_closing),
+            summary.status, now, str(summary.date)
+        ))
+    else:
+        cursor.execute("""
+            INSERT INTO regb_daily_summary (
+                date, total_opening_bottles, total_received_bottles, total_accounted_bottles,
+                total_wastage_bottles, total_issued_bottles, total_closing_bottles,
+                total_opening_bl, total_received_bl, total_accounted_bl,
+                total_wastage_bl, total_issued_bl, total_closing_bl,
+                total_opening_al, total_received_al, total_accounted_al,
+                total_wastage_al, total_issued_al, total_closing_al,
+                production_fees_opening, production_fees_deposit, production_fees_credited,
+                production_fees_debited, production_fees_closing,
+                status, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, (
+            str(summary.date),
+            summary.total_opening_bottles, summary.total_received_bottles, summary.total_accounted_bottles,
+            summary.total_wastage_bottles, summary.total_issued_bottles, summary.total_closing_bottles,
+            float(summary.total_opening_bl), float(summary.total_received_bl), float(summary.total_accounted_bl),
+            float(summary.total_wastage_bl), float(summary.total_issued_bl), float(summary.total_closing_bl),
+            float(summary.total_opening_al), float(summary.total_received_al), float(summary.total_accounted_al),
+            float(summary.total_wastage_al), float(summary.total_issued_al), float(summary.total_closing_al),
+            float(summary.production_fees_opening), float(summary.production_fees_deposit), float(summary.production_fees_credited),
+            float(summary.production_fees_debited), float(summary.production_fees_closing),
+            summary.status, now, now
+        ))
+
+
 def save_daily_summary(summary: RegBDailySummary) -> bool:
     """Save daily summary to database"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-        
-        now = datetime.now().isoformat()
-        
-        # Check if exists
-        cursor.execute("SELECT regb_summary_id FROM regb_daily_summary WHERE date = ?", (str(summary.date),))
-        existing = cursor.fetchone()
-        
-        if existing:
-            cursor.execute("""
-                UPDATE regb_daily_summary SET
-                    total_opening_bottles = ?, total_received_bottles = ?, total_accounted_bottles = ?,
-                    total_wastage_bottles = ?, total_issued_bottles = ?, total_closing_bottles = ?,
-                    total_opening_bl = ?, total_received_bl = ?, total_accounted_bl = ?,
-                    total_wastage_bl = ?, total_issued_bl = ?, total_closing_bl = ?,
-                    total_opening_al = ?, total_received_al = ?, total_accounted_al = ?,
-                    total_wastage_al = ?, total_issued_al = ?, total_closing_al = ?,
-                    production_fees_opening = ?, production_fees_deposit = ?, production_fees_credited = ?,
-                    production_fees_debited = ?, production_fees_closing = ?,
-                    status = ?, updated_at = ?
-                WHERE date = ?
-            """, (
-                summary.total_opening_bottles, summary.total_received_bottles, summary.total_accounted_bottles,
-                summary.total_wastage_bottles, summary.total_issued_bottles, summary.total_closing_bottles,
-                float(summary.total_opening_bl), float(summary.total_received_bl), float(summary.total_accounted_bl),
-                float(summary.total_wastage_bl), float(summary.total_issued_bl), float(summary.total_closing_bl),
-                float(summary.total_opening_al), float(summary.total_received_al), float(summary.total_accounted_al),
-                float(summary.total_wastage_al), float(summary.total_issued_al), float(summary.total_closing_al),
-                float(summary.production_fees_opening), float(summary.production_fees_deposit), float(summary.production_fees_credited),
-                float(summary.production_fees_debited), float(summary.production_fees_closing),
-                summary.status, now, str(summary.date)
-            ))
-        else:
-            cursor.execute("""
-                INSERT INTO regb_daily_summary (
-                    date, total_opening_bottles, total_received_bottles, total_accounted_bottles,
-                    total_wastage_bottles, total_issued_bottles, total_closing_bottles,
-                    total_opening_bl, total_received_bl, total_accounted_bl,
-                    total_wastage_bl, total_issued_bl, total_closing_bl,
-                    total_opening_al, total_received_al, total_accounted_al,
-                    total_wastage_al, total_issued_al, total_closing_al,
-                    production_fees_opening, production_fees_deposit, production_fees_credited,
-                    production_fees_debited, production_fees_closing,
-                    status, created_at, updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                str(summary.date),
-                summary.total_opening_bottles, summary.total_received_bottles, summary.total_accounted_bottles,
-                summary.total_wastage_bottles, summary.total_issued_bottles, summary.total_closing_bottles,
-                float(summary.total_opening_bl), float(summary.total_received_bl), float(summary.total_accounted_bl),
-                float(summary.total_wastage_bl), float(summary.total_issued_bl), float(summary.total_closing_bl),
-                float(summary.total_opening_al), float(summary.total_received_al), float(summary.total_accounted_al),
-                float(summary.total_wastage_al), float(summary.total_issued_al), float(summary.total_closing_al),
-                float(summary.production_fees_opening), float(summary.production_fees_deposit), float(summary.production_fees_credited),
-                float(summary.production_fees_debited), float(summary.production_fees_closing),
-                summary.status, now, now
-            ))
-        
-        conn.commit()
-        conn.close()
+        db_writer.write(_save_summary_row, summary, db_path=DB_PATH)
         logger.info(f"✅ Daily summary saved for {summary.date}")
         return True
     except Exception as e:
@@ -698,6 +833,10 @@ def get_all_product_variants() -> List[Dict]:
 def delete_regb_entry(target_date: date) -> bool:
     """Delete all Reg-B entries for a specific date"""
     try:
+        if ledger_engine.is_date_closed("regb_production_fees", target_date):
+            logger.error(f"❌ Production fees period containing {target_date} is closed")
+            return False
+        
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
         
@@ -708,6 +847,9 @@ def delete_regb_entry(target_date: date) -> bool:
         conn.commit()
         conn.close()
         logger.info(f"✅ Deleted Reg-B entries for {target_date}")
+        
+        ledger_engine.recompute_balances("regb_production_fees", target_date)
+        lineage.refresh_lineage(target_date)
         return True
     except Exception as e:
         logger.error(f"❌ Error deleting Reg-B entry: {e}")
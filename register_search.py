@@ -0,0 +1,273 @@
+"""
+Register Search - Full-text search across all registers
+One FTS5 index over the searchable text of Reg-76, Reg-74, Reg-A, Reg-B,
+the excise duty ledger and the maintenance log (permit and pass numbers,
+tankers, distilleries, batches, vats, brands, officers, remarks), kept
+current by triggers on every insert, update and delete. search() returns
+ranked hits with the matching words highlighted.
+
+Usage: python register_search.py "WB 23"     # search from the command line
+       python register_search.py --rebuild   # re-index every register
+"""
+
+import argparse
+import html
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+DB_PATH = "excise_registers.db"
+
+_initialized = set()
+_init_lock = threading.Lock()
+
+# table -> (label, primary key, date column, searchable columns)
+# The index id (position + 1) is kept in the top bits of each entry's rowid,
+# so a table's entries can be found and replaced by rowid; only append here.
+SEARCH_TABLES = {
+    "reg76_receipts": ("Reg-76", "reg76_id", "date_receipt", [
+        "reg76_id", "permit_no", "distillery", "spirit_nature", "vehicle_no", "tanker_make_model",
+        "invoice_no", "export_order_no", "import_order_no", "export_pass_no", "import_pass_no",
+        "storage_vat_no", "excise_remarks",
+    ]),
+    "reg74_operations": ("Reg-74", "reg74_id", "operation_date", [
+        "reg74_id", "operation_type", "batch_no", "ref_reg76_id", "source_vat", "destination_vat",
+        "storage_wastage_note", "wastage_remarks", "permit_no", "pass_no", "evc_no",
+        "operation_remarks", "officer_name",
+    ]),
+    "rega_production": ("Reg-A", "rega_id", "production_date", [
+        "rega_id", "batch_no", "ref_reg74_id", "source_brt_vat", "wastage_note", "warehouse_location",
+        "godown_number", "dispatch_challan_no", "dispatch_vehicle_no", "dispatch_destination",
+        "brand_name", "product_type", "label_registration_no", "production_officer_name",
+        "excise_officer_name", "operation_remarks",
+    ]),
+    "regb_bottle_stock": ("Reg-B", "regb_stock_id", "date", [
+        "product_name", "bottle_size_ml",
+    ]),
+    "excise_duty_ledger": ("Excise Duty", "duty_id", "date", [
+        "echallan_no", "name_of_issue", "warehouse_no", "transport_permit_no", "remarks",
+        "excise_officer_name",
+    ]),
+    "maintenance_activities": ("Maintenance", "id", "date", [
+        "instruments", "serial_numbers", "activity_description", "detailed_steps", "technician",
+        "issues_found", "resolution", "billing_category", "notes",
+    ]),
+}
+
+ROWID_SHIFT = 40
+
+CREATE_SEARCH_TABLE = """
+CREATE VIRTUAL TABLE IF NOT EXISTS register_search USING fts5(
+    register UNINDEXED,
+    row_key UNINDEXED,
+    row_date UNINDEXED,
+    body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+
+# snippet() wraps hits in these; they are swapped for <mark> after HTML-escaping the text
+_HIT_START, _HIT_END = "\x02", "\x03"
+
+
+def _base(table: str) -> int:
+    return (list(SEARCH_TABLES).index(table) + 1) << ROWID_SHIFT
+
+
+def _body_sql(columns: List[str], ref: str = "") -> str:
+    return " || ' ' || ".join(f"COALESCE({ref}{column}, '')" for column in columns)
+
+
+def _entry_sql(table: str, ref: str) -> str:
+    """INSERT of the search entry for one row (NEW inside a trigger), or SELECT of all rows when ref is empty"""
+    _, pk, date_col, columns = SEARCH_TABLES[table]
+    values = f"{_base(table)} + {ref}rowid, '{table}', CAST({ref}{pk} AS TEXT), {ref}{date_col}, {_body_sql(columns, ref)}"
+    insert = "INSERT INTO register_search (rowid, register, row_key, row_date, body)"
+    if ref:
+        return f"{insert} VALUES ({values});"
+    return f"{insert} SELECT {values} FROM {table};"
+
+
+def _triggers_sql(table: str) -> str:
+    _, pk, date_col, columns = SEARCH_TABLES[table]
+    watched = ", ".join(dict.fromkeys([pk, date_col] + columns))
+    base = _base(table)
+    return f"""
+CREATE TRIGGER IF NOT EXISTS trg_search_{table}_ins AFTER INSERT ON {table}
+BEGIN
+    {_entry_sql(table, "NEW.")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_search_{table}_upd AFTER UPDATE OF {watched} ON {table}
+BEGIN
+    DELETE FROM register_search WHERE rowid = {base} + OLD.rowid;
+    {_entry_sql(table, "NEW.")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_search_{table}_del AFTER DELETE ON {table}
+BEGIN
+    DELETE FROM register_search WHERE rowid = {base} + OLD.rowid;
+END;
+"""
+
+
+def _reindex_table(conn: sqlite3.Connection, table: str):
+    base = _base(table)
+    conn.execute("DELETE FROM register_search WHERE rowid BETWEEN ? AND ?", (base, base + (1 << ROWID_SHIFT) - 1))
+    conn.execute(_entry_sql(table, ""))
+
+
+# ============================================================================
+# SETUP
+# ============================================================================
+
+def init_register_search(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Create the search index and the triggers of every register table that
+    exists yet (called from the backends' init functions). A table gets its
+    existing rows indexed when its triggers are first created; afterwards the
+    triggers keep the index current.
+    """
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        conn.executescript(CREATE_SEARCH_TABLE)
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")}
+        for table in SEARCH_TABLES:
+            if table not in existing or f"trg_search_{table}_del" in existing:
+                continue
+            conn.executescript(_triggers_sql(table))
+            _reindex_table(conn, table)
+        conn.commit()
+        if all(table in existing for table in SEARCH_TABLES):
+            _initialized.add(DB_PATH)
+        return True
+    except Exception as e:
+        print(f"Error initializing register search: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+def ensure_register_search() -> None:
+    """Set the index up for readers that may run before any backend init (rechecked until every register exists)"""
+    if DB_PATH in _initialized:
+        return
+    with _init_lock:
+        if DB_PATH not in _initialized:
+            init_register_search()
+
+
+def rebuild_register_search() -> bool:
+    """Re-index every register from scratch"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_register_search(conn)
+        existing = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        conn.execute("DELETE FROM register_search")
+        for table in SEARCH_TABLES:
+            if table in existing:
+                conn.execute(_entry_sql(table, ""))
+        conn.execute("INSERT INTO register_search (register_search) VALUES ('optimize')")
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error rebuilding register search: {e}")
+        return False
+
+
+# ============================================================================
+# SEARCH
+# ============================================================================
+
+def to_match_query(text: str) -> str:
+    """
+    Free text to an FTS5 query: every word must match, each taken literally
+    (so permit numbers like WB-23/114 need no escaping), the last one as a prefix
+    """
+    terms = [term.replace('"', '""') for term in re.findall(r"[^\s\"]+", text or "")]
+    if not terms:
+        return ""
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def highlight_html(snippet: str) -> str:
+    """A snippet with its hits as <mark>, everything else HTML-escaped"""
+    return html.escape(snippet or "").replace(_HIT_START, "<mark>").replace(_HIT_END, "</mark>")
+
+
+def search(text: str, limit: int = 50, registers: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Best matches across the registers, most relevant first. Columns: register
+    (table), label, row_key, row_date, snippet (plain, hits wrapped in
+    \\x02...\\x03; see highlight_html) and score (bm25, lower is better).
+    Ordering by FTS5's own rank lets it pick the top hits without sorting
+    every match.
+    """
+    columns = ["register", "label", "row_key", "row_date", "snippet", "score"]
+    query = to_match_query(text)
+    if not query:
+        return pd.DataFrame(columns=columns)
+    ensure_register_search()
+    
+    where, params = "register_search MATCH ?", [query]
+    if registers:
+        where += f" AND register IN ({', '.join('?' for _ in registers)})"
+        params += list(registers)
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        df = pd.read_sql_query(f"""
+            SELECT register, row_key, row_date,
+                   snippet(register_search, 3, '{_HIT_START}', '{_HIT_END}', ' … ', 12) AS snippet,
+                   rank AS score
+            FROM register_search
+            WHERE {where}
+            ORDER BY rank
+            LIMIT ?
+        """, conn, params=params + [limit])
+        conn.close()
+    except Exception as e:
+        print(f"Register search error: {e}")
+        return pd.DataFrame(columns=columns)
+    df.insert(1, "label", df["register"].map(lambda table: SEARCH_TABLES[table][0]))
+    return df[columns]
+
+
+def index_counts() -> Dict[str, int]:
+    """Indexed rows per register"""
+    ensure_register_search()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return {
+            SEARCH_TABLES[table][0]: count
+            for table, count in conn.execute("SELECT register, COUNT(*) FROM register_search GROUP BY register")
+        }
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search every register, or rebuild the search index.")
+    parser.add_argument("query", nargs="?", help="Words to search for")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every register")
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    
+    if args.rebuild:
+        print("✅ Search index rebuilt" if rebuild_register_search() else "❌ Rebuild failed")
+        print(index_counts())
+    if args.query:
+        hits = search(args.query, limit=args.limit)
+        for hit in hits.itertuples():
+            text = hit.snippet.replace(_HIT_START, "[").replace(_HIT_END, "]")
+            print(f"{hit.label:<12} {hit.row_key:<14} {hit.row_date or '':<10}  {text}")
+        print(f"{len(hits)} hits")
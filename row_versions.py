@@ -0,0 +1,130 @@
+"""
+Row Versions - Optimistic concurrency for register writes
+Every register row carries a row_version that each write bumps. A save names
+the version its data was read at, so an operator on another session can no
+longer overwrite a record silently: the second writer gets a conflict instead
+"""
+
+import sqlite3
+from typing import Dict, Optional
+
+ROW_VERSION_COLUMN = "row_version"
+
+
+class ConcurrentUpdateError(Exception):
+    """The record was written by another session after it was read"""
+    
+    def __init__(self, table: str, record_id: str, expected_version: int, current_version: Optional[int]):
+        self.table = table
+        self.record_id = record_id
+        self.expected_version = expected_version
+        self.current_version = current_version
+        if expected_version == 0:
+            detail = "it was created by another session"
+        elif current_version is None:
+            detail = "it has been deleted"
+        else:
+            detail = f"it is now at version {current_version}, not {expected_version}"
+        super().__init__(f"{record_id} in {table} was changed by another user ({detail}). Reload and try again.")
+
+
+def ensure_row_version(conn: sqlite3.Connection, table: str) -> None:
+    """Add the row_version column to a table created before it existed"""
+    columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    if columns and ROW_VERSION_COLUMN not in columns:
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {ROW_VERSION_COLUMN} INTEGER NOT NULL DEFAULT 1")
+        conn.commit()
+
+
+def next_record_id(conn: sqlite3.Connection, table: str, key: str, prefix: str) -> str:
+    """First free '{prefix}{n:04d}' ID, counting on from the number of rows in the table"""
+    n = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] + 1
+    while conn.execute(f"SELECT 1 FROM {table} WHERE {key} = ?", (f"{prefix}{n:04d}",)).fetchone():
+        n += 1
+    return f"{prefix}{n:04d}"
+
+
+def _current_version(conn: sqlite3.Connection, table: str, key: str, record_id) -> Optional[int]:
+    row = conn.execute(f"SELECT {ROW_VERSION_COLUMN} FROM {table} WHERE {key} = ?", (record_id,)).fetchone()
+    return row[0] if row else None
+
+
+def read_version(conn: sqlite3.Connection, table: str, key: str, record_id) -> int:
+    """Version to hand back with an edit of this record; 0 if it does not exist yet"""
+    return _current_version(conn, table, key, record_id) or 0
+
+
+def save_row(conn: sqlite3.Connection, table: str, key: str, data_dict: Dict,
+             expected_version: Optional[int] = None, id_prefix: Optional[str] = None,
+             natural_key: Optional[str] = None) -> int:
+    """
+    Write one register row in its own transaction (a savepoint when conn is
+    already in one, as on the database writer) and return its new row_version.
+    
+    expected_version None upserts unconditionally (derived records such as the
+    daily synopsis); 0 inserts a new row; n updates the row only while it is still
+    at version n. A row without a key value takes the ID of the row with the same
+    natural_key value (a UNIQUE column such as the synopsis date) if there is one,
+    and otherwise the next free ID for id_prefix, inside the same transaction.
+    Raises ConcurrentUpdateError on a version mismatch.
+    """
+    data = {col: val for col, val in data_dict.items() if col != ROW_VERSION_COLUMN}
+    
+    nested = conn.in_transaction
+    conn.execute("SAVEPOINT save_row" if nested else "BEGIN IMMEDIATE")
+    try:
+        if not data.get(key) and natural_key and data.get(natural_key) is not None:
+            row = conn.execute(f"SELECT {key} FROM {table} WHERE {natural_key} = ?",
+                               (data[natural_key],)).fetchone()
+            if row:
+                data[key] = data_dict[key] = row[0]
+        if not data.get(key):
+            if id_prefix is None:
+                raise ValueError(f"No {key} given and no ID prefix to generate one")
+            data[key] = next_record_id(conn, table, key, id_prefix)
+            data_dict[key] = data[key]
+            expected_version = 0
+        
+        columns = list(data.keys())
+        values = [data[col] for col in columns]
+        updates = [col for col in columns if col != key]
+        
+        if expected_version is None:
+            cursor = conn.execute(f"""
+                INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+                ON CONFLICT({key}) DO UPDATE SET
+                    {', '.join(f'{col} = excluded.{col}' for col in updates)},
+                    {ROW_VERSION_COLUMN} = {ROW_VERSION_COLUMN} + 1
+            """, values)
+        elif expected_version == 0:
+            cursor = conn.execute(f"""
+                INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})
+                ON CONFLICT({key}) DO NOTHING
+            """, values)
+        else:
+            cursor = conn.execute(f"""
+                UPDATE {table} SET
+                    {', '.join(f'{col} = ?' for col in updates)},
+                    {ROW_VERSION_COLUMN} = {ROW_VERSION_COLUMN} + 1
+                WHERE {key} = ? AND {ROW_VERSION_COLUMN} = ?
+            """, [data[col] for col in updates] + [data[key], expected_version])
+        
+        if cursor.rowcount == 0:
+            raise ConcurrentUpdateError(table, data[key], expected_version,
+                                        _current_version(conn, table, key, data[key]))
+        
+        version = _current_version(conn, table, key, data[key])
+        if nested:
+            conn.execute("RELEASE save_row")
+        else:
+            conn.commit()
+    except Exception:
+        if nested:
+            conn.execute("ROLLBACK TO save_row")
+            conn.execute("RELEASE save_row")
+        else:
+            conn.rollback()
+        raise
+    
+    data_dict[ROW_VERSION_COLUMN] = version
+    return version
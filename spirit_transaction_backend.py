@@ -1,7 +1,7 @@
 import os
 import sqlite3
 from datetime import datetime, date
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 import pandas as pd
 import streamlit as st
@@ -16,15 +16,19 @@ from spirit_transaction_sqlite_schema import (
     CREATE_SPIRIT_TRANSACTION_TABLE,
     CREATE_SPIRIT_TRANSACTION_INDEXES,
 )
+from row_versions import ConcurrentUpdateError, ensure_row_version, read_version, save_row
+from backup_journal import BackupJournal
+import changelog
+import db_writer
+import period_close
 
 CSV_PATH = "backup_data/spirit_transaction_data.csv"
 DB_PATH = "excise_registers.db"
+BACKUP = BackupJournal(CSV_PATH, "txn_date", SPIRIT_TRANSACTION_COLUMNS)
 
-
-def _ensure_backup_dir():
-    backup_dir = os.path.dirname(CSV_PATH)
-    if backup_dir:
-        os.makedirs(backup_dir, exist_ok=True)
+# Change log consumer that recomputes the days whose source records changed
+CHANGELOG_CONSUMER = "spirit_transaction"
+SOURCE_TABLES = ["reg76_receipts", "reg74_operations", "rega_production", "reg78_synopsis"]
 
 
 def _as_date(value) -> Optional[date]:
@@ -51,6 +55,9 @@ def init_sqlite_db():
         cursor.executescript(CREATE_SPIRIT_TRANSACTION_TABLE)
         cursor.executescript(CREATE_SPIRIT_TRANSACTION_INDEXES)
         conn.commit()
+        ensure_row_version(conn, "spirit_transaction_daily")
+        changelog.init_changelog(conn)
+        period_close.init_period_close(conn)
         conn.close()
     except Exception as e:
         st.error(f"SQLite initialization error: {e}")
@@ -70,36 +77,27 @@ def get_data_from_sqlite() -> pd.DataFrame:
         return pd.DataFrame(columns=SPIRIT_TRANSACTION_COLUMNS)
 
 
-def save_to_sqlite(data_dict: Dict) -> bool:
-    """Save record to SQLite database"""
+def save_to_sqlite(data_dict: Dict, expected_version: Optional[int] = None) -> bool:
+    """
+    Upsert the day's row. With expected_version set, the write only succeeds if
+    nobody has saved the day since that version was read (ConcurrentUpdateError).
+    """
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        columns = list(data_dict.keys())
-        placeholders = ", ".join(["?" for _ in columns])
-        column_names = ", ".join(columns)
-        values = [data_dict[col] for col in columns]
-
-        query = (
-            f"INSERT OR REPLACE INTO spirit_transaction_daily "
-            f"({column_names}) VALUES ({placeholders})"
-        )
-        cursor.execute(query, values)
-
-        conn.commit()
-        conn.close()
+        db_writer.write(save_row, "spirit_transaction_daily", "txn_date", data_dict, expected_version,
+                        db_path=DB_PATH)
         return True
+    except ConcurrentUpdateError:
+        raise
     except Exception as e:
         st.error(f"SQLite save error: {e}")
         return False
 
 
 def get_data_local() -> pd.DataFrame:
-    """Load local CSV fallback"""
-    if os.path.exists(CSV_PATH):
+    """Load local CSV fallback (snapshot plus any journaled saves not yet compacted)"""
+    if os.path.exists(CSV_PATH) or os.path.exists(BACKUP.journal_dir):
         try:
-            return pd.read_csv(CSV_PATH)
+            return BACKUP.read()
         except Exception:
             return pd.DataFrame(columns=SPIRIT_TRANSACTION_COLUMNS)
     return pd.DataFrame(columns=SPIRIT_TRANSACTION_COLUMNS)
@@ -216,9 +214,26 @@ def _load_reg78_sample(conn: sqlite3.Connection, target_date: str) -> float:
         return 0.0
 
 
-def _get_latest_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date) -> float:
+def _load_reg74_for_balances(conn: sqlite3.Connection, target_date: date):
+    """
+    Reg-74 operations for target_date's VAT balances, and the balances they
+    carry on from: with a sealed period before the date, only operations after
+    it are read and its snapshot supplies the earlier balances.
+    """
+    snapshot = period_close.latest_snapshot(before=target_date, conn=conn)
+    if snapshot is None:
+        return pd.read_sql_query("SELECT * FROM reg74_operations", conn), {}
+    reg74_df = pd.read_sql_query(
+        "SELECT * FROM reg74_operations WHERE operation_date > ? ORDER BY rowid",
+        conn,
+        params=(snapshot["period_end"],),
+    )
+    return reg74_df, snapshot["payload"]["vat_closing_al"]
+
+
+def _get_latest_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date, default: float = 0.0) -> float:
     if reg74_df.empty:
-        return 0.0
+        return default
     df = reg74_df.copy()
     df["operation_date_dt"] = pd.to_datetime(df["operation_date"]).dt.date
     df = df[
@@ -226,15 +241,15 @@ def _get_latest_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date)
         & ((df["source_vat"] == vat) | (df["destination_vat"] == vat))
     ]
     if df.empty:
-        return 0.0
+        return default
     df = df.sort_values("operation_date_dt")
     latest = df.iloc[-1]
     return float(latest.get("closing_al") or 0.0)
 
 
-def _get_opening_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date) -> float:
+def _get_opening_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date, default: float = 0.0) -> float:
     if reg74_df.empty:
-        return 0.0
+        return default
     df = reg74_df.copy()
     df["operation_date_dt"] = pd.to_datetime(df["operation_date"]).dt.date
     df = df[
@@ -242,18 +257,20 @@ def _get_opening_vat_balance(reg74_df: pd.DataFrame, vat: str, target_date: date
         & ((df["source_vat"] == vat) | (df["destination_vat"] == vat))
     ]
     if df.empty:
-        return 0.0
+        return default
     df = df.sort_values("operation_date_dt")
     latest = df.iloc[-1]
     return float(latest.get("closing_al") or 0.0)
 
 
-def _compute_vat_totals(reg74_df: pd.DataFrame, vats, target_date: date) -> Dict[str, float]:
+def _compute_vat_totals(reg74_df: pd.DataFrame, vats, target_date: date,
+                        carried: Optional[Dict[str, float]] = None) -> Dict[str, float]:
     opening_total = 0.0
     closing_total = 0.0
     for vat in vats:
-        opening_total += _get_opening_vat_balance(reg74_df, vat, target_date)
-        closing_total += _get_latest_vat_balance(reg74_df, vat, target_date)
+        carried_al = float((carried or {}).get(vat, 0.0))
+        opening_total += _get_opening_vat_balance(reg74_df, vat, target_date, carried_al)
+        closing_total += _get_latest_vat_balance(reg74_df, vat, target_date, carried_al)
     return {"opening": float(opening_total), "closing": float(closing_total)}
 
 
@@ -265,15 +282,15 @@ def compute_spirit_transaction_row(target_date) -> Dict[str, float]:
 
     conn = sqlite3.connect(DB_PATH)
 
-    reg74_df = pd.read_sql_query("SELECT * FROM reg74_operations", conn)
+    reg74_df, carried = _load_reg74_for_balances(conn, target_date_obj)
     reg76_summary = _load_reg76_daily(conn, target_date_str)
     rega_summary = _load_rega_daily(conn, target_date_str)
     sample_drawn = _load_reg78_sample(conn, target_date_str)
 
     conn.close()
 
-    vat_totals_sst = _compute_vat_totals(reg74_df, SST_VATS, target_date_obj)
-    vat_totals_brt = _compute_vat_totals(reg74_df, BRT_VATS, target_date_obj)
+    vat_totals_sst = _compute_vat_totals(reg74_df, SST_VATS, target_date_obj, carried)
+    vat_totals_brt = _compute_vat_totals(reg74_df, BRT_VATS, target_date_obj, carried)
 
     reg74_day = reg74_df.copy()
     if not reg74_day.empty:
@@ -364,11 +381,11 @@ def validate_reconciliation(row: Dict[str, float], target_date) -> (str, str):
         return "warning", "Invalid date for reconciliation"
 
     conn = sqlite3.connect(DB_PATH)
-    reg74_df = pd.read_sql_query("SELECT * FROM reg74_operations", conn)
+    reg74_df, carried = _load_reg74_for_balances(conn, target_date_obj)
     conn.close()
 
-    vat_totals_sst = _compute_vat_totals(reg74_df, SST_VATS, target_date_obj)
-    vat_totals_brt = _compute_vat_totals(reg74_df, BRT_VATS, target_date_obj)
+    vat_totals_sst = _compute_vat_totals(reg74_df, SST_VATS, target_date_obj, carried)
+    vat_totals_brt = _compute_vat_totals(reg74_df, BRT_VATS, target_date_obj, carried)
 
     strong_diff = abs(row.get("strong_spirit_closing_balance", 0.0) - vat_totals_sst["closing"])
     blended_diff = abs(row.get("blended_spirit_closing_balance", 0.0) - vat_totals_brt["closing"])
@@ -401,8 +418,9 @@ def save_record(data_dict: Dict) -> Optional[str]:
         data_dict["recon_status"] = recon_status
         data_dict["recon_note"] = recon_note
 
+    expected_version = data_dict.pop("row_version", None)
     init_sqlite_db()
-    success_sqlite = save_to_sqlite(data_dict)
+    success_sqlite = save_to_sqlite(data_dict, expected_version)
     if not success_sqlite:
         st.error("Failed to save Spirit Transaction to SQLite")
         return None
@@ -417,11 +435,7 @@ def save_record(data_dict: Dict) -> Optional[str]:
         st.warning(f"Desktop Excel save failed: {e}")
 
     try:
-        _ensure_backup_dir()
-        df_local = get_data_local()
-        df_local = df_local[df_local["txn_date"].astype(str) != txn_date] if not df_local.empty else df_local
-        df_local = pd.concat([df_local, pd.DataFrame([data_dict])], ignore_index=True)
-        df_local.to_csv(CSV_PATH, index=False)
+        BACKUP.append_upsert(data_dict)
     except Exception as e:
         st.warning(f"CSV backup failed: {e}")
 
@@ -433,6 +447,45 @@ def refresh_for_date(target_date) -> Optional[str]:
     return save_record(row)
 
 
+def refresh_changed_dates() -> List[str]:
+    """
+    Recompute every day whose Reg-76, Reg-74, Reg-A or Reg-78 records changed
+    since the last run, from any session, and checkpoint the change log. A day
+    that fails to save stays after the cursor and is retried next time; a day
+    inside a sealed period cannot be rewritten, so its changes are passed over.
+    Returns the dates refreshed.
+    """
+    changes = changelog.read_changes(CHANGELOG_CONSUMER, SOURCE_TABLES)
+    if changes.empty:
+        return []
+    
+    changes["txn_date"] = changes["row_date"].map(_as_date_str)
+    changes = changes.dropna(subset=["txn_date"])
+    sealed_through = period_close.get_sealed_through()
+    refreshed, failed_seqs = [], []
+    for txn_date, day_changes in changes.groupby("txn_date", sort=True):
+        if sealed_through and _as_date(txn_date) <= sealed_through:
+            continue
+        if refresh_for_date(txn_date):
+            refreshed.append(txn_date)
+        else:
+            failed_seqs.append(int(day_changes["seq"].min()))
+    
+    last_seq = min(failed_seqs) - 1 if failed_seqs else int(changes["seq"].max())
+    changelog.advance_cursor(CHANGELOG_CONSUMER, last_seq)
+    return refreshed
+
+
+def get_row_version(target_date) -> int:
+    """Stored version of the day's row (0 if not saved yet), to send back with an edit"""
+    init_sqlite_db()
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        return read_version(conn, "spirit_transaction_daily", "txn_date", _as_date_str(target_date))
+    finally:
+        conn.close()
+
+
 def get_spirit_transaction(date_from=None, date_to=None) -> pd.DataFrame:
     df = get_data()
     if df is None or df.empty:
@@ -37,7 +37,8 @@ CREATE TABLE IF NOT EXISTS spirit_transaction_daily (
 
     status TEXT NOT NULL DEFAULT 'draft',
     created_at TEXT NOT NULL,
-    updated_at TEXT
+    updated_at TEXT,
+    row_version INTEGER NOT NULL DEFAULT 1
 );
 """
 
@@ -0,0 +1,274 @@
+"""
+Tank Calibration - Dip-to-volume conversion for SST/BRT VATs
+Calibration charts are stored per VAT in SQLite and held in memory as sorted
+NumPy arrays, so single readings and whole Reg-74 histories convert by interpolation
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+import pandas as pd
+
+import db_writer
+import period_close
+from reg74_schema import ALL_VATS
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DB_PATH = "excise_registers.db"
+
+CREATE_TANK_CALIBRATION_TABLE = """
+CREATE TABLE IF NOT EXISTS tank_calibration (
+    vat_no TEXT NOT NULL,
+    dip_cm REAL NOT NULL,
+    volume_bl REAL NOT NULL,
+    chart_ref TEXT,
+    created_at TEXT NOT NULL,
+    
+    PRIMARY KEY (vat_no, dip_cm)
+);
+"""
+
+# {vat_no: (dips_cm, volumes_bl)} - both sorted ascending by dip
+_charts: Optional[Dict[str, Tuple[np.ndarray, np.ndarray]]] = None
+_charts_lock = threading.Lock()
+
+
+# ============================================================================
+# CHART STORAGE
+# ============================================================================
+
+def init_calibration_table(conn: Optional[sqlite3.Connection] = None):
+    """Create the tank_calibration table if it doesn't exist"""
+    own_conn = conn is None
+    if own_conn:
+        conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.executescript(CREATE_TANK_CALIBRATION_TABLE)
+        conn.commit()
+    finally:
+        if own_conn:
+            conn.close()
+
+
+def save_calibration_chart(vat_no: str, dips_cm, volumes_bl, chart_ref: str = "") -> Tuple[bool, str]:
+    """Replace the calibration chart of one VAT"""
+    dips = np.asarray(dips_cm, dtype=float)
+    volumes = np.asarray(volumes_bl, dtype=float)
+    
+    if len(dips) < 2 or len(dips) != len(volumes):
+        return False, "❌ A chart needs at least two matching dip/volume points"
+    
+    order = np.argsort(dips)
+    dips, volumes = dips[order], volumes[order]
+    if np.any(np.diff(dips) == 0):
+        return False, f"❌ Duplicate dip values in chart for {vat_no}"
+    if np.any(np.diff(volumes) < 0):
+        return False, f"❌ Volume must not decrease with dip in chart for {vat_no}"
+    
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_calibration_table(conn)
+        now = datetime.now().isoformat()
+        with conn:
+            conn.execute("DELETE FROM tank_calibration WHERE vat_no = ?", (vat_no,))
+            conn.executemany(
+                "INSERT INTO tank_calibration (vat_no, dip_cm, volume_bl, chart_ref, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(vat_no, float(d), float(v), chart_ref, now) for d, v in zip(dips, volumes)]
+            )
+        conn.close()
+        invalidate_chart_cache()
+        return True, f"✅ Calibration chart saved for {vat_no} ({len(dips)} points)"
+    except Exception as e:
+        return False, f"❌ Error saving calibration chart: {str(e)}"
+
+
+def import_calibration_csv(csv_source, chart_ref: str = "") -> Tuple[bool, str]:
+    """
+    Import calibration charts from a CSV with columns vat_no, dip_cm, volume_bl.
+    
+    csv_source may be a path or a file-like object (e.g. a Streamlit upload).
+    Every VAT present in the file has its chart replaced.
+    """
+    try:
+        df = pd.read_csv(csv_source)
+        df.columns = [c.strip().lower() for c in df.columns]
+        missing = {"vat_no", "dip_cm", "volume_bl"} - set(df.columns)
+        if missing:
+            return False, f"❌ Missing columns: {', '.join(sorted(missing))}"
+        
+        if not chart_ref and isinstance(csv_source, str):
+            chart_ref = os.path.basename(csv_source)
+        
+        messages = []
+        for vat_no, chart in df.groupby("vat_no"):
+            ok, msg = save_calibration_chart(str(vat_no).strip(), chart["dip_cm"], chart["volume_bl"], chart_ref)
+            if not ok:
+                return False, msg
+            messages.append(str(vat_no))
+        return True, f"✅ Imported calibration charts for {', '.join(messages)}"
+    except Exception as e:
+        return False, f"❌ Error importing calibration CSV: {str(e)}"
+
+
+def _load_charts() -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    global _charts
+    charts = _charts
+    if charts is not None:
+        return charts
+    
+    with _charts_lock:
+        if _charts is None:
+            conn = sqlite3.connect(DB_PATH)
+            try:
+                init_calibration_table(conn)
+                df = pd.read_sql_query(
+                    "SELECT vat_no, dip_cm, volume_bl FROM tank_calibration ORDER BY vat_no, dip_cm", conn
+                )
+            finally:
+                conn.close()
+            _charts = {
+                vat_no: (chart["dip_cm"].to_numpy(dtype=float), chart["volume_bl"].to_numpy(dtype=float))
+                for vat_no, chart in df.groupby("vat_no")
+            }
+        return _charts
+
+
+def invalidate_chart_cache():
+    """Force the next lookup to reload charts from the database"""
+    global _charts
+    with _charts_lock:
+        _charts = None
+
+
+def get_calibrated_vats() -> list:
+    """VATs that have a calibration chart"""
+    return sorted(_load_charts().keys())
+
+
+def get_chart_range(vat_no: str) -> Optional[Tuple[float, float]]:
+    """Lowest and highest calibrated dip (cm) for a VAT"""
+    chart = _load_charts().get(vat_no)
+    if chart is None:
+        return None
+    return float(chart[0][0]), float(chart[0][-1])
+
+
+# ============================================================================
+# DIP → VOLUME CONVERSION
+# ============================================================================
+
+def dip_to_bl(vat_no: str, dip_cm):
+    """
+    Convert dip reading(s) to bulk litres by linear interpolation on the VAT's chart.
+    
+    Accepts a scalar or array-like; returns the same shape. Dips outside the
+    calibrated range, or VATs without a chart, give NaN.
+    """
+    chart = _load_charts().get(vat_no)
+    dips = np.asarray(dip_cm, dtype=float)
+    if chart is None:
+        result = np.full(dips.shape, np.nan)
+    else:
+        result = np.interp(dips, chart[0], chart[1], left=np.nan, right=np.nan)
+    return float(result) if result.ndim == 0 else result
+
+
+def _dip_vat(operation_type: str, source_vat: str, destination_vat: str) -> str:
+    """VAT whose closing stock the post-operation dip measures"""
+    if destination_vat in ALL_VATS:
+        return destination_vat
+    return source_vat
+
+
+def _write_dip_volumes(conn: sqlite3.Connection, rows: List[Tuple]) -> int:
+    """Store re-derived dip volumes where they changed; runs on the database writer"""
+    now = datetime.now().isoformat()
+    return conn.executemany("""
+        UPDATE reg74_operations
+        SET dip_calculated_bl = ?, dip_variance_bl = ?, updated_at = ?, row_version = row_version + 1
+        WHERE reg74_id = ? AND (dip_calculated_bl IS NOT ? OR dip_variance_bl IS NOT ?)
+    """, [(calculated, variance, now, reg74_id, calculated, variance) for calculated, variance, reg74_id in rows]).rowcount
+
+
+def rederive_dip_volumes(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                         write_back: bool = False) -> pd.DataFrame:
+    """
+    Re-derive every dip-based volume in reg74_operations from the current charts.
+    
+    Each VAT's readings are converted in one vectorized interpolation. Returns one
+    row per operation with the opening and closing dip volumes and their variance
+    against the recorded actual opening / closing BL. With write_back=True the
+    dip_calculated_bl and dip_variance_bl columns of operations after the last
+    sealed period are updated in a single batch (bumping row_version of the
+    rows that changed, so open edit forms notice).
+    """
+    conn = sqlite3.connect(DB_PATH)
+    query = """
+        SELECT reg74_id, operation_date, operation_type, source_vat, destination_vat,
+               opening_dip_cm, actual_opening_bl, dip_reading_cm, closing_bl
+        FROM reg74_operations
+        WHERE (dip_reading_cm > 0 OR opening_dip_cm > 0)
+    """
+    params = []
+    if start_date and end_date:
+        query += " AND operation_date BETWEEN ? AND ?"
+        params = [str(start_date), str(end_date)]
+    query += " ORDER BY operation_date"
+    
+    try:
+        df = pd.read_sql_query(query, conn, params=params if params else None)
+    finally:
+        conn.close()
+    
+    if df.empty:
+        return df
+    
+    df = df.fillna({"source_vat": "", "destination_vat": "", "opening_dip_cm": 0.0,
+                    "dip_reading_cm": 0.0, "actual_opening_bl": 0.0, "closing_bl": 0.0})
+    df["dip_vat"] = [
+        _dip_vat(op, src, dst)
+        for op, src, dst in zip(df["operation_type"], df["source_vat"], df["destination_vat"])
+    ]
+    
+    df["opening_dip_bl"] = np.nan
+    df["dip_calculated_bl"] = np.nan
+    
+    for vat_no, idx in df.groupby("source_vat").groups.items():
+        dips = df.loc[idx, "opening_dip_cm"].to_numpy(dtype=float)
+        df.loc[idx, "opening_dip_bl"] = np.where(dips > 0, dip_to_bl(vat_no, dips), np.nan)
+    
+    for vat_no, idx in df.groupby("dip_vat").groups.items():
+        dips = df.loc[idx, "dip_reading_cm"].to_numpy(dtype=float)
+        df.loc[idx, "dip_calculated_bl"] = np.where(dips > 0, dip_to_bl(vat_no, dips), np.nan)
+    
+    df["opening_dip_variance_bl"] = df["actual_opening_bl"] - df["opening_dip_bl"]
+    df["dip_variance_bl"] = df["closing_bl"] - df["dip_calculated_bl"]
+    
+    if write_back:
+        updates = df.dropna(subset=["dip_calculated_bl"])
+        sealed_through = period_close.get_sealed_through()
+        if sealed_through:
+            updates = updates[updates["operation_date"].astype(str).str[:10] > str(sealed_through)]
+        if not updates.empty:
+            rows = list(zip(updates["dip_calculated_bl"].round(3).astype(float),
+                            updates["dip_variance_bl"].round(3).astype(float),
+                            updates["reg74_id"]))
+            try:
+                written = db_writer.write(_write_dip_volumes, rows, db_path=DB_PATH)
+                logger.info(f"✅ Re-derived dip volumes stored for {written} Reg-74 operations")
+            except Exception as e:
+                logger.error(f"❌ Error storing re-derived dip volumes: {e}")
+    
+    return df[[
+        "reg74_id", "operation_date", "operation_type", "dip_vat",
+        "opening_dip_cm", "opening_dip_bl", "actual_opening_bl", "opening_dip_variance_bl",
+        "dip_reading_cm", "dip_calculated_bl", "closing_bl", "dip_variance_bl"
+    ]]
@@ -1,14 +1,18 @@
+import numpy as np
 import pandas as pd
 
 def calculate_bl(weight_kg, density_gm_cc):
-    """Calculate Bulk Liters from Weight (kg) and Density (gm/cc)"""
-    if density_gm_cc and density_gm_cc > 0:
-        return weight_kg / density_gm_cc
-    return 0.0
+    """Calculate Bulk Liters from Weight (kg) and Density (gm/cc); scalars or arrays, zero where density is missing"""
+    mass = np.asarray(weight_kg, dtype=float)
+    density = np.asarray(density_gm_cc, dtype=float)
+    safe = np.where(density > 0, density, 1.0)
+    result = np.where(density > 0, mass / safe, 0.0)
+    return float(result) if result.ndim == 0 else result
 
 def calculate_al(bl, strength_perc):
-    """Calculate Alcohol Liters from BL and Strength (% v/v)"""
-    return bl * (strength_perc / 100)
+    """Calculate Alcohol Liters from BL and Strength (% v/v); scalars or arrays"""
+    result = np.asarray(bl, dtype=float) * np.asarray(strength_perc, dtype=float) / 100
+    return float(result) if result.ndim == 0 else result
 
 def calculate_transit_days(dispatch_date, receipt_date):
     """Calculate days in transit"""
@@ -0,0 +1,179 @@
+"""
+Work Queues - Open Reg-76 receipts and open Reg-74 batches
+Small tables kept current by triggers, so the Reg-74 and Reg-A entry forms
+list what is waiting to be processed without scanning either register
+"""
+
+import sqlite3
+import threading
+from typing import List, Optional
+
+from reg76_sqlite_schema import CREATE_REG76_TABLE
+from reg74_sqlite_schema import CREATE_REG74_TABLE
+
+DB_PATH = "excise_registers.db"
+
+# Databases whose queues this process has already set up
+_initialized = set()
+_init_lock = threading.Lock()
+
+# Reg-74 operations that leave spirit in a BRT ready for bottling
+BATCH_OPERATION_TYPES = ("Reduction/Blending", "Transfer SST to BRT")
+
+_BATCH_TYPES_SQL = ", ".join(f"'{t}'" for t in BATCH_OPERATION_TYPES)
+
+CREATE_WORK_QUEUE_TABLES = """
+CREATE TABLE IF NOT EXISTS wq_open_receipts (
+    reg76_id TEXT PRIMARY KEY,
+    date_receipt TEXT
+);
+
+CREATE TABLE IF NOT EXISTS wq_open_batches (
+    batch_no TEXT PRIMARY KEY
+);
+"""
+
+CREATE_WORK_QUEUE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_wq_open_receipts_date ON wq_open_receipts(date_receipt);
+"""
+
+# Receipts are open until a Reg-74 operation references them; a batch is open
+# while any of its reduction/transfer operations closed with stock in the BRT.
+_REFRESH_BATCH = f"""
+        DELETE FROM wq_open_batches WHERE batch_no = {{ref}}.batch_no;
+        INSERT OR IGNORE INTO wq_open_batches (batch_no)
+        SELECT batch_no FROM reg74_operations
+        WHERE batch_no = {{ref}}.batch_no AND batch_no <> ''
+          AND operation_type IN ({_BATCH_TYPES_SQL})
+          AND closing_bl > 0
+        LIMIT 1;"""
+
+CREATE_WORK_QUEUE_TRIGGERS = f"""
+CREATE TRIGGER IF NOT EXISTS trg_wq_reg76_insert AFTER INSERT ON reg76_receipts
+BEGIN
+    INSERT OR IGNORE INTO wq_open_receipts (reg76_id, date_receipt)
+    SELECT NEW.reg76_id, NEW.date_receipt
+    WHERE NOT EXISTS (SELECT 1 FROM reg74_operations WHERE ref_reg76_id = NEW.reg76_id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_wq_reg76_delete AFTER DELETE ON reg76_receipts
+BEGIN
+    DELETE FROM wq_open_receipts WHERE reg76_id = OLD.reg76_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_wq_reg74_insert AFTER INSERT ON reg74_operations
+BEGIN
+    DELETE FROM wq_open_receipts WHERE reg76_id = NEW.ref_reg76_id;{_REFRESH_BATCH.format(ref="NEW")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_wq_reg74_update AFTER UPDATE ON reg74_operations
+BEGIN
+    DELETE FROM wq_open_receipts WHERE reg76_id = NEW.ref_reg76_id;
+    INSERT OR IGNORE INTO wq_open_receipts (reg76_id, date_receipt)
+    SELECT reg76_id, date_receipt FROM reg76_receipts
+    WHERE reg76_id = OLD.ref_reg76_id
+      AND NOT EXISTS (SELECT 1 FROM reg74_operations WHERE ref_reg76_id = OLD.ref_reg76_id);{_REFRESH_BATCH.format(ref="OLD")}{_REFRESH_BATCH.format(ref="NEW")}
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_wq_reg74_delete AFTER DELETE ON reg74_operations
+BEGIN
+    INSERT OR IGNORE INTO wq_open_receipts (reg76_id, date_receipt)
+    SELECT reg76_id, date_receipt FROM reg76_receipts
+    WHERE reg76_id = OLD.ref_reg76_id
+      AND NOT EXISTS (SELECT 1 FROM reg74_operations WHERE ref_reg76_id = OLD.ref_reg76_id);{_REFRESH_BATCH.format(ref="OLD")}
+END;
+"""
+
+# Full rebuild with the same rules, used when the queues are first created
+REBUILD_WORK_QUEUES = f"""
+DELETE FROM wq_open_receipts;
+INSERT INTO wq_open_receipts (reg76_id, date_receipt)
+SELECT r.reg76_id, r.date_receipt
+FROM reg76_receipts r
+WHERE NOT EXISTS (SELECT 1 FROM reg74_operations o WHERE o.ref_reg76_id = r.reg76_id);
+
+DELETE FROM wq_open_batches;
+INSERT INTO wq_open_batches (batch_no)
+SELECT DISTINCT batch_no FROM reg74_operations
+WHERE batch_no IS NOT NULL AND batch_no <> ''
+  AND operation_type IN ({_BATCH_TYPES_SQL})
+  AND closing_bl > 0;
+"""
+
+
+def init_work_queues(conn: Optional[sqlite3.Connection] = None) -> bool:
+    """
+    Create the work queue tables and their triggers (called from the register
+    backends' init_sqlite_db). The queues are filled from the registers the
+    first time they are created; afterwards the triggers keep them current on
+    every insert, update and delete.
+    """
+    own_conn = conn is None
+    try:
+        if own_conn:
+            conn = sqlite3.connect(DB_PATH)
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'wq_open_batches'"
+        ).fetchone()
+        
+        # Triggers from before empty batch numbers were filtered out are replaced
+        outdated = [
+            name for name, sql in conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_wq_reg74_%'"
+            ) if "batch_no <> ''" not in sql
+        ]
+        for name in outdated:
+            conn.execute(f"DROP TRIGGER {name}")
+        
+        conn.executescript(CREATE_REG76_TABLE)
+        conn.executescript(CREATE_REG74_TABLE)
+        conn.executescript(CREATE_WORK_QUEUE_TABLES)
+        conn.executescript(CREATE_WORK_QUEUE_INDEXES)
+        conn.executescript(CREATE_WORK_QUEUE_TRIGGERS)
+        if not exists or outdated:
+            conn.executescript(REBUILD_WORK_QUEUES)
+        conn.commit()
+        _initialized.add(DB_PATH)
+        return True
+    except Exception as e:
+        print(f"Error initializing work queues: {e}")
+        return False
+    finally:
+        if own_conn and conn is not None:
+            conn.close()
+
+
+def ensure_work_queues() -> None:
+    """Set the queues up once per process for readers that may run before any backend init"""
+    if DB_PATH in _initialized:
+        return
+    with _init_lock:
+        if DB_PATH not in _initialized:
+            init_work_queues()
+
+
+def rebuild_work_queues() -> bool:
+    """Re-derive both queues from the registers"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        init_work_queues(conn)
+        conn.executescript(REBUILD_WORK_QUEUES)
+        conn.commit()
+        conn.close()
+        return True
+    except Exception as e:
+        print(f"Error rebuilding work queues: {e}")
+        return False
+
+
+def get_open_batch_numbers() -> List[str]:
+    """Batch numbers with stock waiting in a BRT, sorted"""
+    try:
+        ensure_work_queues()
+        conn = sqlite3.connect(DB_PATH)
+        rows = conn.execute("SELECT batch_no FROM wq_open_batches ORDER BY batch_no").fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+    except Exception as e:
+        print(f"Error fetching open batches: {e}")
+        return []